@@ -0,0 +1,650 @@
+# THIS USES PYTHON 3
+
+# ASYNCIO ENGINE
+# SINGLE EVENT LOOP RUNTIME FOR THE MASTER CONTROLLER AND THE CLIENT
+# UDP CONTROL, PINGS, RETRANSMITS, WEB CONTROL, TASK TIMERS AND CHILD
+# PROCESSES ALL RUN OFF ONE LOOP SO THE THREAD COUNT DOESN'T GROW WITH
+# THE NUMBER OF CLIENTS OR TASKS
+
+# MODULE IMPORT
+import asyncio
+import functools
+import http
+import json
+import urllib.parse
+import signal
+import time
+import os
+import sys
+import logging
+# LOCAL MODULES
+import tasker
+import taskplan
+import supervisor
+import master_control
+import client
+import venue
+import events
+import metrics
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_SEC = tasker.NS_PER_SEC
+# EVERY COMMAND LEADS ITS OWN PROCESS GROUP, LIKE supervisor.posix_spawn
+NEW_PROCESS_GROUP = {"process_group": 0} if sys.version_info >= (3, 11) else {"start_new_session": True}
+
+# CLASSES
+class AsyncTasker(tasker.TaskerBase):
+    """
+    AsyncTasker - Runs a task list off event loop timers instead of a thread
+     - One timer is armed for the earliest deadline, nothing is armed when idle
+     - Commands are started as asyncio subprocesses and reaped by the loop
+    """
+    def __init__(self, plan, loop, **kwargs):
+        self.loop = loop
+        self._handle = None
+        tasker.TaskerBase.__init__(self, plan, **kwargs)
+
+    def _create_supervisor(self, **kwargs):
+        return AsyncSupervisor(self.loop, **kwargs)
+
+    def _call_at_ns(self, deadline, callback):
+        # loop.time() IS time.monotonic() SO TRANSLATE OUR NANOSECONDS INTO IT
+        early = self.spin_window_ns if self.precision else 0
+        when = self.loop.time() + (deadline - early - self.clock()) / NS_PER_SEC
+        self._handle = self.loop.call_at(when, callback)
+
+    def start(self):
+        self.start_at(self.clock())
+
+    def start_at(self, start_ns):
+        # ANCHOR THE TIMELINE AT start_ns (MONOTONIC NS)
+        if self.dead:
+            return
+        self.start_at_ns = start_ns
+        self._call_at_ns(start_ns, self._on_start)
+
+    def join(self, timeout=None):
+        # NOTHING TO JOIN, HERE SO THE CONTROLLER CAN TREAT US LIKE A Tasker
+        pass
+
+    def kill(self):
+        tasker.TaskerBase.kill(self)
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        if self.start_ns is not None:
+            self._finish()
+
+    def abort(self):
+        stopped = tasker.TaskerBase.abort(self)
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        # EVEN IF WE WERE STILL WAITING FOR THE START INSTANT
+        if self.start_at_ns is not None:
+            self._finish()
+        return stopped
+
+    # PAUSE, RESUME AND SEEK MOVE THE DEADLINES, RE-ARM FOR THE NEW ONE
+    def pause(self, at_ns=None, offset_ns=None):
+        return self._rearm(tasker.TaskerBase.pause(self, at_ns, offset_ns))
+
+    def resume(self, at_ns=None, offset_ns=None):
+        return self._rearm(tasker.TaskerBase.resume(self, at_ns, offset_ns))
+
+    def seek(self, offset_ns, at_ns=None):
+        return self._rearm(tasker.TaskerBase.seek(self, offset_ns, at_ns))
+
+    def _rearm(self, changed):
+        if changed:
+            if self._handle:
+                self._handle.cancel()
+                self._handle = None
+            self._schedule()
+        return changed
+
+    def _on_start(self):
+        self._handle = None
+        if self.precision:
+            self._spin_until(self.start_at_ns)
+        self._begin(self.start_at_ns)
+        self._schedule()
+
+    def _schedule(self):
+        # ARM A TIMER FOR THE EARLIEST DEADLINE, NOTHING WHILE PAUSED
+        if self.dead:
+            self._finish()
+        elif self.paused_ns is None and self._peek() is not None:
+            self._call_at_ns(self.start_ns + self._peek()[0], self._on_deadline)
+
+    def _on_deadline(self):
+        # RUN EVERYTHING THAT'S DUE THEN RE-ARM
+        self._handle = None
+        early = self.spin_window_ns if self.precision else 0
+        while self._peek() is not None and not self.dead:
+            deadline = self.start_ns + self._peek()[0]
+            if deadline - early > self.clock():
+                break
+            _, _, phase, task = self._pop()
+            if self.precision and phase == taskplan.CUE:
+                # THIS BLOCKS THE LOOP FOR AT MOST THE SPIN WINDOW
+                self._spin_until(deadline)
+            self._fire(deadline, phase, task)
+        self._schedule()
+
+
+class ChildProtocol(asyncio.subprocess.SubprocessStreamProtocol):
+    """
+    ChildProtocol - Subprocess protocol that says when the child exits
+    Process.wait() also waits for the pipes to close, which never happens
+    while a grandchild is holding them
+    """
+    def __init__(self, loop):
+        asyncio.subprocess.SubprocessStreamProtocol.__init__(self, supervisor.READ_CHUNK, loop)
+        self.exited = loop.create_future()
+        self.child_transport = None
+
+    def connection_made(self, transport):
+        asyncio.subprocess.SubprocessStreamProtocol.connection_made(self, transport)
+        self.child_transport = transport
+
+    def process_exited(self):
+        asyncio.subprocess.SubprocessStreamProtocol.process_exited(self)
+        if not self.exited.done():
+            self.exited.set_result(self.child_transport.get_returncode())
+
+
+class AsyncSupervisor(supervisor.SupervisorBase):
+    """
+    AsyncSupervisor - Task commands as asyncio subprocesses, the loop reaps
+    them, reads their output and runs their timeouts
+    """
+    def __init__(self, loop, **kwargs):
+        supervisor.SupervisorBase.__init__(self, **kwargs)
+        self.loop = loop
+
+    def _start(self, task, preload):
+        child = supervisor.Child(task, self.capture_bytes)
+        # THE GATE IS OPEN BEFORE THE CHILD IS, SO A RELEASE CAN'T BEAT THE SPAWN
+        gate = child.open_gate() if preload else None
+        self.children.append(child)
+        self.loop.create_task(self._run(child, gate))
+        return child
+
+    def _released(self, child):
+        if child.timeout_ns is not None:
+            self.loop.call_later(child.timeout_ns / NS_PER_SEC, self._timed_out, child)
+
+    def _resumed(self, children):
+        # RE-ARM THE TIMEOUTS, _timed_out WORKS OUT WHAT'S LEFT OF THEM
+        for child in children:
+            if child.timeout_ns is not None:
+                self._timed_out(child)
+
+    def _stop_children(self, children, reason):
+        now = time.monotonic_ns()
+        for child in children:
+            if child.state != supervisor.RUNNING:
+                continue
+            if child.proc is None:
+                # STILL SPAWNING, _run STOPS IT ONCE IT'S UP
+                # A GATE SHELL THAT FINDS ITS GATE CLOSED NEVER RUNS THE COMMAND
+                child.close_gate()
+                child.state = supervisor.STOPPED
+                continue
+            logger.info("STOPPING TASK {0} (PID {1}) ON {2}".format(child.idx, child.pid, reason))
+            self._stop(child, supervisor.STOPPED, now)
+
+    def _stop(self, child, state, now):
+        self._terminate(child, state, now)
+        self.loop.call_later(self.kill_grace_ns / NS_PER_SEC, self._maybe_escalate, child)
+
+    def _maybe_escalate(self, child):
+        if child.exit_code is None:
+            self._escalate(child)
+
+    def _timed_out(self, child):
+        if child.exit_code is not None or child.kill_at_ns is not None:
+            return
+        # PAUSES PUSH THE TIMEOUT BACK, A PAUSED CHILD IS RE-ARMED WHEN IT'S RESUMED
+        due = child.timeout_at_ns()
+        if due is None:
+            return
+        now = time.monotonic_ns()
+        if due > now:
+            self.loop.call_later((due - now) / NS_PER_SEC, self._timed_out, child)
+            return
+        logger.warning("TASK {0} (PID {1}) TIMED OUT AFTER {2:.3f} S".format(
+            child.idx, child.pid, child.timeout_ns / NS_PER_SEC))
+        self._stop(child, supervisor.TIMED_OUT, now)
+
+    async def _capture(self, stream, tail):
+        while True:
+            chunk = await stream.read(supervisor.READ_CHUNK)
+            if not chunk:
+                return
+            tail.feed(chunk)
+
+    async def _run(self, child, gate=None):
+        requested = time.monotonic_ns()
+        args = child.args
+        options = {}
+        if gate is not None:
+            if child.gated_stdin():
+                options["stdin"] = gate
+            else:
+                options["pass_fds"] = (gate,)
+                args = supervisor.gate_args(args, gate)
+        try:
+            transport, protocol = await self.loop.subprocess_exec(
+                lambda: ChildProtocol(self.loop), *args,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                **NEW_PROCESS_GROUP, **options)
+        except OSError as err:
+            self._failed(child, err)
+            self._check_quiet()
+            return
+        finally:
+            if gate is not None:
+                os.close(gate)
+        proc = asyncio.subprocess.Process(transport, protocol, self.loop)
+        child.started(proc, requested, time.monotonic_ns())
+        if child.state != supervisor.RUNNING:
+            # STOPPED WHILE IT WAS STARTING
+            self._stop(child, child.state, time.monotonic_ns())
+        readers = [self.loop.create_task(self._capture(proc.stdout, child.stdout)),
+                   self.loop.create_task(self._capture(proc.stderr, child.stderr))]
+        timer = None
+        if child.timeout_ns is not None and not child.preloaded:
+            timer = self.loop.call_later(child.timeout_ns / NS_PER_SEC, self._timed_out, child)
+        code = await protocol.exited
+        if timer:
+            timer.cancel()
+        # ANYTHING STILL HOLDING THE PIPES OPEN ISN'T OURS TO WAIT FOR
+        _, pending = await asyncio.wait(readers, timeout=supervisor.POLL_INTERVAL)
+        for reader in pending:
+            reader.cancel()
+        transport.close()
+        self._exited(child, code)
+        self._check_quiet()
+
+
+class AsyncWebControl(master_control.WebControlState):
+    """
+    AsyncWebControl - The web control page, JSON API and event stream served
+    from the event loop, every connection is its own coroutine
+    """
+    def __init__(self, callback=None, status=None, bus=None, control=None):
+        master_control.WebControlState.__init__(self, callback, status, bus, control)
+        self.server = None
+
+    async def start(self, address):
+        self.server = await asyncio.start_server(self._handle, address[0] or None, address[1],
+                                                 reuse_address=True)
+
+    def close(self):
+        if self.server:
+            self.server.close()
+
+    async def _handle(self, reader, writer):
+        # JUST ENOUGH HTTP FOR THE CONTROL PAGE, API AND EVENTS
+        try:
+            request = await reader.readline()
+            # SKIP THE HEADERS
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request.decode("latin-1").split()
+            state, target = self.route(parts[1]) if len(parts) >= 2 else (None, None)
+            if len(parts) < 2 or parts[0] not in ("GET", "POST"):
+                writer.write(b"HTTP/1.0 405 Method Not Allowed\r\n\r\n")
+            elif state is None:
+                self._respond(writer, 404, "application/json", json.dumps({"RESULT": "UNKNOWN ROOM"}))
+            else:
+                method = parts[0]
+                path = urllib.parse.urlparse(target).path
+                if path == master_control.EVENTS_PATH and method == "GET":
+                    await self._stream_events(writer, state)
+                elif path == metrics.METRICS_PATH and method == "GET":
+                    self._respond(writer, 200, metrics.CONTENT_TYPE, state.metrics.render())
+                elif path.startswith(master_control.API_PREFIX):
+                    code, payload = state.api(method, target)
+                    self._respond(writer, code, "application/json", json.dumps(payload, default=str))
+                elif method == "GET":
+                    self._respond(writer, 200, "text/html", state.page(target))
+                else:
+                    writer.write(b"HTTP/1.0 405 Method Not Allowed\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, code, content_type, text):
+        body = str.encode(text)
+        writer.write("HTTP/1.0 {0} {1}\r\nContent-type: {2}\r\n".format(
+            code, http.HTTPStatus(code).phrase, content_type).encode())
+        writer.write("Content-Length: {0}\r\n\r\n".format(len(body)).encode())
+        writer.write(body)
+
+    async def _stream_events(self, writer, state):
+        # SERVER-SENT EVENTS - IF THE BROWSER CAN'T KEEP UP THE BUS DROPS US
+        # AND WE HANG UP SO IT RECONNECTS
+        backlog = asyncio.Queue(maxsize=events.SUBSCRIBER_BACKLOG)
+        dropped = asyncio.Event()
+
+        def deliver(event):
+            try:
+                backlog.put_nowait(event)
+            except asyncio.QueueFull:
+                dropped.set()
+                return False
+            return True
+
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n\r\n")
+        writer.write(state.status_event().to_sse())
+        await writer.drain()
+        state.events.subscribe(deliver)
+        try:
+            while not dropped.is_set():
+                try:
+                    event = await asyncio.wait_for(backlog.get(), events.KEEPALIVE)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                else:
+                    writer.write(event.to_sse())
+                await writer.drain()
+        finally:
+            state.events.unsubscribe(deliver)
+
+
+class AsyncController(master_control.Controller):
+    """
+    AsyncController - Controller whose socket, pings, retransmits, web
+    control and tasker all run on one asyncio loop
+    """
+    def __init__(self, server_address, RequestHandlerClass, config, loop, **kwargs):
+        self.loop = loop
+        self._ping_handle = None
+        self._delivery_handle = None
+        self._delivery_due = None
+        self._stopped = loop.create_future()
+        master_control.Controller.__init__(self, server_address, RequestHandlerClass, config, **kwargs)
+
+    def _create_tasker(self):
+        # THE LOOP TELLS US WHEN THE TASKS ARE DONE, NO POLLING NEEDED
+        return AsyncTasker(self.plan, self.loop, on_done=self.service_actions,
+                           on_fire=self._task_fired,
+                           **tasker.options_from_config(self.config, self.debug))
+
+    def _start_services(self):
+        # NOTHING GETS A THREAD, serve() HOOKS EVERYTHING INTO THE LOOP
+        self.delivery.on_pending = self._arm_delivery
+        self.webcontrol = AsyncWebControl(callback=self.start_all, status=self.get_status,
+                                          bus=self.events, control=self.control)
+
+    async def serve(self):
+        # UDP REQUESTS ARE HANDLED BY THE SAME ControllerHandler AS THE THREADED ENGINE
+        self.socket.setblocking(False)
+        self.loop.add_reader(self.socket.fileno(), self._handle_request_noblock)
+        await self.webcontrol.start((master_control.ANYHOST, master_control.web_port(self.config)))
+        # PING IMMEDIATELY AND THEN EVERY LIVENESS TICK
+        self._ping()
+        await self._stopped
+
+    def _ping(self):
+        self.send_ping()
+        self._ping_handle = self.loop.call_later(self.liveness.tick_interval, self._ping)
+
+    def retick(self):
+        # _ping() LOOKS UP THE INTERVAL EVERY TIME
+        pass
+
+    def _arm_delivery(self):
+        # (RE)ARM THE RETRANSMIT TIMER IF THE NEXT DUE TIME MOVED EARLIER
+        due = self.delivery.next_due()
+        if due is None or (self._delivery_handle and self._delivery_due <= due):
+            return
+        if self._delivery_handle:
+            self._delivery_handle.cancel()
+        self._delivery_due = due
+        when = self.loop.time() + (due - time.monotonic_ns()) / NS_PER_SEC
+        self._delivery_handle = self.loop.call_at(when, self._service_delivery)
+
+    def _service_delivery(self):
+        self._delivery_handle = None
+        self.delivery.service(time.monotonic_ns())
+        self._arm_delivery()
+
+    def kill(self):
+        if self._ping_handle:
+            self._ping_handle.cancel()
+        if self._delivery_handle:
+            self._delivery_handle.cancel()
+        self.loop.remove_reader(self.socket.fileno())
+        self.webcontrol.close()
+        self.tasky.kill()
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+
+
+class AsyncVenueRoom(venue.VenueRoom):
+    """
+    AsyncVenueRoom - A venue room whose tasker runs on the venue's loop
+    """
+    def _create_tasker(self):
+        return AsyncTasker(self.plan, self.venue.loop, on_done=self.service_actions,
+                           on_fire=self._task_fired,
+                           **tasker.options_from_config(self.config, self.debug))
+
+
+class AsyncVenueWebControl(AsyncWebControl, venue.VenueWebState):
+    """
+    AsyncVenueWebControl - The room list and every room's pages, API and
+    events served from the event loop
+    """
+    def __init__(self, host):
+        venue.VenueWebState.__init__(self, host)
+        self.server = None
+
+
+class AsyncVenue(venue.Venue):
+    """
+    AsyncVenue - Venue whose socket, pings, retransmits, web control and
+    every room's tasker all run on one asyncio loop
+    """
+    def __init__(self, server_address, RequestHandlerClass, config, rooms, loop, **kwargs):
+        self.loop = loop
+        self._ping_handle = None
+        self._delivery_handle = None
+        self._delivery_due = None
+        self._stopped = loop.create_future()
+        venue.Venue.__init__(self, server_address, RequestHandlerClass, config, rooms, **kwargs)
+
+    def _create_room(self, name, config):
+        return AsyncVenueRoom(self, name, config, debug=self.debug)
+
+    def _start_services(self):
+        # NOTHING GETS A THREAD, serve() HOOKS EVERYTHING INTO THE LOOP
+        self.webcontrol = AsyncVenueWebControl(self)
+
+    async def serve(self):
+        self.socket.setblocking(False)
+        self.loop.add_reader(self.socket.fileno(), self._handle_request_noblock)
+        await self.webcontrol.start((master_control.ANYHOST, master_control.web_port(self.config)))
+        self._ping()
+        await self._stopped
+
+    def _ping(self):
+        self.send_pings()
+        self._ping_handle = self.loop.call_later(self.tick_interval, self._ping)
+
+    def retick(self):
+        # _ping() LOOKS UP THE INTERVAL EVERY TIME
+        pass
+
+    def wake_delivery(self):
+        # (RE)ARM THE RETRANSMIT TIMER IF THE EARLIEST DUE TIME IN ANY ROOM MOVED EARLIER
+        due = min((when for when in (room.delivery.next_due() for room in self.rooms.values())
+                   if when is not None), default=None)
+        if due is None or (self._delivery_handle and self._delivery_due <= due):
+            return
+        if self._delivery_handle:
+            self._delivery_handle.cancel()
+        self._delivery_due = due
+        when = self.loop.time() + (due - time.monotonic_ns()) / NS_PER_SEC
+        self._delivery_handle = self.loop.call_at(when, self._service_delivery)
+
+    def _service_delivery(self):
+        self._delivery_handle = None
+        self.service_deliveries(time.monotonic_ns())
+        self.wake_delivery()
+
+    def kill(self):
+        if self._ping_handle:
+            self._ping_handle.cancel()
+        if self._delivery_handle:
+            self._delivery_handle.cancel()
+        self.loop.remove_reader(self.socket.fileno())
+        self.webcontrol.close()
+        for room in self.rooms.values():
+            room.tasky.kill()
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+
+
+class AsyncClient(client.Client):
+    """
+    AsyncClient - Client whose socket and tasker run on one asyncio loop
+    """
+    def __init__(self, server_address, RequestHandlerClass, config, loop, **kwargs):
+        self.loop = loop
+        self._ping_handle = None
+        self._delivery_handle = None
+        self._delivery_due = None
+        self._stopped = loop.create_future()
+        client.Client.__init__(self, server_address, RequestHandlerClass, config, **kwargs)
+
+    def _create_tasker(self):
+        return AsyncTasker(self.plan, self.loop, on_done=self.service_actions,
+                           **tasker.options_from_config(self.config, self.debug))
+
+    def _start_services(self):
+        # NOTHING GETS A THREAD, serve() HOOKS THE SOCKETS (AND A RELAY'S TIMERS) INTO THE LOOP
+        if self.relay is not None:
+            self.relay.delivery.on_pending = self._arm_delivery
+
+    async def serve(self):
+        self.socket.setblocking(False)
+        self.loop.add_reader(self.socket.fileno(), self._handle_request_noblock)
+        if self.mcast_socket is not None:
+            self.mcast_socket.setblocking(False)
+            self.loop.add_reader(self.mcast_socket.fileno(), self.handle_multicast)
+        if self.relay is not None:
+            self._ping()
+        await self._stopped
+
+    def _ping(self):
+        self.relay.send_ping()
+        self._ping_handle = self.loop.call_later(self.relay.liveness.tick_interval, self._ping)
+
+    def _arm_delivery(self):
+        # SAME AS AsyncController, FOR THE RELAY'S RETRANSMITS
+        due = self.relay.delivery.next_due()
+        if due is None or (self._delivery_handle and self._delivery_due <= due):
+            return
+        if self._delivery_handle:
+            self._delivery_handle.cancel()
+        self._delivery_due = due
+        when = self.loop.time() + (due - time.monotonic_ns()) / NS_PER_SEC
+        self._delivery_handle = self.loop.call_at(when, self._service_delivery)
+
+    def _service_delivery(self):
+        self._delivery_handle = None
+        self.relay.delivery.service(time.monotonic_ns())
+        self._arm_delivery()
+
+    def kill(self):
+        if self._ping_handle:
+            self._ping_handle.cancel()
+        if self._delivery_handle:
+            self._delivery_handle.cancel()
+        self.loop.remove_reader(self.socket.fileno())
+        if self.mcast_socket is not None:
+            self.loop.remove_reader(self.mcast_socket.fileno())
+        self.tasky.kill()
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+
+
+# FUNCTIONS
+def _use_pidfd_watcher():
+    # THE DEFAULT CHILD WATCHER BEFORE 3.12 STARTS A THREAD PER CHILD PROCESS
+    # PIDFDS LET THE LOOP ITSELF WAIT ON THEM
+    if sys.version_info < (3, 12) and hasattr(asyncio, "PidfdChildWatcher"):
+        try:
+            watcher = asyncio.PidfdChildWatcher()
+            asyncio.set_child_watcher(watcher)
+            watcher.attach_loop(asyncio.get_running_loop())
+        except OSError:
+            logger.debug("PIDFD CHILD WATCHER NOT AVAILABLE")
+
+
+async def _serve(server):
+    try:
+        await server.serve()
+    finally:
+        server.kill()
+        server.server_close()
+
+
+def _reload_on_sighup(server, loop, path):
+    # SIGHUP OR POST /api/reload RE-READS THE CONFIG FILE, BOTH ON THE LOOP
+    if path is None:
+        return
+    server.webcontrol.reload_callback = functools.partial(master_control.reload_config, server, path)
+    loop.add_signal_handler(signal.SIGHUP, master_control.try_reload, server, path)
+
+
+async def _master_main(address, config, debug, config_path):
+    _use_pidfd_watcher()
+    loop = asyncio.get_running_loop()
+    controller = AsyncController(address, master_control.ControllerHandler, config, loop, debug=debug)
+    _reload_on_sighup(controller, loop, config_path)
+    logger.info("STARTING MASTER CONTROLLER (ASYNCIO)")
+    await _serve(controller)
+
+
+async def _venue_main(address, config, rooms, debug, config_path):
+    _use_pidfd_watcher()
+    loop = asyncio.get_running_loop()
+    host = AsyncVenue(address, master_control.ControllerHandler, config, rooms, loop, debug=debug)
+    _reload_on_sighup(host, loop, config_path)
+    logger.info("STARTING VENUE WITH {0} ROOMS (ASYNCIO)".format(len(host.rooms)))
+    await _serve(host)
+
+
+async def _client_main(address, config, debug):
+    _use_pidfd_watcher()
+    loop = asyncio.get_running_loop()
+    myclient = AsyncClient(address, client.ClientHandler, config, loop, debug=debug)
+    logger.info("STARTING CLIENT (ASYNCIO)")
+    await _serve(myclient)
+
+
+def run_master(address, config, debug=False, config_path=None):
+    asyncio.run(_master_main(address, config, debug, config_path))
+
+
+def run_venue(address, config, rooms, debug=False, config_path=None):
+    asyncio.run(_venue_main(address, config, rooms, debug, config_path))
+
+
+def run_client(address, config, debug=False):
+    asyncio.run(_client_main(address, config, debug))
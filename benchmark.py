@@ -0,0 +1,430 @@
+# THIS USES PYTHON 3
+
+# BENCHMARK
+# LOOPBACK LOAD GENERATION FOR THE MASTER, ITS CLIENTS AND THE TASKER
+#
+# RUNS A REAL Controller AGAINST HUNDREDS OR THOUSANDS OF SIMULATED CLIENTS ON
+# 127.0.0.1 AND MEASURES
+#  - START FAN-OUT, HOW LONG SENDING START TOOK AND HOW LONG UNTIL THE LAST ACK
+#  - CUE SKEW, WHEN EACH SIMULATED CLIENT'S CUES FIRED AGAINST THE MASTER'S
+#    DEADLINES FOR THE SAME CUES (EVERYONE IS ON THIS HOST SO THEY SHARE A CLOCK)
+#  - PONG THROUGHPUT, HOW FAST THE MASTER WORKS THROUGH A FLOOD OF PONGS
+#  - DISPATCH JITTER, HOW LATE A LONE TASKER FIRES AT DIFFERENT TASK DENSITIES
+#
+# SIMULATED CLIENTS EACH HAVE THEIR OWN PORT LIKE A REAL ONE, BUT HUNDREDS OF
+# THEM SHARE ONE SELECTOR LOOP, IN THIS PROCESS OR SPREAD OVER --workers
+# PROCESSES. THEY SPEAK THE BINARY PROTOCOL, ANSWER PINGS, ACK STARTS AND
+# CONTROLS AND RECORD WHEN EACH CUE WOULD HAVE FIRED, NOTHING IS RUN
+#
+# RESULTS ARE JSON SO RUNS CAN BE KEPT AND COMPARED, --compare OLD.json PRINTS
+# THE CHANGES AND EXITS WITH 1 IF ANYTHING GOT WORSE BY MORE THAN --tolerance
+
+# MODULE IMPORTS
+import argparse
+import json
+import multiprocessing
+import selectors
+import subprocess
+import threading
+import platform
+import datetime
+import socket
+import heapq
+import time
+import sys
+import logging
+# LOCAL MODULES
+import master_control
+import tasker
+import taskplan
+import protocol
+
+# CONSTANTS
+NAME = "ESCAPE ROOM"
+FORMAT = '%(asctime)-15s %(levelname)-10s %(module)-12s %(message)s'
+NS_PER_MS = tasker.NS_PER_MS
+NS_PER_SEC = tasker.NS_PER_SEC
+LOOPBACK = "127.0.0.1"
+# LONGEST A SIMULATED CLIENT LOOP SLEEPS BEFORE LOOKING FOR COMMANDS
+IDLE_WAIT = 0.05
+# HOW LONG THE PONG COUNT HAS TO STAND STILL BEFORE A FLOOD IS OVER
+FLOOD_SETTLE = 0.25
+# RESULTS WHERE BIGGER IS BETTER, EVERYTHING ELSE IS A TIME
+HIGHER_IS_BETTER = ("PER SECOND", "HANDLED")
+
+# LOGGING
+logging.basicConfig(format=FORMAT)
+logger = logging.getLogger(NAME)
+
+# CLASSES
+class SimulatedClients:
+    """
+    SimulatedClients - Many fake clients answering the master from one loop
+     - Answers pings with pongs, acks starts and controls like a client
+     - A start schedules every cue at the start instant plus its offset, when
+       the loop gets to one it's recorded as (CLIENT ID, CUE, FIRED NS)
+    """
+    def __init__(self, ids, master, base_port, cue_offsets):
+        self.master = master
+        self.cue_offsets = cue_offsets
+        self.selector = selectors.DefaultSelector()
+        self.sockets = {}
+        for client_id in ids:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((LOOPBACK, base_port + client_id))
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, client_id)
+            self.sockets[client_id] = sock
+        # (DUE NS, CLIENT ID, CUE) FOR EVERY CUE STILL TO FIRE
+        self.timers = []
+        self.fires = []
+        # ACKS BY (CLIENT ID, SEQ) SO RETRANSMITS AREN'T STARTED TWICE
+        self.acks = {}
+
+    def step(self):
+        # FIRE WHATEVER IS DUE AND HANDLE WHATEVER HAS ARRIVED
+        now = time.monotonic_ns()
+        while self.timers and self.timers[0][0] <= now:
+            _, client_id, cue = heapq.heappop(self.timers)
+            self.fires.append((client_id, cue, now))
+        wait = IDLE_WAIT
+        if self.timers:
+            wait = min(wait, max(0, self.timers[0][0] - now) / NS_PER_SEC)
+        for key, _ in self.selector.select(wait):
+            while True:
+                try:
+                    data, address = key.fileobj.recvfrom(2048)
+                except BlockingIOError:
+                    break
+                self.handle(key.data, key.fileobj, data, address, time.monotonic_ns())
+
+    def handle(self, client_id, sock, data, address, recv_ns):
+        if not protocol.is_binary(data):
+            # THE MASTER STARTS EVERYONE ON TEXT PINGS, SAY WE SPEAK BINARY
+            parts = data.split()
+            if parts and parts[0] == b"ping" and len(parts) > 1:
+                sock.sendto("pong {0} {1} {2} v{3}".format(
+                    int(parts[1]), recv_ns, time.monotonic_ns(), protocol.VERSION).encode(), address)
+            return
+        msg = protocol.decode(data)
+        if msg.type == protocol.PING:
+            sock.sendto(protocol.pong(client_id, msg.timestamp, recv_ns, time.monotonic_ns()), address)
+        elif msg.type == protocol.START:
+            reply = self.acks.get((client_id, msg.seq))
+            if reply is None:
+                instant, flags = protocol.unpack_start(msg)
+                start_ns = instant if flags & protocol.FLAG_HAS_VALUE else recv_ns
+                for cue, offset_ns in enumerate(self.cue_offsets):
+                    heapq.heappush(self.timers, (start_ns + offset_ns, client_id, cue))
+                reply = protocol.ack(client_id, msg.seq, time.monotonic_ns(), protocol.START,
+                                     start_ns - recv_ns)
+                self.acks[(client_id, msg.seq)] = reply
+            sock.sendto(reply, address)
+        elif msg.type == protocol.CONTROL:
+            sock.sendto(protocol.ack(client_id, msg.seq, time.monotonic_ns(), protocol.CONTROL,
+                                     time.monotonic_ns()), address)
+
+    def flood(self, count):
+        # SEND count PONGS FROM EVERY CLIENT AS FAST AS WE CAN, RETURNS HOW MANY WENT
+        sent = 0
+        for _ in range(count):
+            for client_id, sock in self.sockets.items():
+                now = time.monotonic_ns()
+                try:
+                    sock.sendto(protocol.pong(client_id, now, now, now), self.master)
+                except BlockingIOError:
+                    continue
+                sent += 1
+        return sent
+
+    def take_fires(self):
+        fires, self.fires = self.fires, []
+        return fires
+
+    def close(self):
+        for sock in self.sockets.values():
+            self.selector.unregister(sock)
+            sock.close()
+
+
+# FUNCTIONS
+def client_worker(conn, ids, master, base_port, cue_offsets):
+    # RUN SIMULATED CLIENTS UNTIL TOLD TO STOP, conn TAKES (COMMAND, ARGUMENT)
+    sim = SimulatedClients(ids, master, base_port, cue_offsets)
+    conn.send("READY")
+    try:
+        while True:
+            sim.step()
+            while conn.poll():
+                cmd, arg = conn.recv()
+                if cmd == "flood":
+                    conn.send(sim.flood(arg))
+                elif cmd == "fires":
+                    conn.send(sim.take_fires())
+                elif cmd == "stop":
+                    return
+    finally:
+        sim.close()
+
+
+def start_workers(args, cue_offsets):
+    # SPLIT THE CLIENTS OVER THE WORKERS, ZERO WORKERS MEANS ONE THREAD IN HERE
+    ids = list(range(1, args.clients + 1))
+    count = max(1, args.workers)
+    master = (LOOPBACK, args.port)
+    conns = []
+    for n in range(count):
+        parent, child = multiprocessing.Pipe()
+        worker_args = (child, ids[n::count], master, args.port, cue_offsets)
+        if args.workers:
+            runner = multiprocessing.Process(target=client_worker, args=worker_args, daemon=True)
+        else:
+            runner = threading.Thread(target=client_worker, args=worker_args, daemon=True)
+        runner.start()
+        conns.append(parent)
+    for conn in conns:
+        conn.recv()
+    return conns
+
+
+def ask_workers(conns, cmd, arg=None):
+    for conn in conns:
+        conn.send((cmd, arg))
+    return [conn.recv() for conn in conns]
+
+
+def summarize(values_ns):
+    # COUNT, MEAN, PERCENTILES AND MAX IN MILLISECONDS
+    if not values_ns:
+        return {"COUNT": 0}
+    values = sorted(values_ns)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))] / NS_PER_MS
+
+    return {"COUNT": len(values),
+            "MEAN": sum(values) / len(values) / NS_PER_MS,
+            "P50": pick(0.5),
+            "P99": pick(0.99),
+            "MAX": values[-1] / NS_PER_MS}
+
+
+def task_list(offsets_ms):
+    # A CUE AT EACH OFFSET AND A STOP AFTER THE LAST, COMMANDS ARE NEVER RUN (DEBUG)
+    tasks = [{"TYPE": "TASK", "DELTA TIME FROM START": offset, "TIME UNITS": "MILLISECONDS",
+              "COMMAND": "true"} for offset in offsets_ms]
+    tasks.append({"TYPE": "STOP", "DELTA TIME FROM START": offsets_ms[-1] + 1, "TIME UNITS": "MILLISECONDS",
+                  "COMMAND": ""})
+    return tasks
+
+
+def build_config(args, cue_offsets):
+    # A MASTER CONFIG FOR THE SIMULATED ROOM
+    tasks = task_list([offset_ns / NS_PER_MS for offset_ns in cue_offsets])
+    return {"CONFIG": "MASTER",
+            "PORT": args.port,
+            "PING TIMER": 1,
+            "START OPTION": "WEB",
+            "START LEAD MS": args.lead_ms,
+            "PRECISION MODE": args.precision,
+            "CLIENTS": [{"ID": client_id, "IP": LOOPBACK, "PORT": args.port + client_id}
+                        for client_id in range(1, args.clients + 1)],
+            "TASKS": tasks}
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def bench_master(args):
+    # CONNECT, START AND FLOOD A REAL CONTROLLER, RETURNS ITS PART OF THE RESULTS
+    cue_offsets = [(n + 1) * int(args.cue_spacing_ms * NS_PER_MS) for n in range(args.cues)]
+    # WORKERS FIRST, SO THEY'RE FORKED BEFORE THE CONTROLLER HAS ANY THREADS
+    conns = start_workers(args, cue_offsets)
+    master_control.WEBPORT = args.web_port
+    began = time.monotonic()
+    controller = master_control.Controller((LOOPBACK, args.port), master_control.ControllerHandler,
+                                           build_config(args, cue_offsets), debug=True)
+    serving = threading.Thread(target=controller.serve_forever, daemon=True)
+    serving.start()
+    results = {}
+    try:
+        if not wait_for(lambda: controller.all_connected, args.timeout):
+            raise RuntimeError("ONLY {0} OF {1} CLIENTS CONNECTED".format(
+                controller.clients.connected_count, args.clients))
+        results["CONNECT SECONDS"] = time.monotonic() - began
+
+        send, fanout, skew, lateness = [], [], [], []
+        for _ in range(args.rounds):
+            sent = master_control.START_SEND.labels()
+            reached = master_control.START_FANOUT.labels()
+            sent_before, reached_before = sent.sum_ns, reached.sum_ns
+            if not controller.webcontrol.push_start():
+                raise RuntimeError("MASTER WOULDN'T START")
+            if not wait_for(controller.get_tasks_completed, args.timeout):
+                raise RuntimeError("THE RUN NEVER FINISHED")
+            # STRAGGLING CUES ON THE CLIENTS, THE LAST ACK HAS CERTAINLY COME IN BY NOW
+            time.sleep(0.1)
+            send.append(sent.sum_ns - sent_before)
+            fanout.append(reached.sum_ns - reached_before)
+            start_ns = controller.tasky.start_ns
+            lateness.extend(late for _, late in controller.tasky.lateness)
+            for fires in ask_workers(conns, "fires"):
+                skew.extend(abs(fired_ns - start_ns - cue_offsets[cue]) for _, cue, fired_ns in fires)
+        results["START SEND MS"] = summarize(send)
+        results["START FANOUT MS"] = summarize(fanout)
+        results["CUE SKEW MS"] = summarize(skew)
+        results["MASTER LATENESS MS"] = summarize(lateness)
+        results["CUES MISSED"] = args.rounds * args.cues * args.clients - len(skew)
+        results["PONG THROUGHPUT"] = flood(conns, args.flood)
+    finally:
+        for conn in conns:
+            conn.send(("stop", None))
+        controller.kill()
+        controller.shutdown()
+        controller.webcontrol.shutdown()
+        controller.webcontrol.server_close()
+        controller.server_close()
+    return results
+
+
+def flood(conns, per_client):
+    # HAVE EVERY CLIENT SEND per_client PONGS AT ONCE AND TIME THE MASTER WORKING THROUGH THEM
+    # DATAGRAMS THE KERNEL DROPPED BECAUSE THE MASTER FELL BEHIND ARE COUNTED AS LOST
+    pongs = master_control.PONGS_RECEIVED.labels()
+    before = pongs.value
+    began = time.monotonic()
+    sent = sum(ask_workers(conns, "flood", per_client))
+    last, last_change = before, time.monotonic()
+    while time.monotonic() - last_change < FLOOD_SETTLE:
+        time.sleep(0.01)
+        if pongs.value != last:
+            last, last_change = pongs.value, time.monotonic()
+    handled = last - before
+    seconds = max(last_change - began, 1e-9)
+    return {"SENT": sent,
+            "HANDLED": handled,
+            "LOST": max(0, sent - handled),
+            "SECONDS": seconds,
+            "PER SECOND": handled / seconds}
+
+
+def bench_tasker(args):
+    # HOW LATE A TASKER ON ITS OWN FIRES AT EACH DENSITY (TASKS PER SECOND)
+    jitter = {}
+    for density in args.densities:
+        spacing_ms = 1000.0 / density
+        count = max(1, int(density * args.jitter_seconds))
+        tasks = task_list([(n + 1) * spacing_ms for n in range(count)])
+        tasky = tasker.Tasker(taskplan.compile_tasks(tasks), debug=True, precision=args.precision)
+        tasky.start()
+        tasky.join()
+        jitter[str(density)] = summarize([late for _, late in tasky.lateness])
+    return jitter
+
+
+def version():
+    # WHICH COMMIT WE'RE BENCHMARKING, IF WE CAN TELL
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    # {"A": {"B": 1}} -> {"A/B": 1} FOR COMPARING RUNS
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "/"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(baseline, results, tolerance):
+    # PRINT WHAT CHANGED SINCE THE BASELINE, RETURNS THE NAMES OF THE REGRESSIONS
+    for key, value in results["PARAMETERS"].items():
+        if baseline.get("PARAMETERS", {}).get(key, value) != value:
+            print("BASELINE RAN WITH {0} = {1}, THIS RUN {2}".format(key, baseline["PARAMETERS"][key], value))
+    old, new = flatten(baseline["RESULTS"]), flatten(results["RESULTS"])
+    regressions = []
+    for key in sorted(set(old) & set(new)):
+        if key.endswith("/COUNT") or key.endswith("/SENT") or not old[key]:
+            continue
+        change = (new[key] - old[key]) / abs(old[key])
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print("{0:45} {1:14.4f} -> {2:14.4f} {3:+8.1%}{4}".format(key, old[key], new[key], change, flag))
+    return regressions
+
+
+def main():
+    """
+    main - Run the benchmarks and print or save the results
+    """
+    parser = argparse.ArgumentParser(description='Escape Room Loopback Benchmark')
+    parser.add_argument('--clients', type=int, default=200, help='Simulated clients (defaults to 200)')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Processes to spread the clients over, 0 runs them on a thread in here (defaults to 2)')
+    parser.add_argument('--rounds', type=int, default=3, help='Starts to time (defaults to 3)')
+    parser.add_argument('--cues', type=int, default=20, help='Cues per run (defaults to 20)')
+    parser.add_argument('--cue-spacing-ms', type=float, default=50, help='Time between cues (defaults to 50)')
+    parser.add_argument('--lead-ms', type=float, default=250, help='START LEAD MS for the master (defaults to 250)')
+    parser.add_argument('--flood', type=int, default=20, help='Pongs each client sends in the flood (defaults to 20)')
+    parser.add_argument('--densities', type=float, nargs='+', default=[10, 100, 1000],
+                        help='Tasks per second for the dispatch jitter runs (defaults to 10 100 1000)')
+    parser.add_argument('--jitter-seconds', type=float, default=2, help='Length of each jitter run (defaults to 2)')
+    parser.add_argument('--precision', action='store_true', help='Use precision mode for the taskers')
+    parser.add_argument('--port', type=int, default=21000,
+                        help='Master port, clients take the ports after it (defaults to 21000)')
+    parser.add_argument('--web-port', type=int, default=28080, help='Master web port (defaults to 28080)')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for anything (defaults to 30)')
+    parser.add_argument('--skip', choices=['master', 'tasker'], action='append', default=[],
+                        help='Leave out a part of the benchmark')
+    parser.add_argument('--output', metavar='file', help='Write the results here instead of printing them')
+    parser.add_argument('--compare', metavar='file', type=argparse.FileType('r'),
+                        help='Earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='How much worse (0.2 is 20%%) a result may get before --compare fails (defaults to 0.2)')
+    parser.add_argument('--verbose', '-v', action='count', default=0,
+                        help='Log what the master and taskers say, -v is Warning, -vv is Info, -vvv is Debug')
+    args = parser.parse_args()
+
+    # LATE CUES ARE WARNINGS AND A BENCHMARK MAKES A LOT OF THEM, ERRORS ONLY UNLESS ASKED
+    logger.setLevel([logging.ERROR, logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 3)])
+
+    results = {}
+    if "master" not in args.skip:
+        results.update(bench_master(args))
+    if "tasker" not in args.skip:
+        results["DISPATCH JITTER MS"] = bench_tasker(args)
+    report = {"VERSION": version(),
+              "TIME": datetime.datetime.now().isoformat(),
+              "PYTHON": platform.python_version(),
+              "PLATFORM": platform.platform(),
+              "PARAMETERS": {key: value for key, value in vars(args).items()
+                             if key not in ("output", "compare", "verbose")},
+              "RESULTS": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        if compare(json.load(args.compare), report, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
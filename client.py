@@ -13,9 +13,17 @@ import datetime
 import time
 import signal
 import sys
+import struct
+import collections
+import functools
 import logging
 # LOCAL MODULES
 import tasker
+import taskplan
+import protocol
+import metrics
+import logpipe
+import relay
 
 # CONSTANTS
 ANYHOST = ""
@@ -39,34 +47,153 @@ class ClientHandler(socketserver.BaseRequestHandler):
 
     # OVERLOAD THE HANDLE FUNCTION
     def handle(self):
-        # STRIP EXTRA STUFF AND MAKE IT LOWERCASE
+        # GRAB THE RECEIVE TIME FIRST THING, IT'S T2 FOR THE CLOCK OFFSET MATH
+        recv_ns = time.monotonic_ns()
         data = self.request[0]
-        # FIGURE OUT WHO THIS IS FROM - GET JUST THE IP
-        sender = self.client_address[0]
         # GET THE SOCKET THAT IS LOCAL TO THE HANDLER
         sock = self.request[1]
+        # A RELAY HEARS BACK FROM ITS OWN CLIENTS ON THE SAME SOCKET
+        if self.server.relay is not None and self.server.relay.owns(self.client_address):
+            self.server.relay.handle(data, recv_ns, self.client_address)
+            return
+        # THE MULTICAST READER THREAD GETS HERE TOO, ONE COMMAND AT A TIME SO A START
+        # THAT ARRIVES BOTH WAYS IS RUN ONCE AND THE SECOND COPY JUST GETS THE ACK
+        with self.server.command_lock:
+            self.handle_command(data, recv_ns, sock)
+
+    def handle_command(self, data, recv_ns, sock):
+        # WE ANSWER IN WHATEVER FORMAT THE MASTER SPOKE TO US IN
+        if protocol.is_binary(data):
+            try:
+                msg = protocol.decode(data)
+            except protocol.ProtocolError as err:
+                logger.warning("BAD MESSAGE FROM {0}: {1}".format(self.client_address, err))
+                return
+            self.handle_binary(msg, recv_ns, sock)
+        else:
+            try:
+                self.handle_text(data, recv_ns, sock)
+            except (ValueError, IndexError):
+                # A GARBLED OR TRUNCATED COMMAND, ONE LINE RATHER THAN A TRACEBACK
+                logger.warning("BAD MESSAGE FROM {0}: {1}".format(self.client_address, data[:64]))
+
+    def handle_text(self, data, recv_ns, sock):
+        # FIGURE OUT WHO THIS IS FROM - GET JUST THE IP
+        sender = self.client_address[0]
+        # MESSAGES ARE SPACE SEPARATED, FIRST WORD IS THE COMMAND
+        parts = data.split()
+        cmd = parts[0] if parts else b""
 
         # FIGURE OUT IF THE DATA IS A PING
         # NOTE: THIS LOOKS GOOFY, BUT CLIENT HANDLER WILL BE PASSED
         # INTO CLIENT SERVER AND CAN ACCESS THE PARENT CLASS MEMBER VARIABLES
-        if data == self.server.PING:
+        if cmd == self.server.PING:
             # SEND THE IP INTO THE SERVER FUNCTION TO SET CONNECTED
-            logger.info("PING RECEIVED FROM: {0}".format(sender))
-            logger.info("SENDING PONG TO: {0}".format(self.client_address))
-            sock.sendto(self.server.PONG, self.client_address)
+            logger.info(logpipe.Repeating(sender, "PING RECEIVED FROM: {0}", sender))
+            logger.info(logpipe.Repeating(sender, "SENDING PONG TO: {0}", self.client_address))
+            if len(parts) >= 2:
+                # ECHO THE MASTER'S SEND TIME WITH OUR RECEIVE AND SEND TIMES
+                msg = self.server.PONG + " {0} {1} {2}".format(
+                    int(parts[1]), recv_ns, time.monotonic_ns()).encode()
+                # LET THE MASTER KNOW IF IT CAN REACH US OVER MULTICAST
+                if self.server.mcast_socket is not None:
+                    msg += b" " + self.server.MCAST_MEMBER
+                # AND THAT IT CAN SWITCH US TO THE BINARY PROTOCOL
+                msg += b" " + self.server.VERSION_PREFIX + str(protocol.VERSION).encode()
+                # AND HOW MANY OF OUR OWN CLIENTS ARE UP IF WE'RE A RELAY
+                if self.server.relay is not None:
+                    msg += b" " + relay.summary_field(self.server.relay.summary())
+            else:
+                msg = self.server.PONG
+            sock.sendto(msg, self.client_address)
+
+        # THE MASTER TELLS MULTICAST MEMBERS THEIR CLOCK OFFSET SO THEY CAN
+        # TRANSLATE A SHARED START INSTANT THEMSELVES
+        if cmd == self.server.SYNC:
+            self.server.clock_offset = int(parts[1])
 
         # FIGURE OUT IF DATA IS A START
         # SO WE CAN START THE LOCAL TASKS
-        if data == self.server.START:
-            # FIGURE OUT IF WE'VE RUN BEFORE AND IF SO, RESET
-            if self.server.get_tasks_completed():
-                self.server.reset()
-            # START THE TASKY
+        if cmd == self.server.START:
+            # START <SEQ> [START INSTANT [m]] HAS TO BE ACKED, A BARE START IS AN OLD MASTER
+            seq = int(parts[1]) if len(parts) >= 2 else None
+            # RETRANSMITS OF SOMETHING WE ALREADY DID JUST GET THE SAME ACK AGAIN
+            if seq is not None and self.server.resend_ack(seq, sock, self.client_address):
+                return
             logger.info("START RECEIVED FROM: {0}".format(sender))
-            mystr = "client {0} starting".format(self.server.config["ID"])
-            sock.sendto(str.encode(mystr), self.client_address)
-            self.server.tasky.start()
-
+            if seq is None:
+                msg = self.server.STARTED + " {0}".format(self.server.config["ID"]).encode()
+                sock.sendto(msg, self.client_address)
+                self.server.start_tasks(None, recv_ns)
+                if self.server.relay is not None:
+                    # NOBODY TO ACK TO, OUR CLIENTS STILL GET A START THEY CAN ACK
+                    self.server.relay.forward(self.server.relay.delivery.next_seq(), protocol.START, None, None)
+                return
+            instant = int(parts[2]) if len(parts) >= 3 else None
+            start_ns = self.server.local_start_instant(instant, parts[3:] == [self.server.MASTER_CLOCK])
+            lead_ns = self.server.start_tasks(start_ns, recv_ns)
+            # TELL THE MASTER HOW MUCH HEADROOM WE HAD SO IT CAN REPORT SKEW
+            self.server.ack_command(seq, protocol.TEXT_VERSION, protocol.START, lead_ns, sock, self.client_address,
+                                    start_ns)
+
+        # PAUSE, RESUME, SEEK OR STOP THE RUNNING TIMELINE
+        # CONTROL <SEQ> <ACTION> <OFFSET> [INSTANT [m]]
+        if cmd == self.server.CONTROL and len(parts) >= 4:
+            seq = int(parts[1])
+            if self.server.resend_ack(seq, sock, self.client_address):
+                return
+            action = self.server.CONTROL_ACTIONS.get(parts[2])
+            if action is None:
+                logger.warning("UNKNOWN CONTROL {0} FROM: {1}".format(parts[2].upper(), sender))
+                return
+            instant = int(parts[4]) if len(parts) >= 5 else None
+            at_ns = self.server.local_start_instant(instant, parts[5:] == [self.server.MASTER_CLOCK])
+            applied_ns = self.server.control_tasks(action, int(parts[3]), at_ns, recv_ns)
+            # TELL THE MASTER WHEN WE APPLIED IT SO IT CAN REPORT THE LATENCY
+            self.server.ack_command(seq, protocol.TEXT_VERSION, protocol.CONTROL, applied_ns, sock, self.client_address,
+                                    at_ns if at_ns is not None else recv_ns, action, int(parts[3]))
+            if action == protocol.CONTROL_STOP:
+                # AND AGAIN ONCE EVERYTHING WE STARTED IS GONE
+                self.server.tasky.when_quiet(functools.partial(
+                    self.server.tasks_quiet, seq, protocol.TEXT_VERSION, self.client_address))
+
+    def handle_binary(self, msg, recv_ns, sock):
+        # ANSWER IN THE LOWER OF THE MASTER'S VERSION AND OURS
+        version = protocol.negotiate(msg.version)
+        client_id = self.server.config["ID"]
+        if msg.type == protocol.PING:
+            logger.info(logpipe.Repeating(self.client_address[0], "PING RECEIVED FROM: {0}", self.client_address[0]))
+            flags = protocol.FLAG_MULTICAST if self.server.mcast_socket is not None else 0
+            summary = self.server.relay.summary() if self.server.relay is not None else None
+            reply = protocol.pong(client_id, msg.timestamp, recv_ns, time.monotonic_ns(), flags, version, summary)
+            sock.sendto(reply, self.client_address)
+        elif msg.type == protocol.SYNC:
+            self.server.clock_offset, _ = protocol.unpack_sync(msg)
+        elif msg.type == protocol.START:
+            if self.server.resend_ack(msg.seq, sock, self.client_address):
+                return
+            logger.info("START RECEIVED FROM: {0}".format(self.client_address[0]))
+            instant, flags = protocol.unpack_start(msg)
+            if not flags & protocol.FLAG_HAS_VALUE:
+                instant = None
+            start_ns = self.server.local_start_instant(instant, bool(flags & protocol.FLAG_MASTER_CLOCK))
+            lead_ns = self.server.start_tasks(start_ns, recv_ns)
+            self.server.ack_command(msg.seq, version, protocol.START, lead_ns, sock, self.client_address, start_ns)
+        elif msg.type == protocol.CONTROL:
+            if self.server.resend_ack(msg.seq, sock, self.client_address):
+                return
+            action, offset_ns, instant, flags = protocol.unpack_control(msg)
+            if not flags & protocol.FLAG_HAS_VALUE:
+                instant = None
+            at_ns = self.server.local_start_instant(instant, bool(flags & protocol.FLAG_MASTER_CLOCK))
+            applied_ns = self.server.control_tasks(action, offset_ns, at_ns, recv_ns)
+            self.server.ack_command(msg.seq, version, protocol.CONTROL, applied_ns, sock, self.client_address,
+                                    at_ns if at_ns is not None else recv_ns, action, offset_ns)
+            if action == protocol.CONTROL_STOP:
+                self.server.tasky.when_quiet(functools.partial(
+                    self.server.tasks_quiet, msg.seq, version, self.client_address))
+        else:
+            logger.info("UNEXPECTED {0} FROM: {1}".format(msg.type_name(), self.client_address))
 
 class Client(socketserver.UDPServer):
     """
@@ -84,6 +211,21 @@ class Client(socketserver.UDPServer):
     PING = str.encode("ping")
     PONG = str.encode("pong")
     START = str.encode("start")
+    STARTED = str.encode("started")
+    ACK = str.encode("ack")
+    SYNC = str.encode("sync")
+    CONTROL = str.encode("control")
+    QUIET = str.encode("quiet")
+    # CONTROL ACTIONS BY THEIR TEXT NAMES
+    CONTROL_ACTIONS = {name.lower().encode(): action for action, name in protocol.CONTROL_NAMES.items()}
+    # MULTICAST MEMBERSHIP FLAG IN PONGS AND MASTER CLOCK FLAG IN STARTS AND CONTROLS
+    MCAST_MEMBER = str.encode("mc")
+    MASTER_CLOCK = str.encode("m")
+    # TEXT PONGS ADVERTISE THE BINARY PROTOCOL VERSION WE SPEAK AS v<VERSION>
+    VERSION_PREFIX = str.encode("v")
+
+    # HOW MANY RECENT COMMAND SEQUENCE NUMBERS TO REMEMBER FOR DUPLICATES
+    RECENT_COMMANDS = 64
 
     def __init__(self, server_address, RequestHandlerClass, config, debug=False):
         socketserver.UDPServer.__init__(self, server_address, RequestHandlerClass)
@@ -91,9 +233,181 @@ class Client(socketserver.UDPServer):
         self.config = config
         self.debug = debug
         self.done_with_tasks = False
+        # ACKS WE'VE SENT BY SEQUENCE NUMBER SO RETRANSMITS AREN'T RUN TWICE
+        self.recent_acks = collections.OrderedDict()
+        # OUR CLOCK MINUS THE MASTER'S, ONLY SENT TO MULTICAST MEMBERS
+        self.clock_offset = None
+        # HELD WHILE A COMMAND IS HANDLED AND THE TASKER CHECKED ON, THE UNICAST
+        # AND MULTICAST SOCKETS ARE READ ON DIFFERENT THREADS. RE-ENTRANT, AN
+        # ASYNCIO TASKER THAT'S STOPPED OR RESET CALLS service_actions() RIGHT AWAY
+        self.command_lock = threading.RLock()
+        # COMPILE THE TASK LIST ONCE, EVERY RUN SHARES THE PLAN
+        self.plan = taskplan.from_config(self.config)
         # CREATE THE TASKER INSTANCE FOR THE CONTROLLER
         # WE WON'T START UNTIL ALL CLIENTS HAVE CONNECTED
-        self.tasky = tasker.Tasker(self.config["TASKS"], debug=self.debug)
+        self.tasky = self._create_tasker()
+        # OPTIONAL MULTICAST GROUP FOR FAN-OUT FROM THE MASTER
+        self.mcast_socket = self._join_multicast()
+        # OPTIONAL CLIENTS OF OUR OWN WE PASS THE MASTER'S COMMANDS ON TO
+        self.relay = relay.Relay(self.socket, self.config) if self.config.get("RELAY CLIENTS") else None
+        self._start_services()
+
+    def _join_multicast(self):
+        # JOIN THE MULTICAST GROUP FROM THE CONFIG, RETURNS NONE IF THERE ISN'T
+        # ONE OR WE CAN'T JOIN IT - THE MASTER FALLS BACK TO UNICAST FOR US
+        mcast = self.config.get("MULTICAST")
+        if not mcast:
+            return None
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((ANYHOST, mcast["PORT"]))
+            mreq = struct.pack("4s4s", socket.inet_aton(mcast["GROUP"]),
+                               socket.inet_aton(mcast.get("INTERFACE", "0.0.0.0")))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError as err:
+            logger.warning("COULD NOT JOIN MULTICAST GROUP {0}: {1}".format(mcast["GROUP"], err))
+            sock.close()
+            return None
+        logger.info("JOINED MULTICAST GROUP {0}:{1}".format(mcast["GROUP"], mcast["PORT"]))
+        return sock
+
+    def _start_services(self):
+        # THREADED ENGINE - THE MULTICAST SOCKET GETS ITS OWN READER THREAD
+        if self.mcast_socket is not None:
+            self.mcast_thread = threading.Thread(target=self._multicast_loop, daemon=True)
+            self.mcast_thread.start()
+        # AND A RELAY'S PINGS AND RETRANSMITS GET ONE EACH, LIKE A MASTER'S
+        if self.relay is not None:
+            self.relay_delivery_thread = threading.Thread(target=self.relay.delivery.run, daemon=True)
+            self.relay_delivery_thread.start()
+            self.relay_ping_thread = threading.Thread(target=self.relay.run_pings, daemon=True)
+            self.relay_ping_thread.start()
+
+    def _multicast_loop(self):
+        while True:
+            self.handle_multicast()
+
+    def handle_multicast(self):
+        # READ ONE DATAGRAM FROM THE GROUP AND HANDLE IT AS IF IT CAME IN ON OUR
+        # MAIN SOCKET, SO PONGS AND ACKS GO BACK OVER UNICAST
+        try:
+            data, address = self.mcast_socket.recvfrom(self.max_packet_size)
+        except OSError:
+            return
+        self.process_request((data, self.socket), address)
+
+    def _create_tasker(self):
+        # A NEW RUN OVER THE COMPILED PLAN
+        return tasker.Tasker(self.plan, **tasker.options_from_config(self.config, self.debug))
+
+    def local_start_instant(self, instant, master_clock=False):
+        # START (OR CONTROL) INSTANT IN OUR CLOCK, NONE TO ACT RIGHT AWAY
+        # AN INSTANT ON THE MASTER'S CLOCK (MULTICAST STARTS) NEEDS OUR OFFSET
+        if instant is None or not master_clock:
+            return instant
+        if self.clock_offset is None:
+            return None
+        return instant + self.clock_offset
+
+    def start_tasks(self, start_ns, recv_ns):
+        # START THE TASKY AT start_ns ON OUR CLOCK, OR RIGHT AWAY IF IT'S NONE
+        # RETURNS HOW FAR AHEAD OF THE INSTANT THE START ARRIVED, OR NONE
+        # FIGURE OUT IF WE'VE RUN BEFORE AND IF SO, RESET
+        # A STOP LEAVES THE TASKY DEAD BEFORE service_actions() NOTICES IT'S DONE
+        if self.get_tasks_completed() or self.tasky.dead or self.tasky.has_started():
+            self.reset()
+        if start_ns is None:
+            self.tasky.start()
+            return None
+        self.tasky.start_at(start_ns)
+        return start_ns - recv_ns
+
+    def control_tasks(self, action, offset_ns, at_ns, recv_ns):
+        # PAUSE, RESUME OR SEEK THE TASKY SO IT'S AT offset_ns AS OF at_ns ON OUR CLOCK
+        # (OR WHEN THE COMMAND ARRIVED), THE SAME PLACE THE MASTER IS
+        # STOP ABORTS IT RIGHT AWAY, STOPPING EVERY COMMAND IT STARTED
+        # RETURNS WHEN IT WAS APPLIED ON OUR CLOCK, OR NONE IF THERE WAS NOTHING TO DO
+        if at_ns is None:
+            at_ns = recv_ns
+        name = protocol.CONTROL_NAMES.get(action)
+        if action == protocol.CONTROL_STOP:
+            logger.warning("STOP RECEIVED, STOPPING {0} COMMANDS".format(self.tasky.abort()))
+            return time.monotonic_ns()
+        if action == protocol.CONTROL_PAUSE:
+            done = self.tasky.pause(at_ns, offset_ns)
+        elif action == protocol.CONTROL_RESUME:
+            done = self.tasky.resume(at_ns, offset_ns)
+        elif action == protocol.CONTROL_SEEK:
+            done = self.tasky.seek(offset_ns, at_ns)
+        else:
+            logger.warning("UNKNOWN CONTROL ACTION {0}".format(action))
+            return None
+        if not done:
+            logger.warning("{0} TO {1:.3f} S IGNORED, TASKS NOT RUNNING".format(name, offset_ns / tasker.NS_PER_SEC))
+            return None
+        logger.info("{0} TO {1:.3f} S APPLIED".format(name, offset_ns / tasker.NS_PER_SEC))
+        return time.monotonic_ns()
+
+    def ack_message(self, version, seq, acked_type, value, summary=None):
+        # ACK A START OR CONTROL WITH ITS VALUE (LEAD OR APPLY TIME) AND A RELAY SUMMARY
+        if version > protocol.TEXT_VERSION:
+            return protocol.ack(self.config["ID"], seq, time.monotonic_ns(), acked_type, value, version, summary)
+        msg = self.ACK + " {0} {1}".format(self.config["ID"], seq).encode()
+        if value is not None:
+            msg += " {0}".format(value).encode()
+        if summary is not None:
+            msg += b" " + relay.summary_field(summary)
+        return msg
+
+    def ack_command(self, seq, version, acked_type, value, sock, address, at_ns, action=None, offset_ns=None):
+        # ACK A START OR CONTROL WE'VE APPLIED, A RELAY PASSES IT ON (AT at_ns ON OUR CLOCK)
+        # FIRST AND ONLY ACKS ONCE ITS OWN CLIENTS HAVE, SAYING HOW MANY GOT IT
+        if self.relay is None:
+            self.send_ack(seq, self.ack_message(version, seq, acked_type, value), sock, address)
+            return
+        on_quiet = None
+        if action == protocol.CONTROL_STOP:
+            on_quiet = functools.partial(self.send_quiet, seq, version, address)
+        self.relay.forward(seq, acked_type, at_ns,
+                           functools.partial(self._relayed, seq, version, acked_type, value, sock, address),
+                           action, offset_ns, on_quiet)
+
+    def _relayed(self, seq, version, acked_type, value, sock, address, summary):
+        self.send_ack(seq, self.ack_message(version, seq, acked_type, value, summary), sock, address)
+
+    def tasks_quiet(self, seq, version, address, quiet_ns):
+        # OUR LAST COMMAND EXITED AFTER THE STOP seq, A RELAY ALSO WAITS FOR ITS CLIENTS
+        if self.relay is not None and self.relay.quieted(seq, relay.SELF, quiet_ns):
+            return
+        self.send_quiet(seq, version, address, quiet_ns)
+
+    def send_quiet(self, seq, version, address, quiet_ns):
+        # TELL THE MASTER WHEN THE LAST COMMAND EXITED AFTER ITS STOP seq
+        # NOT ACKED, IF IT'S LOST THE MASTER JUST DOESN'T GET OUR TIME
+        logger.info("ALL COMMANDS STOPPED, TELLING THE MASTER")
+        if version > protocol.TEXT_VERSION:
+            msg = protocol.quiet(self.config["ID"], seq, quiet_ns, version)
+        else:
+            msg = self.QUIET + " {0} {1} {2}".format(self.config["ID"], seq, quiet_ns).encode()
+        self.socket.sendto(msg, address)
+
+    def send_ack(self, seq, msg, sock, address):
+        # SEND AN ACK, REMEMBERED SO A RETRANSMIT GETS THE SAME ANSWER
+        self.recent_acks[seq] = msg
+        if len(self.recent_acks) > self.RECENT_COMMANDS:
+            self.recent_acks.popitem(last=False)
+        sock.sendto(msg, address)
+
+    def resend_ack(self, seq, sock, address):
+        # IF WE'VE ALREADY HANDLED seq RESEND THE ACK AND RETURN TRUE
+        msg = self.recent_acks.get(seq)
+        if msg is None:
+            # A RELAY STILL WAITING ON ITS CLIENTS ACKS WHEN THEY HAVE
+            return self.relay is not None and self.relay.forwarding(seq)
+        logger.debug(logpipe.Lazy("DUPLICATE COMMAND SEQ {0}, RESENDING ACK", seq))
+        sock.sendto(msg, address)
+        return True
 
     def get_tasks_completed(self):
         return self.done_with_tasks
@@ -101,17 +415,26 @@ class Client(socketserver.UDPServer):
     def reset(self):
         # FUNCTION TO RESET THE CLIENT FOR ANOTHER GO
         logger.info("RESET")
+        # MAKE SURE THE OLD TASKER IS WOKEN UP AND DONE BEFORE REPLACING IT
+        self.tasky.kill()
         self.done_with_tasks = False
-        self.tasky = tasker.Tasker(self.config["TASKS"], debug=self.debug)
+        self.tasky = self._create_tasker()
+
+    def kill(self):
+        # COMMANDS ARE IN THEIR OWN PROCESS GROUPS, CTRL-C DOESN'T REACH THEM
+        self.tasky.kill()
+        if self.relay is not None:
+            self.relay.kill()
 
     # THIS IS AN OVERLOADED FUNCTION
     def service_actions(self):
         # CHECK FOR TASKY RUNNING
         # IF NOT, AUTO SHUTDOWN
-        if not self.tasky.is_running() and not self.done_with_tasks:
-            logger.info("TASKS COMPLETE")
-            self.done_with_tasks = True
-            self.tasky.join()
+        with self.command_lock:
+            if not self.tasky.is_running() and not self.done_with_tasks:
+                logger.info("TASKS COMPLETE")
+                self.done_with_tasks = True
+                self.tasky.join()
 
 
 # FUNCTIONS
@@ -133,6 +456,9 @@ def main():
                         help='JSON Configuration File (defaults to config.json)')
     # DEBUG
     parser.add_argument('--debug', '-d', default=False, help="Debug capability: For simulating Tasker")
+    # RUNTIME ENGINE
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                        help='threads runs each service on its own thread, asyncio runs everything on one event loop')
     # LOGGING VERBOSITY - DEFAULTS TO WARNING
     parser.add_argument('--verbose', '-v', action='count', 
                         default=0,
@@ -157,6 +483,9 @@ def main():
     logger.debug("CONFIGURATION")
     logger.debug(config)
 
+    # LOG FROM A WRITER THREAD SO SLOW OUTPUT DOESN'T HOLD UP THE NETWORK OR THE CUES
+    logpipe.install(**logpipe.options_from_config(config))
+
     # SETUP BACKDOOR KILL SIGNALLING
     signal.signal(signal.SIGTERM, sigterm_handler)
 
@@ -164,6 +493,22 @@ def main():
     address = (ANYHOST, config["PORT"])
     logger.debug("ADDRESS: {0}".format(address))
 
+    # CLIENTS DON'T HAVE A WEB PAGE, THEIR METRICS GET A PORT OF THEIR OWN IF ASKED FOR
+    if "METRICS PORT" in config:
+        metrics.serve((ANYHOST, config["METRICS PORT"]))
+
+    # THE ASYNCIO ENGINE HAS ITS OWN RUN LOOP
+    if args.engine == 'asyncio':
+        import aioengine
+        try:
+            aioengine.run_client(address, config, debug=args.debug)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("")
+            logger.info("EXITING")
+        return
+
     # INSTANTIATE CLASSES
     client = Client(address, ClientHandler, config, debug=args.debug)
 
@@ -178,6 +523,7 @@ def main():
         logger.info("SHUTTING DOWN CLIENT")
         client.shutdown()
     except KeyboardInterrupt:
+        client.kill()
         client.shutdown()
     finally:
         # WANT THIS PRINT TO PUSH THINGS DOWN TO A NEW LINE
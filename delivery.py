@@ -0,0 +1,210 @@
+# THIS USES PYTHON 3
+
+# DELIVERY
+# CODE TO HANDLE ACKNOWLEDGED CONTROL MESSAGES OVER UDP
+
+# MODULE IMPORT
+import threading
+import random
+import time
+import heapq
+import logging
+# LOCAL MODULES
+import metrics
+import logpipe
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_MS = 1000000
+NS_PER_SEC = 1000000000
+
+# DELIVERY STATES
+PENDING = "PENDING"
+ACKED = "ACKED"
+FAILED = "FAILED"
+
+# METRICS
+ACK_TIME = metrics.histogram("escape_room_command_ack_seconds",
+                             "Time from first sending a command to its ack", labels=("command",))
+RETRANSMITS = metrics.counter("escape_room_command_retransmits_total",
+                              "Commands sent again because they weren't acked in time", labels=("command",))
+UNACKED = metrics.counter("escape_room_command_failures_total",
+                          "Commands that ran out of retries", labels=("command",))
+
+# CLASSES
+class Delivery:
+    """
+    Delivery - Record of one acknowledged command sent to one client
+    """
+    __slots__ = ("client_id", "seq", "cmd", "msg", "address", "attempts",
+                 "first_ns", "acked_ns", "state", "reply")
+
+    def __init__(self, client_id, seq, cmd, msg, address, now):
+        self.client_id = client_id
+        self.seq = seq
+        self.cmd = cmd
+        self.msg = msg
+        self.address = address
+        self.attempts = 1
+        self.first_ns = now
+        self.acked_ns = None
+        self.state = PENDING
+        # EXTRA FIELDS THE CLIENT SENT BACK WITH ITS ACK
+        self.reply = []
+
+    def latency_ns(self):
+        if self.acked_ns is None:
+            return None
+        return self.acked_ns - self.first_ns
+
+    def as_dict(self):
+        latency = self.latency_ns()
+        return {"COMMAND": self.cmd.decode(),
+                "SEQ": self.seq,
+                "STATE": self.state,
+                "ATTEMPTS": self.attempts,
+                "LATENCY MS": latency / NS_PER_MS if latency is not None else None}
+
+
+class DeliveryTracker:
+    """
+    DeliveryTracker - Class to send commands that have to be acknowledged
+     - Every command gets a sequence number and the client acks it with
+       that number, duplicates are the client's problem to ignore
+     - Anything not acked is resent with exponential backoff until it
+       runs out of retries
+     - Retransmits for every client come off one heap so nobody waits
+       on the slowest client
+    """
+    def __init__(self, send, retries=5, timeout_ns=100 * NS_PER_MS, backoff=2,
+                 on_acked=None, on_failed=None, on_pending=None):
+        # send IS CALLED AS send(msg, address)
+        self.send = send
+        self.retries = retries
+        self.timeout_ns = timeout_ns
+        self.backoff = backoff
+        self.on_acked = on_acked
+        self.on_failed = on_failed
+        # CALLED AFTER NEW WORK IS QUEUED, FOR DRIVERS THAT AREN'T run()
+        self.on_pending = on_pending
+        # START SEQUENCE NUMBERS SOMEWHERE RANDOM SO A RESTARTED MASTER
+        # DOESN'T LOOK LIKE A DUPLICATE TO THE CLIENTS
+        self._seq = random.getrandbits(31)
+        # PENDING DELIVERIES BY (CLIENT ID, SEQ) AND THE RETRANSMIT HEAP
+        self._pending = {}
+        self._heap = []
+        # LAST DELIVERY FOR EACH CLIENT, THIS IS WHAT WE REPORT
+        self.status = {}
+        self.dead = False
+        self._wakeup = threading.Condition()
+
+    def next_seq(self):
+        with self._wakeup:
+            self._seq = (self._seq + 1) & 0x7fffffff
+            return self._seq
+
+    def send_command(self, client_id, address, cmd, seq, msg, send_now=True):
+        # SEND msg NOW AND KEEP TRYING UNTIL client_id ACKS seq
+        # WITH send_now FALSE THE CALLER ALREADY SENT IT SOME OTHER WAY (MULTICAST)
+        # AND msg IS ONLY USED FOR THE RETRANSMITS
+        now = time.monotonic_ns()
+        delivery = Delivery(client_id, seq, cmd, msg, address, now)
+        with self._wakeup:
+            self._pending[(client_id, seq)] = delivery
+            self.status[client_id] = delivery
+            heapq.heappush(self._heap, (now + self.timeout_ns, client_id, seq))
+            self._wakeup.notify()
+        if send_now:
+            self.send(msg, address)
+        if self.on_pending:
+            self.on_pending()
+        return delivery
+
+    def ack(self, client_id, seq, reply=None):
+        # MARK A DELIVERY AS ACKED, RETURNS NONE FOR UNKNOWN OR DUPLICATE ACKS
+        now = time.monotonic_ns()
+        with self._wakeup:
+            delivery = self._pending.pop((client_id, seq), None)
+            if delivery is None:
+                return None
+            delivery.acked_ns = now
+            delivery.state = ACKED
+            delivery.reply = reply or []
+        ACK_TIME.labels(delivery.cmd.decode()).observe_ns(now - delivery.first_ns)
+        if self.on_acked:
+            self.on_acked(delivery)
+        return delivery
+
+    def forget(self, client_ids):
+        # STOP SENDING TO CLIENTS THAT WERE TAKEN OUT OF THE CONFIG, WHAT THEY HAD
+        # PENDING IS DROPPED WITHOUT BEING ACKED OR FAILED
+        with self._wakeup:
+            for key in [key for key in self._pending if key[0] in client_ids]:
+                del self._pending[key]
+            for client_id in client_ids:
+                self.status.pop(client_id, None)
+
+    def get_status(self):
+        with self._wakeup:
+            return {cid: d.as_dict() for cid, d in self.status.items()}
+
+    def next_due(self):
+        # WHEN THE NEXT RETRANSMIT IS DUE (MONOTONIC NS) OR NONE
+        with self._wakeup:
+            return self._heap[0][0] if self._heap else None
+
+    def service(self, now):
+        # RESEND ANYTHING THAT'S DUE, RETURNS THE NEXT DUE TIME OR NONE
+        resend = []
+        failed = []
+        with self._wakeup:
+            while self._heap and self._heap[0][0] <= now:
+                _, client_id, seq = heapq.heappop(self._heap)
+                delivery = self._pending.get((client_id, seq))
+                if delivery is None:
+                    # ALREADY ACKED
+                    continue
+                if delivery.attempts > self.retries:
+                    del self._pending[(client_id, seq)]
+                    delivery.state = FAILED
+                    failed.append(delivery)
+                    continue
+                delivery.attempts += 1
+                due = now + self.timeout_ns * self.backoff ** (delivery.attempts - 1)
+                heapq.heappush(self._heap, (due, client_id, seq))
+                resend.append(delivery)
+            nxt = self._heap[0][0] if self._heap else None
+        for delivery in resend:
+            RETRANSMITS.labels(delivery.cmd.decode()).inc()
+            logger.debug(logpipe.Lazy("RESENDING {0} SEQ {1} TO CLIENT {2} (ATTEMPT {3})",
+                                      delivery.cmd.decode().upper(), delivery.seq, delivery.client_id, delivery.attempts))
+            self.send(delivery.msg, delivery.address)
+        for delivery in failed:
+            UNACKED.labels(delivery.cmd.decode()).inc()
+            logger.warning("CLIENT ID: {0} NEVER ACKED {1} SEQ {2}".format(
+                delivery.client_id, delivery.cmd.decode().upper(), delivery.seq))
+            if self.on_failed:
+                self.on_failed(delivery)
+        return nxt
+
+    def kill(self):
+        with self._wakeup:
+            self.dead = True
+            self._wakeup.notify_all()
+
+    def run(self):
+        # THREAD BODY - SLEEP UNTIL THE NEXT RETRANSMIT IS DUE OR NEW WORK SHOWS UP
+        while not self.dead:
+            nxt = self.service(time.monotonic_ns())
+            with self._wakeup:
+                if self.dead:
+                    break
+                if nxt is None and not self._heap:
+                    self._wakeup.wait()
+                elif self._heap:
+                    wait = self._heap[0][0] - time.monotonic_ns()
+                    if wait > 0:
+                        self._wakeup.wait(wait / NS_PER_SEC)
@@ -0,0 +1,79 @@
+# THIS USES PYTHON 3
+
+# EVENTS
+# CODE TO PUSH STATE CHANGES OUT TO WHOEVER IS WATCHING (WEB DASHBOARDS)
+
+# MODULE IMPORT
+import threading
+import itertools
+import datetime
+import json
+import logging
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+# HOW MANY EVENTS A SUBSCRIBER MAY FALL BEHIND BEFORE IT'S DROPPED
+SUBSCRIBER_BACKLOG = 256
+# SECONDS BETWEEN SSE KEEPALIVE COMMENTS SO PROXIES DON'T CLOSE IDLE STREAMS
+KEEPALIVE = 15
+
+# CLASSES
+class Event:
+    """
+    Event - One state change, numbered so an SSE stream can say where it was
+    """
+    __slots__ = ("id", "kind", "time", "data")
+
+    def __init__(self, event_id, kind, data):
+        self.id = event_id
+        self.kind = kind
+        self.time = datetime.datetime.now().isoformat()
+        self.data = data
+
+    def as_dict(self):
+        return {"ID": self.id, "EVENT": self.kind, "TIME": self.time, "DATA": self.data}
+
+    def to_sse(self):
+        # SERVER-SENT EVENTS WIRE FORMAT
+        return "id: {0}\nevent: {1}\ndata: {2}\n\n".format(
+            self.id, self.kind, json.dumps(self.as_dict(), default=str)).encode()
+
+
+class EventBus:
+    """
+    EventBus - Fans events out to subscribers without ever blocking the publisher
+     - A subscriber is a callable taking an Event that returns False when it
+       can't keep up, it's dropped and has to reconnect
+     - Safe to publish from any thread
+    """
+    def __init__(self):
+        self._subscribers = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, deliver):
+        with self._lock:
+            self._subscribers.append(deliver)
+        return deliver
+
+    def unsubscribe(self, deliver):
+        with self._lock:
+            if deliver in self._subscribers:
+                self._subscribers.remove(deliver)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, kind, data=None):
+        with self._lock:
+            event = Event(next(self._ids), kind, data)
+            subscribers = list(self._subscribers)
+        for deliver in subscribers:
+            if deliver(event) is False:
+                logger.warning("EVENT SUBSCRIBER FELL BEHIND, DROPPING IT")
+                self.unsubscribe(deliver)
+        return event
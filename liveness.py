@@ -0,0 +1,188 @@
+# THIS USES PYTHON 3
+
+# LIVENESS
+# CODE TO DECIDE IF CLIENTS ARE STILL THERE FROM HOW THEY ANSWER PINGS
+#
+# EACH CLIENT KEEPS A HISTORY OF HOW LONG ITS PONGS TOOK TO ARRIVE AFTER THE
+# PING THAT ASKED FOR THEM. WHILE A PING IS UNANSWERED, PHI IS HOW UNLIKELY
+# IT IS (-log10 OF THE PROBABILITY) THAT A LIVE CLIENT WOULD STILL BE THIS
+# LATE GIVEN THAT HISTORY. MEASURING FROM THE PING RATHER THAN FROM THE LAST
+# PONG KEEPS THE HISTORY VALID WHILE THE PING INTERVAL CHANGES
+#
+# CONNECTED -> SUSPECT WHEN PHI PASSES SUSPECT PHI, SUSPECTS ARE PINGED AT
+# THE MINIMUM INTERVAL. SUSPECT -> DOWN WHEN PHI PASSES DOWN PHI. ANY PONG
+# BRINGS A CLIENT BACK TO CONNECTED. HEALTHY CLIENTS ARE PINGED LESS AND
+# LESS OFTEN UP TO THE MAXIMUM INTERVAL, DOWN CLIENTS BACK OFF THE SAME WAY
+
+# MODULE IMPORT
+import collections
+import threading
+import math
+import logging
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_MS = 1000000
+NS_PER_SEC = 1000000000
+# NUMBER OF ARRIVAL DELAYS KEPT PER CLIENT
+HISTORY_SIZE = 100
+# SMALLEST PROBABILITY WE TAKE THE LOG OF, KEEPS PHI FINITE
+MIN_PROBABILITY = 1e-300
+
+# LIVENESS STATES
+CONNECTED = "CONNECTED"
+SUSPECT = "SUSPECT"
+DOWN = "DOWN"
+
+# CLASSES
+class Heartbeat:
+    """
+    Heartbeat - Ping/pong timing for one client
+    """
+    __slots__ = ("delays", "pending_since", "interval_ns", "next_ping_ns")
+
+    def __init__(self, interval_ns):
+        self.delays = collections.deque(maxlen=HISTORY_SIZE)
+        # SEND TIME OF THE OLDEST PING THAT HASN'T BEEN ANSWERED
+        self.pending_since = None
+        self.interval_ns = interval_ns
+        self.next_ping_ns = 0
+
+    def pinged(self, now):
+        if self.pending_since is None:
+            self.pending_since = now
+        self.next_ping_ns = now + self.interval_ns
+
+    def arrived(self, now):
+        # A PONG ANSWERS EVERY OUTSTANDING PING, LOST PINGS MAKE THE DELAY LONGER
+        if self.pending_since is not None:
+            self.delays.append(now - self.pending_since)
+            self.pending_since = None
+
+    def phi(self, now, min_std_ns):
+        if self.pending_since is None or not self.delays:
+            return 0.0
+        elapsed = now - self.pending_since
+        mean = sum(self.delays) / len(self.delays)
+        variance = sum((d - mean) ** 2 for d in self.delays) / len(self.delays)
+        std = max(math.sqrt(variance), min_std_ns)
+        # PROBABILITY A NORMALLY DISTRIBUTED DELAY IS LONGER THAN elapsed
+        later = 0.5 * math.erfc((elapsed - mean) / (std * math.sqrt(2)))
+        return -math.log10(max(later, MIN_PROBABILITY))
+
+
+class LivenessMonitor:
+    """
+    LivenessMonitor - Phi accrual failure detector for the master's clients
+     - Call pinged() when a ping goes out, heartbeat() when a pong comes in
+       and check() on a timer to move clients between states
+     - due() says who needs a ping, the interval adapts per client
+     - Callbacks are called as on_x(client, phi) outside the lock
+    """
+    def __init__(self, min_interval=1, max_interval=60, growth=2, suspect_phi=3, down_phi=8,
+                 min_std_ns=500 * NS_PER_MS, on_suspect=None, on_down=None, on_up=None):
+        self.on_suspect = on_suspect
+        self.on_down = on_down
+        self.on_up = on_up
+        self._lock = threading.Lock()
+        self.configure(min_interval, max_interval, growth, suspect_phi, down_phi, min_std_ns)
+
+    def configure(self, min_interval, max_interval, growth, suspect_phi, down_phi, min_std_ns):
+        # (RE)SET THE TUNING, THE CLIENTS KEEP THEIR HISTORIES AND GROW INTO THE NEW INTERVALS
+        with self._lock:
+            self.min_interval_ns = int(min_interval * NS_PER_SEC)
+            self.max_interval_ns = max(int(max_interval * NS_PER_SEC), self.min_interval_ns)
+            self.growth = growth
+            self.suspect_phi = suspect_phi
+            self.down_phi = down_phi
+            self.min_std_ns = min_std_ns
+
+    @property
+    def tick_interval(self):
+        # HOW OFTEN check() AND due() SHOULD RUN, IN SECONDS
+        return self.min_interval_ns / NS_PER_SEC
+
+    def _heart(self, client):
+        if client.heartbeat is None:
+            client.heartbeat = Heartbeat(self.min_interval_ns)
+        return client.heartbeat
+
+    def _grow(self, heart):
+        heart.interval_ns = min(int(heart.interval_ns * self.growth), self.max_interval_ns)
+
+    def due(self, clients, now):
+        # CLIENTS WHOSE NEXT PING TIME HAS COME, OR WILL BEFORE THE NEXT TICK IS HALF OVER
+        deadline = now + self.min_interval_ns // 2
+        with self._lock:
+            return [client for client in clients if self._heart(client).next_ping_ns <= deadline]
+
+    def pinged(self, client, now):
+        with self._lock:
+            heart = self._heart(client)
+            heart.pinged(now)
+            if client.liveness == DOWN:
+                # KEEP LOOKING FOR IT, JUST LESS AND LESS OFTEN
+                self._grow(heart)
+
+    def heartbeat(self, client, now):
+        # A PONG CAME IN, RETURNS THE STATE THE CLIENT WAS IN BEFORE
+        with self._lock:
+            heart = self._heart(client)
+            heart.arrived(now)
+            previous = client.liveness
+            if previous == CONNECTED:
+                # STILL HEALTHY, BACK OFF
+                self._grow(heart)
+            else:
+                heart.interval_ns = self.min_interval_ns
+                heart.next_ping_ns = now + heart.interval_ns
+            client.liveness = CONNECTED
+        if previous in (SUSPECT, DOWN) and self.on_up:
+            self.on_up(client, 0.0)
+        return previous
+
+    def check(self, clients, now):
+        # MOVE CLIENTS DOWN THE STATES AS THEIR PHI GROWS
+        changed = []
+        with self._lock:
+            for client in clients:
+                if client.liveness not in (CONNECTED, SUSPECT) or client.heartbeat is None:
+                    continue
+                heart = client.heartbeat
+                phi = heart.phi(now, self.min_std_ns)
+                if phi >= self.down_phi:
+                    client.liveness = DOWN
+                    changed.append((self.on_down, client, phi))
+                elif phi >= self.suspect_phi and client.liveness == CONNECTED:
+                    client.liveness = SUSPECT
+                    # FIND OUT QUICKLY
+                    heart.interval_ns = self.min_interval_ns
+                    heart.next_ping_ns = now
+                    changed.append((self.on_suspect, client, phi))
+        for callback, client, phi in changed:
+            if callback:
+                callback(client, phi)
+
+    def get_status(self, clients, now):
+        with self._lock:
+            return {client.id: {"STATE": client.liveness,
+                                "PHI": client.heartbeat.phi(now, self.min_std_ns) if client.heartbeat else None,
+                                "INTERVAL": client.heartbeat.interval_ns / NS_PER_SEC if client.heartbeat else None}
+                    for client in clients}
+
+
+# FUNCTIONS
+def options_from_config(config):
+    # PULL THE LIVENESS SETTINGS OUT OF A MASTER CONFIG
+    # PING TIMER IS THE LONGEST WE'LL GO WITHOUT PINGING A HEALTHY CLIENT
+    heartbeat = config.get("HEARTBEAT", {})
+    max_interval = heartbeat.get("MAX INTERVAL", config["PING TIMER"])
+    return {"min_interval": heartbeat.get("MIN INTERVAL", min(1, max_interval)),
+            "max_interval": max_interval,
+            "growth": heartbeat.get("GROWTH", 2),
+            "suspect_phi": heartbeat.get("SUSPECT PHI", 3),
+            "down_phi": heartbeat.get("DOWN PHI", 8),
+            "min_std_ns": int(heartbeat.get("MIN STD MS", 500) * NS_PER_MS)}
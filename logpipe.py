@@ -0,0 +1,219 @@
+# THIS USES PYTHON 3
+
+# LOGPIPE
+# CODE TO GET LOGGING OFF THE NETWORK AND SCHEDULING HOT PATHS
+#
+# A LOG CALL ONLY PUTS THE RECORD ON A BOUNDED QUEUE, ONE WRITER THREAD FORMATS
+# IT AND WRITES IT OUT, SO A SLOW TERMINAL OR DISK NEVER HOLDS UP A PONG OR A
+# CUE. IF THE WRITER FALLS THAT FAR BEHIND NEW LINES ARE DROPPED AND COUNTED
+# RATHER THAN WAITED ON, THE WRITER SAYS HOW MANY IT LOST WHEN IT CATCHES UP
+#
+# HOT PATHS LOG A Lazy MESSAGE SO NOTHING IS FORMATTED UNLESS THE LINE IS
+# WRITTEN, AND LINES THAT REPEAT FOR EVERY CLIENT ON EVERY PING ARE Repeating
+# SO EACH CLIENT GETS AT MOST ONE OF THEM PER REPEAT INTERVAL:
+#
+#   logger.info(logpipe.Lazy("TASK {0} FIRED {1:.3f} MS LATE", idx, late))
+#   logger.info(logpipe.Repeating(client.id, "PONG RECEIVED FROM: CLIENT ID {0}", client.id))
+#
+# THE ARGUMENTS ARE FORMATTED LATER ON ANOTHER THREAD, DON'T PASS ANYTHING
+# THAT'S GOING TO CHANGE
+
+# MODULE IMPORT
+import logging.handlers
+import threading
+import datetime
+import atexit
+import queue
+import json
+import time
+import logging
+# LOCAL MODULES
+import metrics
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_SEC = 1000000000
+# RECORDS THAT CAN WAIT FOR THE WRITER BEFORE NEW ONES ARE DROPPED
+DEFAULT_BUFFER = 10000
+# A REPEATING LINE IS WRITTEN AT MOST ONCE PER THIS MANY SECONDS FOR EACH KEY
+DEFAULT_REPEAT_SECONDS = 10
+
+# METRICS
+LINES_DROPPED = metrics.counter("escape_room_log_lines_dropped_total",
+                                "Log lines dropped because the log writer fell behind")
+LINES_SUPPRESSED = metrics.counter("escape_room_log_lines_suppressed_total",
+                                   "Repeating log lines left out by the rate limit")
+
+# CLASSES
+class Lazy:
+    """
+    Lazy - A log message that's only put through str.format when it's written
+    """
+    __slots__ = ("template", "args", "key", "suppressed")
+
+    def __init__(self, template, *args):
+        self.template = template
+        self.args = args
+        # RATE LIMIT KEY, ONLY Repeating MESSAGES HAVE ONE
+        self.key = None
+        # HOW MANY LINES LIKE THIS ONE THE RATE LIMIT LEFT OUT BEFORE IT
+        self.suppressed = 0
+
+    def __str__(self):
+        text = self.template.format(*self.args)
+        if self.suppressed:
+            text += " ({0} MORE LIKE THIS SUPPRESSED)".format(self.suppressed)
+        return text
+
+
+class Repeating(Lazy):
+    """
+    Repeating - A Lazy message that comes up over and over, e.g. once per
+    client per ping, rate limited separately for every key
+    """
+    __slots__ = ()
+
+    def __init__(self, key, template, *args):
+        Lazy.__init__(self, template, *args)
+        self.key = key
+
+
+class RepeatFilter(logging.Filter):
+    """
+    RepeatFilter - Lets one Repeating line through per interval for each
+    template and key, the next one through says how many were left out
+    """
+    def __init__(self, interval_ns=DEFAULT_REPEAT_SECONDS * NS_PER_SEC):
+        logging.Filter.__init__(self)
+        self.interval_ns = interval_ns
+        # (TEMPLATE, KEY) -> (WHEN THE LAST ONE WENT THROUGH, HOW MANY SINCE)
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record.msg, "key", None)
+        if key is None or not self.interval_ns:
+            return True
+        key = (record.msg.template, key)
+        now = time.monotonic_ns()
+        with self._lock:
+            last, suppressed = self._seen.get(key, (None, 0))
+            if last is not None and now - last < self.interval_ns:
+                self._seen[key] = (last, suppressed + 1)
+                LINES_SUPPRESSED.inc()
+                return False
+            self._seen[key] = (now, 0)
+        record.msg.suppressed = suppressed
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    DroppingQueueHandler - Hands records to the writer thread as they are
+     - Nothing is formatted here, the writer does that
+     - A full queue drops the record and counts it instead of blocking, the
+       next record that fits carries the count so the writer can say where
+       the gap is
+    """
+    def __init__(self, records):
+        logging.handlers.QueueHandler.__init__(self, records)
+        self.dropped = 0
+        self._gap = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        # CALLED UNDER THE HANDLER LOCK
+        record.dropped_before = self._gap
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._gap += 1
+            LINES_DROPPED.inc()
+        else:
+            self._gap = 0
+
+
+class LogWriter(logging.handlers.QueueListener):
+    """
+    LogWriter - The writer thread, formats and writes every queued record
+    with the handlers logging was set up with and owns up to dropped lines
+    """
+    def __init__(self, records, *handlers):
+        logging.handlers.QueueListener.__init__(self, records, *handlers, respect_handler_level=True)
+
+    def handle(self, record):
+        dropped = getattr(record, "dropped_before", 0)
+        if dropped:
+            logging.handlers.QueueListener.handle(self, logging.makeLogRecord({
+                "name": NAME, "module": "logpipe", "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "LOGGING FELL BEHIND, DROPPED {0} LINES".format(dropped)}))
+        logging.handlers.QueueListener.handle(self, record)
+
+    def enqueue_sentinel(self):
+        # WAIT FOR ROOM, THE WRITER HAS TO SEE THIS ONE
+        self.queue.put(self._sentinel)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    JsonLinesFormatter - One JSON object per line for the structured event log,
+    Lazy messages keep their template and arguments so lines can be picked
+    out by what they are rather than by what they say
+    """
+    def format(self, record):
+        entry = {"TIME": datetime.datetime.fromtimestamp(record.created).isoformat(),
+                 "LEVEL": record.levelname,
+                 "MODULE": record.module,
+                 "MESSAGE": record.getMessage()}
+        if isinstance(record.msg, Lazy):
+            entry["TEMPLATE"] = record.msg.template
+            entry["ARGS"] = record.msg.args
+            if record.msg.key is not None:
+                entry["KEY"] = record.msg.key
+                entry["SUPPRESSED"] = record.msg.suppressed
+        if record.exc_info:
+            entry["EXCEPTION"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# FUNCTIONS
+def install(buffer=DEFAULT_BUFFER, repeat_ns=DEFAULT_REPEAT_SECONDS * NS_PER_SEC, json_path=None):
+    # PUT THE ROOT LOGGER'S HANDLERS (AND THE JSON LOG IF ASKED FOR) BEHIND THE QUEUE
+    # A buffer OF 0 KEEPS LOGGING SYNCHRONOUS, THE RATE LIMIT AND JSON LOG STILL APPLY
+    # RETURNS THE WRITER OR NONE, IT'S STOPPED (AND FLUSHED) AT EXIT
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    if json_path:
+        structured = logging.FileHandler(json_path)
+        structured.setFormatter(JsonLinesFormatter())
+        handlers.append(structured)
+        logger.info("WRITING JSON LOG TO {0}".format(json_path))
+    repeats = RepeatFilter(repeat_ns)
+    if not buffer:
+        for handler in handlers:
+            handler.addFilter(repeats)
+            if handler not in root.handlers:
+                root.addHandler(handler)
+        return None
+    front = DroppingQueueHandler(queue.Queue(buffer))
+    front.addFilter(repeats)
+    writer = LogWriter(front.queue, *handlers)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(front)
+    writer.start()
+    atexit.register(writer.stop)
+    return writer
+
+
+def options_from_config(config):
+    # install() KEYWORD ARGUMENTS FROM A MASTER OR CLIENT CONFIG, ALL OPTIONAL
+    return {"buffer": config.get("LOG BUFFER", DEFAULT_BUFFER),
+            "repeat_ns": int(config.get("LOG REPEAT SECONDS", DEFAULT_REPEAT_SECONDS) * NS_PER_SEC),
+            "json_path": config.get("LOG JSON")}
@@ -11,17 +11,48 @@ import socketserver
 import urllib.parse
 import socket
 import threading
+import queue
 import datetime
 import time
 import signal
 import sys
+import os
+import struct
+import functools
 import logging
 # LOCAL MODULES
 import tasker
+import taskplan
+import delivery
+import registry
+import protocol
+import liveness
+import events
+import metrics
+import logpipe
+import relay
 
 # CONSTANTS
 ANYHOST = ""
 WEBPORT = 8080
+# JSON API AND SERVER-SENT EVENTS LIVE UNDER HERE ON THE WEB PORT
+API_PREFIX = "/api/"
+EVENTS_PATH = "/api/events"
+# A VENUE SERVES EACH ROOM'S PAGES, API AND EVENTS UNDER HERE
+ROOMS_PATH = "/rooms/"
+# WEB ACTIONS THAT PAUSE, RESUME, SEEK OR STOP THE TIMELINE, AND WHY THEY'D BE REFUSED
+# (STOP NEVER IS, THERE MAY BE COMMANDS LEFT OVER FROM A FINISHED RUN)
+CONTROL_ACTIONS = {"pause": protocol.CONTROL_PAUSE,
+                   "resume": protocol.CONTROL_RESUME,
+                   "seek": protocol.CONTROL_SEEK,
+                   "stop": protocol.CONTROL_STOP}
+CONTROL_REFUSED = {protocol.CONTROL_PAUSE: "NOT RUNNING OR ALREADY PAUSED",
+                   protocol.CONTROL_RESUME: "NOT PAUSED",
+                   protocol.CONTROL_SEEK: "NOT RUNNING OR PAST THE END",
+                   protocol.CONTROL_STOP: "NOTHING TO STOP"}
+# CONFIG KEYS ONLY READ WHEN THE MASTER STARTS, RELOADING A CHANGE TO THEM JUST WARNS
+RESTART_KEYS = ("PORT", "WEB PORT", "MULTICAST", "SHARDS", "SHARD PORT", "SHARD METRICS PORT",
+                "LOG BUFFER", "LOG REPEAT SECONDS", "LOG JSON")
 NAME = "ESCAPE ROOM"
 FORMAT = '%(asctime)-15s %(levelname)-10s %(module)-12s %(message)s'
 
@@ -32,34 +63,60 @@ logger.setLevel(logging.DEBUG)
 
 # GLOBALS
 sevent = threading.Event()
+# ONE RELOAD AT A TIME, A SIGHUP AND A WEB RELOAD CAN COME IN TOGETHER
+reloading = threading.Lock()
+
+# METRICS
+PINGS_SENT = metrics.counter("escape_room_pings_sent_total",
+                             "Pings sent to clients", labels=("mode",))
+PONGS_RECEIVED = metrics.counter("escape_room_pongs_received_total",
+                                 "Pongs received from known clients")
+PONG_HANDLING = metrics.histogram("escape_room_pong_handling_seconds",
+                                  "Time from a pong arriving to being done with it")
+PING_RTT = metrics.histogram("escape_room_ping_rtt_seconds",
+                             "Ping round trip less the client's turnaround", labels=("client",))
+CLIENTS_CONNECTED = metrics.gauge("escape_room_clients_connected",
+                                  "Clients currently connected")
+START_SEND = metrics.histogram("escape_room_start_send_seconds",
+                               "Time taken to send START to every client")
+START_FANOUT = metrics.histogram("escape_room_start_fanout_seconds",
+                                 "Time from pushing start to the last client's START ack")
+CONTROL_APPLY = metrics.histogram("escape_room_control_apply_seconds",
+                                  "Time from a control click to the last client applying it",
+                                  labels=("action",))
+STOP_QUIET = metrics.histogram("escape_room_stop_quiet_seconds",
+                               "Time from a stop click to the last command exiting everywhere")
+RELOAD_TIME = metrics.histogram("escape_room_reload_seconds",
+                                "Time taken to apply a reloaded config")
 
 # CLASSES
 class LoopingTimer:
     """
     LoopingTimer - CLASS THAT IMPLEMENTS A LOOPING TIMER
-    # HAT TIP TO:
-    # https://stackoverflow.com/questions/12435211/python-threading-timer-repeat-function-every-n-seconds
+     - One thread for the life of the timer, it waits on an event between
+       runs so cancel() wakes it straight up and nothing can re-arm after
+     - interval is read before every wait, so it can be changed while running
     """
     def __init__(self, interval, func_to_run, immediate_fire=False):
         logger.info("LOOPING TIMER CREATED")
         self.interval = interval
         self.func = func_to_run
-        self.timer = threading.Timer(self.interval, self._handle)
         self.immediate_fire = immediate_fire
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
 
-    def _handle(self):
-        # RUN FUNCTION
-        self.func()
-        self.timer = threading.Timer(self.interval, self._handle)
-        self.timer.start()
+    def _run(self):
+        # RUN FUNCTION EVERY INTERVAL UNTIL CANCELLED
+        while not self._stop.wait(self.interval):
+            self.func()
 
     def start(self):
         if self.immediate_fire:
             self.func()
-        self.timer.start()
+        self.thread.start()
 
     def cancel(self):
-        self.timer.cancel()
+        self._stop.set()
 
 
 class WebControlHandler(http.server.SimpleHTTPRequestHandler):
@@ -68,35 +125,22 @@ class WebControlHandler(http.server.SimpleHTTPRequestHandler):
 
     # OVERLOADED FUNCTION
     def do_GET(self):
-
-        # PARSE THE URL
-        urlcomp = urllib.parse.urlparse(self.path) # split url in components
-        query = urllib.parse.parse_qs(urlcomp.query) # Get args as dictionary
-        # LOOK FOR QUERY INFO
-        try:
-            cmd = query['cmd']
-        except KeyError:
-            message = "<p>NO COMMANDS PROCESSED</p>"
-        else:
-            message = "<p></p>"
-            if cmd == ["start"]:
-                self.server.start_has_been_pushed = True
-                # ONLY RUN CALLBACK IF NO TASKS ARE RUNNING
-                if not self.server.tasks_running:
-                    self.server.run_callback()
-                    message = "<p>SCRIPT STARTED</p>"
-                else:
-                    message = "<p>SCRIPT IS ALREADY RUNNING</p>"
-            elif cmd == ["stop"]:
-                message = "<p>FEATURE NOT IMPLEMENTED</p>"
-            else:
-                message = "<p>UNKNOWN ACTION {}</p>".format(cmd.upper())
-        # Build links whatever the action was
-        message += """<p>
-                      <a href="/control.html?cmd=start">START EVERYTHING</a>
-                      </p><p>
-                      <a href="/control.html?cmd=stop">STOP EVERYTHING</a>
-                      </p>"""
+        # A VENUE SERVES EVERY ROOM'S PAGES UNDER ITS OWN PREFIX, PICK OUT WHOSE THESE ARE
+        state, target = self.server.route(self.path)
+        if state is None:
+            self.send_json(404, {"RESULT": "UNKNOWN ROOM"})
+            return
+        path = urllib.parse.urlparse(target).path
+        if path == EVENTS_PATH:
+            self.stream_events(state)
+            return
+        if path == metrics.METRICS_PATH:
+            self.send_text(200, metrics.CONTENT_TYPE, state.metrics.render())
+            return
+        if path.startswith(API_PREFIX):
+            self.send_json(*state.api("GET", target))
+            return
+        message = state.page(target)
         self.send_response(200)
         # Custom headers, if need be
         self.send_header('Content-type', 'text/html')
@@ -104,30 +148,218 @@ class WebControlHandler(http.server.SimpleHTTPRequestHandler):
         # Custom body
         self.wfile.write(str.encode(message))
 
+    # OVERLOADED FUNCTION
+    def do_POST(self):
+        state, target = self.server.route(self.path)
+        if state is None:
+            self.send_json(404, {"RESULT": "UNKNOWN ROOM"})
+            return
+        self.send_json(*state.api("POST", target))
 
-class WebControl(socketserver.TCPServer):
+    def send_json(self, code, payload):
+        self.send_text(code, 'application/json', json.dumps(payload, default=str))
 
-    # WE KINDA WANT TO BE A DAEMON
-    daemon_threads = True
-    # FASTER BINDING
-    allow_reuse_address = True
+    def send_text(self, code, content_type, text):
+        body = text.encode()
+        self.send_response(code)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-    def __init__(self, server_address, RequestHandlerClass, callback=None):
-        socketserver.TCPServer.__init__(self, server_address, RequestHandlerClass)
+    def stream_events(self, state):
+        # SERVER-SENT EVENTS - THIS THREAD SLEEPS ON ITS OWN BACKLOG BETWEEN EVENTS
+        # IF THE BROWSER CAN'T KEEP UP THE BUS DROPS US AND WE HANG UP SO IT RECONNECTS
+        backlog = queue.Queue(maxsize=events.SUBSCRIBER_BACKLOG)
+        dropped = threading.Event()
+
+        def deliver(event):
+            try:
+                backlog.put_nowait(event)
+            except queue.Full:
+                dropped.set()
+                return False
+            return True
+
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        state.events.subscribe(deliver)
+        try:
+            # START EVERY STREAM WITH THE FULL PICTURE
+            self.wfile.write(state.status_event().to_sse())
+            self.wfile.flush()
+            while not dropped.is_set():
+                try:
+                    event = backlog.get(timeout=events.KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write(event.to_sse())
+                self.wfile.flush()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            state.events.unsubscribe(deliver)
+
+    def log_message(self, format, *args):
+        # KEEP REQUEST LOGGING IN OUR LOGGER INSTEAD OF STDERR
+        logger.debug("WEB {0} {1}".format(self.address_string(), format % args))
+
+
+class WebControlState:
+    """
+    WebControlState - What the web control page needs to know about the
+    controller, shared by the threaded and asyncio web servers
+    """
+    def __init__(self, callback=None, status=None, bus=None, control=None, registry=None, prefix=""):
         self.callback = callback
+        # WHERE OUR PAGES ARE SERVED FROM, A VENUE PUTS EACH ROOM UNDER /rooms/NAME
+        self.prefix = prefix
+        # status() RETURNS THE CONTROLLER STATE AS PLAIN DATA
+        self.status = status
+        # control(ACTION, OFFSET NS) PAUSES, RESUMES, SEEKS OR STOPS, SEE Controller.control
+        self.control_callback = control
+        self.events = bus if bus is not None else events.EventBus()
+        # COUNTERS AND HISTOGRAMS FOR /metrics AND /api/metrics
+        self.metrics = registry if registry is not None else metrics.REGISTRY
+        # reload_callback() RELOADS THE CONFIG FILE, SET BY main() WHEN THERE IS ONE
+        self.reload_callback = None
         self.start_has_been_pushed = False
         self.tasks_running = False
+        # REQUESTS CAN COME IN ON SEVERAL THREADS, ONLY ONE GETS TO START
+        self._start_lock = threading.Lock()
 
     def run_callback(self):
         if self.callback:
             self.callback()
 
+    def push_start(self):
+        # RUN THE START CALLBACK UNLESS TASKS ARE RUNNING, RETURNS TRUE IF IT RAN
+        with self._start_lock:
+            self.start_has_been_pushed = True
+            if self.tasks_running:
+                return False
+            self.run_callback()
+            return True
+
+    def push_control(self, action, offset_ns=None):
+        # RUN THE CONTROL CALLBACK, RETURNS THE TIMELINE POSITION OR NONE IF IT WAS REFUSED
+        if self.control_callback:
+            return self.control_callback(action, offset_ns)
+        return None
+
+    def push_reload(self):
+        # RUN THE RELOAD CALLBACK, RETURNS WHAT CHANGED OR NONE IF THERE'S NOTHING TO RELOAD
+        # RAISES OSError OR ValueError IF THE CONFIG COULDN'T BE USED
+        if self.reload_callback:
+            return self.reload_callback()
+        return None
+
     def set_tasks_running(self, running):
         self.tasks_running = running
 
     def has_start_been_pushed(self):
         return self.start_has_been_pushed
 
+    def get_status(self):
+        return self.status() if self.status else {}
+
+    def status_event(self):
+        # SNAPSHOT SENT AT THE START OF EVERY EVENT STREAM, NOT PUBLISHED
+        return events.Event(0, "status", self.get_status())
+
+    def route(self, path):
+        # (STATE, PATH) FOR A REQUEST PATH, THE SERVER ONLY SERVES US SO IT'S US AS IS
+        return self, path
+
+    def api(self, method, path):
+        return web_api(self, method, path)
+
+    def page(self, path):
+        return web_control_page(self, path)
+
+
+class WebControl(socketserver.ThreadingMixIn, WebControlState, socketserver.TCPServer):
+
+    # WE KINDA WANT TO BE A DAEMON
+    daemon_threads = True
+    # DON'T WAIT ON EVENT STREAMS WHEN CLOSING
+    block_on_close = False
+    # FASTER BINDING
+    allow_reuse_address = True
+
+    def __init__(self, server_address, RequestHandlerClass, callback=None, status=None, bus=None,
+                 control=None):
+        socketserver.TCPServer.__init__(self, server_address, RequestHandlerClass)
+        WebControlState.__init__(self, callback, status, bus, control)
+
+
+class ControlRecord:
+    """
+    ControlRecord - One pause, resume, seek or stop sent from the master and
+    how long everyone took to apply it, measured from the web click on our clock
+     - A client that acks with its apply time is converted with its clock
+       offset, without an offset the ack round trip is used and it's
+       listed as ESTIMATED
+     - After a stop everyone also reports when their last command exited,
+       that's the time to quiescence
+    """
+    def __init__(self, action, seq, offset_ns, clicked_ns, applied_ns, client_ids):
+        self.action = action
+        self.seq = seq
+        self.offset_ns = offset_ns
+        self.clicked_ns = clicked_ns
+        # CLIENT ID (OR MASTER) -> NANOSECONDS FROM THE CLICK TO APPLYING IT
+        self.latency = {"MASTER": applied_ns - clicked_ns}
+        self.estimated = []
+        # CLIENT ID -> WHY IT DIDN'T APPLY IT
+        self.skipped = {}
+        self.pending = set(client_ids)
+        # CLIENT ID (OR MASTER) -> NANOSECONDS FROM THE CLICK TO NOTHING RUNNING, STOPS ONLY
+        self.quiet = {}
+
+    def name(self):
+        return protocol.CONTROL_NAMES[self.action]
+
+    def applied(self, client_id, latency_ns, estimated=False):
+        self.pending.discard(client_id)
+        self.latency[client_id] = latency_ns
+        if estimated:
+            self.estimated.append(client_id)
+
+    def skip(self, client_id, reason):
+        self.pending.discard(client_id)
+        self.skipped[client_id] = reason
+
+    def quieted(self, who, latency_ns, estimated=False):
+        self.quiet[who] = latency_ns
+        if estimated and who not in self.estimated:
+            self.estimated.append(who)
+
+    def done(self):
+        return not self.pending
+
+    def all_quiet(self):
+        # EVERYONE WHO APPLIED THE STOP HAS REPORTED IN
+        return self.done() and all(who in self.quiet for who in self.latency)
+
+    def max_latency_ns(self):
+        return max(self.latency.values())
+
+    def as_dict(self):
+        return {"ACTION": self.name(),
+                "SEQ": self.seq,
+                "POSITION": self.offset_ns / tasker.NS_PER_SEC,
+                "LATENCY MS": {who: latency / tasker.NS_PER_MS for who, latency in self.latency.items()},
+                "MAX MS": self.max_latency_ns() / tasker.NS_PER_MS,
+                "QUIET MS": {who: quiet / tasker.NS_PER_MS for who, quiet in self.quiet.items()},
+                "MAX QUIET MS": max(self.quiet.values()) / tasker.NS_PER_MS if self.quiet else None,
+                "ESTIMATED": list(self.estimated),
+                "SKIPPED": dict(self.skipped),
+                "PENDING": sorted(self.pending)}
+
 
 class ControllerHandler(socketserver.BaseRequestHandler):
     """
@@ -140,38 +372,129 @@ class ControllerHandler(socketserver.BaseRequestHandler):
 
     # OVERLOAD THE HANDLE FUNCTION
     def handle(self):
-        # STRIP EXTRA STUFF AND MAKE IT LOWERCASE
+        # GRAB THE RECEIVE TIME FIRST THING, IT'S T4 FOR THE CLOCK OFFSET MATH
+        recv_ns = time.monotonic_ns()
         data = self.request[0]
-        # FIGURE OUT WHO THIS IS FROM - GET JUST THE IP
-        sender = self.client_address[0]
+        # THE ROOM THE SENDER BELONGS TO, A CONTROLLER IS ITS OWN ONLY ROOM
+        self.room = self.server.room_for(self.client_address)
+        if self.room is None:
+            logger.warning(logpipe.Repeating(self.client_address, "MESSAGE FROM UNKNOWN CLIENT {0}",
+                                             self.client_address))
+            return
+        # CLIENTS THAT NEGOTIATED THE BINARY PROTOCOL SEND FRAMES STARTING WITH ITS MAGIC
+        if protocol.is_binary(data):
+            try:
+                msg = protocol.decode(data)
+            except protocol.ProtocolError as err:
+                logger.warning("BAD MESSAGE FROM {0}: {1}".format(self.client_address, err))
+                return
+            self.handle_binary(msg, recv_ns)
+        else:
+            try:
+                self.handle_text(data, recv_ns)
+            except (ValueError, IndexError):
+                # A GARBLED OR TRUNCATED COMMAND, ONE LINE RATHER THAN A TRACEBACK
+                logger.warning("BAD MESSAGE FROM {0}: {1}".format(self.client_address, data[:64]))
+
+    def handle_text(self, data, recv_ns):
+        # FIGURE OUT WHO THIS IS FROM - CLIENTS ANSWER FROM THEIR LISTENING PORT
+        # SO (IP, PORT) PICKS OUT THE CLIENT EVEN IF SEVERAL SHARE AN IP
+        sender = self.client_address
+        # MESSAGES ARE SPACE SEPARATED, FIRST WORD IS THE COMMAND
+        parts = data.split()
+        cmd = parts[0] if parts else b""
 
         # FIGURE OUT IF THE DATA IS A PONG
         # NOTE: THIS LOOKS GOOFY, BUT CONTROLLER HANDLER WILL BE PASSED
-        # INTO CONTROLLER SERVER AND CAN ACCESS THE PARENT CLASS MEMBER VARIABLES
-        if data == self.server.PONG:
-            # SEND THE IP INTO THE SERVER FUNCTION TO SET CONNECTED
-            logger.info("PONG RECEIVED FROM: {0}".format(sender))
-            self.server.set_client_connected(sender)
-            # IF WE ARE ABLE TO AUTO START AND EVERYTHING IS CONNECTED
-            if not self.server.started and self.server.get_start_auto() and self.server.all_connected:
-                logger.info("AUTO STARTING ALL CLIENTS")
-                self.server.start_all()
+        # INTO CONTROLLER SERVER AND CAN ACCESS THE ROOM IT PICKED OUT
+        if cmd == self.room.PONG:
+            logger.info(logpipe.Repeating(sender, "PONG RECEIVED FROM: {0}", sender))
+            client = self.room.clients.get_by_address(sender)
+            if client is None:
+                logger.warning("PONG FROM UNKNOWN CLIENT {0}".format(sender))
+                return
+            # PONG [T1 T2 T3 [mc] [v<N>] [r<CONNECTED>/<TOTAL>]]
+            # TIMESTAMPED PONGS ECHO OUR PING TIME AND THE CLIENT RECEIVE/SEND TIMES
+            # A BARE PONG MEANS AN OLD CLIENT THAT DOESN'T DO TIMESTAMPS OR ACKS
+            # A RELAY ENDS WITH HOW MANY OF ITS OWN CLIENTS ARE CONNECTED
+            times = None
+            if len(parts) >= 4:
+                times = tuple(int(x) for x in parts[1:4]) + (recv_ns,)
+            fields, summary = relay.parse_summary(parts[4:])
+            version = protocol.TEXT_VERSION
+            for field in fields:
+                if field.startswith(self.room.VERSION_PREFIX):
+                    version = protocol.negotiate(int(field[1:]))
+            self.handle_pong(client, version, times, self.room.MCAST_MEMBER in fields, recv_ns, summary)
+        elif cmd == self.room.ACK:
+            # ACK <CLIENT ID> <SEQ> [EXTRA FIELDS FOR THE COMMAND] [r<REACHED>/<TOTAL>]
+            fields, summary = relay.parse_summary(parts[3:])
+            self.room.delivery.ack(int(parts[1]), int(parts[2]), fields)
+            if summary is not None:
+                self.room.report_relayed(int(parts[1]), int(parts[2]), summary)
+        elif cmd == self.room.STARTED:
+            # OLD STYLE START REPLY, NOTHING TO MEASURE
+            self.room.report_client_start(int(parts[1]), None)
+        elif cmd == self.room.QUIET:
+            # QUIET <CLIENT ID> <STOP SEQ> <WHEN ITS LAST COMMAND EXITED>
+            client = self.room.clients.get(int(parts[1]))
+            if client is not None:
+                self.room.report_client_quiet(client, int(parts[2]), int(parts[3]), recv_ns)
         else:
             logger.info(data.upper())
 
+    def handle_binary(self, msg, recv_ns):
+        # BINARY MESSAGES SAY WHICH CLIENT SENT THEM, SO THE ADDRESS DOESN'T MATTER
+        client = self.room.clients.get(msg.client_id)
+        if client is None:
+            logger.warning("{0} FROM UNKNOWN CLIENT ID {1} AT {2}".format(
+                msg.type_name(), msg.client_id, self.client_address))
+            return
+        if msg.type == protocol.PONG:
+            logger.info(logpipe.Repeating(client.id, "PONG RECEIVED FROM: CLIENT ID {0}", client.id))
+            t1, t2, flags = protocol.unpack_pong(msg)
+            self.handle_pong(client, protocol.negotiate(msg.version), (t1, t2, msg.timestamp, recv_ns),
+                             bool(flags & protocol.FLAG_MULTICAST), recv_ns,
+                             protocol.unpack_relay(msg, protocol.PONG_BODY))
+        elif msg.type == protocol.ACK:
+            _, flags, value = protocol.unpack_ack(msg)
+            self.room.delivery.ack(client.id, msg.seq,
+                                     [value] if flags & protocol.FLAG_HAS_VALUE else [])
+            summary = protocol.unpack_relay(msg, protocol.ACK_BODY)
+            if summary is not None:
+                self.room.report_relayed(client.id, msg.seq, summary)
+        elif msg.type == protocol.QUIET:
+            self.room.report_client_quiet(client, msg.seq, msg.timestamp, recv_ns)
+        else:
+            logger.info("UNEXPECTED {0} FROM CLIENT ID {1}".format(msg.type_name(), client.id))
+
+    def handle_pong(self, client, version, times, member, recv_ns, summary=None):
+        # SET CONNECTED, MULTICAST, CLOCK AND RELAY STATE FROM A PONG IN EITHER FORMAT
+        PONGS_RECEIVED.inc()
+        self.room.set_client_connected(client, legacy=times is None, version=version)
+        self.room.set_client_relay(client, summary)
+        if times is not None:
+            if member:
+                self.room.set_client_multicast(client, times[0])
+            self.room.update_client_clock(client, *times)
+        # IF WE ARE ABLE TO AUTO START AND EVERYTHING IS CONNECTED
+        # GO THROUGH THE WEB START LOCK SO A START PUSHED AT THE SAME MOMENT CAN'T RUN TOO
+        if not self.room.started and self.room.get_start_auto() and self.room.all_connected:
+            if self.room.webcontrol.push_start():
+                logger.info("AUTO STARTED ALL CLIENTS")
+        PONG_HANDLING.observe_ns(time.monotonic_ns() - recv_ns)
 
-class Controller(socketserver.UDPServer):
+
+class Room:
     """
-    Controller
-     - This code handles control of all connected clients
-     - Runs any tasks the master controller is responsible for 
+    Room - One room's clients, tasks and runs
+     - Handles control of all its connected clients
+     - Runs any tasks the master controller is responsible for
+     - Sends on the socket it's given and starts no threads of its own, the
+       Controller (one room) or a venue (many rooms) it lives in does the
+       receiving, pinging, retransmitting and web serving
     """
 
-    # WE KINDA WANT TO BE A DAEMON
-    daemon_threads = True
-    # FASTER BINDING
-    allow_reuse_address = True
-
     # CLASS CONSTANTS
     START_AUTO = "AUTO"
     START_BUTTON = "GPIO"
@@ -181,42 +504,95 @@ class Controller(socketserver.UDPServer):
     PING = str.encode("ping")
     PONG = str.encode("pong")
     START = str.encode("start")
+    STARTED = str.encode("started")
+    ACK = str.encode("ack")
+    SYNC = str.encode("sync")
+    CONTROL = str.encode("control")
+    QUIET = str.encode("quiet")
+    # MULTICAST MEMBERSHIP FLAG IN PONGS AND MASTER CLOCK FLAG IN STARTS AND CONTROLS
+    MCAST_MEMBER = str.encode("mc")
+    MASTER_CLOCK = str.encode("m")
+    # TEXT PONGS FROM CLIENTS THAT SPEAK THE BINARY PROTOCOL CARRY v<VERSION>
+    VERSION_PREFIX = str.encode("v")
 
-    def __init__(self, server_address, RequestHandlerClass, config, gpio=None, debug=False):
-        socketserver.UDPServer.__init__(self, server_address, RequestHandlerClass)
+    def __init__(self, config, gpio=None, debug=False, name=None):
+        # self.socket HAS TO BE SET ALREADY, EVERYTHING WE SEND GOES OUT ON IT
         # STORE OUR CONFIG SO WE CAN KEEP TRACK OF THINGS
         self.config = config
+        # NONE FOR A CONTROLLER, THE ROOM'S NAME IN A VENUE
+        self.name = name
         # LOCAL INSTANCE OF GPIO LIBRARY
         # THIS CAN BE USED IF ONE WANTS AN ACTUAL BUTTON TO START
         self.gpio = gpio
         # TASKER DEBUG
         self.debug = debug
-        # VARIABLE TO LET US KNOW IF ALL CLIENTS HAVE CONNECTED
-        self.all_connected = False
         # VARIABLE TO LET US KNOW IF WE'VE STARTED
         self.started = False
         # ARE WE DONE WITH TASKS
         self.done_with_tasks = False
+        # THE LAST PAUSE, RESUME OR SEEK AND HOW IT WENT
+        self.last_control = None
+        # THE LAST START, WHO HASN'T ACKED IT AND WHEN THE LATEST ACK CAME, FOR START_FANOUT
+        self._start_seq = None
+        self._start_pushed_ns = None
+        self._start_waiting = set()
+        self._start_acked_ns = None
 
-        # RUN THE STUFF TO ENHANCE THE DICTIONARY
-        self._update_local_config()
+        # STATE CHANGES ARE PUBLISHED HERE FOR THE WEB DASHBOARDS
+        self.events = events.EventBus()
 
+        # CLIENT STATE LIVES IN THE REGISTRY, THE CONFIG IS LEFT ALONE
+        self.clients = registry.ClientRegistry(self.config["CLIENTS"])
+        # OPTIONAL MULTICAST GROUP FOR PING AND START FAN-OUT
+        self.mcast_address = self._setup_multicast()
+        # SEND TIME OF THE LAST MULTICAST PING, PONGS ECHOING IT PROVE MULTICAST WORKS
+        self.mcast_ping_ns = None
+        # HEARTBEAT FAILURE DETECTION, ALSO DECIDES WHO GETS PINGED WHEN
+        self.liveness = liveness.LivenessMonitor(on_suspect=self._client_suspect,
+                                                 on_down=self._client_down,
+                                                 on_up=self._client_up,
+                                                 **liveness.options_from_config(self.config))
+
+        # ACKNOWLEDGED COMMAND DELIVERY, RETRANSMITS RUN ON THEIR OWN THREAD
+        self.delivery = delivery.DeliveryTracker(self.socket.sendto,
+                                                 retries=self.config.get("RETRIES", 5),
+                                                 timeout_ns=int(self.config.get("RETRY TIMEOUT MS", 100) * tasker.NS_PER_MS),
+                                                 on_acked=self._command_acked,
+                                                 on_failed=self._command_failed)
+
+        # COMPILE THE TASK LIST ONCE, EVERY RUN SHARES THE PLAN
+        self.plan = taskplan.from_config(self.config)
         # CREATE THE TASKER INSTANCE FOR THE CONTROLLER
         # WE WON'T START UNTIL ALL CLIENTS HAVE CONNECTED
-        self.tasky = tasker.Tasker(self.config["TASKS"], debug=self.debug)
+        self.tasky = self._create_tasker()
 
-        # CREATE OUR LOOPING TIMER - WE WANT IT TO IMMEDATELY RUN THE COMMAND
-        self.looper = LoopingTimer(self.config["PING TIMER"], self.send_ping, True)
-        self.looper.start()
+        # GET THE PINGS, RETRANSMITS AND WEB CONTROL GOING
+        self._start_services()
 
-        # WEB CONTROL
-        self.webcontrol = WebControl((ANYHOST, WEBPORT), WebControlHandler, callback=self.start_all)
-        self.web_thread = threading.Thread(target=self.webcontrol.serve_forever)
-        self.web_thread.start()
+    def _start_services(self):
+        # NO THREADS OR SOCKETS HERE, JUST WHAT THE WEB PAGES AND API TALK TO
+        self.webcontrol = WebControlState(callback=self.start_all, status=self.get_status, bus=self.events,
+                                          control=self.control, prefix=room_prefix(self.name))
 
     def kill(self):
-        # THIS IS HERE TO KILL THE LOOPING TIMER
-        self.looper.cancel()
+        # STOP RETRANSMITTING AND KILL OUR COMMANDS, THEY'RE IN THEIR OWN PROCESS
+        # GROUPS SO CTRL-C DOESN'T REACH THEM
+        self.delivery.kill()
+        self.tasky.kill()
+
+    def _setup_multicast(self):
+        # SET UP OUR SOCKET TO SEND TO THE MULTICAST GROUP IN THE CONFIG
+        # RETURNS THE GROUP ADDRESS OR NONE IF THERE ISN'T ONE
+        mcast = self.config.get("MULTICAST")
+        if not mcast:
+            return None
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL,
+                               struct.pack("b", mcast.get("TTL", 1)))
+        if "INTERFACE" in mcast:
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                   socket.inet_aton(mcast["INTERFACE"]))
+        logger.info("USING MULTICAST GROUP {0}:{1}".format(mcast["GROUP"], mcast["PORT"]))
+        return (mcast["GROUP"], mcast["PORT"])
 
     # TODO: THINK ABOUT BUTTON CONTROL - CAN USE A GPIO THAT HANDLES
     # EVENT DETECTION TO RUN A CALLBACK THAT CAN START THE STUFF
@@ -224,32 +600,320 @@ class Controller(socketserver.UDPServer):
     # WOULD HAVE TO BE ADDED TO SEND TO THE CLIENT
     # AND TELL THEM TO STOP
 
+    def _create_tasker(self):
+        # A NEW RUN OVER THE COMPILED PLAN
+        return tasker.Tasker(self.plan, on_fire=self._task_fired,
+                             **tasker.options_from_config(self.config, self.debug))
+
     def get_tasks_completed(self):
         return self.done_with_tasks
 
+    def reload(self, config):
+        # TAKE ON A CHANGED CONFIG WITHOUT A RESTART, RETURNS WHAT CHANGED
+        # ONLY ADDED, REMOVED OR MOVED CLIENTS AND CHANGED TASKS ARE TOUCHED, EVERYONE ELSE
+        # KEEPS THEIR CONNECTION, CLOCK AND LIVENESS STATE. A RUN IN PROGRESS CARRIES ON
+        # WITH THE TASKS IT STARTED WITH, CHANGED ONES ARE USED FROM THE NEXT START
+        # RAISES ValueError (PlanError IS ONE) AND CHANGES NOTHING IF config CAN'T BE USED
+        began_ns = time.monotonic_ns()
+        missing = [key for key in ("CLIENTS", "START OPTION", "PING TIMER") if key not in config]
+        if missing:
+            raise ValueError("CONFIG IS MISSING {0}".format(", ".join(missing)))
+        old = {client["ID"]: client for client in self.config["CLIENTS"]}
+        new = {client["ID"]: client for client in config["CLIENTS"]}
+        if len(new) != len(config["CLIENTS"]):
+            raise ValueError("DUPLICATE CLIENT IDS IN CLIENTS")
+        moved = [client_id for client_id, client in new.items() if client_id in old and
+                 (client["IP"], client["PORT"]) != (old[client_id]["IP"], old[client_id]["PORT"])]
+        removed = [client_id for client_id in old if client_id not in new] + moved
+        added = [(client_id, client["IP"], client["PORT"]) for client_id, client in new.items()
+                 if client_id not in old or client_id in moved]
+        # EVERYTHING THAT CAN FAIL COMES BEFORE ANYTHING IS CHANGED
+        plan = taskplan.reload(self.plan, self.config, config)
+        heartbeat = liveness.options_from_config(config)
+        added, removed = self.clients.change(added, removed)
+
+        # CLIENTS THAT ARE GONE (OR AT A NEW ADDRESS) AREN'T WAITED ON OR SENT TO ANY MORE
+        gone = {client.id for client in removed}
+        if gone:
+            self.delivery.forget(gone)
+            self._start_waiting -= gone
+            record = self.last_control
+            if record is not None:
+                for client_id in gone & record.pending:
+                    record.skip(client_id, "REMOVED")
+                    self._control_progress(record, client_id)
+        if added or removed:
+            self._clients_changed(added, removed)
+
+        tasks_changed = plan is not self.plan
+        if tasks_changed:
+            self.plan = plan
+            if not self.started:
+                # NOTHING IS RUNNING ON THE OLD PLAN, SWAP THE TASKER NOW SO THE TIMELINE SHOWS IT
+                old_tasker, self.tasky = self.tasky, self._create_tasker()
+                old_tasker.kill()
+            else:
+                logger.warning("TASKS CHANGED, THEY'LL BE USED FROM THE NEXT START")
+        self.liveness.configure(**heartbeat)
+        self.delivery.retries = config.get("RETRIES", 5)
+        self.delivery.timeout_ns = int(config.get("RETRY TIMEOUT MS", 100) * tasker.NS_PER_MS)
+        restart = [key for key in RESTART_KEYS if config.get(key) != self.config.get(key)]
+        if restart:
+            logger.warning("{0} CHANGED, THAT NEEDS A RESTART".format(", ".join(restart)))
+        self.config = config
+
+        changes = {"ADDED": sorted(client.id for client in added if client.id not in moved),
+                   "REMOVED": sorted(client_id for client_id in gone if client_id not in moved),
+                   "MOVED": sorted(moved),
+                   "TASKS CHANGED": tasks_changed,
+                   "NEEDS RESTART": restart}
+        logger.warning("CONFIG RELOADED: {0} CLIENTS ADDED, {1} REMOVED, {2} MOVED, TASKS {3}".format(
+            len(changes["ADDED"]), len(changes["REMOVED"]), len(moved),
+            "CHANGED" if tasks_changed else "UNCHANGED"))
+        for client in added:
+            self.events.publish("client", client.as_dict())
+        self.events.publish("reload", changes)
+        RELOAD_TIME.observe_ns(time.monotonic_ns() - began_ns)
+        return changes
+
+    def _clients_changed(self, added, removed):
+        # CALLED BY reload() WITH THE CLIENT STATES IT ADDED AND REMOVED
+        self._count_connected()
+
     def reset(self):
         # FUNCTION TO RESET THE CLIENT FOR ANOTHER GO
         logger.info("RESET")
+        # MAKE SURE THE OLD TASKER IS WOKEN UP AND DONE BEFORE REPLACING IT
+        self.tasky.kill()
         self.started = False
         self.done_with_tasks = False
-        self.tasky = tasker.Tasker(self.config["TASKS"], debug=self.debug)
-
-    def _update_local_config(self):
-        # THIS FUNCTION ADDS A CONNECTED KEY TO THE DICTIONARY
-        # SO WE CAN KEEP TRACK WHO IS CONNECTED
-        for client in self.config["CLIENTS"]:
-            client["CONNECTED"] = False
-            client["ADDRESS"] = (client["IP"], client["PORT"])
-    
-    def set_client_connected(self, ip):
+        self.tasky = self._create_tasker()
+        self.events.publish("run", {"STATE": "RESET"})
+
+    @property
+    def all_connected(self):
+        # VARIABLE TO LET US KNOW IF ALL CLIENTS HAVE CONNECTED
+        return self.clients.all_connected()
+
+    def set_client_connected(self, client, legacy=False, version=protocol.TEXT_VERSION):
         # THIS FUNCTION IS USED TO SET A SPECIFIC CLIENT THAT IT'S BEEN CONNECTED
-        for client in self.config["CLIENTS"]:
-            if client["IP"] == ip:
-                logger.info("CLIENT ID: {0} CONNECTED!".format(client["ID"]))
-                client["CONNECTED"] = True
+        # EVERY PONG IS A HEARTBEAT, CLIENTS THE LIVENESS MONITOR CALLED DOWN COME BACK HERE
+        self.liveness.heartbeat(client, time.monotonic_ns())
+        client.legacy = legacy
+        changed = False
+        if client.version != version:
+            logger.info("CLIENT ID: {0} SPEAKS PROTOCOL VERSION {1}".format(client.id, version))
+            client.version = version
+            changed = True
+        if self.clients.set_connected(client, True):
+            logger.info("CLIENT ID: {0} CONNECTED!".format(client.id))
+            self._count_connected()
+            changed = True
+        if changed:
+            self.events.publish("client", client.as_dict())
+
+    def _count_connected(self):
+        CLIENTS_CONNECTED.set(self.clients.connected_count)
+
+    def set_client_relay(self, client, summary):
+        # HOW MANY CLIENTS BELOW A RELAY ARE CONNECTED, NONE IF IT ISN'T ONE
+        if summary == client.relay:
+            return
+        if summary is not None:
+            logger.info("CLIENT ID: {0} RELAYS TO {1} CLIENTS, {2} CONNECTED".format(
+                client.id, summary[1], summary[0]))
+        client.relay = summary
+        self.events.publish("client", client.as_dict())
+
+    def client_label(self, client):
+        # WHAT A CLIENT IS CALLED IN THE METRICS, CLIENT IDS ARE ONLY UNIQUE IN A ROOM
+        if self.name is None:
+            return client.id
+        return "{0}/{1}".format(self.name, client.id)
+
+    def _client_suspect(self, client, phi):
+        logger.warning("CLIENT ID: {0} SUSPECT (PHI {1:.1f})".format(client.id, phi))
+        self.events.publish("client", client.as_dict())
 
-        # UPDATE THE ALL CONNECTED VARIABLE
-        self._determine_all_clients_connected()
+    def _client_down(self, client, phi):
+        # DOWN CLIENTS DON'T COUNT AS CONNECTED AND GET UNICAST UNTIL THEY ANSWER AGAIN
+        logger.warning("CLIENT ID: {0} DOWN (PHI {1:.1f})".format(client.id, phi))
+        client.multicast = False
+        self.clients.set_connected(client, False)
+        self._count_connected()
+        self.events.publish("client", client.as_dict())
+
+    def _client_up(self, client, phi):
+        logger.warning("CLIENT ID: {0} IS BACK".format(client.id))
+        self.events.publish("client", client.as_dict())
+
+    def get_status(self):
+        # EVERYTHING A DASHBOARD NEEDS AS PLAIN DATA - CLIENTS, RUN STATE AND TIMELINE
+        deliveries = self.get_delivery_status()
+        clients = []
+        for client in self.clients:
+            info = client.as_dict()
+            info["DELIVERY"] = deliveries.get(client.id)
+            clients.append(info)
+        return {"STARTED": self.started,
+                "DONE": self.done_with_tasks,
+                "CONNECTED": self.clients.connected_count,
+                "ALL CONNECTED": self.all_connected,
+                "CLIENTS": clients,
+                "CONTROL": self.last_control.as_dict() if self.last_control else None,
+                "TIMELINE": self.tasky.get_timeline()}
+
+    def get_liveness_status(self):
+        # LIVENESS STATE, PHI AND PING INTERVAL FOR EVERY CLIENT
+        return self.liveness.get_status(self.clients, time.monotonic_ns())
+
+    def set_client_multicast(self, client, ping_ns):
+        # A GROUP MEMBER ANSWERED A PING, IF IT WAS OUR MULTICAST PING THEN
+        # MULTICAST REACHES THIS CLIENT
+        if ping_ns == self.mcast_ping_ns:
+            client.mcast_ping_ns = ping_ns
+            client.multicast = True
+
+    def update_client_clock(self, client, t1, t2, t3, t4):
+        # NTP STYLE OFFSET AND ROUND TRIP ESTIMATE FROM ONE PING/PONG EXCHANGE
+        rtt, offset = clock_sample(t1, t2, t3, t4)
+        PING_RTT.labels(self.client_label(client)).observe_ns(rtt)
+        client.add_sync_sample(rtt, offset)
+        # MULTICAST STARTS CARRY OUR CLOCK, SO MEMBERS NEED THEIR OFFSET
+        if client.multicast:
+            if client.version > protocol.TEXT_VERSION:
+                msg = protocol.sync(time.monotonic_ns(), client.offset, client.rtt, client.version)
+            else:
+                msg = self.SYNC + " {0}".format(client.offset).encode()
+            self.socket.sendto(msg, client.address)
+        logger.debug(logpipe.Repeating(client.id, "CLIENT ID: {0} OFFSET {1:.3f} MS RTT {2:.3f} MS",
+                                       client.id, client.offset / tasker.NS_PER_MS, client.rtt / tasker.NS_PER_MS))
+
+    def report_client_start(self, client_id, lead_ns):
+        # RECORD HOW WELL A CLIENT'S START LINED UP WITH THE SHARED START INSTANT
+        # A NEGATIVE LEAD MEANS THE START ARRIVED AFTER THE INSTANT, THAT'S ALL SKEW
+        # OTHERWISE THE SKEW IS BOUNDED BY HALF THE RTT OF THE OFFSET ESTIMATE
+        client = self.clients.get(client_id)
+        if client is None:
+            return
+        if lead_ns is None:
+            logger.info("CLIENT ID: {0} STARTED UNSYNCHRONIZED".format(client_id))
+            return
+        bound = client.rtt / 2 if client.rtt is not None else 0
+        client.start_skew = max(0, -lead_ns)
+        logger.info("CLIENT ID: {0} START LEAD {1:.3f} MS SKEW {2:.3f} MS (+/- {3:.3f} MS)".format(
+            client_id, lead_ns / tasker.NS_PER_MS, client.start_skew / tasker.NS_PER_MS,
+            bound / tasker.NS_PER_MS))
+
+    def _command_acked(self, delivery):
+        # CALLED BY THE DELIVERY TRACKER WHEN A CLIENT ACKS A COMMAND
+        logger.info(logpipe.Lazy("CLIENT ID: {0} ACKED {1} SEQ {2} IN {3:.3f} MS ({4} ATTEMPTS)",
+                                 delivery.client_id, delivery.cmd.decode().upper(), delivery.seq,
+                                 delivery.latency_ns() / tasker.NS_PER_MS, delivery.attempts))
+        if delivery.cmd == self.START:
+            # START ACKS CARRY HOW EARLY THE START ARRIVED ON THE CLIENT'S CLOCK
+            lead_ns = int(delivery.reply[0]) if delivery.reply else None
+            self.report_client_start(delivery.client_id, lead_ns)
+            self._start_reached(delivery.seq, delivery.client_id, delivery.acked_ns)
+        elif delivery.cmd == self.CONTROL:
+            self.report_client_control(delivery)
+        self.events.publish("delivery", dict(delivery.as_dict(), CLIENT=delivery.client_id))
+
+    def _command_failed(self, delivery):
+        # CALLED BY THE DELIVERY TRACKER WHEN A CLIENT RAN OUT OF RETRIES
+        if delivery.cmd == self.START:
+            self._start_reached(delivery.seq, delivery.client_id, delivery.acked_ns)
+        elif delivery.cmd == self.CONTROL:
+            self.report_client_control(delivery)
+        self.events.publish("delivery", dict(delivery.as_dict(), CLIENT=delivery.client_id))
+
+    def report_relayed(self, client_id, seq, summary):
+        # A RELAY ACKED seq ONCE ITS OWN CLIENTS HAD, summary IS HOW MANY OF THEM GOT IT
+        reached, total = summary
+        if reached < total:
+            logger.warning("CLIENT ID: {0} RELAYED SEQ {1} TO ONLY {2} OF {3} CLIENTS".format(
+                client_id, seq, reached, total))
+        else:
+            logger.info(logpipe.Lazy("CLIENT ID: {0} RELAYED SEQ {1} TO ALL {2} CLIENTS", client_id, seq, total))
+
+    def _start_reached(self, seq, client_id, acked_ns):
+        # ONE LESS CLIENT TO HEAR FROM ABOUT THE LAST START (ACKED AT acked_ns, NONE IF IT
+        # NEVER DID), WHEN NOBODY IS LEFT THE LATEST ACK IS HOW LONG THE START TOOK TO
+        # REACH EVERYONE IT DID REACH
+        if seq != self._start_seq or client_id not in self._start_waiting:
+            return
+        self._start_waiting.discard(client_id)
+        if acked_ns is not None:
+            self._start_acked_ns = max(self._start_acked_ns or 0, acked_ns)
+        if not self._start_waiting and self._start_acked_ns is not None:
+            START_FANOUT.observe_ns(self._start_acked_ns - self._start_pushed_ns)
+
+    def report_client_control(self, delivery):
+        # RECORD HOW LONG AFTER THE CLICK A CLIENT APPLIED A PAUSE, RESUME OR SEEK
+        # CONTROL ACKS CARRY WHEN IT WAS APPLIED ON THE CLIENT'S CLOCK
+        record = self.last_control
+        if record is None or record.seq != delivery.seq:
+            return
+        client = self.clients.get(delivery.client_id)
+        if client is None:
+            # REMOVED SINCE THE CONTROL WENT OUT
+            return
+        if delivery.acked_ns is None:
+            record.skip(client.id, "NO ACK")
+        elif not delivery.reply:
+            record.skip(client.id, "NOT RUNNING")
+            logger.warning("CLIENT ID: {0} DIDN'T {1}, ITS TASKS AREN'T RUNNING".format(
+                client.id, record.name()))
+        elif client.offset is not None:
+            record.applied(client.id, int(delivery.reply[0]) - client.offset - record.clicked_ns)
+        else:
+            # NO CLOCK OFFSET YET, THE ACK ARRIVING IS THE BEST WE CAN DO
+            record.applied(client.id, delivery.acked_ns - record.clicked_ns, estimated=True)
+        self._control_progress(record, client.id)
+
+    def _control_progress(self, record, client_id):
+        # LOG WHAT client_id DID WITH THE CONTROL IN record AND WHETHER EVERYONE HAS NOW
+        if client_id in record.latency:
+            logger.info("CLIENT ID: {0} APPLIED {1} {2:.3f} MS AFTER THE CLICK{3}".format(
+                client_id, record.name(), record.latency[client_id] / tasker.NS_PER_MS,
+                " (ESTIMATED)" if client_id in record.estimated else ""))
+        if record.done():
+            CONTROL_APPLY.labels(record.name().lower()).observe_ns(record.max_latency_ns())
+            logger.info("{0} TO {1:.3f} S APPLIED EVERYWHERE IN {2:.3f} MS ({3} SKIPPED)".format(
+                record.name(), record.offset_ns / tasker.NS_PER_SEC,
+                record.max_latency_ns() / tasker.NS_PER_MS, len(record.skipped)))
+        self.events.publish("control", record.as_dict())
+
+    def report_client_quiet(self, client, seq, quiet_ns, recv_ns):
+        # A CLIENT'S LAST COMMAND EXITED AT quiet_ns ON ITS CLOCK AFTER THE STOP seq
+        record = self.last_control
+        if record is None or record.seq != seq:
+            return
+        if client.offset is not None:
+            self.report_quiet(record, client.id, quiet_ns - client.offset)
+        else:
+            self.report_quiet(record, client.id, recv_ns, estimated=True)
+
+    def report_quiet(self, record, who, quiet_ns, estimated=False):
+        # RECORD WHEN EVERYTHING STOPPED SOMEWHERE, quiet_ns IS ON OUR CLOCK
+        record.quieted(who, quiet_ns - record.clicked_ns, estimated)
+        logger.info("{0} QUIET {1:.3f} MS AFTER THE STOP{2}".format(
+            "MASTER" if who == "MASTER" else "CLIENT ID: {0}".format(who),
+            record.quiet[who] / tasker.NS_PER_MS, " (ESTIMATED)" if estimated else ""))
+        if record.all_quiet():
+            STOP_QUIET.observe_ns(max(record.quiet.values()))
+            logger.info("EVERYTHING QUIET {0:.3f} MS AFTER THE STOP".format(
+                max(record.quiet.values()) / tasker.NS_PER_MS))
+        self.events.publish("control", record.as_dict())
+
+    def _task_fired(self, idx, task, late_ns):
+        # CALLED BY THE TASKER EVERY TIME IT RUNS A TASK
+        self.events.publish("task", {"INDEX": idx, "TYPE": task.type,
+                                     "LATE MS": late_ns / tasker.NS_PER_MS})
+
+    def get_delivery_status(self):
+        # LAST ACKNOWLEDGED COMMAND STATE FOR EVERY CLIENT
+        return self.delivery.get_status()
 
     def get_start_auto(self):
         if self.config["START OPTION"].upper() == self.START_AUTO:
@@ -259,32 +923,172 @@ class Controller(socketserver.UDPServer):
         if self.config["START OPTION"].upper() == self.START_WEB:
             return True
 
-    def _determine_all_clients_connected(self):
-        # LOOP THROUGH AND UPDATE THE ALL CONNECTED BOOLEAN TO SEE IF WE HAVE ALL CLIENTS
-        tlist = []
-        for client in self.config["CLIENTS"]:
-            tlist.append(client["CONNECTED"])
-        self.all_connected = (not (False in tlist))
+    def group_version(self):
+        # THE GROUP IS SPOKEN TO IN THE OLDEST PROTOCOL ANY MEMBER SPEAKS
+        # TEXT UNTIL WE KNOW THEM ALL, SO NEW MEMBERS CAN STILL READ IT
+        versions = [client.version for client in self.clients if client.multicast]
+        return min(versions) if versions else protocol.TEXT_VERSION
+
+    def ping_message(self, version, now):
+        if version > protocol.TEXT_VERSION:
+            return protocol.ping(now, version)
+        return self.PING + " {0}".format(now).encode()
+
+    def start_message(self, version, seq, instant=None, master_clock=False):
+        # START WITH AN OPTIONAL INSTANT, ON OUR CLOCK IF master_clock
+        if version > protocol.TEXT_VERSION:
+            flags = protocol.FLAG_MASTER_CLOCK if master_clock else 0
+            return protocol.start(seq, time.monotonic_ns(), instant, flags, version)
+        msg = self.START + " {0}".format(seq).encode()
+        if instant is not None:
+            msg += " {0}".format(instant).encode()
+            if master_clock:
+                msg += b" " + self.MASTER_CLOCK
+        return msg
+
+    def control_message(self, version, seq, action, offset_ns, instant=None, master_clock=False):
+        # CONTROL WITH THE TIMELINE OFFSET TO BE AT AND AN OPTIONAL INSTANT TO BE THERE,
+        # ON OUR CLOCK IF master_clock
+        if version > protocol.TEXT_VERSION:
+            flags = protocol.FLAG_MASTER_CLOCK if master_clock else 0
+            return protocol.control(seq, time.monotonic_ns(), action, offset_ns, instant, flags, version)
+        msg = self.CONTROL + " {0} {1} {2}".format(
+            seq, protocol.CONTROL_NAMES[action].lower(), offset_ns).encode()
+        if instant is not None:
+            msg += " {0}".format(instant).encode()
+            if master_clock:
+                msg += b" " + self.MASTER_CLOCK
+        return msg
 
     def send_ping(self):
         # FUNCTION TO VERIFY CLIENT CONNECTION
-        for client in self.config["CLIENTS"]:
-            logger.info("PINGING CLIENT {0}".format(client["ID"]))
-            self.socket.sendto(self.PING, client["ADDRESS"])
+        # RUNS EVERY LIVENESS TICK, UPDATES CLIENT STATES AND PINGS WHOEVER IS DUE
+        # THE PING CARRIES OUR SEND TIME SO THE PONG CAN BE USED FOR CLOCK SYNC
+        # ONE MULTICAST PING REACHES EVERY MEMBER, EVERYONE ELSE GETS UNICAST
+        # A MEMBER THAT DIDN'T ANSWER THE LAST GROUP PING FALLS BACK TO UNICAST
+        now = time.monotonic_ns()
+        self.liveness.check(self.clients, now)
+        due = self.liveness.due(self.clients, now)
+        if not due:
+            return
+        if self.mcast_address:
+            for client in self.clients:
+                client.multicast = (self.mcast_ping_ns is not None and
+                                    client.mcast_ping_ns == self.mcast_ping_ns)
+            logger.info(logpipe.Repeating(self.mcast_address, "PINGING MULTICAST GROUP"))
+            self.mcast_ping_ns = time.monotonic_ns()
+            self.socket.sendto(self.ping_message(self.group_version(), self.mcast_ping_ns),
+                               self.mcast_address)
+            PINGS_SENT.labels("multicast").inc()
+            for client in self.clients:
+                if client.multicast:
+                    self.liveness.pinged(client, self.mcast_ping_ns)
+        for client in due:
+            if client.multicast:
+                continue
+            logger.info(logpipe.Repeating(client.id, "PINGING CLIENT {0}", client.id))
+            ping_ns = time.monotonic_ns()
+            self.socket.sendto(self.ping_message(client.version, ping_ns), client.address)
+            self.liveness.pinged(client, ping_ns)
+            PINGS_SENT.labels("unicast").inc()
 
     def start_all(self):
         # FIGURE OUT IF WE'VE RUN BEFORE AND IF SO, RESET
         if self.get_tasks_completed():
             self.reset()
-        # FUNCTION TO START CLIENTS
-        for client in self.config["CLIENTS"]:
-            self.socket.sendto(self.START, client["ADDRESS"])
+        # PICK A SHARED START INSTANT FAR ENOUGH OUT TO REACH EVERY CLIENT
+        lead_ns = int(self.config.get("START LEAD MS", 250) * tasker.NS_PER_MS)
+        start_ns = time.monotonic_ns() + lead_ns
+        pushed_ns = time.monotonic_ns()
+        seq = self.delivery.next_seq()
+        # SET BEFORE ANYTHING IS SENT SO NO ACK CAN BEAT IT
+        self._start_seq = seq
+        self._start_pushed_ns = pushed_ns
+        self._start_acked_ns = None
+        self._start_waiting = {client.id for client in self.clients if not client.legacy}
+        self.send_start(seq, start_ns)
+        START_SEND.observe_ns(time.monotonic_ns() - pushed_ns)
         self.started = True
         self.webcontrol.set_tasks_running(self.started)
-        # ONCE DONE WITH THE CLIENTS, START TASKY
-        self.tasky.start()
+        # ONCE DONE WITH THE CLIENTS, START TASKY AT THE SAME INSTANT
+        self.tasky.start_at(start_ns)
+        self.events.publish("run", {"STATE": "STARTED", "START IN MS": lead_ns / tasker.NS_PER_MS})
 
-    # THIS IS AN OVERLOADED FUNCTION
+    def send_start(self, seq, start_ns):
+        # FUNCTION TO START CLIENTS
+        # EACH CLIENT GETS THE START INSTANT TRANSLATED INTO ITS OWN CLOCK
+        # CLIENTS WE HAVEN'T SYNCED WITH YET JUST START ON RECEIPT
+        # EVERYBODY SHARES ONE SEQUENCE NUMBER, RETRANSMITS HAPPEN IN THE BACKGROUND
+        # MULTICAST MEMBERS GET ONE GROUP DATAGRAM WITH THE INSTANT ON OUR CLOCK,
+        # THEIR ACKS AND ANY RETRANSMITS STILL GO OVER UNICAST
+        if self.mcast_address:
+            msg = self.start_message(self.group_version(), seq, start_ns, master_clock=True)
+            self.socket.sendto(msg, self.mcast_address)
+        for client in self.clients:
+            if client.legacy:
+                self.socket.sendto(self.START, client.address)
+                continue
+            instant = start_ns + client.offset if client.offset is not None else None
+            msg = self.start_message(client.version, seq, instant)
+            self.delivery.send_command(client.id, client.address, self.START, seq, msg,
+                                       send_now=not client.multicast)
+
+    def control(self, action, offset_ns=None):
+        # PAUSE, RESUME OR SEEK (TO offset_ns) OUR TIMELINE AND EVERY CLIENT'S, OR STOP EVERYTHING
+        # RETURNS THE TIMELINE POSITION IN NS, NONE IF OUR TASKER REFUSED
+        # WE APPLY IT AS OF THE CLICK AND TELL EVERYONE TO BE AT THE SAME OFFSET AS OF
+        # THE SAME INSTANT, SO A SLOW CLIENT CATCHES UP INSTEAD OF DRIFTING
+        clicked_ns = time.monotonic_ns()
+        if action == protocol.CONTROL_PAUSE:
+            done = self.tasky.pause(clicked_ns)
+        elif action == protocol.CONTROL_RESUME:
+            done = self.tasky.resume(clicked_ns)
+        elif action == protocol.CONTROL_SEEK:
+            done = self.tasky.seek(offset_ns, clicked_ns)
+        else:
+            logger.warning("STOPPING EVERYTHING, {0} COMMANDS HERE".format(self.tasky.abort()))
+            done = True
+        if not done:
+            return None
+        applied_ns = time.monotonic_ns()
+        position_ns = self.tasky.position_ns(clicked_ns)
+        if position_ns is None:
+            # A STOP BEFORE WE STARTED
+            position_ns = 0
+        # SAME FAN-OUT AS start_all - ONE SEQUENCE NUMBER, GROUP DATAGRAM FOR MULTICAST
+        # MEMBERS, UNICAST WITH THE INSTANT ON THEIR CLOCK FOR EVERYONE ELSE
+        seq = self.delivery.next_seq()
+        record = ControlRecord(action, seq, position_ns, clicked_ns, applied_ns,
+                               [client.id for client in self.clients])
+        self.last_control = record
+        if action == protocol.CONTROL_STOP:
+            self.tasky.when_quiet(functools.partial(self.report_quiet, record, "MASTER"))
+        sent = self.send_control(record)
+        logger.info("{0} TO {1:.3f} S SENT TO {2} CLIENTS".format(
+            record.name(), position_ns / tasker.NS_PER_SEC, sent))
+        self.events.publish("control", record.as_dict())
+        return position_ns
+
+    def send_control(self, record):
+        # SEND THE CONTROL IN record TO EVERY CLIENT, THE INSTANT IS THE CLICK
+        # RETURNS HOW MANY IT WAS SENT TO, ACKS MAY ALREADY BE EMPTYING record.pending
+        sent = 0
+        if self.mcast_address:
+            msg = self.control_message(self.group_version(), record.seq, record.action, record.offset_ns,
+                                       record.clicked_ns, master_clock=True)
+            self.socket.sendto(msg, self.mcast_address)
+        for client in self.clients:
+            if client.legacy:
+                record.skip(client.id, "LEGACY")
+                continue
+            instant = record.clicked_ns + client.offset if client.offset is not None else None
+            msg = self.control_message(client.version, record.seq, record.action, record.offset_ns, instant)
+            self.delivery.send_command(client.id, client.address, self.CONTROL, record.seq, msg,
+                                       send_now=not client.multicast)
+            sent += 1
+        return sent
+
+    # THIS IS AN OVERLOADED FUNCTION FOR A Controller, A VENUE CALLS IT FOR EVERY ROOM
     def service_actions(self):
         # CHECK FOR TASKY RUNNING
         # IF NOT, AUTO SHUTDOWN
@@ -294,9 +1098,233 @@ class Controller(socketserver.UDPServer):
             self.webcontrol.set_tasks_running(self.started)
             self.done_with_tasks = True
             self.tasky.join()
+            self.events.publish("run", {"STATE": "DONE", "LATENESS": self.tasky.get_lateness_stats()})
+
+
+class Controller(Room, socketserver.UDPServer):
+    """
+    Controller
+     - This code handles control of all connected clients
+     - Runs any tasks the master controller is responsible for 
+     - One Room with its own socket, ping timer, retransmit thread and web control
+    """
+
+    # WE KINDA WANT TO BE A DAEMON
+    daemon_threads = True
+    # FASTER BINDING
+    allow_reuse_address = True
+
+    def __init__(self, server_address, RequestHandlerClass, config, gpio=None, debug=False):
+        socketserver.UDPServer.__init__(self, server_address, RequestHandlerClass)
+        Room.__init__(self, config, gpio, debug)
+
+    def _start_services(self):
+        # THREADED ENGINE - RETRANSMITS, PINGS AND WEB CONTROL EACH GET A THREAD
+        self.delivery_thread = threading.Thread(target=self.delivery.run, daemon=True)
+        self.delivery_thread.start()
+
+        # CREATE OUR LOOPING TIMER - WE WANT IT TO IMMEDATELY RUN THE COMMAND
+        # IT TICKS AT THE SHORTEST PING INTERVAL, send_ping ONLY PINGS WHO'S DUE
+        self.looper = LoopingTimer(self.liveness.tick_interval, self.send_ping, True)
+        self.looper.start()
+
+        # WEB CONTROL
+        self.webcontrol = WebControl((ANYHOST, web_port(self.config)), WebControlHandler,
+                                     callback=self.start_all, status=self.get_status, bus=self.events,
+                                     control=self.control)
+        self.web_thread = threading.Thread(target=self.webcontrol.serve_forever)
+        self.web_thread.start()
+
+    def kill(self):
+        # THIS IS HERE TO KILL THE LOOPING TIMER AND RETRANSMITS
+        self.looper.cancel()
+        Room.kill(self)
+
+    def reload(self, config):
+        changes = Room.reload(self, config)
+        self.retick()
+        return changes
+
+    def retick(self):
+        # THE PING TIMER PICKS UP A CHANGED SHORTEST INTERVAL FROM ITS NEXT TICK
+        self.looper.interval = self.liveness.tick_interval
+
+    def room_for(self, address):
+        # EVERY MESSAGE IS FOR OUR ONE ROOM
+        return self
 
 
 # FUNCTIONS
+def clock_sample(t1, t2, t3, t4):
+    # (ROUND TRIP, OFFSET) FROM ONE PING/PONG EXCHANGE, OFFSET IS CLIENT CLOCK MINUS OURS
+    # T1/T4 ARE OUR SEND/RECEIVE TIMES, T2/T3 ARE THE CLIENT'S
+    return (t4 - t1) - (t3 - t2), ((t2 - t1) + (t3 - t4)) // 2
+
+
+def web_control_page(server, path):
+    # BUILD THE WEB CONTROL PAGE FOR A REQUEST PATH AND RUN ANY COMMAND IN IT
+    # server IS ANYTHING THAT LOOKS LIKE WebControlState
+    # HAT TIP TO: https://codereview.stackexchange.com/questions/112222/web-server-to-switch-gpio-pin
+
+    # PARSE THE URL
+    urlcomp = urllib.parse.urlparse(path) # split url in components
+    query = urllib.parse.parse_qs(urlcomp.query) # Get args as dictionary
+    # LOOK FOR QUERY INFO
+    try:
+        cmd = query['cmd']
+    except KeyError:
+        message = "<p>NO COMMANDS PROCESSED</p>"
+    else:
+        message = "<p></p>"
+        if cmd == ["start"]:
+            # ONLY RUN CALLBACK IF NO TASKS ARE RUNNING
+            if server.push_start():
+                message = "<p>SCRIPT STARTED</p>"
+            else:
+                message = "<p>SCRIPT IS ALREADY RUNNING</p>"
+        elif cmd[0] in CONTROL_ACTIONS:
+            action = CONTROL_ACTIONS[cmd[0]]
+            try:
+                offset_ns = seconds_to_ns(query.get("offset", ["0"])[0])
+            except ValueError:
+                message = "<p>BAD OFFSET</p>"
+            else:
+                position = server.push_control(action, offset_ns)
+                if position is not None:
+                    message = "<p>{0} AT {1:.3f} S</p>".format(protocol.CONTROL_NAMES[action],
+                                                               position / tasker.NS_PER_SEC)
+                else:
+                    message = "<p>CAN'T {0}, {1}</p>".format(protocol.CONTROL_NAMES[action],
+                                                            CONTROL_REFUSED[action])
+        else:
+            message = "<p>UNKNOWN ACTION {}</p>".format(cmd[0].upper())
+    # Build links whatever the action was
+    message += """<p>
+                  <a href="{0}/control.html?cmd=start">START EVERYTHING</a>
+                  </p><p>
+                  <a href="{0}/control.html?cmd=stop">STOP EVERYTHING</a>
+                  </p><p>
+                  <a href="{0}/control.html?cmd=pause">PAUSE</a>
+                  <a href="{0}/control.html?cmd=resume">RESUME</a>
+                  </p><form action="{0}/control.html">
+                  <input type="hidden" name="cmd" value="seek">
+                  SEEK TO <input name="offset" size="6"> SECONDS <input type="submit" value="GO">
+                  </form>""".format(server.prefix)
+    # LIVE EVENT LOG, THE BROWSER IS PUSHED CHANGES INSTEAD OF RELOADING
+    message += """<pre id="events"></pre>
+                  <script>
+                  var log = document.getElementById("events");
+                  var source = new EventSource("{0}");
+                  source.onmessage = function(e) {{ log.textContent = e.data + "\\n" + log.textContent; }};
+                  ["status", "client", "run", "task", "delivery", "control", "reload"].forEach(function(kind) {{
+                    source.addEventListener(kind, source.onmessage);
+                  }});
+                  </script>""".format(server.prefix + EVENTS_PATH)
+    return message
+
+
+def room_prefix(name):
+    # WHERE A ROOM'S WEB PAGES AND API LIVE, A CONTROLLER'S ONE ROOM IS AT THE TOP
+    if name is None:
+        return ""
+    return "{0}{1}".format(ROOMS_PATH, urllib.parse.quote(name))
+
+
+def web_port(config):
+    # THE WEB CONTROL PORT FROM A MASTER OR VENUE CONFIG
+    return config.get("WEB PORT", WEBPORT)
+
+
+def seconds_to_ns(value):
+    # A TIMELINE OFFSET FROM A WEB REQUEST, RAISES ValueError IF IT ISN'T ONE
+    offset = float(value)
+    if not offset >= 0:
+        raise ValueError("NEGATIVE OFFSET {0}".format(value))
+    return int(offset * tasker.NS_PER_SEC)
+
+
+def web_api(server, method, path):
+    # JSON STATUS AND CONTROL API SHARED BY BOTH ENGINES, RETURNS (HTTP CODE, PAYLOAD)
+    # GET /api/status, /api/clients, /api/timeline, /api/metrics - POST /api/start, /api/stop,
+    # /api/pause, /api/resume, /api/seek?offset=SECONDS, /api/reload
+    url = urllib.parse.urlparse(path)
+    route = url.path[len(API_PREFIX):].strip("/").lower()
+    if route in ("status", "clients", "timeline"):
+        if method != "GET":
+            return 405, {"RESULT": "USE GET"}
+        status = server.get_status()
+        return 200, status if route == "status" else status.get(route.upper())
+    if route == "metrics":
+        if method != "GET":
+            return 405, {"RESULT": "USE GET"}
+        return 200, server.metrics.as_dict()
+    if route == "start":
+        if method != "POST":
+            return 405, {"RESULT": "USE POST"}
+        if server.push_start():
+            return 202, {"RESULT": "STARTED"}
+        return 409, {"RESULT": "ALREADY RUNNING"}
+    if route == "reload":
+        if method != "POST":
+            return 405, {"RESULT": "USE POST"}
+        try:
+            changes = server.push_reload()
+        except (OSError, ValueError) as err:
+            return 400, {"RESULT": "RELOAD FAILED", "ERROR": str(err)}
+        if changes is None:
+            return 409, {"RESULT": "NO CONFIG FILE TO RELOAD"}
+        return 200, {"RESULT": "RELOADED", "CHANGES": changes}
+    if route in CONTROL_ACTIONS:
+        if method != "POST":
+            return 405, {"RESULT": "USE POST"}
+        action = CONTROL_ACTIONS[route]
+        offset_ns = None
+        if action == protocol.CONTROL_SEEK:
+            offset = urllib.parse.parse_qs(url.query).get("offset")
+            try:
+                offset_ns = seconds_to_ns(offset[0]) if offset else None
+            except ValueError:
+                offset_ns = None
+            if offset_ns is None:
+                return 400, {"RESULT": "SEEK NEEDS offset=SECONDS"}
+        position = server.push_control(action, offset_ns)
+        if position is None:
+            return 409, {"RESULT": CONTROL_REFUSED[action]}
+        return 202, {"RESULT": protocol.CONTROL_NAMES[action], "POSITION": position / tasker.NS_PER_SEC}
+    return 404, {"RESULT": "UNKNOWN ACTION {0}".format(route.upper())}
+
+
+def reload_config(server, path):
+    # RE-READ THE CONFIG FILE AT path AND HAND IT TO server.reload(), RETURNS WHAT CHANGED
+    # RAISES OSError OR ValueError AND LEAVES server AS IT WAS IF IT CAN'T BE USED
+    with reloading:
+        with open(path) as config_file:
+            config = json.load(config_file)
+        if ("ROOMS" in config) != ("ROOMS" in server.config):
+            raise ValueError("SWITCHING BETWEEN A VENUE AND A SINGLE ROOM NEEDS A RESTART")
+        try:
+            if "ROOMS" in config:
+                import venue
+                config = dict(config, ROOMS=venue.load_rooms(config, os.path.dirname(path)))
+            return server.reload(config)
+        except KeyError as err:
+            raise ValueError("CONFIG IS MISSING {0}".format(err)) from err
+
+
+def try_reload(server, path):
+    # reload_config() FOR A SIGNAL, THERE'S NOBODY TO TELL BUT THE LOG
+    try:
+        reload_config(server, path)
+    except (OSError, ValueError) as err:
+        logger.error("CONFIG NOT RELOADED: {0}".format(err))
+
+
+def sighup_handler(server, path, _signo, _stack_frame):
+    # RELOAD ON A THREAD OF ITS OWN, THE SIGNAL MAY HAVE COME IN WHILE THIS ONE HELD A LOCK
+    logger.info("SIGHUP, RELOADING {0}".format(path))
+    threading.Thread(target=try_reload, args=(server, path), daemon=True).start()
+
+
 def sigterm_handler(_signo, _stack_frame):
     logger.info("FORCE KILLED")
     sys.exit(0)
@@ -315,6 +1343,9 @@ def main():
                         help='JSON Configuration File (defaults to config.json)')
     # DEBUG
     parser.add_argument('--debug', '-d', default=False, help="Debug capability: For simulating Tasker")
+    # RUNTIME ENGINE
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                        help='threads runs each service on its own thread, asyncio runs everything on one event loop')
     # LOGGING VERBOSITY - DEFAULTS TO WARNING
     parser.add_argument('--verbose', '-v', action='count', 
                         default=0,
@@ -339,14 +1370,54 @@ def main():
     logger.debug("CONFIGURATION")
     logger.debug(config)
 
+    # LOG FROM A WRITER THREAD SO SLOW OUTPUT DOESN'T HOLD UP THE NETWORK OR THE CUES
+    logpipe.install(**logpipe.options_from_config(config))
+
     # SETUP BACKDOOR KILL SIGNALLING
     signal.signal(signal.SIGTERM, sigterm_handler)
 
     # CREATE OUR LOCAL ADDRESS
     address = (ANYHOST, config["PORT"])
 
+    # A VENUE CONFIG LISTS ROOMS, EACH ONE A MASTER CONFIG OF ITS OWN
+    rooms = None
+    if "ROOMS" in config:
+        import venue
+        rooms = venue.load_rooms(config, os.path.dirname(args.config.name))
+
+    # A BIG ROOM CAN SPREAD ITS CLIENTS OVER SHARD PROCESSES, THREADED ENGINE ONLY
+    shards = config.get("SHARDS", 0) if rooms is None else 0
+    if shards and args.engine == 'asyncio':
+        logger.warning("SHARDS NEED THE THREADED ENGINE, RUNNING ONE PROCESS")
+        shards = 0
+
+    # THE ASYNCIO ENGINE HAS ITS OWN RUN LOOP
+    if args.engine == 'asyncio':
+        import aioengine
+        try:
+            if rooms is not None:
+                aioengine.run_venue(address, config, rooms, debug=args.debug, config_path=args.config.name)
+            else:
+                aioengine.run_master(address, config, debug=args.debug, config_path=args.config.name)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("")
+            logger.info("EXITING")
+        return
+
     # INSTANTIATE CLASSES
-    controller = Controller(address, ControllerHandler, config, debug=args.debug)
+    if rooms is not None:
+        controller = venue.Venue(address, ControllerHandler, config, rooms, debug=args.debug)
+    elif shards:
+        import shards as sharding
+        controller = sharding.ShardedController(address, ControllerHandler, config, shards, debug=args.debug)
+    else:
+        controller = Controller(address, ControllerHandler, config, debug=args.debug)
+
+    # SIGHUP OR POST /api/reload RE-READS THE CONFIG FILE AND APPLIES WHAT CHANGED
+    controller.webcontrol.reload_callback = functools.partial(reload_config, controller, args.config.name)
+    signal.signal(signal.SIGHUP, functools.partial(sighup_handler, controller, args.config.name))
 
     # RUN FOREVER
     logger.info("STARTING MASTER CONTROLLER")
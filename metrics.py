@@ -0,0 +1,338 @@
+# THIS USES PYTHON 3
+
+# METRICS
+# CODE TO COUNT AND TIME WHAT HAPPENS ON THE HOT PATHS WITHOUT SLOWING THEM DOWN
+#
+# COUNTERS, GAUGES AND HISTOGRAMS ARE DECLARED ONCE AT IMPORT TIME BY THE MODULE
+# THAT UPDATES THEM AND LIVE IN ONE REGISTRY PER PROCESS. UPDATING ONE IS A
+# BISECT AND A FEW INTEGER ADDS UNDER A LOCK, NOTHING IS FORMATTED OR LOGGED
+# UNTIL SOMEONE ASKS FOR THEM, AS PROMETHEUS TEXT (render) OR PLAIN DATA (as_dict)
+#
+# HISTOGRAMS TAKE NANOSECONDS AND REPORT SECONDS LIKE PROMETHEUS EXPECTS
+#
+#   SPAWN = metrics.histogram("escape_room_spawn_seconds", "Time to start a task command")
+#   SPAWN.observe_ns(started_ns - requested_ns)
+#
+#   RTT = metrics.histogram("escape_room_ping_rtt_seconds", "Ping round trip", labels=("client",))
+#   RTT.labels(5).observe_ns(rtt_ns)
+
+# MODULE IMPORT
+import http.server
+import threading
+import bisect
+import json
+import math
+import logging
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_SEC = 1000000000
+# PROMETHEUS SCRAPES /metrics, THE SAME NUMBERS AS JSON ARE AT /api/metrics
+METRICS_PATH = "/metrics"
+JSON_PATH = "/api/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# DEFAULT HISTOGRAM BUCKET UPPER BOUNDS IN SECONDS, 50 US TO 5 S
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# QUANTILES ESTIMATED FROM THE BUCKETS FOR THE JSON REPORT
+QUANTILES = (0.5, 0.9, 0.99)
+
+# METRIC TYPES
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# CLASSES
+class Counter:
+    """
+    Counter - A count that only goes up
+    """
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name):
+        return [(name, (), self.value)]
+
+    def as_dict(self):
+        return {"VALUE": self.value}
+
+
+class Gauge:
+    """
+    Gauge - A value that's set to whatever it is now
+    """
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name):
+        return [(name, (), self.value)]
+
+    def as_dict(self):
+        return {"VALUE": self.value}
+
+
+class Histogram:
+    """
+    Histogram - How many observations fell under each bucket bound
+     - Observations are nanoseconds, bounds are kept in nanoseconds too so an
+       observation is one bisect with no float math
+     - The slowest observation is kept as well, it's the one people ask about
+    """
+    __slots__ = ("bounds", "counts", "count", "sum_ns", "max_ns", "_lock")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = [int(bound * NS_PER_SEC) for bound in buckets]
+        # ONE MORE THAN THE BOUNDS, THE LAST ONE IS +Inf
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum_ns = 0
+        self.max_ns = None
+        self._lock = threading.Lock()
+
+    def observe_ns(self, value_ns):
+        idx = bisect.bisect_left(self.bounds, value_ns)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum_ns += value_ns
+            if self.max_ns is None or value_ns > self.max_ns:
+                self.max_ns = value_ns
+
+    def snapshot(self):
+        # (CUMULATIVE COUNTS, COUNT, SUM NS, MAX NS) ALL FROM THE SAME MOMENT
+        with self._lock:
+            counts, count, sum_ns, max_ns = list(self.counts), self.count, self.sum_ns, self.max_ns
+        total = 0
+        cumulative = []
+        for bucket in counts:
+            total += bucket
+            cumulative.append(total)
+        return cumulative, count, sum_ns, max_ns
+
+    def quantile(self, q, cumulative=None):
+        # UPPER BOUND OF THE BUCKET THE q QUANTILE FALLS IN, IN SECONDS, NONE IF EMPTY
+        # ANYTHING PAST THE LAST BOUND REPORTS THE SLOWEST OBSERVATION
+        if cumulative is None:
+            cumulative = self.snapshot()[0]
+        if not cumulative[-1]:
+            return None
+        rank = q * cumulative[-1]
+        idx = bisect.bisect_left(cumulative, rank)
+        if idx >= len(self.bounds):
+            return self.max_ns / NS_PER_SEC
+        return self.bounds[idx] / NS_PER_SEC
+
+    def samples(self, name):
+        cumulative, count, sum_ns, _ = self.snapshot()
+        samples = [(name + "_bucket", (("le", format_value(bound / NS_PER_SEC)),), total)
+                   for bound, total in zip(self.bounds, cumulative)]
+        samples.append((name + "_bucket", (("le", "+Inf"),), cumulative[-1]))
+        samples.append((name + "_sum", (), sum_ns / NS_PER_SEC))
+        samples.append((name + "_count", (), count))
+        return samples
+
+    def as_dict(self):
+        cumulative, count, sum_ns, max_ns = self.snapshot()
+        report = {"COUNT": count,
+                  "SUM": sum_ns / NS_PER_SEC,
+                  "MEAN": sum_ns / count / NS_PER_SEC if count else None,
+                  "MAX": max_ns / NS_PER_SEC if max_ns is not None else None}
+        for q in QUANTILES:
+            report["P{0}".format(int(q * 100))] = self.quantile(q, cumulative)
+        report["BUCKETS"] = {format_value(bound / NS_PER_SEC): total
+                             for bound, total in zip(self.bounds, cumulative)}
+        return report
+
+
+class Metric:
+    """
+    Metric - One named counter, gauge or histogram and its label sets
+     - Without labels it passes inc(), set() and observe_ns() straight on
+     - With labels, labels(VALUES...) picks out (or makes) the one to update,
+       callers on a hot path can keep what it returns
+    """
+    KINDS = {COUNTER: Counter, GAUGE: Gauge, HISTOGRAM: Histogram}
+
+    def __init__(self, kind, name, description, labels=(), **kwargs):
+        self.kind = kind
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._kwargs = kwargs
+        # LABEL VALUES (AS STRINGS) -> COUNTER, GAUGE OR HISTOGRAM
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError("{0} NEEDS LABELS {1}, GOT {2}".format(self.name, self.label_names, key))
+            with self._lock:
+                child = self._children.setdefault(key, self.KINDS[self.kind](**self._kwargs))
+        return child
+
+    def remove(self, *values):
+        # FORGET A LABEL SET, E.G. A CLIENT THAT WAS TAKEN OUT OF THE CONFIG
+        with self._lock:
+            self._children.pop(tuple(str(value) for value in values), None)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def observe_ns(self, value_ns):
+        self._default.observe_ns(value_ns)
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self):
+        lines = ["# HELP {0} {1}".format(self.name, escape_help(self.description)),
+                 "# TYPE {0} {1}".format(self.name, self.kind)]
+        for values, child in self._items():
+            labels = tuple(zip(self.label_names, values))
+            for name, extra, value in child.samples(self.name):
+                lines.append("{0}{1} {2}".format(name, format_labels(labels + extra), format_value(value)))
+        return lines
+
+    def as_dict(self):
+        return {"TYPE": self.kind.upper(),
+                "HELP": self.description,
+                "VALUES": [dict(child.as_dict(), LABELS=dict(zip(self.label_names, values)))
+                           for values, child in self._items()]}
+
+
+class MetricsRegistry:
+    """
+    MetricsRegistry - Every metric in the process by name
+     - Declaring one that already exists hands back the existing one, so a
+       module can be reloaded without losing its numbers
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, kind, name, description, labels=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric(kind, name, description, labels, **kwargs)
+            elif metric.kind != kind:
+                raise ValueError("METRIC {0} IS ALREADY A {1}".format(name, metric.kind.upper()))
+            return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def _sorted(self):
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def render(self):
+        # PROMETHEUS TEXT EXPOSITION FORMAT
+        lines = []
+        for metric in self._sorted():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self):
+        return {metric.name: metric.as_dict() for metric in self._sorted()}
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """
+    MetricsHandler - /metrics and /api/metrics for processes without a web
+    control page (clients), see serve()
+    """
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == METRICS_PATH:
+            self._send(200, CONTENT_TYPE, self.server.registry.render())
+        elif path == JSON_PATH:
+            self._send(200, "application/json", json.dumps(self.server.registry.as_dict()))
+        else:
+            self._send(404, "text/plain", "NOT FOUND\n")
+
+    def _send(self, code, content_type, text):
+        body = text.encode()
+        self.send_response(code)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("METRICS {0} {1}".format(self.address_string(), format % args))
+
+
+# THE PROCESS WIDE REGISTRY
+REGISTRY = MetricsRegistry()
+
+
+# FUNCTIONS
+def counter(name, description, labels=()):
+    return REGISTRY.register(COUNTER, name, description, labels)
+
+
+def gauge(name, description, labels=()):
+    return REGISTRY.register(GAUGE, name, description, labels)
+
+
+def histogram(name, description, labels=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(HISTOGRAM, name, description, labels, buckets=buckets)
+
+
+def format_value(value):
+    # SAMPLE VALUES AND BUCKET BOUNDS THE WAY PROMETHEUS SPELLS THEM
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(value)
+
+
+def escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(
+        name, value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for name, value in labels) + "}"
+
+
+def serve(address, registry=REGISTRY):
+    # SERVE THE METRICS ON THEIR OWN PORT FROM A DAEMON THREAD, RETURNS THE SERVER
+    server = http.server.ThreadingHTTPServer(address, MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    logger.info("SERVING METRICS ON PORT {0}".format(server.server_address[1]))
+    return server
@@ -0,0 +1,281 @@
+# THIS USES PYTHON 3
+
+# PLUGINS
+# CODE TO RUN TASK TYPES INSIDE THIS PROCESS INSTEAD OF STARTING A COMMAND
+#
+# A TASK "TYPE" OTHER THAN TASK (A COMMAND, SEE SUPERVISOR) OR STOP NAMES A
+# PLUGIN. THE PLUGIN PARSES THE TASK'S COMMAND ONCE WHEN THE TASK LIST IS
+# LOADED, AT THE CUE IT RUNS ON A SMALL FIXED POOL OF WORKER THREADS (OR
+# RIGHT ON THE SCHEDULER IF IT CAN'T BLOCK) SO A SLOW PROP NEVER HOLDS UP
+# THE NEXT CUE
+#
+# MORE TYPES CAN BE ADDED BY LISTING MODULES UNDER "PLUGINS" IN THE CONFIG,
+# EACH ONE REGISTERS ITS TYPES WHEN IT'S IMPORTED:
+#
+#   import plugins
+#
+#   @plugins.register("RELAY")
+#   class Relay(plugins.TaskPlugin):
+#       def prepare(self, task):
+#           return int(task["COMMAND"])
+#       def run(self, args):
+#           flip_relay(args)
+
+# MODULE IMPORT
+import concurrent.futures
+import threading
+import importlib
+import socket
+import shlex
+import time
+import logging
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_MS = 1000000
+DEFAULT_WORKERS = 4
+
+# PLUGIN RUN STATES
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+
+# TASK TYPE NAME -> PLUGIN INSTANCE
+REGISTRY = {}
+
+# CLASSES
+class TaskPlugin:
+    """
+    TaskPlugin - Base for an in-process task type
+     - prepare(task) is called once when the task list is loaded and returns
+       whatever run() needs, raise ValueError if the command makes no sense
+     - run(args) is called at every cue with what prepare() returned
+     - INLINE plugins run on the scheduler itself and must never block,
+       the rest run on the worker pool
+    """
+    INLINE = False
+
+    def prepare(self, task):
+        return shlex.split(task["COMMAND"])
+
+    def run(self, args):
+        raise NotImplementedError
+
+
+class PluginRun:
+    """
+    PluginRun - One cue of a plugin task and how it went
+    """
+    __slots__ = ("idx", "type", "state", "queued_ns", "started_ns", "ended_ns", "error")
+
+    def __init__(self, idx, task_type):
+        self.idx = idx
+        self.type = task_type
+        self.state = QUEUED
+        self.queued_ns = time.monotonic_ns()
+        self.started_ns = None
+        self.ended_ns = None
+        self.error = None
+
+    def as_dict(self):
+        wait = run = None
+        if self.started_ns is not None:
+            wait = (self.started_ns - self.queued_ns) / NS_PER_MS
+        if self.ended_ns is not None:
+            run = (self.ended_ns - self.started_ns) / NS_PER_MS
+        return {"INDEX": self.idx,
+                "TYPE": self.type,
+                "STATE": self.state,
+                "QUEUE MS": wait,
+                "RUN MS": run,
+                "ERROR": self.error}
+
+
+class PluginRunner:
+    """
+    PluginRunner - Runs one tasker's plugin tasks
+     - Pooled plugins share at most workers threads, started on first use,
+       anything more waits its turn and is logged
+     - Every run is kept for the report
+    """
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self.runs = []
+        self._pool = None
+        self._busy = 0
+        # POOLED RUNS STILL WAITING FOR A WORKER, shutdown(cancel=True) DROPS THEM
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def run(self, task):
+        # task IS A COMPILED TaskRecord, ITS ARGS ARE WHAT THE PLUGIN PREPARED
+        idx, plugin = task.index, task.plugin
+        record = PluginRun(idx, task.type)
+        with self._lock:
+            self.runs.append(record)
+        if plugin.INLINE:
+            self._call(plugin, task.args, record)
+            return record
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                                   thread_name_prefix="plugin")
+            self._busy += 1
+            self._queued.add(record)
+            if self._busy > self.workers:
+                logger.warning("PLUGIN POOL BUSY, TASK {0} WAITS BEHIND {1} OTHERS".format(
+                    idx, self._busy - self.workers))
+        self._pool.submit(self._pooled, plugin, task.args, record)
+        return record
+
+    def _pooled(self, plugin, args, record):
+        with self._lock:
+            if record not in self._queued:
+                # DROPPED BY shutdown(), WHICH ALREADY TOOK IT OFF THE BUSY COUNT
+                return
+            self._queued.discard(record)
+        try:
+            self._call(plugin, args, record)
+        finally:
+            with self._lock:
+                self._busy -= 1
+
+    def _call(self, plugin, args, record):
+        if record.state == CANCELLED:
+            return
+        record.state = RUNNING
+        record.started_ns = time.monotonic_ns()
+        try:
+            plugin.run(args)
+        except Exception as err:
+            record.state = FAILED
+            record.error = str(err)
+            logger.error("TASK {0} ({1}) FAILED: {2}".format(record.idx, record.type, err))
+        else:
+            record.state = DONE
+        record.ended_ns = time.monotonic_ns()
+
+    def get_report(self):
+        with self._lock:
+            return [record.as_dict() for record in self.runs]
+
+    def shutdown(self, cancel=False):
+        # LET QUEUED WORK FINISH, OR DROP IT IF cancel, BUT DON'T WAIT FOR IT
+        # A RUN THAT HAS ALREADY STARTED CAN'T BE INTERRUPTED
+        with self._lock:
+            pool, self._pool = self._pool, None
+            if cancel:
+                for record in self._queued:
+                    record.state = CANCELLED
+                self._busy -= len(self._queued)
+                self._queued = set()
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=cancel)
+
+
+# FUNCTIONS
+def register(name):
+    # CLASS DECORATOR, MAKES TASKS OF TYPE name RUN THE PLUGIN
+    def decorate(cls):
+        REGISTRY[name.upper()] = cls()
+        return cls
+    return decorate
+
+
+def get(name):
+    return REGISTRY.get(name.upper())
+
+
+def load_modules(names):
+    # IMPORT THE CONFIG'S PLUGIN MODULES SO THEY CAN REGISTER THEIR TYPES
+    for name in names:
+        importlib.import_module(name)
+        logger.info("LOADED PLUGIN MODULE {0}".format(name))
+
+
+# BUILT IN PLUGINS
+@register("UDP")
+class UdpPlugin(TaskPlugin):
+    """
+    UdpPlugin - COMMAND is "HOST PORT MESSAGE", sends MESSAGE in one datagram
+    The address is looked up once at load
+    """
+    INLINE = True
+
+    def __init__(self):
+        self._sockets = {}
+
+    def prepare(self, task):
+        parts = task["COMMAND"].split(None, 2)
+        if len(parts) < 2:
+            raise ValueError("UDP TASK NEEDS \"HOST PORT MESSAGE\", GOT {0!r}".format(task["COMMAND"]))
+        message = parts[2] if len(parts) > 2 else ""
+        family, _, _, _, address = socket.getaddrinfo(parts[0], int(parts[1]), type=socket.SOCK_DGRAM)[0]
+        return family, address, message.encode()
+
+    def run(self, args):
+        family, address, message = args
+        sock = self._sockets.get(family)
+        if sock is None:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            self._sockets[family] = sock
+        sock.sendto(message, address)
+
+
+@register("FILE")
+class FilePlugin(TaskPlugin):
+    """
+    FilePlugin - COMMAND is "PATH TEXT", writes TEXT to PATH, e.g. a GPIO
+    value under /sys/class/gpio
+    """
+    def prepare(self, task):
+        parts = task["COMMAND"].split(None, 1)
+        if not parts:
+            raise ValueError("FILE TASK NEEDS \"PATH TEXT\"")
+        return parts[0], parts[1] if len(parts) > 1 else ""
+
+    def run(self, args):
+        path, text = args
+        with open(path, "w") as out:
+            out.write(text)
+
+
+@register("CALL")
+class CallPlugin(TaskPlugin):
+    """
+    CallPlugin - COMMAND is "MODULE:FUNCTION ARG ARG...", calls the function
+    with the arguments as strings, the function is imported once at load
+    """
+    def prepare(self, task):
+        args = shlex.split(task["COMMAND"])
+        module, _, name = args[0].partition(":") if args else ("", "", "")
+        if not module or not name:
+            raise ValueError("CALL TASK NEEDS \"MODULE:FUNCTION ARGS\", GOT {0!r}".format(task["COMMAND"]))
+        function = getattr(importlib.import_module(module), name)
+        if not callable(function):
+            raise ValueError("{0} IS NOT CALLABLE".format(args[0]))
+        return function, args[1:]
+
+    def run(self, args):
+        function, call_args = args
+        function(*call_args)
+
+
+@register("LOG")
+class LogPlugin(TaskPlugin):
+    """
+    LogPlugin - COMMAND is logged as a warning, handy for marking the timeline
+    """
+    INLINE = True
+
+    def prepare(self, task):
+        return task["COMMAND"]
+
+    def run(self, args):
+        logger.warning("CUE: {0}".format(args))
@@ -0,0 +1,199 @@
+# THIS USES PYTHON 3
+
+# PROTOCOL
+# BINARY WIRE FORMAT BETWEEN THE MASTER AND THE CLIENTS
+#
+# EVERY MESSAGE STARTS WITH A FIXED HEADER
+#   MAGIC (2) VERSION (1) TYPE (1) CLIENT ID (4) SEQ (4) TIMESTAMP (8)
+# ALL BIG ENDIAN, TIMESTAMP IS THE SENDER'S time.monotonic_ns() WHEN IT SENT
+# THE MESSAGE, THE CLIENT ID IS THE SENDING CLIENT (0 FROM THE MASTER)
+# A TYPE SPECIFIC BODY FOLLOWS, NEWER VERSIONS MAY ADD FIELDS TO THE END OF
+# A BODY AND OLDER READERS IGNORE THEM
+#
+# VERSION 0 IS THE ORIGINAL SPACE SEPARATED TEXT ("ping", "pong", "start"...)
+# WHICH THE MASTER AND CLIENT STILL SPEAK. THE MASTER STARTS EVERY CLIENT ON
+# TEXT, A CLIENT THAT KNOWS THIS FORMAT ADDS "v<N>" TO ITS TEXT PONG AND THE
+# MASTER SWITCHES IT TO BINARY AT THE LOWER OF THE TWO VERSIONS. CLIENTS
+# ALWAYS ANSWER IN THE FORMAT AND VERSION THEY WERE SPOKEN TO IN
+
+# MODULE IMPORT
+import struct
+
+# CONSTANTS
+# FIRST BYTE IS NOT ASCII SO IT CAN NEVER LOOK LIKE A TEXT COMMAND
+MAGIC = b"\xe5\x52"
+VERSION = 1
+TEXT_VERSION = 0
+
+# MESSAGE TYPES
+PING = 1
+PONG = 2
+START = 3
+ACK = 4
+SYNC = 5
+CONTROL = 6
+QUIET = 7
+
+TYPE_NAMES = {PING: "PING", PONG: "PONG", START: "START", ACK: "ACK", SYNC: "SYNC",
+              CONTROL: "CONTROL", QUIET: "QUIET"}
+
+# CONTROL ACTIONS
+CONTROL_PAUSE = 1
+CONTROL_RESUME = 2
+CONTROL_SEEK = 3
+CONTROL_STOP = 4
+
+CONTROL_NAMES = {CONTROL_PAUSE: "PAUSE", CONTROL_RESUME: "RESUME", CONTROL_SEEK: "SEEK",
+                 CONTROL_STOP: "STOP"}
+
+# FLAGS
+# PONG - THE CLIENT HAS JOINED THE MULTICAST GROUP
+FLAG_MULTICAST = 0x01
+# START/CONTROL - THE INSTANT IS ON THE MASTER'S CLOCK, NOT THE CLIENT'S
+FLAG_MASTER_CLOCK = 0x01
+# START/CONTROL - THERE IS AN INSTANT / ACK - THERE IS A VALUE
+FLAG_HAS_VALUE = 0x02
+
+# STRUCTS
+HEADER = struct.Struct("!2sBBIIq")
+# PONG BODY - PING SEND TIME (T1), PING RECEIVE TIME (T2), FLAGS
+PONG_BODY = struct.Struct("!qqB")
+# START BODY - START INSTANT, FLAGS
+START_BODY = struct.Struct("!qB")
+# ACK BODY - TYPE BEING ACKED, FLAGS, VALUE (LEAD TIME FOR A START, APPLY TIME FOR A CONTROL)
+ACK_BODY = struct.Struct("!BBq")
+# CONTROL BODY - ACTION, TIMELINE OFFSET, INSTANT TO BE AT THE OFFSET, FLAGS
+CONTROL_BODY = struct.Struct("!BqqB")
+# QUIET HAS NO BODY - THE SEQ IS THE STOP'S AND THE TIMESTAMP IS WHEN THE LAST COMMAND EXITED
+# SYNC BODY - CLIENT CLOCK OFFSET, RTT OF THE ESTIMATE
+SYNC_BODY = struct.Struct("!qq")
+# A RELAY ADDS THIS TO THE END OF ITS PONG AND ACK BODIES - HOW MANY CLIENTS BELOW
+# IT ARE CONNECTED (PONG) OR GOT THE COMMAND (ACK), AND HOW MANY THERE ARE
+RELAY_BODY = struct.Struct("!II")
+
+
+# CLASSES
+class ProtocolError(ValueError):
+    """
+    ProtocolError - A datagram that claims to be binary but can't be decoded
+    """
+
+
+class Message:
+    """
+    Message - A decoded header, the body is a memoryview into the datagram
+    so nothing is copied until a body field is unpacked
+    """
+    __slots__ = ("version", "type", "client_id", "seq", "timestamp", "body")
+
+    def __init__(self, version, mtype, client_id, seq, timestamp, body):
+        self.version = version
+        self.type = mtype
+        self.client_id = client_id
+        self.seq = seq
+        self.timestamp = timestamp
+        self.body = body
+
+    def type_name(self):
+        return TYPE_NAMES.get(self.type, str(self.type))
+
+
+# FUNCTIONS
+def is_binary(data):
+    return data.startswith(MAGIC)
+
+
+def negotiate(version):
+    # VERSION TO ANSWER IN WHEN SPOKEN TO IN version
+    return min(version, VERSION)
+
+
+def decode(data):
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ProtocolError("SHORT DATAGRAM ({0} BYTES)".format(len(view)))
+    magic, version, mtype, client_id, seq, timestamp = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ProtocolError("BAD MAGIC")
+    return Message(version, mtype, client_id, seq, timestamp, view[HEADER.size:])
+
+
+def _body(msg, body_struct):
+    if len(msg.body) < body_struct.size:
+        raise ProtocolError("SHORT {0} BODY".format(msg.type_name()))
+    return body_struct.unpack_from(msg.body)
+
+
+def unpack_pong(msg):
+    # RETURNS (T1, T2, FLAGS), T3 IS THE HEADER TIMESTAMP
+    return _body(msg, PONG_BODY)
+
+
+def unpack_start(msg):
+    # RETURNS (START INSTANT, FLAGS)
+    return _body(msg, START_BODY)
+
+
+def unpack_ack(msg):
+    # RETURNS (ACKED TYPE, FLAGS, VALUE)
+    return _body(msg, ACK_BODY)
+
+
+def unpack_relay(msg, body_struct):
+    # RETURNS (REACHED, TOTAL) FROM AFTER A body_struct BODY, NONE IF IT ISN'T FROM A RELAY
+    if len(msg.body) < body_struct.size + RELAY_BODY.size:
+        return None
+    return RELAY_BODY.unpack_from(msg.body, body_struct.size)
+
+
+def unpack_sync(msg):
+    # RETURNS (OFFSET, RTT)
+    return _body(msg, SYNC_BODY)
+
+
+def unpack_control(msg):
+    # RETURNS (ACTION, TIMELINE OFFSET, INSTANT, FLAGS)
+    return _body(msg, CONTROL_BODY)
+
+
+def encode(mtype, client_id, seq, timestamp, body=b"", version=VERSION):
+    return HEADER.pack(MAGIC, version, mtype, client_id, seq, timestamp) + body
+
+
+def ping(timestamp, version=VERSION):
+    return encode(PING, 0, 0, timestamp, version=version)
+
+
+def pong(client_id, t1, t2, t3, flags=0, version=VERSION, relay=None):
+    body = PONG_BODY.pack(t1, t2, flags)
+    if relay is not None:
+        body += RELAY_BODY.pack(*relay)
+    return encode(PONG, client_id, 0, t3, body, version)
+
+
+def start(seq, timestamp, instant=None, flags=0, version=VERSION):
+    if instant is not None:
+        flags |= FLAG_HAS_VALUE
+    return encode(START, 0, seq, timestamp, START_BODY.pack(instant or 0, flags), version)
+
+
+def ack(client_id, seq, timestamp, acked_type, value=None, version=VERSION, relay=None):
+    flags = FLAG_HAS_VALUE if value is not None else 0
+    body = ACK_BODY.pack(acked_type, flags, value or 0)
+    if relay is not None:
+        body += RELAY_BODY.pack(*relay)
+    return encode(ACK, client_id, seq, timestamp, body, version)
+
+
+def sync(timestamp, offset, rtt, version=VERSION):
+    return encode(SYNC, 0, 0, timestamp, SYNC_BODY.pack(offset, rtt), version)
+
+
+def control(seq, timestamp, action, offset, instant=None, flags=0, version=VERSION):
+    if instant is not None:
+        flags |= FLAG_HAS_VALUE
+    return encode(CONTROL, 0, seq, timestamp, CONTROL_BODY.pack(action, offset, instant or 0, flags), version)
+
+
+def quiet(client_id, seq, timestamp, version=VERSION):
+    return encode(QUIET, client_id, seq, timestamp, version=version)
@@ -0,0 +1,176 @@
+# THIS USES PYTHON 3
+
+# REGISTRY
+# CODE TO KEEP TRACK OF THE CLIENTS A MASTER CONTROLS
+
+# MODULE IMPORT
+import collections
+import threading
+import logging
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+# NUMBER OF PING SAMPLES KEPT PER CLIENT FOR CLOCK OFFSET ESTIMATION
+SYNC_SAMPLES = 8
+
+# CLASSES
+class ClientState:
+    """
+    ClientState - Everything the master knows about one client
+    """
+    __slots__ = ("id", "ip", "port", "address", "connected", "legacy", "version", "multicast",
+                 "mcast_ping_ns", "samples", "offset", "rtt", "start_skew", "liveness", "heartbeat", "relay")
+
+    def __init__(self, client_id, ip, port):
+        self.id = client_id
+        self.ip = ip
+        self.port = port
+        self.address = (ip, port)
+        self.connected = False
+        # NONE UNTIL WE HEAR A PONG, TRUE FOR CLIENTS THAT ONLY SPEAK BARE COMMANDS
+        self.legacy = None
+        # WIRE PROTOCOL VERSION WE SPEAK TO IT IN, 0 IS TEXT
+        self.version = 0
+        # TRUE ONCE THE CLIENT ANSWERED OUR LAST MULTICAST PING, OTHERWISE IT GETS UNICAST
+        self.multicast = False
+        self.mcast_ping_ns = None
+        # CLOCK SYNC STATE, OFFSET IS CLIENT CLOCK MINUS OUR CLOCK
+        self.samples = collections.deque(maxlen=SYNC_SAMPLES)
+        self.offset = None
+        self.rtt = None
+        self.start_skew = None
+        # LIVENESS STATE AND PING TIMING, FILLED IN BY THE LIVENESS MONITOR
+        self.liveness = None
+        self.heartbeat = None
+        # (CONNECTED, TOTAL) CLIENTS BELOW IT FROM ITS LAST PONG IF IT'S A RELAY
+        self.relay = None
+
+    def add_sync_sample(self, rtt, offset):
+        # THE LOWEST RTT SAMPLE HAS THE LEAST QUEUEING IN IT, TRUST THAT ONE
+        self.samples.append((rtt, offset))
+        self.rtt, self.offset = min(self.samples)
+
+    def update(self, info):
+        # TAKE ON THE STATE IN AN as_dict() FROM SOMEWHERE ELSE (A SHARD), ALL BUT
+        # WHO IT IS AND WHETHER IT'S CONNECTED, THE REGISTRY COUNTS THAT
+        self.liveness = info["LIVENESS"]
+        self.legacy = info["LEGACY"]
+        self.version = info["VERSION"]
+        self.multicast = info["MULTICAST"]
+        self.offset = info["OFFSET"]
+        self.rtt = info["RTT"]
+        self.start_skew = info["START SKEW"]
+        relay = info["RELAY"]
+        self.relay = (relay["CONNECTED"], relay["CLIENTS"]) if relay else None
+
+    def as_dict(self):
+        return {"ID": self.id,
+                "IP": self.ip,
+                "PORT": self.port,
+                "CONNECTED": self.connected,
+                "LIVENESS": self.liveness,
+                "LEGACY": self.legacy,
+                "VERSION": self.version,
+                "MULTICAST": self.multicast,
+                "OFFSET": self.offset,
+                "RTT": self.rtt,
+                "START SKEW": self.start_skew,
+                "RELAY": {"CONNECTED": self.relay[0], "CLIENTS": self.relay[1]} if self.relay else None}
+
+
+class ClientRegistry:
+    """
+    ClientRegistry - Clients indexed by (IP, PORT) and by ID
+     - Lookups are dictionary hits so pong handling doesn't depend on the
+       number of clients
+     - The number of connected clients is kept up to date as flags change
+       instead of being recounted
+     - Flags are flipped from more than one thread, every change to the
+       indexes or the count is made under one lock so none is lost
+    """
+    def __init__(self, clients=()):
+        self.by_address = {}
+        self.by_id = {}
+        self._connected = 0
+        self._lock = threading.Lock()
+        for client in clients:
+            self.add(client["ID"], client["IP"], client["PORT"])
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    @property
+    def connected_count(self):
+        with self._lock:
+            return self._connected
+
+    def add(self, client_id, ip, port):
+        with self._lock:
+            if client_id in self.by_id:
+                raise ValueError("DUPLICATE CLIENT ID {0}".format(client_id))
+            if (ip, port) in self.by_address:
+                raise ValueError("DUPLICATE CLIENT ADDRESS {0}:{1}".format(ip, port))
+            state = ClientState(client_id, ip, port)
+            self.by_id[client_id] = state
+            self.by_address[state.address] = state
+        return state
+
+    def remove(self, client_id):
+        with self._lock:
+            state = self.by_id.pop(client_id)
+            del self.by_address[state.address]
+            if state.connected:
+                self._connected -= 1
+        return state
+
+    def change(self, added=(), removed=()):
+        # REMOVE THE CLIENT IDS IN removed AND ADD THE (ID, IP, PORT)S IN added IN ONE GO,
+        # RETURNS THE (ADDED, REMOVED) STATES OR RAISES ValueError AND CHANGES NOTHING
+        # THE INDEXES ARE REPLACED, NOT CHANGED, SO WHOEVER IS LOOPING OVER THE CLIENTS
+        # ON ANOTHER THREAD (PINGS, STATUS) FINISHES WITH THE OLD ONES
+        with self._lock:
+            by_id = dict(self.by_id)
+            by_address = dict(self.by_address)
+            gone = [by_id.pop(client_id) for client_id in removed]
+            for state in gone:
+                del by_address[state.address]
+            new = []
+            for client_id, ip, port in added:
+                if client_id in by_id:
+                    raise ValueError("DUPLICATE CLIENT ID {0}".format(client_id))
+                if (ip, port) in by_address:
+                    raise ValueError("DUPLICATE CLIENT ADDRESS {0}:{1}".format(ip, port))
+                state = ClientState(client_id, ip, port)
+                by_id[client_id] = state
+                by_address[state.address] = state
+                new.append(state)
+            self.by_id, self.by_address = by_id, by_address
+            self._connected -= sum(1 for state in gone if state.connected)
+        return new, gone
+
+    def get(self, client_id):
+        return self.by_id.get(client_id)
+
+    def get_by_address(self, address):
+        return self.by_address.get(address)
+
+    def set_connected(self, state, connected):
+        # FLIP A CLIENT'S CONNECTED FLAG, RETURNS TRUE IF IT CHANGED
+        with self._lock:
+            if state.connected == connected:
+                return False
+            state.connected = connected
+            # A CLIENT THAT'S BEEN REMOVED WAS TAKEN OFF THE COUNT THEN
+            if self.by_id.get(state.id) is state:
+                self._connected += 1 if connected else -1
+        return True
+
+    def all_connected(self):
+        with self._lock:
+            return self._connected == len(self.by_id)
@@ -0,0 +1,357 @@
+# THIS USES PYTHON 3
+
+# RELAY
+# CODE FOR A CLIENT TO PASS THE MASTER'S COMMANDS ON TO CLIENTS OF ITS OWN
+#
+# THE MASTER ONLY KNOWS THE RELAY. THE RELAY SPEAKS TO ITS "RELAY CLIENTS" THE
+# WAY THE MASTER SPEAKS TO IT - PINGS FOR LIVENESS AND CLOCK SYNC, STARTS AND
+# CONTROLS WITH THE INSTANT TRANSLATED INTO EACH ONE'S CLOCK, RETRANSMITTED
+# UNTIL ACKED. A RELAY CLIENT CAN BE A RELAY ITSELF, SO A FLEET BECOMES A TREE
+# AND NOBODY SENDS TO MORE THAN ITS OWN BRANCHES
+#
+# WHAT GOES BACK UP IS SUMMARIZED. THE RELAY'S PONG SAYS HOW MANY CLIENTS BELOW
+# IT ARE CONNECTED. IT ACKS A START OR CONTROL ONCE EVERY RELAY CLIENT HAS ACKED
+# OR RUN OUT OF RETRIES, SAYING HOW MANY GOT IT, AND IT ONLY REPORTS A STOP
+# QUIET ONCE EVERYTHING BELOW IT IS. COUNTS ARE OF EVERY CLIENT IN THE SUBTREE
+#
+# TEXT PONGS AND ACKS CARRY THE SUMMARY AS r<REACHED>/<TOTAL> AT THE END,
+# BINARY ONES AS protocol.RELAY_BODY AFTER THEIR BODY
+
+# MODULE IMPORT
+import threading
+import time
+import logging
+# LOCAL MODULES
+import registry
+import liveness
+import delivery
+import protocol
+import logpipe
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_MS = 1000000
+# A RELAY HAS TO ANSWER BEFORE ITS MASTER GIVES UP, SO IT RETRIES FASTER AND
+# LESS THAN A MASTER DOES BY DEFAULT (ABOUT 0.75 S AGAINST 6.3 S)
+RETRIES = 3
+RETRY_TIMEOUT_MS = 50
+# LONGEST BETWEEN PINGS TO A HEALTHY RELAY CLIENT IF THE CONFIG DOESN'T SAY
+PING_TIMER = 5
+# HOW MANY FORWARDED COMMANDS TO REMEMBER, A STOP IS KEPT UNTIL EVERYTHING IS QUIET
+RECENT_FORWARDS = 64
+# THE RELAY ITSELF IN A STOP'S QUIET LIST
+SELF = None
+# TEXT SUMMARY FIELD PREFIX
+SUMMARY_PREFIX = str.encode("r")
+
+# CLASSES
+class Forward:
+    """
+    Forward - One start or control from upstream on its way to the relay clients
+    """
+    __slots__ = ("seq", "waiting", "reached", "total", "on_done", "quiet_waiting", "quiet_ns", "on_quiet")
+
+    def __init__(self, seq, total, on_done, on_quiet=None):
+        self.seq = seq
+        # RELAY CLIENTS WE HAVEN'T HEARD BACK FROM
+        self.waiting = set()
+        # CLIENTS BELOW US THAT GOT IT OUT OF HOW MANY THERE ARE
+        self.reached = 0
+        self.total = total
+        # CALLED AS on_done((REACHED, TOTAL)) WHEN NOBODY IS LEFT WAITING
+        self.on_done = on_done
+        # STOPS ONLY - WHO STILL HAS COMMANDS RUNNING (SELF IS US), THE LATEST
+        # TIME ONE OF THEM WENT QUIET ON OUR CLOCK AND WHO TO TELL
+        self.quiet_waiting = set()
+        self.quiet_ns = 0
+        self.on_quiet = on_quiet
+
+
+class Relay:
+    """
+    Relay - A client's own clients and the commands it passed on to them
+     - Pings them on its own timer for liveness and clock sync
+     - Forwards starts and controls to all of them at once, each with the
+       instant in its clock, retransmitting until they ack
+     - Calls back with one summary once every relay client has answered
+    """
+
+    # TEXT COMMANDS, THE SAME AS THE MASTER'S
+    PING = str.encode("ping")
+    PONG = str.encode("pong")
+    START = str.encode("start")
+    STARTED = str.encode("started")
+    ACK = str.encode("ack")
+    CONTROL = str.encode("control")
+    QUIET = str.encode("quiet")
+    VERSION_PREFIX = str.encode("v")
+
+    def __init__(self, sock, config):
+        self.socket = sock
+        self.clients = registry.ClientRegistry(config["RELAY CLIENTS"])
+        self.liveness = liveness.LivenessMonitor(on_down=self._client_down, on_up=self._client_up,
+                                                 **liveness.options_from_config(dict({"PING TIMER": PING_TIMER}, **config)))
+        self.delivery = delivery.DeliveryTracker(self.socket.sendto,
+                                                 retries=config.get("RETRIES", RETRIES),
+                                                 timeout_ns=int(config.get("RETRY TIMEOUT MS", RETRY_TIMEOUT_MS) * NS_PER_MS),
+                                                 on_failed=self._command_failed)
+        # UPSTREAM SEQ -> FORWARD, OLDEST FIRST
+        self.forwards = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        logger.info("RELAYING TO {0} CLIENTS".format(len(self.clients)))
+
+    def owns(self, address):
+        # IS THIS ONE OF OUR RELAY CLIENTS TALKING TO US
+        return self.clients.get_by_address(address) is not None
+
+    def summary(self):
+        # (CONNECTED, TOTAL) CLIENTS BELOW US
+        connected = total = 0
+        for client in self.clients:
+            below = client.relay or (0, 0)
+            total += 1 + below[1]
+            if client.connected:
+                connected += 1 + below[0]
+        return connected, total
+
+    def _client_down(self, client, phi):
+        logger.warning("RELAY CLIENT ID: {0} DOWN (PHI {1:.1f})".format(client.id, phi))
+        self.clients.set_connected(client, False)
+
+    def _client_up(self, client, phi):
+        logger.warning("RELAY CLIENT ID: {0} IS BACK".format(client.id))
+
+    def ping_message(self, version, now):
+        if version > protocol.TEXT_VERSION:
+            return protocol.ping(now, version)
+        return self.PING + " {0}".format(now).encode()
+
+    def start_message(self, version, seq, instant):
+        if version > protocol.TEXT_VERSION:
+            return protocol.start(seq, time.monotonic_ns(), instant, 0, version)
+        msg = self.START + " {0}".format(seq).encode()
+        if instant is not None:
+            msg += " {0}".format(instant).encode()
+        return msg
+
+    def control_message(self, version, seq, action, offset_ns, instant):
+        if version > protocol.TEXT_VERSION:
+            return protocol.control(seq, time.monotonic_ns(), action, offset_ns, instant, 0, version)
+        msg = self.CONTROL + " {0} {1} {2}".format(seq, protocol.CONTROL_NAMES[action].lower(), offset_ns).encode()
+        if instant is not None:
+            msg += " {0}".format(instant).encode()
+        return msg
+
+    def send_ping(self):
+        # PING WHOEVER IS DUE, SAME AS A MASTER WITHOUT MULTICAST
+        now = time.monotonic_ns()
+        self.liveness.check(self.clients, now)
+        for client in self.liveness.due(self.clients, now):
+            logger.info(logpipe.Repeating(("RELAY", client.id), "PINGING RELAY CLIENT {0}", client.id))
+            ping_ns = time.monotonic_ns()
+            self.socket.sendto(self.ping_message(client.version, ping_ns), client.address)
+            self.liveness.pinged(client, ping_ns)
+
+    def run_pings(self):
+        # THREAD BODY - PING EVERY LIVENESS TICK UNTIL KILLED
+        while not self._stop.is_set():
+            self.send_ping()
+            self._stop.wait(self.liveness.tick_interval)
+
+    def forward(self, seq, acked_type, at_ns, on_done, action=None, offset_ns=None, on_quiet=None):
+        # PASS A START (OR A CONTROL FOR action) WITH UPSTREAM SEQ seq ON TO EVERY RELAY CLIENT
+        # at_ns IS THE INSTANT ON OUR CLOCK, NONE TO ACT ON RECEIPT, on_done AND on_quiet
+        # (STOPS) ARE CALLED WITH THE SUMMARY AND THE QUIET TIME WHEN EVERYONE HAS ANSWERED
+        record = Forward(seq, sum(1 + (client.relay or (0, 0))[1] for client in self.clients), on_done, on_quiet)
+        sends = []
+        for client in self.clients:
+            instant = at_ns + client.offset if at_ns is not None and client.offset is not None else None
+            if acked_type == protocol.START:
+                if client.legacy:
+                    # NOTHING TO WAIT FOR, AN OLD CLIENT JUST STARTS
+                    self.socket.sendto(self.START, client.address)
+                    record.reached += 1
+                    continue
+                sends.append((client, self.START, self.start_message(client.version, seq, instant)))
+            elif not client.legacy:
+                sends.append((client, self.CONTROL,
+                              self.control_message(client.version, seq, action, offset_ns, instant)))
+            else:
+                continue
+            if not client.connected:
+                # ONE TRY FOR A CLIENT WE CAN'T REACH, IT DOESN'T GET TO HOLD UP THE ACK
+                _, _, msg = sends.pop()
+                self.socket.sendto(msg, client.address)
+                continue
+            record.waiting.add(client.id)
+            if on_quiet is not None:
+                record.quiet_waiting.add(client.id)
+        if on_quiet is not None:
+            record.quiet_waiting.add(SELF)
+        # REMEMBERED BEFORE ANYTHING GOES OUT SO NO ACK CAN BEAT IT
+        with self._lock:
+            self.forwards[seq] = record
+            while len(self.forwards) > RECENT_FORWARDS:
+                del self.forwards[next(iter(self.forwards))]
+        for client, cmd, msg in sends:
+            self.delivery.send_command(client.id, client.address, cmd, seq, msg)
+        if not sends:
+            self._finish(record)
+
+    def forwarding(self, seq):
+        # TRUE WHILE seq IS STILL WAITING ON RELAY CLIENTS, RETRANSMITS OF IT ARE IGNORED
+        with self._lock:
+            record = self.forwards.get(seq)
+            return record is not None and bool(record.waiting)
+
+    def _finish(self, record):
+        # EVERY RELAY CLIENT HAS ANSWERED
+        reached, total = record.reached, record.total
+        if reached < total:
+            logger.warning("RELAYED SEQ {0} TO {1} OF {2} CLIENTS".format(record.seq, reached, total))
+        else:
+            logger.info(logpipe.Lazy("RELAYED SEQ {0} TO ALL {1} CLIENTS", record.seq, total))
+        if record.on_done is not None:
+            record.on_done((reached, total))
+        if record.on_quiet is None:
+            with self._lock:
+                self.forwards.pop(record.seq, None)
+
+    def _settle(self, seq, client_id, reached):
+        # client_id ANSWERED seq, reached OF THE CLIENTS AT OR BELOW IT GOT IT
+        with self._lock:
+            record = self.forwards.get(seq)
+            if record is None or client_id not in record.waiting:
+                return
+            record.waiting.discard(client_id)
+            record.reached += reached
+            if not reached:
+                # IT NEVER GOT THE STOP SO IT WON'T SAY WHEN IT'S QUIET
+                record.quiet_waiting.discard(client_id)
+            done = not record.waiting
+        if done:
+            self._finish(record)
+        self._check_quiet(record)
+
+    def _command_failed(self, delivery):
+        # CALLED BY THE DELIVERY TRACKER WHEN A RELAY CLIENT RAN OUT OF RETRIES
+        self._settle(delivery.seq, delivery.client_id, 0)
+
+    def quieted(self, seq, who, quiet_ns):
+        # who (SELF IS US) HAS NOTHING RUNNING SINCE quiet_ns ON OUR CLOCK AFTER THE STOP seq
+        # RETURNS FALSE IF THAT ISN'T A STOP WE'RE WAITING ON, THEN IT'S NOT OUR BUSINESS
+        with self._lock:
+            record = self.forwards.get(seq)
+            if record is None or who not in record.quiet_waiting:
+                return False
+            record.quiet_waiting.discard(who)
+            record.quiet_ns = max(record.quiet_ns, quiet_ns)
+        self._check_quiet(record)
+        return True
+
+    def _check_quiet(self, record):
+        with self._lock:
+            if record.on_quiet is None or record.quiet_waiting or self.forwards.get(record.seq) is not record:
+                return
+            del self.forwards[record.seq]
+        record.on_quiet(record.quiet_ns)
+
+    def handle(self, data, recv_ns, address):
+        # A PONG, ACK OR QUIET FROM ONE OF OUR RELAY CLIENTS, IN EITHER FORMAT
+        if protocol.is_binary(data):
+            try:
+                msg = protocol.decode(data)
+            except protocol.ProtocolError as err:
+                logger.warning("BAD MESSAGE FROM {0}: {1}".format(address, err))
+                return
+            client = self.clients.get(msg.client_id)
+            if client is None:
+                logger.warning("{0} FROM UNKNOWN RELAY CLIENT ID {1}".format(msg.type_name(), msg.client_id))
+                return
+            if msg.type == protocol.PONG:
+                t1, t2, _ = protocol.unpack_pong(msg)
+                self._pong(client, protocol.negotiate(msg.version), (t1, t2, msg.timestamp, recv_ns),
+                           protocol.unpack_relay(msg, protocol.PONG_BODY), recv_ns)
+            elif msg.type == protocol.ACK:
+                _, flags, value = protocol.unpack_ack(msg)
+                self._acked(client, msg.seq, [value] if flags & protocol.FLAG_HAS_VALUE else [],
+                            protocol.unpack_relay(msg, protocol.ACK_BODY))
+            elif msg.type == protocol.QUIET:
+                self._quiet(client, msg.seq, msg.timestamp, recv_ns)
+            return
+        client = self.clients.get_by_address(address)
+        try:
+            self._handle_text(client, data.split(), recv_ns)
+        except (ValueError, IndexError):
+            # A GARBLED OR TRUNCATED COMMAND, ONE LINE RATHER THAN A TRACEBACK
+            logger.warning("BAD MESSAGE FROM {0}: {1}".format(address, data[:64]))
+
+    def _handle_text(self, client, parts, recv_ns):
+        cmd = parts[0] if parts else b""
+        if cmd == self.PONG:
+            # PONG [T1 T2 T3 [mc] [v<N>] [r<CONNECTED>/<TOTAL>]]
+            times = None
+            if len(parts) >= 4:
+                times = tuple(int(x) for x in parts[1:4]) + (recv_ns,)
+            fields, summary = parse_summary(parts[4:])
+            version = protocol.TEXT_VERSION
+            for field in fields:
+                if field.startswith(self.VERSION_PREFIX):
+                    version = protocol.negotiate(int(field[1:]))
+            self._pong(client, version, times, summary, recv_ns)
+        elif cmd == self.ACK:
+            # ACK <CLIENT ID> <SEQ> [VALUE] [r<REACHED>/<TOTAL>]
+            fields, summary = parse_summary(parts[3:])
+            self._acked(client, int(parts[2]), fields, summary)
+        elif cmd == self.QUIET:
+            # QUIET <CLIENT ID> <STOP SEQ> <WHEN ITS LAST COMMAND EXITED>
+            self._quiet(client, int(parts[2]), int(parts[3]), recv_ns)
+        elif cmd != self.STARTED:
+            logger.info("UNEXPECTED {0} FROM RELAY CLIENT ID {1}".format(cmd.upper(), client.id))
+
+    def _pong(self, client, version, times, summary, recv_ns):
+        self.liveness.heartbeat(client, recv_ns)
+        client.legacy = times is None
+        client.version = version
+        client.relay = summary
+        if self.clients.set_connected(client, True):
+            logger.info("RELAY CLIENT ID: {0} CONNECTED!".format(client.id))
+        if times is not None:
+            t1, t2, t3, t4 = times
+            client.add_sync_sample((t4 - t1) - (t3 - t2), ((t2 - t1) + (t3 - t4)) // 2)
+
+    def _acked(self, client, seq, reply, summary):
+        if self.delivery.ack(client.id, seq, reply) is None:
+            return
+        # IT GOT IT, AND IF IT'S A RELAY TOO SO DID HOWEVER MANY IT SAYS BELOW IT
+        self._settle(seq, client.id, 1 + (summary[0] if summary else 0))
+
+    def _quiet(self, client, seq, quiet_ns, recv_ns):
+        # ITS CLOCK TO OURS, WITHOUT AN OFFSET THE ARRIVAL IS THE BEST WE CAN DO
+        if client.offset is not None:
+            quiet_ns -= client.offset
+        else:
+            quiet_ns = recv_ns
+        self.quieted(seq, client.id, quiet_ns)
+
+    def kill(self):
+        self._stop.set()
+        self.delivery.kill()
+
+
+# FUNCTIONS
+def summary_field(summary):
+    # r<REACHED>/<TOTAL> FOR THE END OF A TEXT PONG OR ACK
+    return SUMMARY_PREFIX + "{0}/{1}".format(*summary).encode()
+
+
+def parse_summary(fields):
+    # TAKE AN r<REACHED>/<TOTAL> OFF THE END OF fields, RETURNS (OTHER FIELDS, SUMMARY OR NONE)
+    if fields and fields[-1].startswith(SUMMARY_PREFIX):
+        reached, _, total = fields[-1][len(SUMMARY_PREFIX):].partition(b"/")
+        return fields[:-1], (int(reached), int(total))
+    return fields, None
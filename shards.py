@@ -0,0 +1,351 @@
+# THIS USES PYTHON 3
+
+# SHARDS
+# CODE TO SPREAD A MASTER'S CLIENTS OVER WORKER PROCESSES
+#
+# EVERY PONG, ACK AND RETRANSMIT IS PYTHON RUNNING UNDER ONE GIL, SO A MASTER
+# WITH THOUSANDS OF CLIENTS RUNS OUT OF ONE CORE ON HEARTBEATS ALONE. WITH
+# "SHARDS" : N THE CLIENTS ARE SPLIT BY ID (ID MOD N) OVER N SHARD PROCESSES.
+# SHARD K HAS ITS OWN SOCKET ON SHARD PORT + K AND DOES EVERYTHING A MASTER DOES
+# FOR ITS CLIENTS - PINGS, LIVENESS, CLOCK SYNC, ACKED STARTS AND CONTROLS
+#
+# THE LEADER (THE PROCESS THAT WAS STARTED) RUNS THE WEB CONTROL AND THE
+# MASTER'S OWN TASKS AND DECIDES WHEN TO START, PAUSE, SEEK AND STOP. IT TELLS
+# THE SHARDS OVER A PIPE EACH, THEY SEND BACK CLIENT STATE, ACK RESULTS AND
+# QUIET TIMES WHICH END UP IN THE SAME STATUS, EVENTS AND CONTROL RECORDS AS
+# A SINGLE PROCESS MASTER. ALL PROCESSES ARE ON ONE HOST SO THEY SHARE THE
+# MONOTONIC CLOCK, START AND CONTROL INSTANTS NEED NO TRANSLATION
+#
+# MESSAGES ARE TUPLES, THE FIRST ITEM SAYS WHAT IT IS
+#   LEADER -> SHARD: START SEQ START_NS, CONTROL SEQ ACTION POSITION_NS CLICKED_NS, EXIT
+#   SHARD -> LEADER: CLIENTS [STATUS], EVENT KIND DATA, REACHED SEQ ID ACKED_NS,
+#                    APPLIED SEQ ID LATENCY_NS ESTIMATED, SKIPPED SEQ ID REASON,
+#                    QUIET SEQ ID QUIET_NS ESTIMATED
+
+# MODULE IMPORT
+import multiprocessing.connection
+import multiprocessing
+import threading
+import signal
+import time
+import logging
+# LOCAL MODULES
+import master_control
+import tasker
+import metrics
+import logpipe
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_SEC = tasker.NS_PER_SEC
+# HOW OFTEN A SHARD SENDS THE LEADER ITS CLIENTS' CLOCK SYNC AND DELIVERY STATE,
+# CONNECTION AND LIVENESS CHANGES ARE SENT AS THEY HAPPEN
+STATUS_INTERVAL_NS = 1 * NS_PER_SEC
+# FIRST SHARD'S PORT IF THE CONFIG DOESN'T SAY, CLEAR OF THE CLIENTS NUMBERED AFTER THE MASTER
+SHARD_PORT_OFFSET = 100
+# MESSAGE KINDS
+START = "START"
+CONTROL = "CONTROL"
+EXIT = "EXIT"
+RELOAD = "RELOAD"
+CLIENTS = "CLIENTS"
+EVENT = "EVENT"
+REACHED = "REACHED"
+APPLIED = "APPLIED"
+SKIPPED = "SKIPPED"
+QUIET = "QUIET"
+# EVENTS A SHARD PASSES ON, ITS RUN AND CONTROL EVENTS ARE ONLY ITS SHARE
+FORWARDED_EVENTS = ("client", "delivery")
+
+# CLASSES
+class Shard(master_control.Controller):
+    """
+    Shard - A Controller for one share of the clients in a worker process
+     - Pings, syncs and delivers to its clients like any master but never
+       starts or runs tasks on its own, the leader tells it when
+     - Reports everything the leader's status and records need over its pipe
+    """
+    def __init__(self, server_address, RequestHandlerClass, config, conn, debug=False):
+        self.conn = conn
+        # THE HANDLER, PING AND RETRANSMIT THREADS ALL REPORT
+        self._send_lock = threading.Lock()
+        self._status_ns = 0
+        master_control.Controller.__init__(self, server_address, RequestHandlerClass, config, debug=debug)
+
+    def _start_services(self):
+        # A CONTROLLER WITHOUT THE WEB CONTROL, THE LEADER HAS THAT
+        master_control.Room._start_services(self)
+        self.events.subscribe(self._forward_event)
+        self.delivery_thread = threading.Thread(target=self.delivery.run, daemon=True)
+        self.delivery_thread.start()
+        self.looper = master_control.LoopingTimer(self.liveness.tick_interval, self.send_ping, True)
+        self.looper.start()
+
+    def tell(self, *msg):
+        with self._send_lock:
+            try:
+                self.conn.send(msg)
+            except (OSError, EOFError):
+                # THE LEADER IS GONE, listen() FINDS OUT AND WE EXIT
+                pass
+
+    def _forward_event(self, event):
+        if event.kind in FORWARDED_EVENTS:
+            self.tell(EVENT, event.kind, event.data)
+        return True
+
+    def get_start_auto(self):
+        # ONLY THE LEADER STARTS, IT KNOWS WHEN EVERY SHARD IS CONNECTED
+        return False
+
+    def send_ping(self):
+        master_control.Controller.send_ping(self)
+        now = time.monotonic_ns()
+        if now - self._status_ns >= STATUS_INTERVAL_NS:
+            self._status_ns = now
+            deliveries = self.get_delivery_status()
+            self.tell(CLIENTS, [dict(client.as_dict(), DELIVERY=deliveries.get(client.id))
+                                for client in self.clients])
+
+    def send_start(self, seq, start_ns):
+        master_control.Controller.send_start(self, seq, start_ns)
+        # OLD CLIENTS NEVER ACK, DON'T LEAVE THE LEADER WAITING FOR THEM
+        for client in self.clients:
+            if client.legacy:
+                self.tell(REACHED, seq, client.id, None)
+
+    def _start_reached(self, seq, client_id, acked_ns):
+        self.tell(REACHED, seq, client_id, acked_ns)
+
+    def _control_progress(self, record, client_id):
+        if client_id in record.latency:
+            self.tell(APPLIED, record.seq, client_id, record.latency[client_id], client_id in record.estimated)
+        elif client_id in record.skipped:
+            self.tell(SKIPPED, record.seq, client_id, record.skipped[client_id])
+
+    def report_quiet(self, record, who, quiet_ns, estimated=False):
+        self.tell(QUIET, record.seq, who, quiet_ns, estimated)
+
+    def listen(self):
+        # DO WHAT THE LEADER SAYS UNTIL IT SAYS EXIT OR GOES AWAY
+        while True:
+            try:
+                msg = self.conn.recv()
+            except (EOFError, OSError):
+                return
+            if msg[0] == START:
+                _, seq, start_ns = msg
+                self._start_seq = seq
+                self.send_start(seq, start_ns)
+            elif msg[0] == CONTROL:
+                _, seq, action, position_ns, clicked_ns = msg
+                record = master_control.ControlRecord(action, seq, position_ns, clicked_ns, clicked_ns,
+                                                      [client.id for client in self.clients])
+                self.last_control = record
+                self.send_control(record)
+                for client_id in list(record.skipped):
+                    self._control_progress(record, client_id)
+            elif msg[0] == RELOAD:
+                # THE LEADER ALREADY CHECKED IT
+                try:
+                    self.reload(msg[1])
+                except ValueError as err:
+                    logger.error("SHARD CONFIG NOT RELOADED: {0}".format(err))
+            elif msg[0] == EXIT:
+                return
+
+
+class ShardedController(master_control.Controller):
+    """
+    ShardedController - The leader, a Controller whose clients are handled by
+    shard processes
+     - Its client registry mirrors what the shards report, so status, the web
+       pages and AUTO start work as they always do
+     - Starts and controls are decided and recorded here, only the sending
+       is left to the shards
+    """
+    def __init__(self, server_address, RequestHandlerClass, config, shards, gpio=None, debug=False):
+        self.shard_count = shards
+        self.shards = []
+        # LAST DELIVERY FOR EACH CLIENT AS ITS SHARD REPORTED IT
+        self.shard_deliveries = {}
+        # THE WEB HANDLERS, THE TASKER AND A RELOAD ALL TELL THE SHARDS THINGS,
+        # PICKLED MESSAGES ON ONE PIPE MUSTN'T INTERLEAVE
+        self._send_lock = threading.Lock()
+        # SET ONCE WE'VE TOLD THE SHARDS TO EXIT, THEIR PIPES CLOSING IS EXPECTED THEN
+        self._exiting = False
+        master_control.Controller.__init__(self, server_address, RequestHandlerClass, config, gpio, debug)
+
+    def _start_services(self):
+        # SHARDS ARE SPAWNED, NOT FORKED, THEY DON'T INHERIT OUR THREADS OR SOCKETS
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.shard_count):
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=run_shard, name="shard-{0}".format(index), daemon=True,
+                                      args=(index, self.shard_count, self.config, child_conn,
+                                            logger.getEffectiveLevel(), self.debug))
+            process.start()
+            child_conn.close()
+            self.shards.append((process, conn))
+            logger.info("SHARD {0} (PID {1}) HAS {2} CLIENTS ON PORT {3}".format(
+                index, process.pid, len(shard_clients(self.config, index, self.shard_count)),
+                shard_port(self.config, index)))
+        self.listen_thread = threading.Thread(target=self.listen, daemon=True)
+        self.listen_thread.start()
+
+        # WEB CONTROL
+        self.webcontrol = master_control.WebControl((master_control.ANYHOST, master_control.web_port(self.config)),
+                                                    master_control.WebControlHandler,
+                                                    callback=self.start_all, status=self.get_status,
+                                                    bus=self.events, control=self.control)
+        self.web_thread = threading.Thread(target=self.webcontrol.serve_forever)
+        self.web_thread.start()
+
+    def tell_shards(self, *msg):
+        for _, conn in self.shards:
+            self.tell_shard(conn, msg)
+
+    def tell_shard(self, conn, msg):
+        with self._send_lock:
+            try:
+                conn.send(msg)
+            except (OSError, EOFError):
+                # listen() LOGS THE SHARD GOING AWAY
+                pass
+
+    def send_ping(self):
+        # THE SHARDS PING THEIR OWN CLIENTS
+        pass
+
+    def send_start(self, seq, start_ns):
+        self.tell_shards(START, seq, start_ns)
+
+    def send_control(self, record):
+        # THE SHARDS SKIP THEIR LEGACY CLIENTS, EVERYONE ELSE IS SENT TO
+        sent = len(self.clients) - sum(1 for client in self.clients if client.legacy)
+        self.tell_shards(CONTROL, record.seq, record.action, record.offset_ns, record.clicked_ns)
+        return sent
+
+    def get_delivery_status(self):
+        return dict(self.shard_deliveries)
+
+    def listen(self):
+        # THREAD BODY - EVERYTHING THE SHARDS REPORT COMES IN HERE
+        conns = {conn: index for index, (_, conn) in enumerate(self.shards)}
+        while conns:
+            for conn in multiprocessing.connection.wait(list(conns)):
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    index = conns.pop(conn)
+                    if not self._exiting:
+                        logger.error("SHARD {0} WENT AWAY, ITS CLIENTS ARE ON THEIR OWN".format(index))
+                    continue
+                self.handle_shard(msg)
+
+    def handle_shard(self, msg):
+        kind = msg[0]
+        if kind == CLIENTS:
+            for info in msg[1]:
+                self.shard_deliveries[info["ID"]] = info["DELIVERY"]
+                self._mirror(info)
+        elif kind == EVENT:
+            _, event, data = msg
+            if event == "client":
+                self._mirror(data)
+            elif event == "delivery":
+                self.shard_deliveries[data["CLIENT"]] = data
+            self.events.publish(event, data)
+        elif kind == REACHED:
+            self._start_reached(*msg[1:])
+        elif kind in (APPLIED, SKIPPED, QUIET):
+            record = self.last_control
+            if record is None or record.seq != msg[1]:
+                return
+            client_id = msg[2]
+            if kind == APPLIED:
+                record.applied(client_id, msg[3], msg[4])
+                self._control_progress(record, client_id)
+            elif kind == SKIPPED:
+                record.skip(client_id, msg[3])
+                self._control_progress(record, client_id)
+            else:
+                self.report_quiet(record, client_id, msg[3], msg[4])
+
+    def _mirror(self, info):
+        # TAKE ON A CLIENT'S STATE AS ITS SHARD SEES IT
+        client = self.clients.get(info["ID"])
+        if client is None:
+            return
+        client.update(info)
+        if self.clients.set_connected(client, info["CONNECTED"]):
+            self._count_connected()
+            # SAME AS A PONG ON A SINGLE PROCESS MASTER, THROUGH THE WEB START LOCK
+            if info["CONNECTED"] and not self.started and self.get_start_auto() and self.all_connected:
+                if self.webcontrol.push_start():
+                    logger.info("AUTO STARTED ALL CLIENTS")
+
+    def reload(self, config):
+        # CHECKED AND MIRRORED HERE, EACH SHARD TAKES ON ITS OWN SHARE
+        changes = master_control.Room.reload(self, config)
+        for index, (_, conn) in enumerate(self.shards):
+            self.tell_shard(conn, (RELOAD, shard_config(config, index, self.shard_count)))
+        return changes
+
+    def _clients_changed(self, added, removed):
+        for client in removed:
+            self.shard_deliveries.pop(client.id, None)
+        master_control.Room._clients_changed(self, added, removed)
+
+    def kill(self):
+        self._exiting = True
+        self.tell_shards(EXIT)
+        master_control.Room.kill(self)
+        for process, _ in self.shards:
+            process.join(1)
+
+
+# FUNCTIONS
+def shard_of(client_id, count):
+    return client_id % count
+
+
+def shard_clients(config, index, count):
+    return [client for client in config["CLIENTS"] if shard_of(client["ID"], count) == index]
+
+
+def shard_config(config, index, count):
+    # A SHARD'S CONFIG IS THE LEADER'S WITH ONLY ITS CLIENTS
+    # EVERY SHARD WOULD SEND THE WHOLE GROUP EVERYTHING, SO NO MULTICAST
+    shard = {key: value for key, value in config.items() if key != "MULTICAST"}
+    shard["CLIENTS"] = shard_clients(config, index, count)
+    return shard
+
+
+def shard_port(config, index):
+    return config.get("SHARD PORT", config["PORT"] + SHARD_PORT_OFFSET) + index
+
+
+def run_shard(index, count, config, conn, level, debug):
+    # SHARD PROCESS BODY, SERVE OUR SHARE OF THE CLIENTS UNTIL THE LEADER IS DONE
+    # master_control SET UP LOGGING WHEN IT WAS IMPORTED, WE ONLY NEED THE LEADER'S LEVEL
+    logger.setLevel(level)
+    logpipe.install(**logpipe.options_from_config(config))
+    # A SIGHUP OR CTRL-C TO THE WHOLE GROUP IS FOR THE LEADER, IT SENDS US A RELOAD
+    # OR AN EXIT (AND IF IT DIES OUR PIPE CLOSES, WHICH ENDS listen() TOO)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if "SHARD METRICS PORT" in config:
+        metrics.serve((master_control.ANYHOST, config["SHARD METRICS PORT"] + index))
+    shard = Shard((master_control.ANYHOST, shard_port(config, index)), master_control.ControllerHandler,
+                  shard_config(config, index, count), conn, debug=debug)
+    serving = threading.Thread(target=shard.serve_forever, daemon=True)
+    serving.start()
+    try:
+        shard.listen()
+    finally:
+        shard.kill()
+        shard.shutdown()
@@ -0,0 +1,393 @@
+# THIS USES PYTHON 3
+
+# SIMULATE
+# WHOLE SHOW REHEARSAL ON A VIRTUAL CLOCK
+#
+# LOADS A MASTER (OR VENUE) CONFIG AND THE CONFIGS OF ITS CLIENTS AND RUNS
+# EVERY TIMELINE IN THIS PROCESS ON ONE VIRTUAL CLOCK. THE MASTER AND EVERY
+# CLIENT GET A TASKER OVER THEIR OWN COMPILED PLAN (THE SAME taskplan A REAL RUN
+# USES), ALL STARTED AT ONE INSTANT THE WAY A SYNCED START IS. NOTHING IS SENT
+# OR RUN, EVERY PRELOAD AND CUE IS RECORDED AS IT'S DISPATCHED INSTEAD
+#
+# WITH --speed N THE CLOCK KEEPS PACE WITH N TIMES REAL TIME, WITHOUT IT THE
+# CLOCK JUMPS STRAIGHT FROM ONE DEADLINE TO THE NEXT, SO AN HOUR LONG SHOW TAKES
+# AS LONG AS IT TAKES TO WALK ITS CUES. --control PAUSES, RESUMES, SEEKS OR STOPS
+# EVERY TIMELINE AT A GIVEN TIME THE SAME WAY THE WEB CONTROL DOES
+#
+# THE TIMELINE GOES TO STDOUT (AND TO --timeline FILE AS JSON LINES) FOLLOWED BY
+# A SUMMARY OF EVERY TASKER. THE EXIT STATUS IS 1 IF A CONFIG COULDN'T BE LOADED
+# OR COMPILED, OR WITH --strict IF ANYTHING LOGGED A WARNING (CUES AFTER THE
+# STOP, UNKNOWN TASK TYPES, CLIENTS WITH NO CONFIG), SO IT CAN GATE A CONFIG
+# CHANGE IN CI
+
+# MODULE IMPORTS
+import argparse
+import functools
+import heapq
+import json
+import time
+import sys
+import os
+import logging
+# LOCAL MODULES
+import aioengine
+import supervisor
+import tasker
+import taskplan
+import protocol
+import venue
+
+# CONSTANTS
+NAME = "ESCAPE ROOM"
+NS_PER_MS = tasker.NS_PER_MS
+NS_PER_SEC = tasker.NS_PER_SEC
+MASTER = "MASTER"
+# WHAT --control ACCEPTS
+CONTROLS = {"pause": protocol.CONTROL_PAUSE,
+            "resume": protocol.CONTROL_RESUME,
+            "seek": protocol.CONTROL_SEEK,
+            "stop": protocol.CONTROL_STOP}
+PHASES = {taskplan.PRELOAD: "PRELOAD", taskplan.CUE: "CUE"}
+
+# LOGGING
+logger = logging.getLogger(NAME)
+
+# CLASSES
+class Timer:
+    """
+    Timer - A callback waiting on the virtual clock, cancel() drops it
+    """
+    __slots__ = ("callback", "args", "cancelled")
+
+    def __init__(self, callback, args):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class VirtualClock:
+    """
+    VirtualClock - Monotonic nanoseconds that only move when a timer is due
+     - Calling it is the time, so it can be handed to a tasker as its clock
+     - run() takes the timers in order and moves the clock to each one
+     - With speed 0 it jumps straight to the next timer, with speed N it
+       sleeps so N virtual seconds go by every real second
+    """
+    def __init__(self, speed=0):
+        self.speed = speed
+        self.now_ns = 0
+        self._timers = []
+        self._seq = 0
+
+    def __call__(self):
+        return self.now_ns
+
+    def time(self):
+        # SECONDS, LIKE AN EVENT LOOP'S time()
+        return self.now_ns / NS_PER_SEC
+
+    def call_at_ns(self, when_ns, callback, *args):
+        timer = Timer(callback, args)
+        self._seq += 1
+        heapq.heappush(self._timers, (max(when_ns, self.now_ns), self._seq, timer))
+        return timer
+
+    def run(self):
+        # RUN TIMERS UNTIL THERE ARE NONE LEFT
+        real_start = time.monotonic_ns()
+        while self._timers:
+            when_ns, _, timer = heapq.heappop(self._timers)
+            if timer.cancelled:
+                continue
+            if self.speed:
+                wait = real_start + (when_ns / self.speed) - time.monotonic_ns()
+                if wait > 0:
+                    time.sleep(wait / NS_PER_SEC)
+            self.now_ns = when_ns
+            timer.callback(*timer.args)
+
+
+class SimTasker(aioengine.AsyncTasker):
+    """
+    SimTasker - An AsyncTasker on a VirtualClock in debug mode
+     - Deadlines are timers on the virtual clock, so a run takes no real time
+     - Preloads and cues are handed to on_preload and on_fire, nothing is started
+    """
+    def __init__(self, plan, clock, on_preload=None, **kwargs):
+        self.on_preload = on_preload
+        aioengine.AsyncTasker.__init__(self, plan, clock, clock=clock, **kwargs)
+
+    def _create_supervisor(self, **kwargs):
+        # NEVER GIVEN A CHILD IN DEBUG MODE, IT'S ONLY HERE TO BE ASKED
+        return supervisor.Supervisor(**kwargs)
+
+    def _call_at_ns(self, deadline, callback):
+        self._handle = self.loop.call_at_ns(deadline, callback)
+
+    def _preload(self, task):
+        aioengine.AsyncTasker._preload(self, task)
+        if self.on_preload:
+            self.on_preload(task)
+
+
+class Rehearsal:
+    """
+    Rehearsal - Every room's master and clients on one virtual clock
+     - add() gives a master or client config its own SimTasker, WHO is
+       MASTER or the client ID
+     - start() starts them all START LEAD MS from now, control() does to
+       them what the web control would
+     - Every dispatch and control is passed to each of the outputs as a dict
+    """
+    def __init__(self, clock, outputs):
+        self.clock = clock
+        self.outputs = outputs
+        # (ROOM, WHO) -> TASKER, ROOM -> MASTER CONFIG
+        self.taskers = {}
+        self.rooms = {}
+        # (ROOM, WHO) -> WHEN IT LAST DISPATCHED ANYTHING, IN SECONDS AFTER THE START
+        self.last = {}
+        self.start_ns = None
+
+    def add(self, room, who, config):
+        options = dict(tasker.options_from_config(config, True), precision=False)
+        self.taskers[(room, who)] = SimTasker(
+            taskplan.from_config(config), self.clock,
+            on_preload=functools.partial(self.record, room, who, taskplan.PRELOAD),
+            on_fire=functools.partial(self.fired, room, who), **options)
+        if who == MASTER:
+            self.rooms[room] = config
+
+    def start(self):
+        # THE MASTER PICKS THE START INSTANT AND EVERY SYNCED CLIENT STARTS THERE
+        lead_ns = max(int(config.get("START LEAD MS", 250) * NS_PER_MS) for config in self.rooms.values())
+        self.start_ns = self.clock() + lead_ns
+        for tasky in self.taskers.values():
+            tasky.start_at(self.start_ns)
+
+    def control(self, action, offset_ns=None):
+        # THE MASTER APPLIES IT AT THE CLICK AND TELLS ITS CLIENTS WHERE IT ENDED UP
+        clicked_ns = self.clock()
+        for room in self.rooms:
+            master = self.taskers[(room, MASTER)]
+            done = self._apply(master, action, clicked_ns, offset_ns)
+            position_ns = master.position_ns(clicked_ns) or 0
+            self.emit({"AT": self._at(clicked_ns), "ROOM": room, "WHO": MASTER, "EVENT": "CONTROL",
+                       "ACTION": protocol.CONTROL_NAMES[action], "POSITION": position_ns / NS_PER_SEC,
+                       "REFUSED": not done})
+            if not done:
+                continue
+            for (in_room, who), tasky in self.taskers.items():
+                if in_room == room and who != MASTER:
+                    self._apply(tasky, action, clicked_ns, position_ns)
+
+    def _apply(self, tasky, action, at_ns, offset_ns):
+        if action == protocol.CONTROL_PAUSE:
+            return tasky.pause(at_ns, offset_ns)
+        if action == protocol.CONTROL_RESUME:
+            return tasky.resume(at_ns, offset_ns)
+        if action == protocol.CONTROL_SEEK:
+            return tasky.seek(offset_ns, at_ns)
+        tasky.abort()
+        return True
+
+    def _at(self, now_ns):
+        return (now_ns - self.start_ns) / NS_PER_SEC
+
+    def fired(self, room, who, idx, task, late_ns):
+        self.record(room, who, taskplan.CUE, task)
+
+    def record(self, room, who, phase, task):
+        self.last[(room, who)] = self._at(self.clock())
+        self.emit({"AT": self._at(self.clock()), "ROOM": room, "WHO": who, "EVENT": PHASES[phase],
+                   "INDEX": task.index, "OFFSET": task.offset_ns / NS_PER_SEC,
+                   "TYPE": task.type, "COMMAND": task.command})
+
+    def emit(self, row):
+        for output in self.outputs:
+            output(row)
+
+    def summary(self):
+        # HOW FAR EVERY TASKER GOT, WHAT FIRED COMES FROM ITS LATENESS RECORD
+        rows = []
+        for (room, who), tasky in self.taskers.items():
+            if tasky.start_ns is None:
+                state = "NEVER STARTED"
+            elif tasky.paused_ns is not None:
+                state = "PAUSED AT {0:.3f} S".format(tasky.position_ns() / NS_PER_SEC)
+            elif tasky.dead:
+                state = "DONE"
+            else:
+                state = "UNFINISHED"
+            rows.append({"ROOM": room, "WHO": who, "STATE": state, "LAST": self.last.get((room, who)),
+                         "FIRED": len({idx for idx, _ in tasky.lateness}), "TASKS": len(tasky.plan)})
+        return rows
+
+
+class WarningCounter(logging.Handler):
+    """
+    WarningCounter - Counts what was logged at warning or above, for --strict
+     - A tasker aborted by a --control stop was asked to be, that's not counted
+    """
+    EXPECTED = frozenset(["TASKER ABORTED"])
+
+    def __init__(self):
+        logging.Handler.__init__(self, logging.WARNING)
+        self.count = 0
+        self.expected = 0
+
+    def emit(self, record):
+        if record.getMessage() in self.EXPECTED:
+            self.expected += 1
+        else:
+            self.count += 1
+
+
+# FUNCTIONS
+def parse_control(text):
+    # SECONDS:ACTION[:OFFSET SECONDS] -> (NS AFTER THE START, ACTION, OFFSET NS OR NONE)
+    parts = text.split(":")
+    try:
+        at_ns = int(float(parts[0]) * NS_PER_SEC)
+        action = CONTROLS[parts[1].lower()]
+        offset_ns = int(float(parts[2]) * NS_PER_SEC) if len(parts) > 2 else None
+    except (ValueError, IndexError, KeyError):
+        raise argparse.ArgumentTypeError("EXPECTED SECONDS:ACTION[:OFFSET], ACTION ONE OF {0}".format(
+            ", ".join(CONTROLS)))
+    if (action == protocol.CONTROL_SEEK) != (offset_ns is not None):
+        raise argparse.ArgumentTypeError("ONLY A SEEK TAKES AN OFFSET AND IT NEEDS ONE")
+    return at_ns, action, offset_ns
+
+
+def load_show(path):
+    # ROOM NAME -> MASTER CONFIG, A SINGLE MASTER IS ROOM "-"
+    with open(path) as config_file:
+        config = json.load(config_file)
+    if "ROOMS" in config:
+        return venue.load_rooms(config, os.path.dirname(path))
+    return {"-": config}
+
+
+def place_clients(rooms, client_configs):
+    # (ROOM, CLIENT CONFIG) FOR EVERY CLIENT CONFIG, MATCHED TO ITS MASTER'S CLIENT LIST
+    # BY ID AND PORT. CLIENTS OF A RELAY ARE LOOKED FOR IN THE RELAY'S "RELAY CLIENTS"
+    slots = {}
+    for room, config in rooms.items():
+        for client in config["CLIENTS"]:
+            slots.setdefault((client["ID"], client["PORT"]), []).append(room)
+    placed = []
+    waiting = list(client_configs)
+    while waiting:
+        unplaced = []
+        for path, config in waiting:
+            found = slots.get((config["ID"], config["PORT"]), [])
+            if len(found) > 1:
+                raise ValueError("CLIENT CONFIG {0} COULD BE IN ROOMS {1}".format(path, ", ".join(found)))
+            if not found:
+                unplaced.append((path, config))
+                continue
+            if (found[0], config["ID"]) in {(room, placed_config["ID"]) for room, placed_config in placed}:
+                raise ValueError("CLIENT CONFIG {0} IS A SECOND CONFIG FOR CLIENT ID {1}".format(path, config["ID"]))
+            placed.append((found[0], config))
+            for sub in config.get("RELAY CLIENTS", []):
+                slots.setdefault((sub["ID"], sub["PORT"]), []).append(found[0])
+        if len(unplaced) == len(waiting):
+            for path, _ in unplaced:
+                logger.warning("CLIENT CONFIG {0} MATCHES NO CLIENT, IT ISN'T REHEARSED".format(path))
+            break
+        waiting = unplaced
+    return placed
+
+
+def print_row(row):
+    where = "" if row["ROOM"] == "-" else "{0} ".format(row["ROOM"])
+    who = MASTER if row["WHO"] == MASTER else "CLIENT {0}".format(row["WHO"])
+    if row["EVENT"] == "CONTROL":
+        print("{0:12.3f} S  {1}{2}  {3} AT {4:.3f} S{5}".format(
+            row["AT"], where, who, row["ACTION"], row["POSITION"], " REFUSED" if row["REFUSED"] else ""))
+    else:
+        print("{0:12.3f} S  {1}{2}  {3} TASK {4} ({5}) {6}".format(
+            row["AT"], where, who, row["EVENT"], row["INDEX"], row["TYPE"], row["COMMAND"]))
+
+
+def main():
+    """
+    main - Rehearse a show on a virtual clock and print what would have run when
+    """
+    parser = argparse.ArgumentParser(description='Escape Room Show Rehearsal')
+    parser.add_argument('--config', metavar='file', default='config.json',
+                        help='Master or venue JSON Configuration File (defaults to config.json)')
+    parser.add_argument('--clients', metavar='file', nargs='*', default=[],
+                        help='Client JSON Configuration Files, matched to the master\'s clients by ID and PORT')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='Run at this many times real time, 0 jumps from cue to cue (defaults to 0)')
+    parser.add_argument('--control', metavar='SECONDS:ACTION[:OFFSET]', type=parse_control, action='append',
+                        default=[], help='Pause, resume, seek (to OFFSET seconds) or stop everything SECONDS after the start')
+    parser.add_argument('--timeline', metavar='file', help='Also write every dispatch here as JSON lines')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Only print the summary')
+    parser.add_argument('--strict', action='store_true', help='Exit with 1 if anything logged a warning')
+    parser.add_argument('--verbose', '-v', action='count', default=0,
+                        help='Set the logging level, nothing is Warnings and Critical, -v is Info, -vv is Debug')
+    args = parser.parse_args()
+
+    logger.setLevel([logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)])
+    warnings = WarningCounter()
+    logger.addHandler(warnings)
+
+    clock = VirtualClock(args.speed)
+    outputs = [] if args.quiet else [print_row]
+    timeline = open(args.timeline, "w") if args.timeline else None
+    if timeline:
+        outputs.append(lambda row: timeline.write(json.dumps(row) + "\n"))
+    show = Rehearsal(clock, outputs)
+    try:
+        rooms = load_show(args.config)
+        client_configs = []
+        for path in args.clients:
+            with open(path) as config_file:
+                client_configs.append((path, json.load(config_file)))
+        placed = place_clients(rooms, client_configs)
+        for room, config in rooms.items():
+            show.add(room, MASTER, config)
+        for room, config in placed:
+            show.add(room, config["ID"], config)
+    except (OSError, ValueError, KeyError) as err:
+        # PlanError IS A ValueError
+        logger.error("CAN'T REHEARSE: {0}".format(err))
+        sys.exit(1)
+    for room, config in rooms.items():
+        rehearsed = {who for in_room, who in show.taskers if in_room == room}
+        for client in config["CLIENTS"]:
+            if client["ID"] not in rehearsed:
+                logger.warning("{0}CLIENT ID {1} HAS NO CONFIG, ITS CUES AREN'T REHEARSED".format(
+                    "" if room == "-" else "ROOM {0} ".format(room), client["ID"]))
+
+    began = time.monotonic()
+    show.start()
+    for at_ns, action, offset_ns in args.control:
+        clock.call_at_ns(show.start_ns + at_ns, show.control, action, offset_ns)
+    try:
+        clock.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if timeline:
+            timeline.close()
+
+    print("REHEARSED {0:.3f} S OF SHOW IN {1:.3f} S, {2} WARNINGS{3}".format(
+        (clock() - show.start_ns) / NS_PER_SEC, time.monotonic() - began, warnings.count,
+        " (AND {0} EXPECTED FROM STOPPING)".format(warnings.expected) if warnings.expected else ""))
+    for row in show.summary():
+        print("{0}{1}: {2}, FIRED {3} OF {4} TASKS{5}".format(
+            "" if row["ROOM"] == "-" else "{0} ".format(row["ROOM"]),
+            MASTER if row["WHO"] == MASTER else "CLIENT {0}".format(row["WHO"]), row["STATE"],
+            row["FIRED"], row["TASKS"], "" if row["LAST"] is None else ", LAST AT {0:.3f} S".format(row["LAST"])))
+    if args.strict and warnings.count:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,605 @@
+# THIS USES PYTHON 3
+
+# SUPERVISOR
+# CODE TO LOOK AFTER THE CHILD PROCESSES A TASKER STARTS
+#
+# EVERY TASK COMMAND IS STARTED WITH ITS STDOUT AND STDERR ON PIPES. ONE
+# REAPER THREAD PER SUPERVISOR WAITS ON ALL OF THEM AT ONCE (PIDFDS WHERE
+# THE KERNEL HAS THEM, POLLING OTHERWISE), KEEPS THE LAST FEW KB OF OUTPUT,
+# REAPS CHILDREN AS SOON AS THEY EXIT AND ENFORCES TASK TIMEOUTS
+# CHILDREN ARE ASKED TO STOP WITH SIGTERM AND GET SIGKILL IF THEY IGNORE IT
+# EVERY COMMAND LEADS ITS OWN PROCESS GROUP AND SIGNALS GO TO THE WHOLE GROUP,
+# SO A SHELL SCRIPT DOESN'T LEAVE WHAT IT STARTED BEHIND
+#
+# COMMANDS ARE STARTED WITH posix_spawn SO THE KERNEL NEVER HAS TO COPY THIS
+# (LARGE) PYTHON PROCESS. A PRELOADED COMMAND IS STARTED AHEAD OF ITS CUE AND
+# HELD ON A PIPE, EITHER BY A SHELL THAT WON'T EXEC IT UNTIL THE GATE PIPE
+# IS WRITTEN, OR (WITH A RELEASE STRING) BY THE COMMAND ITSELF WAITING ON
+# ITS STDIN, E.G. A MEDIA PLAYER STARTED PAUSED THAT PLAYS ON A COMMAND
+#
+# PAUSING A RUN FREEZES ITS CHILDREN WITH SIGSTOP AND THAWS THEM WITH
+# SIGCONT, THEIR TIMEOUTS DON'T COUNT THE TIME THEY SPENT FROZEN
+
+# MODULE IMPORT
+import threading
+import selectors
+import time
+import os
+import signal
+import logging
+# LOCAL MODULES
+import metrics
+import logpipe
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_MS = 1000000
+NS_PER_SEC = 1000000000
+# LAST BYTES OF STDOUT/STDERR KEPT PER CHILD
+DEFAULT_CAPTURE_BYTES = 16384
+# HOW LONG A CHILD GETS BETWEEN SIGTERM AND SIGKILL
+DEFAULT_KILL_GRACE_NS = 2 * NS_PER_SEC
+# BYTES READ FROM A PIPE AT A TIME
+READ_CHUNK = 65536
+# SECONDS BETWEEN CHECKS FOR CHILDREN WHEN THERE ARE NO PIDFDS
+POLL_INTERVAL = 0.1
+# THE GATE SHELL READS ONE LINE FROM THIS FD BEFORE IT EXECS THE COMMAND
+GATE_FD = 3
+GATE_SHELL = "/bin/sh"
+
+# CHILD STATES
+RUNNING = "RUNNING"
+EXITED = "EXITED"
+STOPPED = "STOPPED"
+TIMED_OUT = "TIMED OUT"
+FAILED = "FAILED"
+
+# METRICS
+SPAWN_TIME = metrics.histogram("escape_room_spawn_seconds",
+                               "Time taken to start a task command")
+CHILDREN_ENDED = metrics.counter("escape_room_task_commands_total",
+                                 "Task commands that have ended by how they ended", labels=("state",))
+
+# CLASSES
+class OutputTail:
+    """
+    OutputTail - The last limit bytes written to a stream, older bytes are dropped
+    """
+    __slots__ = ("data", "limit", "dropped")
+
+    def __init__(self, limit):
+        self.data = bytearray()
+        self.limit = limit
+        self.dropped = 0
+
+    def feed(self, chunk):
+        self.data += chunk
+        excess = len(self.data) - self.limit
+        if excess > 0:
+            del self.data[:excess]
+            self.dropped += excess
+
+    def text(self):
+        return self.data.decode(errors="replace")
+
+    def last_line(self):
+        lines = self.text().strip().splitlines()
+        return lines[-1] if lines else ""
+
+
+class SpawnedProcess:
+    """
+    SpawnedProcess - The parts of Popen the supervisor needs for a child
+    started with posix_spawn
+    """
+    def __init__(self, pid, stdout, stderr):
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                pid, status = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                # SOMEBODY ELSE REAPED IT, ALL WE KNOW IS THAT IT'S GONE
+                self.returncode = -1
+                return self.returncode
+            if pid:
+                self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.poll() is None:
+            os.kill(self.pid, sig)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class Child:
+    """
+    Child - One task command and what happened to it
+    """
+    __slots__ = ("idx", "args", "proc", "pid", "requested_ns", "started_ns", "ended_ns",
+                 "exit_code", "timeout_ns", "kill_on_stop", "kill_at_ns", "state",
+                 "stdout", "stderr", "gate", "release_text", "preloaded", "released_ns",
+                 "paused_ns", "held_ns")
+
+    def __init__(self, task, capture_bytes):
+        self.idx = task.index
+        self.args = task.args
+        self.proc = None
+        self.pid = None
+        self.requested_ns = None
+        self.started_ns = None
+        self.ended_ns = None
+        self.exit_code = None
+        # OPTIONAL PER TASK SETTINGS
+        self.timeout_ns = task.timeout_ns
+        self.kill_on_stop = task.kill_on_stop
+        # WHEN TO ESCALATE TO SIGKILL, SET ONCE WE'VE SENT SIGTERM
+        self.kill_at_ns = None
+        self.state = RUNNING
+        self.stdout = OutputTail(capture_bytes)
+        self.stderr = OutputTail(capture_bytes)
+        # PRELOAD - WRITE END OF THE PIPE HOLDING THE CHILD AND WHAT TO WRITE TO RELEASE IT
+        self.gate = None
+        self.release_text = task.release
+        self.preloaded = False
+        self.released_ns = None
+        # PAUSE - WHEN WE SENT SIGSTOP AND HOW LONG IT'S BEEN FROZEN BEFORE
+        self.paused_ns = None
+        self.held_ns = 0
+
+    def open_gate(self):
+        # PIPE TO HOLD A PRELOADED CHILD ON, RETURNS THE END THE CHILD GETS
+        read_fd, self.gate = os.pipe()
+        self.preloaded = True
+        return read_fd
+
+    def gated_stdin(self):
+        # WITH A RELEASE STRING THE COMMAND READS IT FROM STDIN, OTHERWISE THE GATE SHELL HOLDS IT
+        return self.release_text is not None
+
+    def release(self):
+        if self.gate is None:
+            return
+        self.released_ns = time.monotonic_ns()
+        try:
+            os.write(self.gate, self.release_text if self.gated_stdin() else b"\n")
+        except BrokenPipeError:
+            pass
+        self.close_gate()
+
+    def close_gate(self):
+        if self.gate is not None:
+            os.close(self.gate)
+            self.gate = None
+
+    def started(self, proc, requested_ns, started_ns):
+        self.proc = proc
+        self.pid = proc.pid
+        self.requested_ns = requested_ns
+        self.started_ns = started_ns
+        SPAWN_TIME.observe_ns(started_ns - requested_ns)
+
+    def spawn_latency_ns(self):
+        if self.started_ns is None:
+            return None
+        return self.started_ns - self.requested_ns
+
+    def timeout_at_ns(self):
+        # A PRELOADED CHILD'S TIMEOUT RUNS FROM ITS CUE, NOT FROM WHEN IT WAS STARTED
+        # THE CLOCK STOPS WHILE THE CHILD IS PAUSED
+        if self.timeout_ns is None or self.started_ns is None or self.paused_ns is not None:
+            return None
+        if self.preloaded:
+            if self.released_ns is None:
+                return None
+            return self.released_ns + self.held_ns + self.timeout_ns
+        return self.started_ns + self.held_ns + self.timeout_ns
+
+    def deadline_ns(self):
+        # NEXT TIME WE HAVE TO DO SOMETHING TO THIS CHILD, OR NONE
+        if self.kill_at_ns is not None:
+            return self.kill_at_ns
+        return self.timeout_at_ns()
+
+    def as_dict(self):
+        latency = self.spawn_latency_ns()
+        runtime = None
+        if self.started_ns is not None:
+            runtime = ((self.ended_ns or time.monotonic_ns()) - self.started_ns) / NS_PER_SEC
+        return {"INDEX": self.idx,
+                "PID": self.pid,
+                "STATE": self.state,
+                "EXIT CODE": self.exit_code,
+                "SPAWN MS": latency / NS_PER_MS if latency is not None else None,
+                "RUN SECONDS": runtime,
+                "PRELOADED": self.preloaded,
+                "PAUSED": self.paused_ns is not None,
+                "STDERR": self.stderr.last_line()}
+
+
+class SupervisorBase:
+    """
+    SupervisorBase - Bookkeeping shared by the threaded and asyncio supervisors
+     - spawn() starts a task command, stop_all() asks the running ones to stop
+     - preload() starts one ahead of its cue held on a gate, release() lets it go
+     - pause_all() freezes the running ones, resume_all() thaws them
+     - when_quiet() says when the last running child is gone, e.g. after
+       stop_all(force=True)
+     - Every child ever spawned is kept for the report
+    """
+    def __init__(self, capture_bytes=DEFAULT_CAPTURE_BYTES, kill_grace_ns=DEFAULT_KILL_GRACE_NS):
+        self.capture_bytes = capture_bytes
+        self.kill_grace_ns = kill_grace_ns
+        self.children = []
+        # PRELOADED CHILDREN WAITING FOR THEIR CUE BY TASK INDEX
+        self._preloaded = {}
+        # CALLED AS callback(MONOTONIC NS) ONCE NOTHING IS RUNNING, SEE when_quiet()
+        self._quiet_waiters = []
+        self._lock = threading.Lock()
+
+    def running(self):
+        with self._lock:
+            return [child for child in self.children if child.state == RUNNING]
+
+    def get_report(self):
+        with self._lock:
+            return [child.as_dict() for child in self.children]
+
+    def preload(self, task):
+        # START A TASK COMMAND NOW BUT HOLD IT UNTIL release()
+        child = self._start(task, preload=True)
+        if child.state == RUNNING:
+            with self._lock:
+                self._preloaded[task.index] = child
+        return child
+
+    def release(self, task):
+        # LET A PRELOADED COMMAND GO, OR START IT NOW IF IT WASN'T PRELOADED
+        with self._lock:
+            child = self._preloaded.pop(task.index, None)
+        if child is None:
+            return self.spawn(task)
+        if child.state != RUNNING or child.gate is None:
+            logger.warning("PRELOADED TASK {0} ENDED BEFORE ITS CUE, STARTING IT AGAIN".format(task.index))
+            return self.spawn(task)
+        child.release()
+        self._released(child)
+        return child
+
+    def spawn(self, task):
+        return self._start(task, preload=False)
+
+    def stop_preloaded(self, reason):
+        # STOP CHILDREN HELD FOR CUES THAT AREN'T COMING ANY MORE (A SEEK)
+        with self._lock:
+            held, self._preloaded = list(self._preloaded.values()), {}
+        self._stop_children(held, reason)
+
+    def pause_all(self):
+        # SIGSTOP EVERY RUNNING CHILD, ONES ALREADY BEING STOPPED ARE LEFT TO DIE
+        now = time.monotonic_ns()
+        with self._lock:
+            for child in self.children:
+                if (child.state == RUNNING and child.proc is not None and
+                        child.paused_ns is None and child.kill_at_ns is None):
+                    child.paused_ns = now
+                    self._signal(child, signal.SIGSTOP)
+
+    def resume_all(self):
+        # SIGCONT EVERYTHING pause_all() FROZE, THEIR TIMEOUTS PICK UP WHERE THEY LEFT OFF
+        now = time.monotonic_ns()
+        with self._lock:
+            paused = [child for child in self.children if child.paused_ns is not None]
+            for child in paused:
+                self._thaw(child, now)
+        self._resumed(paused)
+
+    def _thaw(self, child, now):
+        child.held_ns += now - child.paused_ns
+        child.paused_ns = None
+        self._signal(child, signal.SIGCONT)
+
+    def _signal(self, child, sig):
+        # THE CHILD LEADS ITS OWN PROCESS GROUP, SIGNAL ALL OF IT
+        try:
+            os.killpg(child.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def when_quiet(self, callback):
+        # CALL callback(MONOTONIC NS) AS SOON AS NO CHILD IS RUNNING, MAYBE RIGHT NOW
+        with self._lock:
+            self._quiet_waiters.append(callback)
+        self._check_quiet()
+
+    def _check_quiet(self):
+        # CALLED AFTER A CHILD IS REAPED OR FAILS, WITHOUT THE LOCK
+        with self._lock:
+            if not self._quiet_waiters or any(child.ended_ns is None for child in self.children):
+                return
+            waiters, self._quiet_waiters = self._quiet_waiters, []
+        now = time.monotonic_ns()
+        for callback in waiters:
+            callback(now)
+
+    def _stoppable(self, child):
+        # PRELOADED CHILDREN THAT NEVER GOT THEIR CUE ARE ALWAYS STOPPED
+        return child.state == RUNNING and (child.kill_on_stop or child.gate is not None)
+
+    def _failed(self, child, err):
+        child.close_gate()
+        child.state = FAILED
+        child.ended_ns = time.monotonic_ns()
+        CHILDREN_ENDED.labels(FAILED).inc()
+        logger.error("TASK {0} COULD NOT RUN {1}: {2}".format(child.idx, child.args, err))
+
+    def _terminate(self, child, state, now):
+        # SIGTERM NOW, SIGKILL AFTER THE GRACE PERIOD IF IT'S STILL AROUND
+        if child.kill_at_ns is not None or child.exit_code is not None:
+            return
+        child.state = state
+        child.kill_at_ns = now + self.kill_grace_ns
+        self._signal(child, signal.SIGTERM)
+        # A FROZEN CHILD WON'T SEE THE SIGTERM UNTIL IT'S THAWED
+        if child.paused_ns is not None:
+            self._thaw(child, now)
+
+    def _escalate(self, child):
+        logger.warning("TASK {0} (PID {1}) IGNORED SIGTERM, KILLING IT".format(child.idx, child.pid))
+        child.kill_at_ns = None
+        child.timeout_ns = None
+        self._signal(child, signal.SIGKILL)
+
+    def _exited(self, child, code):
+        # CHILD IS REAPED, RECORD AND REPORT IT
+        child.close_gate()
+        child.exit_code = code
+        child.ended_ns = time.monotonic_ns()
+        if child.state == RUNNING:
+            child.state = EXITED
+        CHILDREN_ENDED.labels(child.state).inc()
+        message = "TASK {0} (PID {1}) {2} WITH {3} AFTER {4:.3f} S (SPAWN {5:.3f} MS)"
+        details = (child.idx, child.pid, child.state, code, (child.ended_ns - child.started_ns) / NS_PER_SEC,
+                   child.spawn_latency_ns() / NS_PER_MS)
+        if code != 0 and child.state == EXITED:
+            logger.warning(logpipe.Lazy(message + ": {6}", *details, child.stderr.last_line()))
+        else:
+            logger.info(logpipe.Lazy(message, *details))
+
+    def _start(self, task, preload):
+        raise NotImplementedError
+
+    def _released(self, child):
+        pass
+
+    def _resumed(self, children):
+        pass
+
+    def stop_all(self, reason, force=False):
+        # ASK EVERY RUNNING CHILD THAT DOESN'T OPT OUT TO STOP, force STOPS THE ONES THAT DO TOO
+        # RETURNS HOW MANY WERE ASKED
+        with self._lock:
+            stopping = [child for child in self.children
+                        if self._stoppable(child) or (force and child.state == RUNNING)]
+            self._preloaded.clear()
+        self._stop_children(stopping, reason)
+        return len(stopping)
+
+    def _stop_children(self, children, reason):
+        raise NotImplementedError
+
+
+class Supervisor(SupervisorBase):
+    """
+    Supervisor - Starts task commands and reaps them from one background thread
+     - The thread only exists while there are children to watch
+    """
+    def __init__(self, **kwargs):
+        SupervisorBase.__init__(self, **kwargs)
+        # CHILDREN THE REAPER HASN'T PICKED UP YET
+        self._new = []
+        self._thread = None
+        # SELF PIPE TO WAKE THE REAPER UP
+        self._wake_r = None
+        self._wake_w = None
+
+    def _start(self, task, preload):
+        child = Child(task, self.capture_bytes)
+        requested = time.monotonic_ns()
+        try:
+            gate = child.open_gate() if preload else None
+            proc = posix_spawn(task.args, gate, child.gated_stdin())
+        except OSError as err:
+            with self._lock:
+                self.children.append(child)
+            self._failed(child, err)
+            self._check_quiet()
+            return child
+        child.started(proc, requested, time.monotonic_ns())
+        with self._lock:
+            self.children.append(child)
+            self._new.append(child)
+            if self._thread is None:
+                self._wake_r, self._wake_w = os.pipe()
+                os.set_blocking(self._wake_r, False)
+                self._thread = threading.Thread(target=self._reap_loop, daemon=True)
+                self._thread.start()
+            else:
+                self._wake()
+        return child
+
+    def _released(self, child):
+        # ITS TIMEOUT STARTS NOW
+        if child.timeout_ns is not None:
+            with self._lock:
+                if self._thread is not None:
+                    self._wake()
+
+    def _resumed(self, children):
+        # THE REAPER HAS TIMEOUTS TO WATCH AGAIN
+        with self._lock:
+            if children and self._thread is not None:
+                self._wake()
+
+    def _stop_children(self, children, reason):
+        now = time.monotonic_ns()
+        with self._lock:
+            for child in children:
+                if child.state != RUNNING:
+                    continue
+                logger.info("STOPPING TASK {0} (PID {1}) ON {2}".format(child.idx, child.pid, reason))
+                self._terminate(child, STOPPED, now)
+            if children and self._thread is not None:
+                self._wake()
+
+    def _wake(self):
+        # CALLED WITH THE LOCK HELD
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _read(self, stream, tail):
+        # READ WHATEVER IS WAITING, RETURNS FALSE AT END OF FILE
+        while True:
+            try:
+                chunk = os.read(stream.fileno(), READ_CHUNK)
+            except BlockingIOError:
+                return True
+            if not chunk:
+                return False
+            tail.feed(chunk)
+
+    def _reap_loop(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._wake_r, selectors.EVENT_READ, None)
+        # CHILDREN WE'RE WATCHING AND THE PIDFD FOR EACH (NONE IF WE HAVE TO POLL)
+        live = {}
+        while True:
+            with self._lock:
+                new, self._new = self._new, []
+                if not new and not live:
+                    # NOTHING LEFT, THE NEXT spawn() STARTS A NEW THREAD
+                    self._thread = None
+                    os.close(self._wake_r)
+                    os.close(self._wake_w)
+                    selector.close()
+                    return
+            for child in new:
+                live[child] = self._watch(selector, child)
+            # SLEEP UNTIL SOMETHING HAPPENS OR A TIMEOUT IS DUE
+            now = time.monotonic_ns()
+            deadlines = [d for d in (child.deadline_ns() for child in live) if d is not None]
+            timeout = max(0, (min(deadlines) - now) / NS_PER_SEC) if deadlines else None
+            if None in live.values():
+                timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+            for key, _ in selector.select(timeout):
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, READ_CHUNK)
+                    except BlockingIOError:
+                        pass
+                    continue
+                child, tail = key.data
+                if tail is not None and not self._read(key.fileobj, tail):
+                    selector.unregister(key.fileobj)
+            # REAP WHOEVER EXITED, ESCALATE OR TIME OUT THE REST
+            now = time.monotonic_ns()
+            for child in list(live):
+                code = child.proc.poll()
+                if code is not None:
+                    self._unwatch(selector, child, live.pop(child))
+                    with self._lock:
+                        self._exited(child, code)
+                    self._check_quiet()
+                    continue
+                with self._lock:
+                    if child.kill_at_ns is not None and now >= child.kill_at_ns:
+                        self._escalate(child)
+                    elif (child.kill_at_ns is None and child.timeout_at_ns() is not None and
+                          now >= child.timeout_at_ns()):
+                        logger.warning("TASK {0} (PID {1}) TIMED OUT AFTER {2:.3f} S".format(
+                            child.idx, child.pid, child.timeout_ns / NS_PER_SEC))
+                        self._terminate(child, TIMED_OUT, now)
+
+    def _watch(self, selector, child):
+        selector.register(child.proc.stdout, selectors.EVENT_READ, (child, child.stdout))
+        selector.register(child.proc.stderr, selectors.EVENT_READ, (child, child.stderr))
+        # A PIDFD BECOMES READABLE WHEN THE CHILD EXITS, NO POLLING NEEDED
+        try:
+            pidfd = os.pidfd_open(child.pid)
+        except (AttributeError, OSError):
+            return None
+        selector.register(pidfd, selectors.EVENT_READ, (child, None))
+        return pidfd
+
+    def _unwatch(self, selector, child, pidfd):
+        # PICK UP ANY OUTPUT LEFT IN THE PIPES AND CLOSE EVERYTHING
+        for stream, tail in ((child.proc.stdout, child.stdout), (child.proc.stderr, child.stderr)):
+            self._read(stream, tail)
+            try:
+                selector.unregister(stream)
+            except KeyError:
+                pass
+            stream.close()
+        if pidfd is not None:
+            selector.unregister(pidfd)
+            os.close(pidfd)
+
+
+# FUNCTIONS
+def gate_args(args, fd=GATE_FD):
+    # WRAP A COMMAND IN A SHELL THAT WAITS FOR A LINE ON fd BEFORE IT EXECS IT
+    # IF THE PIPE IS CLOSED WITHOUT A LINE (WE DIED) THE COMMAND NEVER RUNS
+    # A PLAIN SH ONLY TAKES SINGLE DIGIT FDS IN REDIRECTIONS, A HIGHER ONE IS READ
+    # THROUGH /dev/fd AND LEFT OPEN IN THE COMMAND, IT HAS NO WRITER BY THEN ANYWAY
+    if fd < 10:
+        script = 'read _ <&{0} || exit 125; exec {0}<&-; exec "$@"'.format(fd)
+    else:
+        script = 'read _ </dev/fd/{0} || exit 125; exec "$@"'.format(fd)
+    return [GATE_SHELL, "-c", script, "gate"] + list(args)
+
+
+def posix_spawn(args, gate=None, gate_stdin=False):
+    # START args WITHOUT FORKING US IN A PROCESS GROUP OF ITS OWN, STDOUT AND STDERR
+    # GO TO NON-BLOCKING PIPES
+    # gate IS A PIPE READ END TO HOLD THE CHILD ON, AS ITS STDIN OR FOR THE GATE SHELL
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    ours = [out_w, err_w]
+    actions = [(os.POSIX_SPAWN_DUP2, out_w, 1), (os.POSIX_SPAWN_DUP2, err_w, 2)]
+    if gate is not None:
+        ours.append(gate)
+        if gate_stdin:
+            actions.append((os.POSIX_SPAWN_DUP2, gate, 0))
+        else:
+            if gate == GATE_FD:
+                # DUP2 ONTO ITSELF WOULDN'T CLEAR CLOSE-ON-EXEC EVERYWHERE
+                gate = os.dup(gate)
+                ours.append(gate)
+            actions.append((os.POSIX_SPAWN_DUP2, gate, GATE_FD))
+            args = gate_args(args)
+    try:
+        pid = os.posix_spawnp(args[0], args, os.environ, file_actions=actions, setpgroup=0)
+    except OSError:
+        os.close(out_r)
+        os.close(err_r)
+        raise
+    finally:
+        for fd in ours:
+            os.close(fd)
+    os.set_blocking(out_r, False)
+    os.set_blocking(err_r, False)
+    return SpawnedProcess(pid, os.fdopen(out_r, "rb", 0), os.fdopen(err_r, "rb", 0))
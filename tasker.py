@@ -8,109 +8,444 @@
 import threading
 import datetime
 import time
-import subprocess
-import shlex
 import logging
+# LOCAL MODULES
+import supervisor
+import plugins
+import taskplan
+import metrics
+import logpipe
 
 # LOGGER HANDLER
 NAME = "ESCAPE ROOM"
 logger = logging.getLogger(NAME)
 
-# CLASS
-class Tasker(threading.Thread):
+# CONSTANTS
+NS_PER_MS = 1000000
+NS_PER_SEC = 1000000000
+# DEFAULTS FOR PRECISION MODE
+DEFAULT_SPIN_WINDOW_NS = 2 * NS_PER_MS
+DEFAULT_JITTER_BUDGET_NS = 1 * NS_PER_MS
+
+# METRICS
+CUE_LATENESS = metrics.histogram("escape_room_cue_lateness_seconds",
+                                 "How late cues were dispatched after their deadline")
+CUES_OVER_BUDGET = metrics.counter("escape_room_cues_over_budget_total",
+                                   "Cues dispatched later than the jitter budget")
+
+# CLASSES
+class TaskerBase:
     """
-    Tasker - Class to handle running tasks at specific times from when it's started
-    Inherits: threading
+    TaskerBase - Everything about running a task list that doesn't care how
+    we wait for the deadlines
+     - Walks a compiled plan's schedule, records lateness and dispatches tasks
+     - The plan is shared and never changed, a tasker is one run over it
+       (a cursor into the schedule and what has fired) so building a new
+       one for every reset costs next to nothing
+     - Tasker drives it from its own thread, the asyncio engine drives it
+       from event loop timers
+
+    Precision mode coarse sleeps until spin_window_ns before the deadline and
+    busy waits on time.monotonic_ns for the rest. Every dispatch records how
+    late it fired, in precision mode anything over jitter_budget_ns is also
+    counted and logged
+
+    Task commands are started and reaped by a supervisor, children still
+    running at a STOP task or when the tasker is killed are stopped unless
+    their task says "KILL ON STOP": false. abort() stops everything, those
+    included, and drops plugin runs still waiting for a worker
+
+    Any other task type is a plugin run inside this process, see plugins
+
+    A running timeline can be paused, resumed and moved to any offset. All
+    three only move start_ns (the deadline base), seek() also finds the next
+    schedule entry with a binary search, so none of them rescan the plan.
+    They take the instant to act at, so a master and its clients given the
+    same instant and offset stay on the same timeline
+
+    Time comes from clock(), time.monotonic_ns unless a simulation gives us a
+    virtual one. Tasker sleeps in real seconds so it needs a real clock, a
+    tasker driven by timers (AsyncTasker, simulate.SimTasker) can run on any
     """
-    def __init__(self, tasks, loop_sleep = 0.5, debug = False):
-        # SINCE WE'RE INHERITING THREAD, WE HAVE TO INIT THAT ALSO
-        threading.Thread.__init__(self)
-        # SET DAEMON
-        self.daemon = True
+    def __init__(self, plan, debug = False, precision = False,
+                 spin_window_ns = DEFAULT_SPIN_WINDOW_NS,
+                 jitter_budget_ns = DEFAULT_JITTER_BUDGET_NS,
+                 on_done = None, on_fire = None,
+                 capture_bytes = supervisor.DEFAULT_CAPTURE_BYTES,
+                 kill_grace_ns = supervisor.DEFAULT_KILL_GRACE_NS,
+                 plugin_workers = plugins.DEFAULT_WORKERS,
+                 pause_children = True, clock = time.monotonic_ns):
         # SET CLASS VARIABLES
-        self.tasks = tasks
+        self.plan = plan
+        # EVERY DEADLINE AND POSITION IS IN NANOSECONDS ON THIS CLOCK
+        self.clock = clock
+        # THIS RUN - POSITION OF THE NEXT SCHEDULE ENTRY, EVERYTHING BEFORE IT HAS FIRED
+        self._cursor = 0
         self.start_time = None
-        self.loop_sleep = loop_sleep
+        self.start_ns = None
+        # OPTIONAL SHARED START INSTANT (MONOTONIC NS) SET BY start_at()
+        self.start_at_ns = None
+        # WHEN WE WERE PAUSED (MONOTONIC NS), NONE WHILE THE TIMELINE IS MOVING
+        self.paused_ns = None
+        # SIGSTOP RUNNING COMMANDS WHILE PAUSED
+        self.pause_children = pause_children
         self.debug = debug
         self.dead = False
-        # CREATE DELTA TIME OBJECTS
-        self._create_delta_times()
-        # PRE-PROCESS COMMANDS FOR EASY USE LATER
-        self._process_commands()
+        # CALLED ONCE WHEN THE TIMELINE IS FINISHED OR KILLED
+        self.on_done = on_done
+        # CALLED AS on_fire(INDEX, TASK RECORD, NANOSECONDS LATE) EVERY DISPATCH
+        self.on_fire = on_fire
+        self._finished = False
+        # PRECISION MODE SETTINGS
+        self.precision = precision
+        self.spin_window_ns = spin_window_ns
+        self.jitter_budget_ns = jitter_budget_ns
+        # DISPATCH LATENESS RECORD - (TASK INDEX, NANOSECONDS LATE)
+        self.lateness = []
+        self.over_budget = 0
+        # CHILD PROCESSES FOR THE TASK COMMANDS
+        self.supervisor = self._create_supervisor(capture_bytes=capture_bytes,
+                                                  kill_grace_ns=kill_grace_ns)
+        # IN-PROCESS TASK TYPES
+        self.plugins = plugins.PluginRunner(plugin_workers)
 
         logger.info("TASKER CREATED")
 
+    def has_started(self):
+        # TRUE ONCE THE RUN HAS BEEN STARTED, A RUN CAN ONLY BE STARTED ONCE
+        return self.start_at_ns is not None or self.start_ns is not None
+
     def is_running(self):
         # THIS FUNCTION IS USED TO TELL THE PARENT THAT IT'S RUNNING
         # IT RETURNS THE OPPOSIDE OF self.dead AS IF WE'RE DEAD
         # WE WANT TO RETURN FALSE
         return not self.dead
 
-    def _create_delta_times(self):
-        # THIS FUNCTION ADDS A DELTA TIME OBJECT TO THE TASK LIST
-        # TO HAVE THAT REFERENCE PRE-BUILD BEFORE THE TASKS ARE
-        # STARTED
-        # THIS ALSO ADDS A RUN BOOLEAN
-        for task in self.tasks:
-            unit = task["TIME UNITS"].lower()
-            dtraw = task["DELTA TIME FROM START"]
-            td = None
-            if unit == "microseconds":
-                td = datetime.timedelta(microseconds = dtraw)
-            elif unit == "milliseconds":
-                td = datetime.timedelta(milliseconds = dtraw)
-            elif unit == "seconds":
-                td = datetime.timedelta(seconds = dtraw)
-            elif unit == "minutes":
-                td = datetime.timedelta(minutes = dtraw)
-            elif unit == "hours":
-                td = datetime.timedelta(hours = dtraw)
-            # TODO: THINK ABOUT DAYS AND WEEKS, THOSE MAY BE A TAD EXCESSIVE
-            # ADD td TO THE DICTIONARY
-            task["TD"] = td
-
-    def _process_commands(self):
-        # THIS FUNCTION PRE-BUILDS THE COMMANDS FROM THE COMMAND STRING
-        # FED IN BY THE TASK LIST
-        for task in self.tasks:
-            task["ARGS"] = shlex.split(task["COMMAND"])
-            # ADD NEW KEY TO LOCAL CONFIG FOR IF COMMAND WAS RUN OR NOT
-            task["RUN"] = False
+    def _peek(self):
+        # NEXT (OFFSET NS, INDEX, PHASE, TASK) DUE IN THIS RUN, NONE WHEN WE'RE THROUGH
+        return self.plan.entry(self._cursor)
+
+    def _pop(self):
+        entry = self.plan.entry(self._cursor)
+        self._cursor += 1
+        return entry
+
+    def _fired(self, task):
+        nxt = self._peek()
+        return task.runnable() and (nxt is None or (task.offset_ns, task.index, taskplan.CUE) < nxt[:3])
+
+    def _create_supervisor(self, **kwargs):
+        return supervisor.Supervisor(**kwargs)
 
     def kill(self):
-        # KILL THE STUFF, THIS MOSTLY WORKS MOST OF THE TIME
-        logging.info("TASKER KILLED")
+        # KILL THE STUFF
+        logger.info("TASKER KILLED")
         self.dead = True
+        self.supervisor.stop_all("KILL")
 
-    def run(self):
-        # CAPTURE START TIME
-        self.start_time = datetime.datetime.now()
+    def abort(self):
+        # STOP EVERYTHING NOW, NO MORE CUES AND EVERY COMMAND STOPPED WHATEVER ITS TASK SAYS
+        # A RUN THAT HASN'T BEEN STARTED HAS NOTHING TO STOP AND IS LEFT READY TO START
+        # RETURNS HOW MANY COMMANDS WERE STOPPED
+        if self.start_at_ns is None and self.start_ns is None:
+            return 0
+        logger.warning("TASKER ABORTED")
+        self.dead = True
+        self.plugins.shutdown(cancel=True)
+        return self.supervisor.stop_all("ABORT", force=True)
+
+    def when_quiet(self, callback):
+        # CALL callback(MONOTONIC NS) ONCE NONE OF OUR COMMANDS ARE RUNNING, MAYBE RIGHT NOW
+        self.supervisor.when_quiet(callback)
+
+    def get_lateness_stats(self):
+        # SUMMARY OF HOW LATE DISPATCHES FIRED, TIMES IN MILLISECONDS
+        lates = [late for _, late in self.lateness]
+        if not lates:
+            return {"COUNT": 0, "MEAN": 0.0, "MAX": 0.0, "OVER BUDGET": 0,
+                    "BUDGET": self.jitter_budget_ns / NS_PER_MS}
+        return {"COUNT": len(lates),
+                "MEAN": sum(lates) / len(lates) / NS_PER_MS,
+                "MAX": max(lates) / NS_PER_MS,
+                "OVER BUDGET": self.over_budget,
+                "BUDGET": self.jitter_budget_ns / NS_PER_MS}
+
+    def position_ns(self, now=None):
+        # WHERE WE ARE ON THE TIMELINE AT now, IT STANDS STILL WHILE WE'RE PAUSED
+        # NONE UNTIL WE'VE STARTED
+        if self.start_ns is None:
+            return None
+        if self.paused_ns is not None:
+            now = self.paused_ns
+        elif now is None:
+            now = self.clock()
+        return now - self.start_ns
 
+    def is_paused(self):
+        return self.paused_ns is not None
+
+    def pause(self, at_ns=None, offset_ns=None):
+        # HOLD THE TIMELINE FROM at_ns, AT offset_ns IF GIVEN SO EVERYONE HOLDS AT THE SAME POINT
+        # CUES BEFORE offset_ns THAT HAVEN'T FIRED YET GO AS SOON AS WE RESUME
+        # RETURNS FALSE IF WE AREN'T RUNNING OR ARE ALREADY PAUSED
+        if self.start_ns is None or self.dead or self.paused_ns is not None:
+            return False
+        self.paused_ns = at_ns if at_ns is not None else self.clock()
+        if offset_ns is not None:
+            self.start_ns = self.paused_ns - offset_ns
+        if self.pause_children and not self.debug:
+            self.supervisor.pause_all()
+        logger.info("TASKER PAUSED AT {0:.3f} S".format(self.position_ns() / NS_PER_SEC))
+        return True
+
+    def resume(self, at_ns=None, offset_ns=None):
+        # CARRY ON FROM WHERE WE PAUSED AS OF at_ns, EVERY DEADLINE MOVES BY THE SAME AMOUNT
+        # FROM offset_ns INSTEAD IF GIVEN, WHICH IS WHERE WE PAUSED UNLESS SOMEONE DISAGREES
+        # RETURNS FALSE IF WE AREN'T PAUSED
+        if self.paused_ns is None or self.dead:
+            return False
+        at_ns = at_ns if at_ns is not None else self.clock()
+        if offset_ns is None:
+            offset_ns = self.paused_ns - self.start_ns
+        self.start_ns = at_ns - offset_ns
+        self.paused_ns = None
+        if self.pause_children and not self.debug:
+            self.supervisor.resume_all()
+        logger.info("TASKER RESUMED AT {0:.3f} S".format(self.position_ns(at_ns) / NS_PER_SEC))
+        return True
+
+    def seek(self, offset_ns, at_ns=None):
+        # MOVE THE TIMELINE SO IT'S AT offset_ns AS OF at_ns, PAUSED STAYS PAUSED
+        # THE NEXT THING TO RUN IS THE FIRST SCHEDULE ENTRY AT OR AFTER offset_ns
+        # RETURNS FALSE IF WE AREN'T RUNNING OR offset_ns IS PAST THE END
+        if self.start_ns is None or self.dead:
+            return False
+        cursor = self.plan.seek(offset_ns)
+        if self.plan.entry(cursor) is None:
+            return False
+        at_ns = at_ns if at_ns is not None else self.clock()
+        self._cursor = cursor
+        self.start_ns = at_ns - offset_ns
+        if self.paused_ns is not None:
+            self.paused_ns = at_ns
+        if not self.debug:
+            # COMMANDS PRELOADED FOR CUES WE'VE JUST MOVED AWAY FROM
+            self.supervisor.stop_preloaded("SEEK")
+        logger.info("TASKER MOVED TO {0:.3f} S".format(offset_ns / NS_PER_SEC))
+        return True
+
+    def get_timeline(self):
+        # THE TASK LIST AS PLAIN DATA FOR STATUS REPORTS, TIMES IN SECONDS
+        elapsed = self.position_ns()
+        if elapsed is not None:
+            elapsed /= NS_PER_SEC
+        return {"ELAPSED": elapsed,
+                "RUNNING": self.start_ns is not None and not self.dead,
+                "PAUSED": self.paused_ns is not None,
+                "TASKS": [dict(task.as_dict(), RUN=self._fired(task))
+                          for task in self.plan.timeline(self._cursor)],
+                "CHILDREN": self.supervisor.get_report(),
+                "PLUGINS": self.plugins.get_report()}
+
+    def _begin(self, start_ns):
+        # ANCHOR THE TIMELINE, WALL CLOCK FOR HUMANS, MONOTONIC FOR DEADLINES
+        self.start_ns = start_ns
+        self.start_time = datetime.datetime.now()
         logger.info("TASKER STARTED")
+
+    def _spin_until(self, deadline):
+        # BUSY WAIT THE FINAL STRETCH, THIS HOLDS THE CPU SO KEEP THE WINDOW SMALL
+        while self.clock() < deadline and not self.dead:
+            pass
+
+    def _record_lateness(self, idx, late):
+        self.lateness.append((idx, late))
+        CUE_LATENESS.observe_ns(late)
+        # THE BUDGET IS A PRECISION MODE PROMISE, A COARSE SLEEP IS ROUTINELY A MILLISECOND OR TWO OUT
+        if self.precision and late > self.jitter_budget_ns:
+            self.over_budget += 1
+            CUES_OVER_BUDGET.inc()
+            logger.warning(logpipe.Lazy("TASK {0} FIRED {1:.3f} MS LATE, OVER {2:.3f} MS JITTER BUDGET",
+                                        idx, late / NS_PER_MS, self.jitter_budget_ns / NS_PER_MS))
+
+    def _fire(self, deadline, phase, task):
+        # RECORD HOW LATE WE ARE AND RUN THE TASK
+        if not task.runnable():
+            # A TASK FILE LINE THAT COULDN'T BE BUILT, ALREADY LOGGED
+            return
+        if phase == taskplan.PRELOAD:
+            self._preload(task)
+            return
+        late = self.clock() - deadline
+        self._record_lateness(task.index, late)
+        self._dispatch(task)
+        if self.on_fire:
+            self.on_fire(task.index, task, late)
+
+    def _preload(self, task):
+        # GET THE COMMAND STARTED AND WAITING AT ITS GATE
+        if not self.debug:
+            self.supervisor.preload(task)
+        else:
+            # DEBUG
+            logger.debug(logpipe.Lazy("PRELOAD {0}", task.args))
+
+    def _dispatch(self, task):
+        # HANDLE TYPE OF TASK
+        if task.type == taskplan.TASK:
+            if not self.debug:
+                # OPENS THE GATE ON A PRELOADED COMMAND, STARTS ANY OTHER
+                self.supervisor.release(task)
+            else:
+                # DEBUG
+                logger.debug(task.args)
+        elif task.type == taskplan.STOP:
+            logger.info("AUTO STOPPING PER TASK LIST")
+            self.dead = True
+            self.supervisor.stop_all("STOP")
+        elif not self.debug:
+            self.plugins.run(task)
+        else:
+            # DEBUG
+            logger.debug(logpipe.Lazy("{0} {1}", task.type, task.command))
+
+    def _finish(self):
+        # TIMELINE IS OVER, REPORT AND LET THE OWNER KNOW
+        if self._finished:
+            return
+        self._finished = True
+        self.plugins.shutdown()
+        logger.info("TASKER LATENESS: {0}".format(self.get_lateness_stats()))
+        if self.on_done:
+            self.on_done()
+
+
+class Tasker(TaskerBase, threading.Thread):
+    """
+    Tasker - Class to handle running tasks at specific times from when it's started
+    Inherits: TaskerBase, threading
+
+    The thread walks the plan's schedule, sleeping on a condition until the
+    next deadline (monotonic clock), and is woken early by kill()
+    """
+    def __init__(self, plan, **kwargs):
+        # SINCE WE'RE INHERITING THREAD, WE HAVE TO INIT THAT ALSO
+        threading.Thread.__init__(self)
+        # SET DAEMON
+        self.daemon = True
+        # CONDITION USED TO SLEEP UNTIL THE NEXT DEADLINE OR UNTIL KILLED
+        self._wakeup = threading.Condition()
+        TaskerBase.__init__(self, plan, **kwargs)
+
+    def kill(self):
+        # KILL THE STUFF AND WAKE THE SCHEDULER SO IT NOTICES RIGHT AWAY
+        with self._wakeup:
+            TaskerBase.kill(self)
+            self._wakeup.notify_all()
+
+    def abort(self):
+        with self._wakeup:
+            stopped = TaskerBase.abort(self)
+            self._wakeup.notify_all()
+        return stopped
+
+    # PAUSE, RESUME AND SEEK MOVE THE DEADLINES, WAKE THE SCHEDULER TO WAIT ON THE NEW ONE
+    def pause(self, at_ns=None, offset_ns=None):
+        with self._wakeup:
+            done = TaskerBase.pause(self, at_ns, offset_ns)
+            self._wakeup.notify_all()
+        return done
+
+    def resume(self, at_ns=None, offset_ns=None):
+        with self._wakeup:
+            done = TaskerBase.resume(self, at_ns, offset_ns)
+            self._wakeup.notify_all()
+        return done
+
+    def seek(self, offset_ns, at_ns=None):
+        with self._wakeup:
+            done = TaskerBase.seek(self, offset_ns, at_ns)
+            self._wakeup.notify_all()
+        return done
+
+    def _next_task(self):
+        # THIS FUNCTION BLOCKS UNTIL THE NEXT TASK IS (ALMOST) DUE AND POPS IT
+        # IN PRECISION MODE IT RETURNS UP TO spin_window_ns EARLY AND THE
+        # CALLER SPINS OUT THE REST
+        # RETURNS (DEADLINE, PHASE, TASK) OR NONE IF WE WERE KILLED WHILE WAITING
+        early = self.spin_window_ns if self.precision else 0
+        with self._wakeup:
+            while not self.dead:
+                entry = self._peek()
+                if entry is None or self.paused_ns is not None:
+                    # NOTHING LEFT TO RUN OR PAUSED, SLEEP UNTIL SOMEONE KILLS, RESUMES OR SEEKS US
+                    self._wakeup.wait()
+                    continue
+                deadline = self.start_ns + entry[0]
+                wait = deadline - early - self.clock()
+                if wait > 0:
+                    self._wakeup.wait(wait / NS_PER_SEC)
+                    continue
+                _, _, phase, task = self._pop()
+                return deadline, phase, task
+        return None
+
+    def has_started(self):
+        # start() MAY HAVE BEEN CALLED WITHOUT THE THREAD HAVING ANCHORED THE TIMELINE YET
+        return self.ident is not None or TaskerBase.has_started(self)
+
+    def start_at(self, start_ns):
+        # START THE THREAD WITH THE TIMELINE ANCHORED AT start_ns (MONOTONIC NS)
+        # INSTEAD OF WHENEVER THE THREAD HAPPENS TO GET GOING
+        self.start_at_ns = start_ns
+        self.start()
+
+    def _wait_until(self, deadline):
+        # SLEEP UNTIL THE DEADLINE (OR UNTIL KILLED), SPINNING THE END IN PRECISION MODE
+        early = self.spin_window_ns if self.precision else 0
+        with self._wakeup:
+            while not self.dead:
+                wait = deadline - early - self.clock()
+                if wait <= 0:
+                    break
+                self._wakeup.wait(wait / NS_PER_SEC)
+        if self.precision:
+            self._spin_until(deadline)
+
+    def run(self):
+        # IF WE WERE GIVEN A SHARED START INSTANT, WAIT FOR IT AND ANCHOR THE
+        # TIMELINE THERE EVEN IF WE WAKE UP A LITTLE LATE
+        if self.start_at_ns is not None:
+            self._wait_until(self.start_at_ns)
+            self._begin(self.start_at_ns)
+        else:
+            self._begin(self.clock())
+
         #logger.debug(self.start_time)
         # LOOP FOREVER - UNTIL WE'RE KILLED
         while not self.dead:
-            # GET CURRENT TIME
-            now = datetime.datetime.now()
-            # LOOP THROUGH TASKS
-            for task in self.tasks:
-                # IF WE HAVEN'T RUN THE TASK AND THE TIME DELTA BETWEEN NOW AND 
-                # START IS GREATER THAN OR EQUAL TO THE CURRENT TASK DELTA
-                if not task["RUN"] and now - self.start_time >= task["TD"]:
-                    # FLAG THE TASK AS RUN NOW
-                    task["RUN"] = True
-                    # HANDLE TYPE OF TASK
-                    if task["TYPE"].upper() == "TASK":
-                        if not self.debug:
-                            p = subprocess.Popen(task["ARGS"])
-                        else:
-                            # DEBUG
-                            logger.debug(task["ARGS"])
-                    elif task["TYPE"].upper() == "STOP":
-                        logger.info("AUTO STOPPING PER TASK LIST")
-                        self.dead = True
-            # LOOP SLEEPER - NOT SURE IF THIS IS NEEDED AT THE MOMENT
-            time.sleep(self.loop_sleep)
+            nxt = self._next_task()
+            if nxt is None:
+                continue
+            deadline, phase, task = nxt
+            if self.precision and phase == taskplan.CUE:
+                self._spin_until(deadline)
+                if self.dead:
+                    break
+            self._fire(deadline, phase, task)
+        self._finish()
+
+# FUNCTIONS
+def options_from_config(config, debug = False):
+    # TASKER KEYWORD ARGUMENTS FROM A MASTER OR CLIENT CONFIG, PRECISION AND CHILD SETTINGS ARE OPTIONAL
+    return {"debug": debug,
+            "precision": config.get("PRECISION MODE", False),
+            "spin_window_ns": int(config.get("SPIN WINDOW MS", 2) * NS_PER_MS),
+            "jitter_budget_ns": int(config.get("JITTER BUDGET MS", 1) * NS_PER_MS),
+            "capture_bytes": config.get("CAPTURE BYTES", supervisor.DEFAULT_CAPTURE_BYTES),
+            "kill_grace_ns": int(config.get("KILL GRACE MS", 2000) * NS_PER_MS),
+            "plugin_workers": config.get("PLUGIN WORKERS", plugins.DEFAULT_WORKERS),
+            "pause_children": config.get("PAUSE CHILDREN", True)}
 
 # UNIT TEST
 if __name__ == "__main__":
@@ -141,8 +476,8 @@ if __name__ == "__main__":
       }
     ]
 
-    tasky = Tasker(TASKLIST)
-    logger.info(tasky.tasks)
+    tasky = Tasker(taskplan.compile_tasks(TASKLIST))
+    logger.info(tasky.plan.as_list())
 
     # RUN AND WAIT FOR IT TO AUTO STOP
     tasky.run()
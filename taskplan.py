@@ -0,0 +1,483 @@
+# THIS USES PYTHON 3
+
+# TASK PLAN
+# CODE TO TURN A TASK LIST INTO A PLAN ONCE, WHEN THE MASTER OR CLIENT STARTS
+#
+# EVERY TASK DICT IN THE CONFIG IS CHECKED AND COMPILED INTO A TaskRecord:
+# OFFSET IN NANOSECONDS, COMMAND ALREADY SPLIT (OR PREPARED BY ITS PLUGIN)
+# AND ITS OPTIONS PULLED OUT. THE PLAN ALSO HOLDS THE SCHEDULE, EVERY PRELOAD
+# AND CUE SORTED BY WHEN IT'S DUE, SO A RUN IS JUST A CURSOR INTO IT AND A
+# RESET DOESN'T HAVE TO REDO ANY OF THIS. A PLAN IS NEVER CHANGED AFTER IT'S
+# COMPILED AND THE CONFIG DICTS ARE LEFT ALONE
+#
+# SHOWS WITH TENS OF THOUSANDS OF CUES CAN KEEP THEM IN A "TASK FILE", ONE
+# JSON TASK PER LINE, INSTEAD OF THE CONFIG. THE FILE IS CHECKED ONCE AND A
+# BINARY INDEX (ONE FIXED SIZE ENTRY PER PRELOAD/CUE, SORTED BY OFFSET) IS
+# SAVED NEXT TO IT. BOTH FILES ARE MEMORY MAPPED, A RECORD IS ONLY BUILT WHEN
+# THE CURSOR GETS CLOSE TO IT AND ONLY A WINDOW OF THEM IS KEPT. SEEKING IS A
+# BINARY SEARCH OF THE INDEX
+
+# MODULE IMPORT
+import argparse
+import collections
+import threading
+import numbers
+import bisect
+import struct
+import shlex
+import json
+import mmap
+import os
+import logging
+# LOCAL MODULES
+import plugins
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_MS = 1000000
+NS_PER_SEC = 1000000000
+# NANOSECONDS PER "TIME UNITS"
+UNITS = {"MICROSECONDS": 1000,
+         "MILLISECONDS": NS_PER_MS,
+         "SECONDS": NS_PER_SEC,
+         "MINUTES": 60 * NS_PER_SEC,
+         "HOURS": 3600 * NS_PER_SEC}
+
+# TASK TYPES THAT AREN'T PLUGINS
+TASK = "TASK"
+STOP = "STOP"
+
+# SCHEDULE ENTRY PHASES, A PRELOAD SORTS BEFORE A CUE AT THE SAME INSTANT
+PRELOAD = 0
+CUE = 1
+
+# TASK FILE INDEX
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"ERIX"
+INDEX_VERSION = 1
+# HEADER - MAGIC, VERSION, TASK FILE SIZE, TASK FILE MTIME NS, TASK COUNT, ENTRY COUNT
+INDEX_HEADER = struct.Struct("!4sIQqII")
+# ONE PER TASK - BYTE OFFSET OF ITS LINE IN THE TASK FILE
+INDEX_TASK = struct.Struct("!Q")
+# ONE PER SCHEDULE ENTRY - OFFSET NS, TASK INDEX, PHASE
+INDEX_ENTRY = struct.Struct("!qIB")
+# TASK RECORDS KEPT IN MEMORY FOR A TASK FILE
+DEFAULT_WINDOW = 512
+# SCHEDULE ENTRIES BUILT AT A TIME WHEN THE CURSOR RUNS OUT OF RECORDS
+BATCH = 32
+# UPCOMING TASKS LISTED IN A TASK FILE'S TIMELINE
+TIMELINE_SIZE = 50
+
+# CLASSES
+class PlanError(ValueError):
+    """
+    PlanError - A task list that can't be run
+    """
+
+
+class TaskRecord:
+    """
+    TaskRecord - One compiled task, index is its place in the config's list
+    """
+    __slots__ = ("index", "type", "offset_ns", "command", "args", "plugin", "preload_ns",
+                 "release", "timeout_ns", "kill_on_stop")
+
+    def __init__(self, index, task_type, offset_ns, command, args, plugin=None, preload_ns=0,
+                 release=None, timeout_ns=None, kill_on_stop=True):
+        self.index = index
+        self.type = task_type
+        self.offset_ns = offset_ns
+        self.command = command
+        self.args = args
+        self.plugin = plugin
+        self.preload_ns = preload_ns
+        # BYTES WRITTEN TO A PRELOADED COMMAND'S STDIN AT ITS CUE
+        self.release = release
+        self.timeout_ns = timeout_ns
+        self.kill_on_stop = kill_on_stop
+
+    def moved(self, index):
+        # THIS TASK AT ANOTHER PLACE IN THE LIST, ITSELF IF IT'S THE SAME PLACE
+        if index == self.index:
+            return self
+        return TaskRecord(index, self.type, self.offset_ns, self.command, self.args, self.plugin,
+                          self.preload_ns, self.release, self.timeout_ns, self.kill_on_stop)
+
+    def runnable(self):
+        # UNKNOWN TYPES ARE KEPT FOR THE TIMELINE BUT NEVER SCHEDULED
+        return self.type in (TASK, STOP) or self.plugin is not None
+
+    def as_dict(self):
+        return {"INDEX": self.index,
+                "TYPE": self.type,
+                "AT": self.offset_ns / NS_PER_SEC,
+                "COMMAND": self.command,
+                "PRELOAD MS": self.preload_ns / NS_PER_MS if self.preload_ns else None}
+
+
+class TaskPlan:
+    """
+    TaskPlan - A compiled task list, shared by every run
+     - tasks are the records in config order
+     - schedule is (OFFSET NS, INDEX, PHASE, RECORD) sorted by when it's due
+     - A run walks the schedule by position with entry(), seek() finds the
+       position for an offset, StreamedPlan answers the same calls
+    """
+    __slots__ = ("tasks", "schedule", "_offsets")
+
+    def __init__(self, tasks, schedule):
+        self.tasks = tuple(tasks)
+        self.schedule = tuple(schedule)
+        self._offsets = tuple(entry[0] for entry in self.schedule)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def entry(self, pos):
+        # SCHEDULE ENTRY AT pos, NONE PAST THE END
+        return self.schedule[pos] if pos < len(self.schedule) else None
+
+    def seek(self, offset_ns):
+        # POSITION OF THE FIRST ENTRY DUE AT OR AFTER offset_ns
+        return bisect.bisect_left(self._offsets, offset_ns)
+
+    def task(self, index):
+        return self.tasks[index]
+
+    def timeline(self, pos):
+        # TASKS FOR A STATUS REPORT, ALL OF THEM SINCE THEY'RE IN MEMORY ANYWAY
+        return self.tasks
+
+    def as_list(self):
+        return [task.as_dict() for task in self.tasks]
+
+
+class StreamedPlan:
+    """
+    StreamedPlan - A plan read from a task file as the run gets to it
+     - The index is built (checking every task) the first time a task file
+       is opened and again whenever it changes, if the index can't be saved
+       next to the file, it is kept in memory
+     - At most window task records are kept, the least recently used go first
+    """
+    def __init__(self, path, window=DEFAULT_WINDOW):
+        self.path = path
+        self.window = max(window, BATCH)
+        self._records = collections.OrderedDict()
+        self._lock = threading.Lock()
+        with open(path, "rb") as source:
+            if os.fstat(source.fileno()).st_size == 0:
+                raise PlanError("TASK FILE {0} IS EMPTY".format(path))
+            self._source = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = load_index(path, self._source)
+        _, _, _, _, self.task_count, self.entry_count = INDEX_HEADER.unpack_from(self._index)
+        self._entries_at = INDEX_HEADER.size + self.task_count * INDEX_TASK.size
+        logger.info("TASK FILE {0}: {1} TASKS, {2} SCHEDULE ENTRIES".format(
+            path, self.task_count, self.entry_count))
+
+    def __len__(self):
+        return self.task_count
+
+    def is_current(self):
+        # FALSE IF THE TASK FILE CHANGED SINCE WE INDEXED IT
+        _, _, size, mtime_ns, _, _ = INDEX_HEADER.unpack_from(self._index)
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+
+    def _key(self, pos):
+        return INDEX_ENTRY.unpack_from(self._index, self._entries_at + pos * INDEX_ENTRY.size)
+
+    def _record(self, index):
+        # CALLED WITH THE LOCK HELD
+        record = self._records.get(index)
+        if record is not None:
+            self._records.move_to_end(index)
+            return record
+        line_at, = INDEX_TASK.unpack_from(self._index, INDEX_HEADER.size + index * INDEX_TASK.size)
+        end = self._source.find(b"\n", line_at)
+        line = self._source[line_at:end if end >= 0 else len(self._source)]
+        try:
+            record = compile_task(index, parse_line(index, line))
+        except PlanError as err:
+            # IT WAS FINE WHEN THE INDEX WAS BUILT (A PLUGIN MODULE WENT AWAY?), SKIP IT
+            logger.error("{0}, IT WILL BE SKIPPED".format(err))
+            record = TaskRecord(index, "INVALID", 0, "", None)
+        self._records[index] = record
+        while len(self._records) > self.window:
+            self._records.popitem(last=False)
+        return record
+
+    def entry(self, pos):
+        if pos >= self.entry_count:
+            return None
+        with self._lock:
+            offset_ns, index, phase = self._key(pos)
+            record = self._records.get(index)
+            if record is None:
+                # BUILD THE NEXT FEW NOW SO CUES CLOSE TOGETHER DON'T EACH PAY FOR IT
+                for ahead in range(pos + 1, min(pos + BATCH, self.entry_count)):
+                    self._record(self._key(ahead)[1])
+            return offset_ns, index, phase, self._record(index)
+
+    def seek(self, offset_ns):
+        low, high = 0, self.entry_count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid)[0] < offset_ns:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def task(self, index):
+        with self._lock:
+            return self._record(index)
+
+    def timeline(self, pos):
+        # THE NEXT FEW TASKS FROM pos, THE FILE IS TOO BIG TO LIST
+        tasks = []
+        with self._lock:
+            for ahead in range(pos, self.entry_count):
+                _, index, phase = self._key(ahead)
+                if phase == CUE:
+                    tasks.append(self._record(index))
+                    if len(tasks) >= TIMELINE_SIZE:
+                        break
+        return tasks
+
+
+# FUNCTIONS
+def _number(idx, key, value):
+    if value is not None and (isinstance(value, bool) or not isinstance(value, numbers.Real) or value < 0):
+        raise PlanError("TASK {0}: {1} MUST BE A NUMBER NO LESS THAN 0, GOT {2!r}".format(idx, key, value))
+    return value
+
+
+def compile_task(idx, task):
+    # CHECK ONE TASK DICT AND BUILD ITS RECORD
+    try:
+        task_type = task["TYPE"].upper()
+        command = task["COMMAND"]
+        unit = task["TIME UNITS"].upper()
+        delta = task["DELTA TIME FROM START"]
+    except KeyError as err:
+        raise PlanError("TASK {0} IS MISSING {1}".format(idx, err)) from err
+    except AttributeError as err:
+        raise PlanError("TASK {0}: TYPE AND TIME UNITS MUST BE STRINGS".format(idx)) from err
+    if unit not in UNITS:
+        raise PlanError("TASK {0}: UNKNOWN TIME UNITS {1!r}, USE ONE OF {2}".format(
+            idx, task["TIME UNITS"], ", ".join(unit.title() for unit in UNITS)))
+    offset_ns = int(round(_number(idx, "DELTA TIME FROM START", delta) * UNITS[unit]))
+    plugin = None
+    if task_type in (TASK, STOP):
+        try:
+            args = shlex.split(command)
+        except ValueError as err:
+            raise PlanError("TASK {0}: CAN'T SPLIT COMMAND {1!r}: {2}".format(idx, command, err)) from err
+        if task_type == TASK and not args:
+            raise PlanError("TASK {0} HAS AN EMPTY COMMAND".format(idx))
+    else:
+        plugin = plugins.get(task_type)
+        args = None
+        if plugin is None:
+            logger.error("TASK {0} HAS UNKNOWN TYPE {1}, IT WILL BE SKIPPED".format(idx, task_type))
+        else:
+            try:
+                args = plugin.prepare(task)
+            except (ValueError, ImportError, AttributeError, OSError) as err:
+                raise PlanError("TASK {0} ({1}): {2}".format(idx, task_type, err)) from err
+    preload_ns = int(_number(idx, "PRELOAD MS", task.get("PRELOAD MS", 0)) * NS_PER_MS)
+    timeout = _number(idx, "TIMEOUT", task.get("TIMEOUT"))
+    release = task.get("RELEASE")
+    if release is not None and not isinstance(release, str):
+        raise PlanError("TASK {0}: RELEASE MUST BE TEXT, GOT {1!r}".format(idx, release))
+    return TaskRecord(idx, task_type, offset_ns, command, args, plugin,
+                      preload_ns=preload_ns if task_type == TASK else 0,
+                      release=release.encode() if release is not None else None,
+                      timeout_ns=int(timeout * NS_PER_SEC) if timeout else None,
+                      kill_on_stop=bool(task.get("KILL ON STOP", True)))
+
+
+def schedule_keys(record):
+    # (OFFSET NS, INDEX, PHASE) OF EVERY SCHEDULE ENTRY FOR A RECORD
+    if not record.runnable():
+        return []
+    keys = [(record.offset_ns, record.index, CUE)]
+    if record.preload_ns:
+        # CUES CLOSER TO THE START THAN THEIR PRELOAD ARE PRELOADED AT THE START
+        keys.append((max(0, record.offset_ns - record.preload_ns), record.index, PRELOAD))
+    return keys
+
+
+def check_stop(stop_key, keys):
+    # A TASK LIST NEEDS A STOP, ANYTHING DUE AFTER THE FIRST ONE NEVER RUNS
+    if stop_key is None:
+        raise PlanError("TASK LIST HAS NO STOP TASK, IT WOULD NEVER FINISH")
+    late = [idx for _, idx, phase in (key for key in keys if key > stop_key) if phase == CUE]
+    if late:
+        logger.warning("{0} TASK(S) COME AFTER THE STOP TASK AND WILL NEVER RUN, FIRST IS TASK {1}".format(
+            len(late), min(late)))
+
+
+def compile_tasks(tasks):
+    # BUILD A PLAN FROM A CONFIG'S TASK LIST, RAISES PlanError IF IT CAN'T RUN
+    return _plan([compile_task(idx, task) for idx, task in enumerate(tasks)])
+
+
+def _plan(records):
+    # (OFFSET, INDEX, PHASE) IS UNIQUE SO RECORDS ARE NEVER COMPARED
+    keys = sorted(key for record in records for key in schedule_keys(record))
+    check_stop(min(((record.offset_ns, record.index, CUE) for record in records if record.type == STOP),
+                   default=None), keys)
+    return TaskPlan(records, [key + (records[key[1]],) for key in keys])
+
+
+def _task_key(task):
+    # TASK DICTS AREN'T HASHABLE, THEIR JSON IS
+    return json.dumps(task, sort_keys=True)
+
+
+def recompile_tasks(plan, old_tasks, tasks):
+    # BUILD THE PLAN FOR tasks FROM plan, WHICH WAS COMPILED FROM old_tasks. RETURNS
+    # plan ITSELF IF NOTHING CHANGED
+    # TASKS ARE MATCHED BY CONTENT, NOT PLACE, SO ONLY NEW OR EDITED ONES ARE COMPILED
+    # AGAIN (SHLEX, PLUGIN PREPARE) AND ONE INSERTED IN THE MIDDLE DOESN'T RECOMPILE
+    # EVERYTHING AFTER IT. THE REST IS STILL WORK ON THE WHOLE LIST - COMPARING,
+    # RENUMBERING AND SORTING THE SCHEDULE AGAIN - JUST NOT THE EXPENSIVE PART
+    if tasks == old_tasks:
+        return plan
+    unused = collections.defaultdict(collections.deque)
+    for idx, task in enumerate(old_tasks):
+        unused[_task_key(task)].append(idx)
+    records = []
+    compiled = 0
+    for idx, task in enumerate(tasks):
+        matches = unused.get(_task_key(task))
+        if matches:
+            records.append(plan.tasks[matches.popleft()].moved(idx))
+        else:
+            records.append(compile_task(idx, task))
+            compiled += 1
+    new_plan = _plan(records)
+    logger.info("RECOMPILED {0} OF {1} TASKS".format(compiled, len(tasks)))
+    return new_plan
+
+
+def reload(plan, old_config, config):
+    # THE PLAN FOR config, REUSING plan (FROM old_config) WHERE IT CAN, SEE recompile_tasks
+    # RETURNS plan ITSELF IF THE TASKS DIDN'T CHANGE, RAISES PlanError IF THE NEW ONES CAN'T RUN
+    if config.get("PLUGINS", []) != old_config.get("PLUGINS", []):
+        # A TASK'S PLUGIN MAY HAVE CHANGED UNDER IT, START OVER
+        return from_config(config)
+    if config.get("TASK FILE"):
+        if (isinstance(plan, StreamedPlan) and plan.path == config["TASK FILE"] and plan.is_current() and
+                config.get("TASK WINDOW") == old_config.get("TASK WINDOW")):
+            return plan
+        return from_config(config)
+    if isinstance(plan, StreamedPlan):
+        return from_config(config)
+    return recompile_tasks(plan, old_config["TASKS"], config["TASKS"])
+
+
+def parse_line(idx, line):
+    try:
+        task = json.loads(line)
+    except ValueError as err:
+        raise PlanError("TASK {0}: BAD JSON: {1}".format(idx, err)) from err
+    if not isinstance(task, dict):
+        raise PlanError("TASK {0}: EXPECTED A JSON OBJECT".format(idx))
+    return task
+
+
+def task_lines(source):
+    # (BYTE OFFSET, LINE) OF EVERY TASK IN A TASK FILE, BLANK LINES ARE SKIPPED
+    pos = 0
+    while pos < len(source):
+        end = source.find(b"\n", pos)
+        if end < 0:
+            end = len(source)
+        line = source[pos:end]
+        if line.strip():
+            yield pos, line
+        pos = end + 1
+
+
+def build_index(source, size, mtime_ns):
+    # CHECK EVERY TASK IN A TASK FILE AND RETURN ITS INDEX, ONE RECORD AT A TIME
+    line_offsets = []
+    keys = []
+    stop_key = None
+    for idx, (line_at, line) in enumerate(task_lines(source)):
+        record = compile_task(idx, parse_line(idx, line))
+        line_offsets.append(line_at)
+        keys.extend(schedule_keys(record))
+        if record.type == STOP and (stop_key is None or (record.offset_ns, idx, CUE) < stop_key):
+            stop_key = (record.offset_ns, idx, CUE)
+    keys.sort()
+    check_stop(stop_key, keys)
+    return b"".join([INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, size, mtime_ns, len(line_offsets), len(keys))] +
+                    [INDEX_TASK.pack(line_at) for line_at in line_offsets] +
+                    [INDEX_ENTRY.pack(*key) for key in keys])
+
+
+def load_index(path, source):
+    # MAP THE INDEX FOR A TASK FILE, BUILDING IT FIRST IF IT'S MISSING OR OUT OF DATE
+    stat = os.stat(path)
+    index_path = path + INDEX_SUFFIX
+    try:
+        with open(index_path, "rb") as saved:
+            index = mmap.mmap(saved.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(index) >= INDEX_HEADER.size:
+            magic, version, size, mtime_ns, _, _ = INDEX_HEADER.unpack_from(index)
+            if (magic, version, size, mtime_ns) == (INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns):
+                return index
+        index.close()
+    except (OSError, ValueError):
+        pass
+    logger.info("INDEXING TASK FILE {0}".format(path))
+    index = build_index(source, stat.st_size, stat.st_mtime_ns)
+    try:
+        # WRITE THEN RENAME SO A HALF WRITTEN INDEX IS NEVER PICKED UP
+        with open(index_path + ".tmp", "wb") as out:
+            out.write(index)
+        os.replace(index_path + ".tmp", index_path)
+    except OSError as err:
+        logger.warning("COULD NOT SAVE TASK INDEX {0}: {1}, KEEPING IT IN MEMORY".format(index_path, err))
+    return index
+
+
+def from_config(config):
+    # LOAD THE CONFIG'S PLUGIN MODULES AND COMPILE ITS TASKS, OR OPEN ITS TASK FILE
+    plugins.load_modules(config.get("PLUGINS", []))
+    if config.get("TASK FILE"):
+        return StreamedPlan(config["TASK FILE"], config.get("TASK WINDOW", DEFAULT_WINDOW))
+    return compile_tasks(config["TASKS"])
+
+
+# MAIN
+if __name__ == "__main__":
+
+    FORMAT = '%(asctime)-15s %(levelname)-10s %(module)-12s %(message)s'
+    logging.basicConfig(format=FORMAT, level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Check and index an Escape Room task file")
+    parser.add_argument("taskfile", help="Task file, one JSON task per line")
+    parser.add_argument("--from-config", metavar="file",
+                        help="Write the TASKS list of this JSON config to the task file first")
+    parser.add_argument("--plugins", nargs="*", default=[], help="Plugin modules the tasks use")
+    args = parser.parse_args()
+
+    if args.from_config:
+        with open(args.from_config) as config_file:
+            tasks = json.load(config_file)["TASKS"]
+        with open(args.taskfile, "w") as out:
+            for task in tasks:
+                out.write(json.dumps(task) + "\n")
+    plugins.load_modules(args.plugins)
+    StreamedPlan(args.taskfile)
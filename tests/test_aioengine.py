@@ -0,0 +1,106 @@
+# THIS USES PYTHON 3
+
+# ASYNCIO ENGINE TESTS
+# TASK TIMERS ON THE LOOP AND A MASTER STARTING A CLIENT OVER LOOPBACK, DEBUG MODE SO NOTHING IS RUN
+
+# MODULE IMPORT
+import unittest.mock
+import unittest
+import asyncio
+import time
+# LOCAL MODULES
+import master_control
+import aioengine
+import taskplan
+import client
+import tasker
+
+# CONSTANTS
+# HOW LONG A RUN GETS BEFORE THE TEST GIVES UP
+TIMEOUT_SECONDS = 5
+
+
+# FUNCTIONS
+def task(at_ms, command="true", task_type="TASK"):
+    return {"TYPE": task_type, "DELTA TIME FROM START": at_ms, "TIME UNITS": "MILLISECONDS", "COMMAND": command}
+
+
+def stop(at_ms):
+    return task(at_ms, "", "STOP")
+
+
+async def wait_for(condition):
+    # POLL THE LOOP UNTIL condition() IS TRUE, FALSE IF IT NEVER IS
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.005)
+    return True
+
+
+# CLASSES
+class RecordingAsyncTasker(aioengine.AsyncTasker):
+    """
+    RecordingAsyncTasker - A debug AsyncTasker that notes the COMMAND of every dispatch
+    """
+    def __init__(self, tasks, loop, **kwargs):
+        self.cues = []
+        aioengine.AsyncTasker.__init__(self, taskplan.compile_tasks(tasks), loop, debug=True, **kwargs)
+
+    def _dispatch(self, task):
+        self.cues.append(task.command)
+        aioengine.AsyncTasker._dispatch(self, task)
+
+
+class AsyncTaskerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_runs_in_order_then_finishes(self):
+        done = asyncio.get_running_loop().create_future()
+        tasky = RecordingAsyncTasker([task(20, "b"), task(10, "a"), stop(30)], asyncio.get_running_loop(),
+                                     on_done=lambda: done.set_result(time.monotonic_ns()))
+        start_ns = time.monotonic_ns() + 10 * tasker.NS_PER_MS
+        tasky.start_at(start_ns)
+        finished_ns = await asyncio.wait_for(done, TIMEOUT_SECONDS)
+        self.assertEqual(tasky.cues, ["a", "b", ""])
+        self.assertEqual(tasky.start_ns, start_ns)
+        self.assertGreaterEqual(finished_ns, start_ns + 30 * tasker.NS_PER_MS)
+        self.assertFalse(tasky.is_running())
+
+    async def test_kill_cancels_the_timer(self):
+        done = asyncio.get_running_loop().create_future()
+        tasky = RecordingAsyncTasker([task(3600000, "much later"), stop(3600001)], asyncio.get_running_loop(),
+                                     on_done=lambda: done.set_result(True))
+        tasky.start()
+        await asyncio.sleep(0.01)
+        tasky.kill()
+        self.assertTrue(await asyncio.wait_for(done, TIMEOUT_SECONDS))
+        self.assertIsNone(tasky._handle)
+        self.assertEqual(tasky.cues, [])
+
+
+class EngineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_master_starts_a_client_at_the_same_instant(self):
+        loop = asyncio.get_running_loop()
+        myclient = aioengine.AsyncClient(("127.0.0.1", 0), client.ClientHandler,
+                                         {"ID": 5, "TASKS": [task(10), stop(20)]}, loop, debug=True)
+        config = {"PING TIMER": 0.05, "START OPTION": "AUTO", "START LEAD MS": 50,
+                  "CLIENTS": [{"ID": 5, "IP": "127.0.0.1", "PORT": myclient.server_address[1]}],
+                  "TASKS": [task(10), stop(20)]}
+        with unittest.mock.patch.object(master_control, "WEBPORT", 0):
+            controller = aioengine.AsyncController(("127.0.0.1", 0), master_control.ControllerHandler, config,
+                                                   loop, debug=True)
+            serving = [loop.create_task(aioengine._serve(server)) for server in (controller, myclient)]
+            try:
+                finished = await wait_for(lambda: controller.done_with_tasks and myclient.done_with_tasks)
+            finally:
+                controller.kill()
+                myclient.kill()
+                await asyncio.gather(*serving)
+        self.assertTrue(finished)
+        # ONE PROCESS, ONE CLOCK, SO THE OFFSET ESTIMATE SHOULD BE ALL BUT EXACT
+        self.assertLess(abs(myclient.tasky.start_ns - controller.tasky.start_ns), 5 * tasker.NS_PER_MS)
+        self.assertEqual(controller.delivery.get_status()[5]["STATE"], "ACKED")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# THIS USES PYTHON 3
+
+# CLIENT TESTS
+# COMMANDS HANDLED STRAIGHT THROUGH process_request, DEBUG MODE SO NOTHING IS RUN
+
+# MODULE IMPORT
+import unittest.mock
+import threading
+import unittest
+import time
+# LOCAL MODULES
+import protocol
+import client
+
+# CONSTANTS
+MASTER = ("127.0.0.1", 10005)
+
+
+# CLASSES
+class FakeSocket:
+    """
+    FakeSocket - Stands in for the socket a reply goes out on, keeps what was sent
+    """
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, msg, address):
+        self.sent.append((msg, address))
+
+
+class ClientTest(unittest.TestCase):
+    def setUp(self):
+        config = {"ID": 5, "TASKS": [{"TYPE": "STOP", "DELTA TIME FROM START": 1, "TIME UNITS": "HOURS",
+                                      "COMMAND": ""}]}
+        self.client = client.Client(("127.0.0.1", 0), client.ClientHandler, config, debug=True)
+        self.sock = FakeSocket()
+
+    def tearDown(self):
+        self.client.tasky.kill()
+        self.client.server_close()
+
+    def command(self, msg):
+        self.client.process_request((msg, self.sock), MASTER)
+
+    def test_start_that_arrives_twice_at_once_runs_once(self):
+        # ONE COPY OVER UNICAST AND ONE OVER MULTICAST, READ ON TWO THREADS
+        barrier = threading.Barrier(2)
+        errors = []
+        resend_ack = self.client.resend_ack
+
+        def slow_resend_ack(*args):
+            # WIDEN THE GAP BETWEEN CHECKING FOR A DUPLICATE AND RECORDING THE ACK
+            done = resend_ack(*args)
+            time.sleep(0.02)
+            return done
+
+        def deliver():
+            barrier.wait()
+            try:
+                self.command(b"start 42")
+            except RuntimeError as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=deliver) for _ in range(2)]
+        with unittest.mock.patch.object(self.client, "resend_ack", side_effect=slow_resend_ack):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertTrue(self.client.tasky.is_alive())
+        # BOTH COPIES ARE ACKED THE SAME
+        self.assertEqual(self.sock.sent, [(b"ack 5 42", MASTER)] * 2)
+
+
+    def test_start_after_a_stop_starts_a_new_run(self):
+        first = self.client.tasky
+        self.client.start_tasks(None, time.monotonic_ns())
+        self.client.control_tasks(protocol.CONTROL_STOP, 0, None, time.monotonic_ns())
+        # service_actions() HASN'T SEEN THE STOP YET
+        self.assertFalse(self.client.get_tasks_completed())
+        self.client.start_tasks(None, time.monotonic_ns())
+        self.assertIsNot(self.client.tasky, first)
+        self.assertTrue(self.client.tasky.is_alive())
+
+    def test_a_second_start_while_running_starts_over(self):
+        first = self.client.tasky
+        self.client.start_tasks(time.monotonic_ns() + 3600 * 10 ** 9, time.monotonic_ns())
+        self.client.start_tasks(None, time.monotonic_ns())
+        self.assertIsNot(self.client.tasky, first)
+        self.assertTrue(first.dead)
+
+    def test_answers_in_the_format_it_was_spoken_to(self):
+        self.command(b"ping 123")
+        text, _ = self.sock.sent.pop()
+        self.assertEqual(text.split()[:2], [b"pong", b"123"])
+        self.assertEqual(text.split()[-1], b"v" + str(protocol.VERSION).encode())
+        self.command(protocol.ping(123))
+        pong = protocol.decode(self.sock.sent.pop()[0])
+        self.assertEqual((pong.type, pong.client_id), (protocol.PONG, 5))
+        self.assertEqual(protocol.unpack_pong(pong)[0], 123)
+
+    def test_bad_messages_are_one_warning(self):
+        for data in (b"start abc", b"ping x", protocol.ping(5)[:-1]):
+            with self.subTest(data=data), self.assertLogs(client.NAME, "WARNING") as logged:
+                self.command(data)
+            self.assertIn("BAD MESSAGE", logged.output[0])
+        self.assertEqual(self.sock.sent, [])
+        self.assertFalse(self.client.tasky.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
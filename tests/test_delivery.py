@@ -0,0 +1,99 @@
+# THIS USES PYTHON 3
+
+# DELIVERY TESTS
+# RETRANSMIT BACKOFF, ACKS AND FORGETTING CLIENTS
+
+# MODULE IMPORT
+import threading
+import unittest
+import time
+# LOCAL MODULES
+import delivery
+
+# CONSTANTS
+TIMEOUT_NS = 100 * delivery.NS_PER_MS
+
+
+# CLASSES
+class DeliveryTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.failed = []
+        self.tracker = delivery.DeliveryTracker(lambda msg, address: self.sent.append(msg), retries=3,
+                                                timeout_ns=TIMEOUT_NS, on_failed=self.failed.append)
+
+    def send(self, client_id, msg=b"start"):
+        # RETURNS WHEN IT WAS SENT, EVERY RETRANSMIT IS DUE RELATIVE TO THAT
+        before = time.monotonic_ns()
+        record = self.tracker.send_command(client_id, ("127.0.0.1", 10000 + client_id), b"start",
+                                           self.tracker.next_seq(), msg)
+        return record, before
+
+    def test_backs_off_then_fails(self):
+        record, sent_ns = self.send(5)
+        self.assertEqual(self.sent, [b"start"])
+        # NOT DUE YET
+        self.tracker.service(sent_ns)
+        self.assertEqual(len(self.sent), 1)
+        # THE WAIT DOUBLES AFTER EVERY ATTEMPT
+        due = record.first_ns + TIMEOUT_NS
+        for attempt, wait in ((2, 2), (3, 4), (4, 8)):
+            nxt = self.tracker.service(due)
+            self.assertEqual((record.attempts, len(self.sent)), (attempt, attempt))
+            self.assertEqual(nxt, due + wait * TIMEOUT_NS)
+            due = nxt
+        # OUT OF RETRIES
+        self.assertIsNone(self.tracker.service(due))
+        self.assertEqual(record.state, delivery.FAILED)
+        self.assertEqual(self.failed, [record])
+        self.assertEqual(len(self.sent), 4)
+
+    def test_ack_stops_retransmits(self):
+        record, _ = self.send(5)
+        self.assertIs(self.tracker.ack(5, record.seq, [b"12"]), record)
+        self.assertEqual((record.state, record.reply), (delivery.ACKED, [b"12"]))
+        # A DUPLICATE OR UNKNOWN ACK IS NOTHING
+        self.assertIsNone(self.tracker.ack(5, record.seq))
+        self.assertIsNone(self.tracker.ack(6, record.seq))
+        self.tracker.service(record.first_ns + 100 * TIMEOUT_NS)
+        self.assertEqual(len(self.sent), 1)
+
+    def test_acks_are_per_client(self):
+        five, _ = self.send(5)
+        six, _ = self.send(6)
+        self.assertNotEqual(five.seq, six.seq)
+        self.assertIsNone(self.tracker.ack(5, six.seq))
+        self.tracker.ack(6, six.seq)
+        self.assertEqual(self.tracker.get_status()[5]["STATE"], delivery.PENDING)
+        self.assertEqual(self.tracker.get_status()[6]["STATE"], delivery.ACKED)
+
+    def test_forget(self):
+        gone, _ = self.send(5)
+        kept, _ = self.send(6)
+        self.tracker.forget({5})
+        self.assertEqual(list(self.tracker.get_status()), [6])
+        self.tracker.service(kept.first_ns + TIMEOUT_NS)
+        self.assertEqual((gone.attempts, kept.attempts), (1, 2))
+        self.assertIsNone(self.tracker.ack(5, gone.seq))
+
+    def test_thread_resends_until_acked_and_stops_when_killed(self):
+        tracker = delivery.DeliveryTracker(lambda msg, address: self.sent.append(msg),
+                                           timeout_ns=5 * delivery.NS_PER_MS)
+        thread = threading.Thread(target=tracker.run)
+        thread.start()
+        try:
+            record = tracker.send_command(5, ("127.0.0.1", 10005), b"start", tracker.next_seq(), b"start")
+            deadline = time.monotonic() + 5
+            while len(self.sent) < 2 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            tracker.ack(5, record.seq)
+        finally:
+            tracker.kill()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertGreaterEqual(record.attempts, 2)
+        self.assertEqual(record.state, delivery.ACKED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# THIS USES PYTHON 3
+
+# EVENTS TESTS
+# THE SERVER-SENT EVENTS WIRE FORMAT AND FANNING EVENTS OUT TO SUBSCRIBERS
+
+# MODULE IMPORT
+import unittest
+import json
+# LOCAL MODULES
+import events
+
+
+# CLASSES
+class EventTest(unittest.TestCase):
+    def test_sse_format(self):
+        event = events.Event(7, "client", {"ID": 5, "CONNECTED": True})
+        lines = event.to_sse().decode().split("\n")
+        self.assertEqual(lines[:2], ["id: 7", "event: client"])
+        self.assertTrue(lines[2].startswith("data: "))
+        # ONE BLANK LINE ENDS THE EVENT
+        self.assertEqual(lines[3:], ["", ""])
+        self.assertEqual(json.loads(lines[2][len("data: "):]), event.as_dict())
+        self.assertEqual(event.as_dict()["DATA"], {"ID": 5, "CONNECTED": True})
+
+    def test_data_that_isnt_json_is_sent_as_text(self):
+        event = events.Event(1, "run", {"LATENESS": object})
+        self.assertIn("<class 'object'>", json.loads(event.to_sse().decode().split("\n")[2][6:])["DATA"]["LATENESS"])
+
+
+class EventBusTest(unittest.TestCase):
+    def test_events_are_numbered_and_fanned_out(self):
+        bus = events.EventBus()
+        first, second = [], []
+        bus.subscribe(first.append)
+        bus.subscribe(second.append)
+        bus.publish("run", {"STATE": "STARTED"})
+        bus.publish("run", {"STATE": "DONE"})
+        self.assertEqual([event.id for event in first], [1, 2])
+        self.assertEqual([event.data["STATE"] for event in second], ["STARTED", "DONE"])
+
+    def test_a_subscriber_that_falls_behind_is_dropped(self):
+        bus = events.EventBus()
+        seen = []
+        bus.subscribe(lambda event: False)
+        bus.subscribe(seen.append)
+        with self.assertLogs(events.NAME, "WARNING"):
+            bus.publish("task")
+        self.assertEqual(bus.subscriber_count(), 1)
+        bus.publish("task")
+        self.assertEqual(len(seen), 2)
+
+    def test_unsubscribe(self):
+        bus = events.EventBus()
+        deliver = bus.subscribe(lambda event: True)
+        bus.unsubscribe(deliver)
+        bus.unsubscribe(deliver)
+        self.assertEqual(bus.subscriber_count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# THIS USES PYTHON 3
+
+# LIVENESS TESTS
+# PHI FROM PING/PONG DELAYS AND THE CONNECTED, SUSPECT AND DOWN CALLBACKS
+
+# MODULE IMPORT
+import unittest
+# LOCAL MODULES
+import liveness
+import registry
+
+# CONSTANTS
+NS_PER_MS = liveness.NS_PER_MS
+NS_PER_SEC = liveness.NS_PER_SEC
+
+
+# CLASSES
+class LivenessMonitorTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.monitor = liveness.LivenessMonitor(min_interval=1, max_interval=8, min_std_ns=10 * NS_PER_MS,
+                                                on_suspect=self.called("SUSPECT"), on_down=self.called("DOWN"),
+                                                on_up=self.called("UP"))
+        self.client = registry.ClientState(5, "10.0.0.5", 10006)
+        self.now = 0
+        # A HISTORY OF PONGS 20 TO 30 MS AFTER THEIR PINGS
+        for delay in (20, 25, 30) * 4:
+            self.exchange(delay * NS_PER_MS)
+
+    def called(self, name):
+        return lambda client, phi: self.calls.append((name, client.id))
+
+    def exchange(self, delay_ns):
+        self.monitor.pinged(self.client, self.now)
+        self.now += delay_ns
+        self.monitor.heartbeat(self.client, self.now)
+        self.now += NS_PER_SEC
+
+    def phi(self, silence_ns):
+        return self.client.heartbeat.phi(self.now + silence_ns, self.monitor.min_std_ns)
+
+    def test_phi_rises_with_silence(self):
+        self.assertEqual(self.phi(0), 0.0)
+        self.monitor.pinged(self.client, self.now)
+        phis = [self.phi(ms * NS_PER_MS) for ms in (0, 25, 40, 60, 100)]
+        self.assertEqual(phis, sorted(phis))
+        self.assertLess(phis[1], 1)
+        self.assertGreater(phis[-1], self.monitor.down_phi)
+
+    def test_suspect_then_down_once_each(self):
+        self.monitor.pinged(self.client, self.now)
+        for ms in range(0, 500, 5):
+            self.monitor.check([self.client], self.now + ms * NS_PER_MS)
+        self.assertEqual(self.calls, [("SUSPECT", 5), ("DOWN", 5)])
+        self.assertEqual(self.client.liveness, liveness.DOWN)
+        # A PONG BRINGS IT BACK
+        self.assertEqual(self.monitor.heartbeat(self.client, self.now + NS_PER_SEC), liveness.DOWN)
+        self.assertEqual(self.calls[-1], ("UP", 5))
+        self.assertEqual(self.client.liveness, liveness.CONNECTED)
+
+    def test_suspects_are_pinged_right_away_at_the_minimum_interval(self):
+        self.assertEqual(self.client.heartbeat.interval_ns, 8 * NS_PER_SEC)
+        self.monitor.pinged(self.client, self.now)
+        suspect_at = self.now + 60 * NS_PER_MS
+        self.monitor.check([self.client], suspect_at)
+        self.assertEqual(self.calls, [("SUSPECT", 5)])
+        self.assertEqual(self.client.heartbeat.interval_ns, NS_PER_SEC)
+        self.assertEqual(self.monitor.due([self.client], suspect_at), [self.client])
+
+    def test_healthy_clients_back_off_to_the_maximum(self):
+        intervals = []
+        client = registry.ClientState(6, "10.0.0.6", 10006)
+        self.monitor.heartbeat(client, 0)
+        for step in range(6):
+            self.monitor.pinged(client, step * NS_PER_SEC)
+            self.monitor.heartbeat(client, step * NS_PER_SEC + NS_PER_MS)
+            intervals.append(client.heartbeat.interval_ns // NS_PER_SEC)
+        self.assertEqual(intervals, [2, 4, 8, 8, 8, 8])
+
+    def test_status(self):
+        status = self.monitor.get_status([self.client], self.now)
+        self.assertEqual(status[5]["STATE"], liveness.CONNECTED)
+        self.assertEqual(status[5]["PHI"], 0.0)
+
+    def test_options_from_config(self):
+        options = liveness.options_from_config({"PING TIMER": 30, "HEARTBEAT": {"DOWN PHI": 12}})
+        self.assertEqual((options["min_interval"], options["max_interval"], options["down_phi"]), (1, 30, 12))
+
+
+if __name__ == "__main__":
+    unittest.main()
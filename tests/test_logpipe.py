@@ -0,0 +1,125 @@
+# THIS USES PYTHON 3
+
+# LOGPIPE TESTS
+# LAZY AND REPEATING MESSAGES, DROPPING WHEN THE WRITER FALLS BEHIND AND THE JSON LOG
+
+# MODULE IMPORT
+import unittest.mock
+import unittest
+import logging
+import queue
+import json
+# LOCAL MODULES
+import logpipe
+
+# CONSTANTS
+NS_PER_SEC = logpipe.NS_PER_SEC
+
+
+# FUNCTIONS
+def log_record(msg, level=logging.INFO):
+    return logging.makeLogRecord({"name": logpipe.NAME, "module": "test", "levelno": level,
+                                  "levelname": logging.getLevelName(level), "msg": msg})
+
+
+# CLASSES
+class ListHandler(logging.Handler):
+    """
+    ListHandler - Keeps every line it's handed
+    """
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class LazyTest(unittest.TestCase):
+    def test_formatted_only_when_written(self):
+        late = unittest.mock.Mock()
+        late.__format__ = unittest.mock.Mock(return_value="1.500")
+        message = logpipe.Lazy("TASK {0} FIRED {1} MS LATE", 3, late)
+        late.__format__.assert_not_called()
+        self.assertEqual(str(message), "TASK 3 FIRED 1.500 MS LATE")
+        self.assertIsNone(message.key)
+
+
+class RepeatFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        patcher = unittest.mock.patch.object(logpipe.time, "monotonic_ns", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.repeats = logpipe.RepeatFilter(10 * NS_PER_SEC)
+
+    def pong(self, client_id):
+        record = log_record(logpipe.Repeating(client_id, "PONG FROM CLIENT ID {0}", client_id))
+        return self.repeats.filter(record), record
+
+    def test_one_line_per_key_per_interval(self):
+        self.assertTrue(self.pong(5)[0])
+        self.assertTrue(self.pong(6)[0])
+        self.now = 9 * NS_PER_SEC
+        self.assertEqual([self.pong(5)[0] for _ in range(3)], [False] * 3)
+        self.now = 10 * NS_PER_SEC
+        passed, record = self.pong(5)
+        self.assertTrue(passed)
+        self.assertEqual(record.getMessage(), "PONG FROM CLIENT ID 5 (3 MORE LIKE THIS SUPPRESSED)")
+
+    def test_other_lines_always_go_through(self):
+        for msg in ("PLAIN", logpipe.Lazy("LAZY {0}", 1)):
+            with self.subTest(msg=msg):
+                self.assertTrue(all(self.repeats.filter(log_record(msg)) for _ in range(3)))
+
+    def test_an_interval_of_zero_turns_it_off(self):
+        self.repeats.interval_ns = 0
+        self.assertTrue(all(self.pong(5)[0] for _ in range(3)))
+
+
+class DroppingTest(unittest.TestCase):
+    def setUp(self):
+        self.front = logpipe.DroppingQueueHandler(queue.Queue(2))
+        self.out = ListHandler()
+        self.writer = logpipe.LogWriter(self.front.queue, self.out)
+
+    def drain(self):
+        while not self.front.queue.empty():
+            self.writer.handle(self.front.queue.get_nowait())
+
+    def test_a_full_queue_drops_and_counts(self):
+        for line in range(5):
+            self.front.handle(log_record("LINE {0}".format(line)))
+        self.assertEqual(self.front.dropped, 3)
+        self.drain()
+        self.assertEqual(self.out.lines, ["LINE 0", "LINE 1"])
+        # THE NEXT LINE THAT FITS OWNS UP TO THE GAP
+        self.front.handle(log_record("LINE 5"))
+        self.front.handle(log_record("LINE 6"))
+        self.drain()
+        self.assertEqual(self.out.lines[2:], ["LOGGING FELL BEHIND, DROPPED 3 LINES", "LINE 5", "LINE 6"])
+
+    def test_records_arent_formatted_on_the_way_in(self):
+        message = logpipe.Lazy("{0}", 1)
+        self.front.handle(log_record(message))
+        self.assertIs(self.front.queue.get_nowait().msg, message)
+
+
+class JsonLinesFormatterTest(unittest.TestCase):
+    def test_repeating_lines_keep_their_template(self):
+        message = logpipe.Repeating(5, "PONG FROM CLIENT ID {0}", 5)
+        message.suppressed = 2
+        entry = json.loads(logpipe.JsonLinesFormatter().format(log_record(message, logging.WARNING)))
+        self.assertEqual(entry["LEVEL"], "WARNING")
+        self.assertEqual(entry["MESSAGE"], "PONG FROM CLIENT ID 5 (2 MORE LIKE THIS SUPPRESSED)")
+        self.assertEqual((entry["TEMPLATE"], entry["ARGS"], entry["KEY"], entry["SUPPRESSED"]),
+                         ("PONG FROM CLIENT ID {0}", [5], 5, 2))
+
+    def test_plain_lines(self):
+        entry = json.loads(logpipe.JsonLinesFormatter().format(log_record("PLAIN")))
+        self.assertEqual(entry["MESSAGE"], "PLAIN")
+        self.assertNotIn("TEMPLATE", entry)
+
+
+if __name__ == "__main__":
+    unittest.main()
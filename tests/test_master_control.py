@@ -0,0 +1,225 @@
+# THIS USES PYTHON 3
+
+# MASTER CONTROL TESTS
+# THE CLOCK OFFSET ESTIMATE FROM A PING/PONG EXCHANGE, THE PING TIMER, THE WEB API
+# AND HOW LONG A PAUSE, RESUME, SEEK OR STOP TOOK TO APPLY
+
+# MODULE IMPORT
+import unittest.mock
+import threading
+import unittest
+import time
+# LOCAL MODULES
+import master_control
+import registry
+import delivery
+import protocol
+
+# CONSTANTS
+NS_PER_MS = 1000000
+NS_PER_SEC = 1000000000
+STATUS = {"STARTED": False, "CLIENTS": {5: {"CONNECTED": True}}, "TIMELINE": [{"INDEX": 0}]}
+
+
+# CLASSES
+class ClockSampleTest(unittest.TestCase):
+    def exchange(self, offset_ns, out_ns, back_ns, turnaround_ns=200000, t1=10 * NS_PER_SEC):
+        # THE FOUR TIMESTAMPS OF A PING SENT AT t1 TO A CLIENT offset_ns AHEAD OF US
+        t2 = t1 + out_ns + offset_ns
+        t3 = t2 + turnaround_ns
+        t4 = t3 - offset_ns + back_ns
+        return master_control.clock_sample(t1, t2, t3, t4)
+
+    def test_symmetric_path_is_exact(self):
+        for offset_ns in (0, 5 * NS_PER_SEC, -3 * NS_PER_SEC):
+            with self.subTest(offset_ns=offset_ns):
+                self.assertEqual(self.exchange(offset_ns, NS_PER_MS, NS_PER_MS), (2 * NS_PER_MS, offset_ns))
+
+    def test_client_turnaround_isnt_round_trip(self):
+        rtt, _ = self.exchange(0, NS_PER_MS, NS_PER_MS, turnaround_ns=50 * NS_PER_MS)
+        self.assertEqual(rtt, 2 * NS_PER_MS)
+
+    def test_asymmetry_is_off_by_half_the_difference(self):
+        # 3 MS OUT AND 1 MS BACK LOOKS LIKE THE CLIENT IS 1 MS FURTHER AHEAD
+        self.assertEqual(self.exchange(5 * NS_PER_SEC, 3 * NS_PER_MS, NS_PER_MS),
+                         (4 * NS_PER_MS, 5 * NS_PER_SEC + NS_PER_MS))
+
+
+class LoopingTimerTest(unittest.TestCase):
+    def test_runs_on_one_thread_until_cancelled(self):
+        runs = []
+        timer = master_control.LoopingTimer(0.005, lambda: runs.append(threading.current_thread()),
+                                            immediate_fire=True)
+        timer.start()
+        deadline = time.monotonic() + 5
+        while len(runs) < 5 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        timer.cancel()
+        timer.thread.join(5)
+        self.assertFalse(timer.thread.is_alive())
+        # THE FIRST RUN IS ON THE CALLER'S THREAD, EVERY OTHER ON THE TIMER'S
+        self.assertIs(runs[0], threading.current_thread())
+        self.assertEqual(set(runs[1:]), {timer.thread})
+        count = len(runs)
+        time.sleep(0.02)
+        self.assertEqual(len(runs), count)
+
+    def test_cancel_wakes_a_long_wait(self):
+        timer = master_control.LoopingTimer(3600, lambda: None)
+        timer.start()
+        timer.cancel()
+        timer.thread.join(5)
+        self.assertFalse(timer.thread.is_alive())
+
+
+class FakeRoom:
+    """
+    FakeRoom - Just enough of a Room for handle_pong to auto start it
+    """
+    started = False
+    all_connected = True
+
+    def __init__(self):
+        self.starts = 0
+        self.webcontrol = master_control.WebControlState(callback=self.start_all)
+
+    def start_all(self):
+        self.starts += 1
+        # GIVE A SECOND PONG TIME TO SLIP IN BEFORE WE'RE MARKED STARTED
+        time.sleep(0.02)
+        self.started = True
+        self.webcontrol.set_tasks_running(True)
+
+    def get_start_auto(self):
+        return True
+
+    def set_client_connected(self, client, legacy=False, version=None):
+        pass
+
+    def set_client_relay(self, client, summary):
+        pass
+
+
+class WebControlTest(unittest.TestCase):
+    def setUp(self):
+        self.starts = []
+        self.state = master_control.WebControlState(callback=lambda: self.starts.append(True),
+                                                    status=lambda: STATUS)
+
+    def test_status_routes(self):
+        self.assertEqual(master_control.web_api(self.state, "GET", "/api/status"), (200, STATUS))
+        self.assertEqual(master_control.web_api(self.state, "GET", "/api/clients/"), (200, STATUS["CLIENTS"]))
+        self.assertEqual(master_control.web_api(self.state, "GET", "/api/TIMELINE"), (200, STATUS["TIMELINE"]))
+        self.assertEqual(master_control.web_api(self.state, "POST", "/api/status")[0], 405)
+        self.assertEqual(master_control.web_api(self.state, "GET", "/api/nothing"),
+                         (404, {"RESULT": "UNKNOWN ACTION NOTHING"}))
+
+    def test_start_runs_once_until_tasks_finish(self):
+        self.assertEqual(master_control.web_api(self.state, "GET", "/api/start")[0], 405)
+        self.assertEqual(master_control.web_api(self.state, "POST", "/api/start"), (202, {"RESULT": "STARTED"}))
+        self.state.set_tasks_running(True)
+        self.assertEqual(master_control.web_api(self.state, "POST", "/api/start"),
+                         (409, {"RESULT": "ALREADY RUNNING"}))
+        self.assertIn("ALREADY RUNNING", master_control.web_control_page(self.state, "/control.html?cmd=start"))
+        self.state.set_tasks_running(False)
+        self.assertIn("SCRIPT STARTED", master_control.web_control_page(self.state, "/control.html?cmd=start"))
+        self.assertEqual(len(self.starts), 2)
+        self.assertEqual(master_control.web_api(self.state, "POST", "/api/stop"),
+                         (409, {"RESULT": "NOTHING TO STOP"}))
+
+    def test_auto_start_from_pongs_on_two_threads_runs_once(self):
+        room = FakeRoom()
+        handler = master_control.ControllerHandler.__new__(master_control.ControllerHandler)
+        handler.room = room
+        barrier = threading.Barrier(2)
+
+        def pong():
+            barrier.wait()
+            handler.handle_pong(None, None, None, False, time.monotonic_ns())
+
+        threads = [threading.Thread(target=pong) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(room.starts, 1)
+
+
+class ControlRecordTest(unittest.TestCase):
+    def setUp(self):
+        # CLICKED AT 1000 MS, APPLIED BY THE MASTER 1 MS LATER
+        self.record = master_control.ControlRecord(protocol.CONTROL_SEEK, 42, 2500 * NS_PER_MS,
+                                                   1000 * NS_PER_MS, 1001 * NS_PER_MS, [5, 6, 7])
+
+    def test_applied_and_skipped(self):
+        self.record.applied(5, 3 * NS_PER_MS)
+        self.record.applied(6, 4 * NS_PER_MS, estimated=True)
+        self.assertFalse(self.record.done())
+        self.record.skip(7, "LEGACY")
+        self.assertTrue(self.record.done())
+        report = self.record.as_dict()
+        self.assertEqual(report["ACTION"], "SEEK")
+        self.assertEqual(report["POSITION"], 2.5)
+        self.assertEqual(report["LATENCY MS"], {"MASTER": 1.0, 5: 3.0, 6: 4.0})
+        self.assertEqual(report["MAX MS"], 4.0)
+        self.assertEqual(report["ESTIMATED"], [6])
+        self.assertEqual(report["SKIPPED"], {7: "LEGACY"})
+        self.assertEqual(report["PENDING"], [])
+
+    def test_all_quiet_waits_for_everyone_who_applied_it(self):
+        self.record.applied(5, 3 * NS_PER_MS)
+        self.record.skip(6, "LEGACY")
+        self.record.quieted("MASTER", 2 * NS_PER_MS)
+        self.record.quieted(5, 9 * NS_PER_MS, estimated=True)
+        # 7 HASN'T ACKED
+        self.assertFalse(self.record.all_quiet())
+        self.record.applied(7, 5 * NS_PER_MS)
+        self.assertFalse(self.record.all_quiet())
+        self.record.quieted(7, 6 * NS_PER_MS)
+        self.assertTrue(self.record.all_quiet())
+        report = self.record.as_dict()
+        self.assertEqual(report["MAX QUIET MS"], 9.0)
+        self.assertEqual(report["ESTIMATED"], [5])
+
+    def test_nothing_back_yet(self):
+        report = self.record.as_dict()
+        self.assertEqual(report["PENDING"], [5, 6, 7])
+        self.assertEqual(report["MAX MS"], 1.0)
+        self.assertIsNone(report["MAX QUIET MS"])
+
+
+class ReportClientControlTest(unittest.TestCase):
+    """
+    ReportClientControlTest - Control acks run through Controller.report_client_control
+    on a stand in with just the clients and the last control
+    """
+    def setUp(self):
+        self.room = unittest.mock.Mock(clients=registry.ClientRegistry())
+        for client_id in (5, 6):
+            self.room.clients.add(client_id, "10.0.0.{0}".format(client_id), 10006)
+        self.room.last_control = master_control.ControlRecord(protocol.CONTROL_PAUSE, 42, 0, 1000 * NS_PER_MS,
+                                                              1001 * NS_PER_MS, [5, 6])
+
+    def ack(self, client_id, acked_ns=None, reply=()):
+        sent = delivery.Delivery(client_id, 42, b"control", b"", ("10.0.0.5", 10006), 1000 * NS_PER_MS)
+        sent.acked_ns = acked_ns
+        sent.reply = list(reply)
+        master_control.Controller.report_client_control(self.room, sent)
+
+    def test_applied_on_the_client_clock(self):
+        self.room.clients.get(5).offset = 7 * NS_PER_SEC
+        self.ack(5, 1010 * NS_PER_MS, [7 * NS_PER_SEC + 1004 * NS_PER_MS])
+        with self.assertLogs(master_control.NAME, "WARNING"):
+            self.ack(6, 1010 * NS_PER_MS)
+        record = self.room.last_control
+        self.assertEqual(record.latency[5], 4 * NS_PER_MS)
+        self.assertEqual(record.skipped, {6: "NOT RUNNING"})
+        self.assertTrue(record.done())
+
+    def test_a_removed_client_is_ignored(self):
+        self.room.clients.remove(6)
+        self.ack(6, 1010 * NS_PER_MS, [1004 * NS_PER_MS])
+        self.assertEqual(self.room.last_control.pending, {5, 6})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# THIS USES PYTHON 3
+
+# METRICS TESTS
+# HISTOGRAM BUCKETS, LABELS AND THE PROMETHEUS TEXT FORMAT, ON A REGISTRY OF THEIR OWN
+
+# MODULE IMPORT
+import urllib.request
+import unittest
+import json
+# LOCAL MODULES
+import metrics
+
+# CONSTANTS
+NS_PER_MS = 1000000
+
+
+# CLASSES
+class HistogramTest(unittest.TestCase):
+    def setUp(self):
+        self.histogram = metrics.Histogram(buckets=(0.001, 0.01))
+
+    def test_buckets_are_cumulative_and_inclusive(self):
+        for value_ms in (0.5, 1, 2, 50):
+            self.histogram.observe_ns(int(value_ms * NS_PER_MS))
+        cumulative, count, sum_ns, max_ns = self.histogram.snapshot()
+        # 1 MS IS IN THE le="0.001" BUCKET
+        self.assertEqual(cumulative, [2, 3, 4])
+        self.assertEqual((count, sum_ns, max_ns), (4, int(53.5 * NS_PER_MS), 50 * NS_PER_MS))
+
+    def test_quantiles(self):
+        self.assertIsNone(self.histogram.quantile(0.5))
+        for value_ms in (0.5, 0.5, 5, 50):
+            self.histogram.observe_ns(int(value_ms * NS_PER_MS))
+        self.assertEqual(self.histogram.quantile(0.5), 0.001)
+        self.assertEqual(self.histogram.quantile(0.75), 0.01)
+        # PAST THE LAST BOUND IS THE SLOWEST OBSERVATION
+        self.assertEqual(self.histogram.quantile(0.99), 0.05)
+        report = self.histogram.as_dict()
+        self.assertEqual((report["P50"], report["MAX"], report["BUCKETS"]), (0.001, 0.05, {"0.001": 2, "0.01": 3}))
+
+
+class RenderTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+    def test_prometheus_text(self):
+        sent = self.registry.register(metrics.COUNTER, "test_sent_total", "Datagrams sent\nby kind",
+                                      labels=("kind",))
+        sent.labels("start").inc(2)
+        sent.labels('say "hi"').inc()
+        self.registry.register(metrics.GAUGE, "test_clients", "Connected clients").set(3)
+        rtt = self.registry.register(metrics.HISTOGRAM, "test_rtt_seconds", "Round trip", labels=("client",),
+                                     buckets=(0.001, 0.01))
+        rtt.labels(5).observe_ns(2 * NS_PER_MS)
+        self.assertEqual(self.registry.render().splitlines(), [
+            "# HELP test_clients Connected clients",
+            "# TYPE test_clients gauge",
+            "test_clients 3",
+            "# HELP test_rtt_seconds Round trip",
+            "# TYPE test_rtt_seconds histogram",
+            'test_rtt_seconds_bucket{client="5",le="0.001"} 0',
+            'test_rtt_seconds_bucket{client="5",le="0.01"} 1',
+            'test_rtt_seconds_bucket{client="5",le="+Inf"} 1',
+            'test_rtt_seconds_sum{client="5"} 0.002',
+            'test_rtt_seconds_count{client="5"} 1',
+            "# HELP test_sent_total Datagrams sent\\nby kind",
+            "# TYPE test_sent_total counter",
+            'test_sent_total{kind="say \\"hi\\""} 1',
+            'test_sent_total{kind="start"} 2'])
+
+    def test_declaring_twice_is_the_same_metric(self):
+        first = self.registry.register(metrics.COUNTER, "test_total", "Things")
+        self.assertIs(self.registry.register(metrics.COUNTER, "test_total", "Things"), first)
+        with self.assertRaises(ValueError):
+            self.registry.register(metrics.GAUGE, "test_total", "Things")
+
+    def test_labels(self):
+        metric = self.registry.register(metrics.COUNTER, "test_acks_total", "Acks", labels=("client",))
+        with self.assertRaises(ValueError):
+            metric.labels()
+        metric.labels(5).inc()
+        metric.remove(5)
+        self.assertEqual(metric.as_dict()["VALUES"], [])
+
+    def test_served_over_http(self):
+        self.registry.register(metrics.COUNTER, "test_total", "Things").inc()
+        server = metrics.serve(("127.0.0.1", 0), self.registry)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = "http://127.0.0.1:{0}".format(server.server_address[1])
+        with urllib.request.urlopen(base + metrics.METRICS_PATH) as response:
+            self.assertEqual(response.headers["Content-type"], metrics.CONTENT_TYPE)
+            self.assertIn(b"test_total 1\n", response.read())
+        with urllib.request.urlopen(base + metrics.JSON_PATH) as response:
+            self.assertEqual(json.load(response)["test_total"]["VALUES"], [{"VALUE": 1, "LABELS": {}}])
+
+
+if __name__ == "__main__":
+    unittest.main()
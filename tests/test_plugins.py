@@ -0,0 +1,151 @@
+# THIS USES PYTHON 3
+
+# PLUGINS TESTS
+# THE WORKER POOL, INLINE RUNS AND THE BUILT IN TASK TYPES
+
+# MODULE IMPORT
+import threading
+import unittest
+import tempfile
+import time
+import os
+# LOCAL MODULES
+import taskplan
+import plugins
+import tasker
+
+# CONSTANTS
+# HOW LONG A RUN GETS BEFORE THE TEST GIVES UP
+TIMEOUT_SECONDS = 5
+
+
+# FUNCTIONS
+def plugin_task(task_type, command=""):
+    return {"TYPE": task_type, "DELTA TIME FROM START": 10, "TIME UNITS": "MILLISECONDS", "COMMAND": command}
+
+
+def wait_for(condition):
+    # POLL UNTIL condition() IS TRUE, FALSE IF IT NEVER IS
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+# CLASSES
+class BlockingPlugin(plugins.TaskPlugin):
+    """
+    BlockingPlugin - Holds its worker until the test opens the gate
+    """
+    def __init__(self):
+        self.gate = threading.Event()
+        self.threads = []
+
+    def run(self, args):
+        self.threads.append(threading.current_thread())
+        if args == ["FAIL"]:
+            raise RuntimeError("PROP JAMMED")
+        self.gate.wait(TIMEOUT_SECONDS)
+
+
+class InlinePlugin(BlockingPlugin):
+    INLINE = True
+
+
+class PluginTestCase(unittest.TestCase):
+    def setUp(self):
+        self.blocking = plugins.REGISTRY["TEST BLOCK"] = BlockingPlugin()
+        self.inline = plugins.REGISTRY["TEST INLINE"] = InlinePlugin()
+        self.inline.gate.set()
+        self.addCleanup(plugins.REGISTRY.pop, "TEST BLOCK")
+        self.addCleanup(plugins.REGISTRY.pop, "TEST INLINE")
+        self.addCleanup(self.blocking.gate.set)
+
+    def task(self, idx, task_type, command=""):
+        return taskplan.compile_task(idx, plugin_task(task_type, command))
+
+
+class PluginRunnerTest(PluginTestCase):
+    def test_busy_count_and_the_queue_warning(self):
+        runner = plugins.PluginRunner(workers=2)
+        records = [runner.run(self.task(0, "TEST BLOCK")), runner.run(self.task(1, "test block"))]
+        with self.assertLogs(plugins.NAME, "WARNING") as logged:
+            records.append(runner.run(self.task(2, "TEST BLOCK")))
+        self.assertIn("WAITS BEHIND 1 OTHERS", logged.output[0])
+        self.assertTrue(wait_for(lambda: len(self.blocking.threads) == 2))
+        self.assertEqual((runner._busy, records[2].state), (3, plugins.QUEUED))
+        self.blocking.gate.set()
+        self.assertTrue(wait_for(lambda: runner._busy == 0))
+        self.assertEqual([record.state for record in records], [plugins.DONE] * 3)
+        self.assertNotIn(threading.current_thread(), self.blocking.threads)
+        runner.shutdown()
+        self.assertEqual([run["INDEX"] for run in runner.get_report()], [0, 1, 2])
+
+    def test_cancel_drops_queued_runs_from_the_busy_count(self):
+        runner = plugins.PluginRunner(workers=1)
+        running = runner.run(self.task(0, "TEST BLOCK"))
+        with self.assertLogs(plugins.NAME, "WARNING"):
+            queued = [runner.run(self.task(idx, "TEST BLOCK")) for idx in (1, 2)]
+        self.assertTrue(wait_for(lambda: running.state == plugins.RUNNING))
+        runner.shutdown(cancel=True)
+        self.assertEqual([record.state for record in queued], [plugins.CANCELLED] * 2)
+        self.assertEqual(runner._busy, 1)
+        # THE RUN ALREADY GOING CAN'T BE INTERRUPTED, IT FINISHES AND NOTHING ELSE RUNS
+        self.blocking.gate.set()
+        self.assertTrue(wait_for(lambda: runner._busy == 0))
+        self.assertEqual(running.state, plugins.DONE)
+        self.assertEqual(len(self.blocking.threads), 1)
+
+    def test_inline_runs_on_the_caller_and_failures_are_kept(self):
+        runner = plugins.PluginRunner()
+        with self.assertLogs(plugins.NAME, "ERROR"):
+            record = runner.run(self.task(3, "TEST INLINE", "FAIL"))
+        self.assertEqual(self.inline.threads, [threading.current_thread()])
+        self.assertEqual((record.state, record.error), (plugins.FAILED, "PROP JAMMED"))
+        self.assertIsNone(runner._pool)
+        self.assertEqual(runner._busy, 0)
+
+
+class BuiltInPluginTest(unittest.TestCase):
+    def test_file_writes_its_text(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "value")
+            task = plugin_task("FILE", "{0} 1".format(path))
+            plugins.get("FILE").run(plugins.get("FILE").prepare(task))
+            with open(path) as written:
+                self.assertEqual(written.read(), "1")
+
+    def test_call_imports_its_function_once(self):
+        function, args = plugins.get("CALL").prepare(plugin_task("CALL", "os.path:join a b"))
+        self.assertIs(function, os.path.join)
+        self.assertEqual(args, ["a", "b"])
+
+    def test_bad_commands(self):
+        for task_type, command in (("UDP", "localhost"), ("FILE", ""), ("CALL", "os.path"),
+                                   ("CALL", "os:sep")):
+            with self.subTest(task_type=task_type, command=command):
+                with self.assertRaises(ValueError):
+                    plugins.get(task_type).prepare(plugin_task(task_type, command))
+
+
+class TaskerPluginTest(PluginTestCase):
+    def test_bad_command_stops_the_load(self):
+        with self.assertRaises(taskplan.PlanError):
+            taskplan.compile_tasks([plugin_task("UDP", "localhost")])
+
+    def test_unknown_types_are_never_scheduled(self):
+        with self.assertLogs(tasker.NAME, "ERROR"):
+            plan = taskplan.compile_tasks([plugin_task("NO SUCH TYPE"), dict(plugin_task("STOP"), TYPE="STOP")])
+        self.assertEqual([idx for _, idx, _, _ in plan.schedule], [1])
+
+    def test_cue_runs_the_plugin(self):
+        tasky = tasker.Tasker(taskplan.compile_tasks([plugin_task("TEST INLINE", "x y"),
+                                                      dict(plugin_task("STOP"), TYPE="STOP")]))
+        tasky._dispatch(tasky.plan.tasks[0])
+        self.assertEqual(tasky.plugins.get_report()[0]["STATE"], plugins.DONE)
+
+
+if __name__ == "__main__":
+    unittest.main()
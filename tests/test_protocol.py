@@ -0,0 +1,106 @@
+# THIS USES PYTHON 3
+
+# PROTOCOL TESTS
+# EVERY BINARY MESSAGE DECODES TO WHAT IT WAS ENCODED FROM
+
+# MODULE IMPORT
+import unittest
+# LOCAL MODULES
+import protocol
+
+# CONSTANTS
+# BIG ENOUGH TO NEED ALL 64 BITS, NEGATIVE FOR THE SIGNED FIELDS
+BIG_NS = 2 ** 62 + 12345
+OFFSET_NS = -(2 ** 40) - 7
+
+
+# CLASSES
+class RoundTripTest(unittest.TestCase):
+    def decode(self, data, mtype):
+        self.assertTrue(protocol.is_binary(data))
+        msg = protocol.decode(data)
+        self.assertEqual(msg.type, mtype)
+        self.assertEqual(msg.version, protocol.VERSION)
+        return msg
+
+    def test_ping(self):
+        msg = self.decode(protocol.ping(BIG_NS), protocol.PING)
+        self.assertEqual(msg.timestamp, BIG_NS)
+
+    def test_pong(self):
+        msg = self.decode(protocol.pong(7, 1, BIG_NS, 3, protocol.FLAG_MULTICAST), protocol.PONG)
+        self.assertEqual((msg.client_id, msg.timestamp), (7, 3))
+        self.assertEqual(protocol.unpack_pong(msg), (1, BIG_NS, protocol.FLAG_MULTICAST))
+        self.assertIsNone(protocol.unpack_relay(msg, protocol.PONG_BODY))
+
+    def test_pong_from_a_relay(self):
+        msg = self.decode(protocol.pong(7, 1, 2, 3, relay=(3, 4)), protocol.PONG)
+        self.assertEqual(protocol.unpack_pong(msg), (1, 2, 0))
+        self.assertEqual(protocol.unpack_relay(msg, protocol.PONG_BODY), (3, 4))
+
+    def test_start(self):
+        msg = self.decode(protocol.start(0x7fffffff, 5, BIG_NS, protocol.FLAG_MASTER_CLOCK), protocol.START)
+        self.assertEqual(msg.seq, 0x7fffffff)
+        self.assertEqual(protocol.unpack_start(msg),
+                         (BIG_NS, protocol.FLAG_MASTER_CLOCK | protocol.FLAG_HAS_VALUE))
+
+    def test_start_without_an_instant(self):
+        msg = self.decode(protocol.start(1, 5), protocol.START)
+        _, flags = protocol.unpack_start(msg)
+        self.assertFalse(flags & protocol.FLAG_HAS_VALUE)
+
+    def test_ack(self):
+        msg = self.decode(protocol.ack(9, 42, 5, protocol.START, OFFSET_NS), protocol.ACK)
+        self.assertEqual((msg.client_id, msg.seq), (9, 42))
+        self.assertEqual(protocol.unpack_ack(msg), (protocol.START, protocol.FLAG_HAS_VALUE, OFFSET_NS))
+
+    def test_ack_from_a_relay(self):
+        msg = self.decode(protocol.ack(9, 42, 5, protocol.CONTROL, OFFSET_NS, relay=(1, 2)), protocol.ACK)
+        self.assertEqual(protocol.unpack_ack(msg), (protocol.CONTROL, protocol.FLAG_HAS_VALUE, OFFSET_NS))
+        self.assertEqual(protocol.unpack_relay(msg, protocol.ACK_BODY), (1, 2))
+
+    def test_ack_without_a_value(self):
+        msg = self.decode(protocol.ack(9, 42, 5, protocol.START), protocol.ACK)
+        self.assertEqual(protocol.unpack_ack(msg), (protocol.START, 0, 0))
+
+    def test_sync(self):
+        msg = self.decode(protocol.sync(5, OFFSET_NS, 1500), protocol.SYNC)
+        self.assertEqual(protocol.unpack_sync(msg), (OFFSET_NS, 1500))
+
+    def test_control(self):
+        for action in protocol.CONTROL_NAMES:
+            with self.subTest(action=protocol.CONTROL_NAMES[action]):
+                msg = self.decode(protocol.control(3, 5, action, BIG_NS, OFFSET_NS), protocol.CONTROL)
+                self.assertEqual(protocol.unpack_control(msg),
+                                 (action, BIG_NS, OFFSET_NS, protocol.FLAG_HAS_VALUE))
+
+    def test_quiet(self):
+        msg = self.decode(protocol.quiet(9, 42, BIG_NS), protocol.QUIET)
+        self.assertEqual((msg.client_id, msg.seq, msg.timestamp), (9, 42, BIG_NS))
+
+    def test_older_version(self):
+        msg = protocol.decode(protocol.ping(5, version=0))
+        self.assertEqual(msg.version, 0)
+        self.assertEqual(protocol.negotiate(protocol.VERSION + 1), protocol.VERSION)
+
+
+class BadMessageTest(unittest.TestCase):
+    def test_text_isnt_binary(self):
+        self.assertFalse(protocol.is_binary(b"ping 123"))
+
+    def test_short_datagram(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode(protocol.ping(5)[:-1])
+
+    def test_bad_magic(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode(b"xx" + protocol.ping(5)[2:])
+
+    def test_short_body(self):
+        msg = protocol.decode(protocol.start(1, 5, 6)[:-1])
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.unpack_start(msg)
+
+
+if __name__ == "__main__":
+    unittest.main()
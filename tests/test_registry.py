@@ -0,0 +1,84 @@
+# THIS USES PYTHON 3
+
+# REGISTRY TESTS
+# LOOKUPS, THE CONNECTED COUNT AND CHANGING THE CLIENTS IN ONE GO
+
+# MODULE IMPORT
+import threading
+import unittest
+# LOCAL MODULES
+import registry
+
+
+# CLASSES
+class ClientRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.clients = registry.ClientRegistry([{"ID": 5, "IP": "10.0.0.5", "PORT": 10006},
+                                                {"ID": 6, "IP": "10.0.0.6", "PORT": 10006}])
+
+    def test_lookups(self):
+        self.assertEqual(self.clients.get_by_address(("10.0.0.6", 10006)).id, 6)
+        self.assertIsNone(self.clients.get(7))
+        with self.assertRaises(ValueError):
+            self.clients.add(7, "10.0.0.5", 10006)
+
+    def test_connected_count(self):
+        five = self.clients.get(5)
+        self.assertTrue(self.clients.set_connected(five, True))
+        self.assertFalse(self.clients.set_connected(five, True))
+        self.assertEqual(self.clients.connected_count, 1)
+        self.assertFalse(self.clients.all_connected())
+        self.clients.set_connected(self.clients.get(6), True)
+        self.assertTrue(self.clients.all_connected())
+
+    def test_remove(self):
+        self.clients.set_connected(self.clients.get(5), True)
+        gone = self.clients.remove(5)
+        self.assertEqual(len(self.clients), 1)
+        self.assertIsNone(self.clients.get_by_address(("10.0.0.5", 10006)))
+        self.assertEqual(self.clients.connected_count, 0)
+        # A LATE FLIP OF A REMOVED CLIENT DOESN'T COUNT AGAINST THE ONES LEFT
+        self.clients.set_connected(gone, False)
+        self.assertEqual(self.clients.connected_count, 0)
+
+    def test_change(self):
+        old_index = self.clients.by_id
+        self.clients.set_connected(self.clients.get(5), True)
+        added, removed = self.clients.change([(7, "10.0.0.7", 10006)], [5])
+        self.assertEqual(([state.id for state in added], [state.id for state in removed]), ([7], [5]))
+        self.assertEqual(sorted(self.clients.by_id), [6, 7])
+        self.assertIsNone(self.clients.get_by_address(("10.0.0.5", 10006)))
+        self.assertEqual(self.clients.connected_count, 0)
+        # THE OLD INDEX IS REPLACED, NOT CHANGED, FOR ANYONE STILL LOOPING OVER IT
+        self.assertEqual(sorted(old_index), [5, 6])
+
+    def test_change_can_move_an_address(self):
+        # CLIENT 5 GOES AND 7 TAKES ITS ADDRESS
+        self.clients.change([(7, "10.0.0.5", 10006)], [5])
+        self.assertEqual(self.clients.get_by_address(("10.0.0.5", 10006)).id, 7)
+
+    def test_bad_change_changes_nothing(self):
+        for added in ([(6, "10.0.0.7", 10006)], [(7, "10.0.0.6", 10006)]):
+            with self.subTest(added=added), self.assertRaises(ValueError):
+                self.clients.change(added, [5])
+            self.assertEqual(sorted(self.clients.by_id), [5, 6])
+
+    def test_count_survives_many_threads(self):
+        clients = registry.ClientRegistry({"ID": idx, "IP": "10.0.0.1", "PORT": 10000 + idx} for idx in range(50))
+        states = list(clients)
+
+        def flip(connected):
+            for _ in range(200):
+                for state in states:
+                    clients.set_connected(state, connected)
+
+        threads = [threading.Thread(target=flip, args=(idx % 2 == 0,)) for idx in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(clients.connected_count, sum(1 for state in states if state.connected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# THIS USES PYTHON 3
+
+# RELAY TESTS
+# THE TEXT SUMMARY FIELD AND A MASTER STARTING AND PAUSING A CLIENT ONE RELAY
+# DOWN OVER LOOPBACK, DEBUG MODE SO NOTHING IS RUN
+
+# MODULE IMPORT
+import unittest.mock
+import unittest
+import asyncio
+import time
+# LOCAL MODULES
+import master_control
+import aioengine
+import protocol
+import client
+import tasker
+import relay
+
+# CONSTANTS
+# HOW LONG A RUN GETS BEFORE THE TEST GIVES UP
+TIMEOUT_SECONDS = 5
+TASKS = [{"TYPE": "TASK", "DELTA TIME FROM START": 10, "TIME UNITS": "MILLISECONDS", "COMMAND": "true"},
+         {"TYPE": "STOP", "DELTA TIME FROM START": 1, "TIME UNITS": "HOURS", "COMMAND": ""}]
+
+
+# FUNCTIONS
+async def wait_for(condition):
+    # POLL THE LOOP UNTIL condition() IS TRUE, FALSE IF IT NEVER IS
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.005)
+    return True
+
+
+# CLASSES
+class SummaryFieldTest(unittest.TestCase):
+    def test_round_trip(self):
+        fields = [b"mc", b"v2", relay.summary_field((3, 4))]
+        self.assertEqual(relay.parse_summary(fields), ([b"mc", b"v2"], (3, 4)))
+        self.assertEqual(relay.parse_summary([b"v2"]), ([b"v2"], None))
+        self.assertEqual(relay.parse_summary([]), ([], None))
+
+
+class BadMessageTest(unittest.TestCase):
+    def test_garbled_text_is_one_warning(self):
+        sock = unittest.mock.Mock()
+        myrelay = relay.Relay(sock, {"RELAY CLIENTS": [{"ID": 9, "IP": "127.0.0.1", "PORT": 10010}]})
+        self.addCleanup(myrelay.kill)
+        for data in (b"pong 1 x 3", b"ack 9", b"ack 9 1 rx/2", b"quiet 9 1"):
+            with self.subTest(data=data), self.assertLogs(relay.NAME, "WARNING") as logged:
+                myrelay.handle(data, time.monotonic_ns(), ("127.0.0.1", 10010))
+            self.assertIn("BAD MESSAGE", logged.output[0])
+        sock.sendto.assert_not_called()
+
+
+class RelayHopTest(unittest.IsolatedAsyncioTestCase):
+    async def test_master_starts_and_pauses_a_client_behind_a_relay(self):
+        loop = asyncio.get_running_loop()
+        leaf = aioengine.AsyncClient(("127.0.0.1", 0), client.ClientHandler, {"ID": 9, "TASKS": TASKS},
+                                     loop, debug=True)
+        hop = aioengine.AsyncClient(("127.0.0.1", 0), client.ClientHandler,
+                                    {"ID": 5, "TASKS": TASKS, "PING TIMER": 0.05,
+                                     "RELAY CLIENTS": [{"ID": 9, "IP": "127.0.0.1",
+                                                        "PORT": leaf.server_address[1]}]},
+                                    loop, debug=True)
+        config = {"PING TIMER": 0.05, "START OPTION": "WEB", "START LEAD MS": 50, "TASKS": TASKS,
+                  "CLIENTS": [{"ID": 5, "IP": "127.0.0.1", "PORT": hop.server_address[1]}]}
+        with unittest.mock.patch.object(master_control, "WEBPORT", 0):
+            controller = aioengine.AsyncController(("127.0.0.1", 0), master_control.ControllerHandler, config,
+                                                   loop, debug=True)
+        servers = (controller, hop, leaf)
+        serving = [loop.create_task(aioengine._serve(server)) for server in servers]
+        try:
+            # THE RELAY'S PONGS SAY ITS ONE CLIENT IS CONNECTED
+            myclient = controller.clients.get(5)
+            self.assertTrue(await wait_for(lambda: myclient.connected and myclient.relay == (1, 1)))
+            with self.assertLogs(relay.NAME, "INFO") as logged:
+                controller.webcontrol.push_start()
+                started = await wait_for(lambda: leaf.tasky.start_ns is not None and
+                                         controller.delivery.get_status()[5]["STATE"] == "ACKED")
+            self.assertTrue(started)
+            self.assertTrue(any("RELAYED SEQ" in line and "TO ALL 1 CLIENTS" in line for line in logged.output))
+            # ONE PROCESS, ONE CLOCK, SO TWO HOPS OF OFFSET ESTIMATES SHOULD STILL LINE UP
+            self.assertLess(abs(leaf.tasky.start_ns - controller.tasky.start_ns), 5 * tasker.NS_PER_MS)
+            self.assertIsNotNone(controller.control(protocol.CONTROL_PAUSE))
+            self.assertTrue(await wait_for(lambda: controller.last_control.done()))
+            self.assertTrue(leaf.tasky.is_paused())
+            self.assertTrue(hop.tasky.is_paused())
+        finally:
+            for server in servers:
+                server.kill()
+            await asyncio.gather(*serving)
+
+
+if __name__ == "__main__":
+    unittest.main()
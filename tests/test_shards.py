@@ -0,0 +1,135 @@
+# THIS USES PYTHON 3
+
+# SHARDS TESTS
+# A SHARD DRIVEN OVER ITS PIPE WITH A CLIENT ON LOOPBACK, AND THE LEADER TAKING ON
+# WHAT ITS SHARDS REPORT, DEBUG MODE SO NOTHING IS RUN
+
+# MODULE IMPORT
+import multiprocessing
+import threading
+import unittest
+import time
+# LOCAL MODULES
+import master_control
+import protocol
+import client
+import tasker
+import shards
+
+# CONSTANTS
+NS_PER_MS = tasker.NS_PER_MS
+# HOW LONG THE SHARD GETS TO ANSWER BEFORE THE TEST GIVES UP
+TIMEOUT_SECONDS = 5
+TASKS = [{"TYPE": "TASK", "DELTA TIME FROM START": 10, "TIME UNITS": "MILLISECONDS", "COMMAND": "true"},
+         {"TYPE": "STOP", "DELTA TIME FROM START": 1, "TIME UNITS": "HOURS", "COMMAND": ""}]
+
+
+# CLASSES
+class ShardTest(unittest.TestCase):
+    def setUp(self):
+        self.client = client.Client(("127.0.0.1", 0), client.ClientHandler, {"ID": 5, "TASKS": TASKS}, debug=True)
+        config = {"PING TIMER": 0.05, "START OPTION": "WEB", "TASKS": TASKS,
+                  "CLIENTS": [{"ID": 5, "IP": "127.0.0.1", "PORT": self.client.server_address[1]}]}
+        self.leader, conn = multiprocessing.Pipe()
+        self.shard = shards.Shard(("127.0.0.1", 0), master_control.ControllerHandler, config, conn, debug=True)
+        self.threads = [threading.Thread(target=server.serve_forever) for server in (self.client, self.shard)]
+        self.threads.append(threading.Thread(target=self.shard.listen))
+        for thread in self.threads:
+            thread.start()
+
+    def tearDown(self):
+        self.leader.send((shards.EXIT,))
+        self.threads[-1].join(TIMEOUT_SECONDS)
+        for server in (self.client, self.shard):
+            server.kill()
+            server.shutdown()
+            server.server_close()
+        self.leader.close()
+
+    def expect(self, kind):
+        # THE NEXT REPORT OF THIS KIND FROM THE SHARD, SKIPPING EVERYTHING ELSE
+        deadline = time.monotonic() + TIMEOUT_SECONDS
+        while self.leader.poll(max(deadline - time.monotonic(), 0)):
+            msg = self.leader.recv()
+            if msg[0] == kind:
+                return msg
+        self.fail("NO {0} FROM THE SHARD".format(kind))
+
+    def test_reports_and_does_what_the_leader_says(self):
+        # THE CONNECTED CLIENT IS REPORTED AS SOON AS IT ANSWERS A PING
+        msg = self.expect(shards.EVENT)
+        while msg[1] != "client":
+            msg = self.expect(shards.EVENT)
+        self.assertEqual((msg[2]["ID"], msg[2]["CONNECTED"]), (5, True))
+        self.leader.send((shards.START, 42, time.monotonic_ns() + 20 * NS_PER_MS))
+        _, seq, client_id, acked_ns = self.expect(shards.REACHED)
+        self.assertEqual((seq, client_id), (42, 5))
+        self.assertIsNotNone(acked_ns)
+        self.assertTrue(self.client.tasky.is_alive())
+        while self.client.tasky.start_ns is None:
+            time.sleep(0.001)
+        now = time.monotonic_ns()
+        self.leader.send((shards.CONTROL, 43, protocol.CONTROL_PAUSE, self.client.tasky.position_ns(), now))
+        _, seq, client_id, latency_ns, _ = self.expect(shards.APPLIED)
+        self.assertEqual((seq, client_id), (43, 5))
+        # ONE CLOCK, SO ONLY THE OFFSET ESTIMATE'S ERROR AND THE TRIP OVER LOOPBACK
+        self.assertLess(abs(latency_ns), 100 * NS_PER_MS)
+        self.assertTrue(self.client.tasky.is_paused())
+
+
+class LeaderTest(unittest.TestCase):
+    def setUp(self):
+        # NO SHARD PROCESSES, THE TEST PLAYS THEIR PART
+        config = {"PING TIMER": 1, "START OPTION": "AUTO", "WEB PORT": 0, "TASKS": TASKS,
+                  "CLIENTS": [{"ID": client_id, "IP": "127.0.0.1", "PORT": 20000 + client_id}
+                              for client_id in (5, 6)]}
+        self.leader = shards.ShardedController(("127.0.0.1", 0), master_control.ControllerHandler, config, 0,
+                                               debug=True)
+
+    def tearDown(self):
+        self.leader.kill()
+        self.leader.webcontrol.shutdown()
+        self.leader.webcontrol.server_close()
+        self.leader.server_close()
+
+    def report(self, client_id, connected=True, legacy=False):
+        info = dict(self.leader.clients.get(client_id).as_dict(), CONNECTED=connected, LEGACY=legacy)
+        self.leader.handle_shard((shards.EVENT, "client", info))
+
+    def test_auto_starts_once_every_shard_client_is_connected(self):
+        self.report(5)
+        self.assertFalse(self.leader.started)
+        self.report(6, legacy=True)
+        self.assertTrue(self.leader.started)
+        self.assertEqual(self.leader.clients.connected_count, 2)
+        self.assertTrue(self.leader.clients.get(6).legacy)
+
+    def test_control_progress_comes_from_the_shards(self):
+        self.report(5)
+        self.report(6, legacy=True)
+        while self.leader.tasky.start_ns is None:
+            time.sleep(0.001)
+        with self.assertLogs(shards.NAME, "INFO") as logged:
+            self.assertIsNotNone(self.leader.control(protocol.CONTROL_PAUSE))
+        # THE LEGACY CLIENT IS SKIPPED BY ITS SHARD
+        self.assertIn("SENT TO 1 CLIENTS", "".join(logged.output))
+        record = self.leader.last_control
+        self.leader.handle_shard((shards.SKIPPED, record.seq, 6, "LEGACY"))
+        self.assertFalse(record.done())
+        self.leader.handle_shard((shards.APPLIED, record.seq - 1, 5, 1000, False))
+        self.assertFalse(record.done())
+        self.leader.handle_shard((shards.APPLIED, record.seq, 5, 1000, False))
+        self.assertTrue(record.done())
+
+
+class ShardSplitTest(unittest.TestCase):
+    def test_by_client_id(self):
+        config = {"PORT": 10005, "CLIENTS": [{"ID": client_id} for client_id in range(1, 8)]}
+        self.assertEqual([[client["ID"] for client in shards.shard_clients(config, index, 3)] for index in range(3)],
+                         [[3, 6], [1, 4, 7], [2, 5]])
+        self.assertEqual(shards.shard_port(config, 2), 10107)
+        self.assertEqual(shards.shard_port(dict(config, **{"SHARD PORT": 11000}), 2), 11002)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+# THIS USES PYTHON 3
+
+# SUPERVISOR TESTS
+# REAL CHILD PROCESSES, EACH ONE SHORT LIVED OR ON A TIMEOUT, AND PRELOADING THEM AHEAD OF THEIR CUE
+
+# MODULE IMPORT
+import unittest
+import asyncio
+import signal
+import shlex
+import time
+import sys
+import os
+# LOCAL MODULES
+import supervisor
+import aioengine
+import taskplan
+
+# CONSTANTS
+NS_PER_MS = supervisor.NS_PER_MS
+# HOW LONG A CHILD GETS BEFORE THE TEST GIVES UP
+TIMEOUT_SECONDS = 5
+# A CHILD THAT IGNORES SIGTERM, SAYS SO AND WAITS TO BE KILLED
+STUBBORN = [sys.executable, "-c", "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+                                  "print('READY', flush=True); time.sleep(30)"]
+# A CHILD THAT ECHOES THE FIRST LINE IT'S GIVEN ON STDIN
+ECHO_STDIN = [sys.executable, "-c", "import sys; print(sys.stdin.readline().strip())"]
+
+
+# FUNCTIONS
+def command(idx, args, **options):
+    # A COMPILED TASK RUNNING args, options ARE THE CONFIG'S (TIMEOUT, RELEASE...)
+    task = {"TYPE": "TASK", "DELTA TIME FROM START": 0, "TIME UNITS": "SECONDS", "COMMAND": shlex.join(args)}
+    task.update(options)
+    return taskplan.compile_task(idx, task)
+
+
+def wait_for(condition):
+    # POLL UNTIL condition() IS TRUE, FALSE IF IT NEVER IS
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+# CLASSES
+class OutputTailTest(unittest.TestCase):
+    def test_keeps_the_last_bytes(self):
+        tail = supervisor.OutputTail(8)
+        tail.feed(b"one\ntwo\n")
+        tail.feed(b"three\n")
+        self.assertEqual(tail.text(), "o\nthree\n")
+        self.assertEqual(tail.dropped, 6)
+        self.assertEqual(tail.last_line(), "three")
+        self.assertEqual(supervisor.OutputTail(8).last_line(), "")
+
+
+class ChildTestCase(unittest.TestCase):
+    def setUp(self):
+        self.supervisor = supervisor.Supervisor(kill_grace_ns=100 * NS_PER_MS)
+
+    def tearDown(self):
+        for child in self.supervisor.running():
+            child.proc.kill()
+        self.assertTrue(wait_for(lambda: self.supervisor._thread is None))
+
+    def finished(self, child):
+        self.assertTrue(wait_for(lambda: child.exit_code is not None))
+        return child
+
+
+class SupervisorTest(ChildTestCase):
+    def test_exit_code_and_output(self):
+        with self.assertLogs(supervisor.NAME, "WARNING") as logged:
+            child = self.finished(self.supervisor.spawn(
+                command(0, ["sh", "-c", "echo hello; echo oops >&2; exit 3"])))
+        self.assertEqual((child.state, child.exit_code), (supervisor.EXITED, 3))
+        self.assertEqual(child.stdout.text(), "hello\n")
+        self.assertIn("oops", logged.output[0])
+        report = self.supervisor.get_report()[0]
+        self.assertEqual((report["INDEX"], report["EXIT CODE"], report["STDERR"]), (0, 3, "oops"))
+        self.assertGreaterEqual(report["SPAWN MS"], 0)
+
+    def test_reaped_as_soon_as_it_exits(self):
+        children = [self.supervisor.spawn(command(idx, ["true"])) for idx in range(3)]
+        for child in children:
+            self.finished(child)
+            # A PIDFD WAKES THE REAPER RIGHT AWAY, POLLING COULD TAKE A WHOLE INTERVAL
+            if hasattr(os, "pidfd_open"):
+                self.assertLess(child.ended_ns - child.started_ns, supervisor.POLL_INTERVAL * 1e9)
+        self.assertEqual(self.supervisor.running(), [])
+        # NO CHILDREN LEFT, NO REAPER THREAD
+        self.assertTrue(wait_for(lambda: self.supervisor._thread is None))
+
+    def test_timeout(self):
+        with self.assertLogs(supervisor.NAME, "WARNING"):
+            child = self.finished(self.supervisor.spawn(command(1, ["sleep", "30"], TIMEOUT=0.05)))
+        self.assertEqual((child.state, child.exit_code), (supervisor.TIMED_OUT, -signal.SIGTERM))
+
+    def test_sigkill_after_the_grace_period(self):
+        child = self.supervisor.spawn(command(2, STUBBORN))
+        self.assertTrue(wait_for(lambda: "READY" in child.stdout.text()))
+        stop_ns = time.monotonic_ns()
+        with self.assertLogs(supervisor.NAME, "WARNING") as logged:
+            self.supervisor.stop_all("STOP")
+            self.finished(child)
+        self.assertIn("IGNORED SIGTERM", logged.output[0])
+        self.assertEqual((child.state, child.exit_code), (supervisor.STOPPED, -signal.SIGKILL))
+        self.assertGreaterEqual(child.ended_ns - stop_ns, self.supervisor.kill_grace_ns)
+
+    def test_kill_on_stop_false_is_left_running(self):
+        keep = self.supervisor.spawn(command(3, ["sleep", "30"], **{"KILL ON STOP": False}))
+        stop = self.supervisor.spawn(command(4, ["sleep", "30"]))
+        self.supervisor.stop_all("STOP")
+        self.finished(stop)
+        self.assertEqual(stop.exit_code, -signal.SIGTERM)
+        self.assertEqual(self.supervisor.running(), [keep])
+
+    def test_forced_stop_and_quiet(self):
+        quiet = []
+        keep = self.supervisor.spawn(command(6, ["sleep", "30"], **{"KILL ON STOP": False}))
+        self.supervisor.when_quiet(quiet.append)
+        self.assertEqual(quiet, [])
+        self.assertEqual(self.supervisor.stop_all("ABORT", force=True), 1)
+        self.finished(keep)
+        self.assertTrue(wait_for(lambda: quiet))
+        self.assertGreaterEqual(quiet[0], keep.ended_ns)
+        # NOTHING RUNNING, CALLED RIGHT AWAY
+        self.supervisor.when_quiet(quiet.append)
+        self.assertEqual(len(quiet), 2)
+
+    def test_command_that_cant_start(self):
+        with self.assertLogs(supervisor.NAME, "ERROR"):
+            child = self.supervisor.spawn(command(5, ["/nonexistent/command"]))
+        self.assertEqual(child.state, supervisor.FAILED)
+        self.assertIsNone(self.supervisor._thread)
+
+
+class PreloadTest(ChildTestCase):
+    def test_gate_holds_the_command_until_release(self):
+        child = self.supervisor.preload(command(0, ["sh", "-c", "echo go"]))
+        time.sleep(0.05)
+        self.assertEqual((child.state, child.stdout.text()), (supervisor.RUNNING, ""))
+        self.assertIs(self.supervisor.release(command(0, ["sh", "-c", "echo go"])), child)
+        self.finished(child)
+        self.assertEqual((child.exit_code, child.stdout.text()), (0, "go\n"))
+        self.assertTrue(self.supervisor.get_report()[0]["PRELOADED"])
+
+    def test_release_text_goes_to_the_command_itself(self):
+        task = command(1, ECHO_STDIN, RELEASE="play\n")
+        child = self.supervisor.preload(task)
+        self.supervisor.release(task)
+        self.finished(child)
+        self.assertEqual(child.stdout.text(), "play\n")
+
+    def test_release_without_a_preload_starts_it(self):
+        child = self.finished(self.supervisor.release(command(2, ["true"])))
+        self.assertEqual((child.exit_code, child.preloaded), (0, False))
+
+    def test_timeout_counts_from_the_cue(self):
+        task = command(3, ["sleep", "30"], TIMEOUT=0.05)
+        child = self.supervisor.preload(task)
+        time.sleep(0.15)
+        self.assertEqual(child.state, supervisor.RUNNING)
+        with self.assertLogs(supervisor.NAME, "WARNING"):
+            self.supervisor.release(task)
+            self.finished(child)
+        self.assertEqual(child.state, supervisor.TIMED_OUT)
+        self.assertGreaterEqual(child.ended_ns - child.released_ns, 50 * NS_PER_MS)
+
+    def test_stop_ends_a_preload_that_never_got_its_cue(self):
+        task = command(4, ["sh", "-c", "echo ran"], **{"KILL ON STOP": False})
+        child = self.supervisor.preload(task)
+        self.supervisor.stop_all("STOP")
+        self.finished(child)
+        self.assertEqual((child.state, child.stdout.text()), (supervisor.STOPPED, ""))
+
+
+class AsyncSupervisorTest(unittest.IsolatedAsyncioTestCase):
+    async def test_timeout_then_sigkill(self):
+        sup = aioengine.AsyncSupervisor(asyncio.get_running_loop(), kill_grace_ns=100 * NS_PER_MS)
+        exited = sup.spawn(command(0, ["sh", "-c", "echo hello"]))
+        stubborn = sup.spawn(command(1, STUBBORN, TIMEOUT=1))
+        with self.assertLogs(supervisor.NAME, "WARNING") as logged:
+            for _ in range(TIMEOUT_SECONDS * 100):
+                if exited.exit_code is not None and stubborn.exit_code is not None:
+                    break
+                await asyncio.sleep(0.01)
+        self.assertEqual((exited.state, exited.exit_code, exited.stdout.text()), (supervisor.EXITED, 0, "hello\n"))
+        self.assertEqual((stubborn.state, stubborn.exit_code), (supervisor.TIMED_OUT, -signal.SIGKILL))
+        self.assertIn("TIMED OUT", logged.output[0])
+        self.assertIn("IGNORED SIGTERM", logged.output[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,291 @@
+# THIS USES PYTHON 3
+
+# TASKER TESTS
+# DEADLINE ORDER ON THE MONOTONIC CLOCK, PRECISION MODE AND PAUSE, RESUME AND SEEK,
+# ALSO ON A VIRTUAL CLOCK SO EVERY TIME IS EXACT, DEBUG MODE SO NOTHING IS RUN
+
+# MODULE IMPORT
+import unittest
+import time
+# LOCAL MODULES
+import taskplan
+import simulate
+import tasker
+
+# CONSTANTS
+NS_PER_SEC = tasker.NS_PER_SEC
+# HOW LONG A TASKER GETS TO FINISH A RUN BEFORE THE TEST GIVES UP
+JOIN_SECONDS = 5
+
+
+# FUNCTIONS
+def task(at, command="true", task_type="TASK", units="MILLISECONDS"):
+    return {"TYPE": task_type, "DELTA TIME FROM START": at, "TIME UNITS": units, "COMMAND": command}
+
+
+def stop(at):
+    return task(at, "", "STOP")
+
+
+# CLASSES
+class RecordingTasker(tasker.Tasker):
+    """
+    RecordingTasker - A debug Tasker that notes (COMMAND, SECONDS IN) of every dispatch and preload
+    """
+    def __init__(self, tasks, **kwargs):
+        self.cues = []
+        self.preloaded = []
+        tasker.Tasker.__init__(self, taskplan.compile_tasks(tasks), debug=True, **kwargs)
+
+    def elapsed(self):
+        return (time.monotonic_ns() - self.start_ns) / tasker.NS_PER_SEC
+
+    def _preload(self, task):
+        self.preloaded.append((task.command, self.elapsed()))
+        tasker.Tasker._preload(self, task)
+
+    def _dispatch(self, task):
+        self.cues.append((task.command, self.elapsed()))
+        tasker.Tasker._dispatch(self, task)
+
+
+class RunTestCase(unittest.TestCase):
+    def run_tasks(self, tasks, **kwargs):
+        # RUN A RecordingTasker TO ITS STOP
+        tasky = RecordingTasker(tasks, **kwargs)
+        tasky.start()
+        tasky.join(JOIN_SECONDS)
+        self.assertFalse(tasky.is_alive())
+        self.assertFalse(tasky.is_running())
+        return tasky
+
+
+class TaskerTest(RunTestCase):
+    def test_runs_in_deadline_order(self):
+        tasky = self.run_tasks([task(30, "c"), task(10, "a"), stop(40), task(20, "b")])
+        self.assertEqual([command for command, _ in tasky.cues], ["a", "b", "c", ""])
+        # NEVER EARLY
+        for (command, elapsed), due in zip(tasky.cues, (0.01, 0.02, 0.03, 0.04)):
+            with self.subTest(command=command):
+                self.assertGreaterEqual(elapsed, due)
+
+    def test_ties_go_in_list_order(self):
+        tasky = self.run_tasks([task(10, "a"), task(0.01, "b", units="SECONDS"), task(10, "c"), stop(20)])
+        self.assertEqual([command for command, _ in tasky.cues], ["a", "b", "c", ""])
+
+    def test_units(self):
+        tasky = self.run_tasks([task(20000, "us", units="MICROSECONDS"), task(0.01, "s", units="SECONDS"),
+                                stop(30)])
+        self.assertEqual([command for command, _ in tasky.cues], ["s", "us", ""])
+
+    def test_start_at_anchors_the_timeline(self):
+        start_ns = time.monotonic_ns() + 50 * tasker.NS_PER_MS
+        tasky = RecordingTasker([task(10, "a"), stop(20)])
+        tasky.start_at(start_ns)
+        tasky.join(JOIN_SECONDS)
+        self.assertEqual(tasky.start_ns, start_ns)
+        self.assertEqual([command for command, _ in tasky.cues], ["a", ""])
+        self.assertGreaterEqual(tasky.cues[0][1], 0.01)
+
+    def test_preloads_go_ahead_of_their_cue(self):
+        late = dict(task(30, "a"), **{"PRELOAD MS": 20})
+        early = dict(task(5, "b"), **{"PRELOAD MS": 50})
+        tasky = self.run_tasks([late, early, dict(stop(40), **{"PRELOAD MS": 10})])
+        # TOO CLOSE TO THE START IS PRELOADED AT THE START, A STOP HAS NOTHING TO PRELOAD
+        self.assertEqual([command for command, _ in tasky.preloaded], ["b", "a"])
+        self.assertGreaterEqual(tasky.preloaded[1][1], 0.01)
+        self.assertLess(tasky.preloaded[1][1], tasky.cues[1][1])
+
+    def test_kill_wakes_a_sleeping_tasker(self):
+        for start in ("start", "start_at"):
+            with self.subTest(start=start):
+                tasky = RecordingTasker([task(1, "much later", units="HOURS"), stop(2)])
+                if start == "start":
+                    tasky.start()
+                else:
+                    # STILL WAITING FOR THE START INSTANT
+                    tasky.start_at(time.monotonic_ns() + 3600 * tasker.NS_PER_SEC)
+                tasky.kill()
+                tasky.join(JOIN_SECONDS)
+                self.assertFalse(tasky.is_alive())
+                self.assertEqual(tasky.cues, [])
+
+
+class PrecisionTest(RunTestCase):
+    def test_spins_to_the_deadline(self):
+        tasky = self.run_tasks([task(10, "a"), task(20, "b"), stop(30)], precision=True)
+        self.assertEqual([idx for idx, _ in tasky.lateness], [0, 1, 2])
+        self.assertTrue(all(late >= 0 for _, late in tasky.lateness))
+        self.assertEqual(tasky.get_lateness_stats()["COUNT"], 3)
+
+    def test_budget_only_counts_in_precision_mode(self):
+        # A COARSE SLEEP IS ROUTINELY A MILLISECOND OUT, THAT'S NOT WORTH A WARNING
+        plan = taskplan.compile_tasks([stop(0)])
+        coarse = tasker.Tasker(plan, debug=True, jitter_budget_ns=tasker.NS_PER_MS)
+        with self.assertNoLogs(tasker.NAME, "WARNING"):
+            coarse._record_lateness(0, 5 * tasker.NS_PER_MS)
+        self.assertEqual((len(coarse.lateness), coarse.over_budget), (1, 0))
+        precise = tasker.Tasker(plan, debug=True, precision=True, jitter_budget_ns=tasker.NS_PER_MS)
+        with self.assertLogs(tasker.NAME, "WARNING"):
+            precise._record_lateness(0, 5 * tasker.NS_PER_MS)
+        precise._record_lateness(0, tasker.NS_PER_MS)
+        self.assertEqual((len(precise.lateness), precise.over_budget), (2, 1))
+        self.assertEqual(precise.get_lateness_stats()["MAX"], 5.0)
+
+
+class ControlTest(unittest.TestCase):
+    """
+    ControlTest - Pause, resume and seek with every instant given, on a tasker
+    anchored at 0 whose thread is never started. Cues at 1, 2 and 3 s, a STOP at 4 s
+    """
+    def setUp(self):
+        self.tasky = RecordingTasker([task(at, str(at), units="SECONDS") for at in (1, 2, 3)] +
+                                     [task(4, "", "STOP", units="SECONDS")])
+
+    def test_nothing_to_control_before_the_start(self):
+        self.assertFalse(self.tasky.pause(0))
+        self.assertFalse(self.tasky.seek(0, 0))
+        self.assertIsNone(self.tasky.position_ns())
+
+    def test_position_stands_still_while_paused(self):
+        self.tasky._begin(0)
+        self.assertTrue(self.tasky.pause(int(1.5 * NS_PER_SEC)))
+        self.assertFalse(self.tasky.pause(2 * NS_PER_SEC))
+        self.assertTrue(self.tasky.is_paused())
+        self.assertEqual(self.tasky.position_ns(10 * NS_PER_SEC), int(1.5 * NS_PER_SEC))
+
+    def test_resume_moves_every_deadline(self):
+        self.tasky._begin(0)
+        self.assertFalse(self.tasky.resume(NS_PER_SEC))
+        self.tasky.pause(int(1.5 * NS_PER_SEC))
+        self.assertTrue(self.tasky.resume(5 * NS_PER_SEC))
+        # 3.5 S PAUSED
+        self.assertEqual(self.tasky.start_ns, int(3.5 * NS_PER_SEC))
+        self.assertEqual(self.tasky.position_ns(6 * NS_PER_SEC), int(2.5 * NS_PER_SEC))
+
+    def test_pause_and_resume_at_an_agreed_offset(self):
+        self.tasky._begin(0)
+        self.tasky.pause(int(1.5 * NS_PER_SEC), offset_ns=NS_PER_SEC)
+        self.assertEqual(self.tasky.position_ns(), NS_PER_SEC)
+        self.tasky.resume(5 * NS_PER_SEC, offset_ns=2 * NS_PER_SEC)
+        self.assertEqual(self.tasky.position_ns(6 * NS_PER_SEC), 3 * NS_PER_SEC)
+
+    def test_seek(self):
+        self.tasky._begin(0)
+        self.assertTrue(self.tasky.seek(2 * NS_PER_SEC, 10 * NS_PER_SEC))
+        self.assertEqual(self.tasky.position_ns(11 * NS_PER_SEC), 3 * NS_PER_SEC)
+        # THE CUE AT 2 S IS NEXT
+        self.assertEqual(self.tasky._peek()[1], 1)
+        self.assertFalse(self.tasky.seek(5 * NS_PER_SEC, 10 * NS_PER_SEC))
+        self.tasky.pause(11 * NS_PER_SEC)
+        self.assertTrue(self.tasky.seek(NS_PER_SEC, 12 * NS_PER_SEC))
+        self.assertTrue(self.tasky.is_paused())
+        self.assertEqual(self.tasky.position_ns(20 * NS_PER_SEC), NS_PER_SEC)
+
+    def test_pause_holds_a_running_tasker(self):
+        tasky = RecordingTasker([task(50, "a"), stop(60)])
+        tasky.start()
+        while tasky.start_ns is None:
+            time.sleep(0.001)
+        self.assertTrue(tasky.pause())
+        time.sleep(0.1)
+        self.assertEqual(tasky.cues, [])
+        self.assertTrue(tasky.resume())
+        tasky.join(JOIN_SECONDS)
+        self.assertEqual([command for command, _ in tasky.cues], ["a", ""])
+
+
+
+class TimelineTest(unittest.TestCase):
+    """
+    TimelineTest - A debug tasker with cues at 1, 2 and 3 s and a STOP at 4 s,
+    started at 0 on a virtual clock. cues is (INDEX, WHEN) of every cue
+    """
+    def setUp(self):
+        tasks = [{"TYPE": "TASK", "DELTA TIME FROM START": at, "TIME UNITS": "SECONDS", "COMMAND": "true"}
+                 for at in (1, 2, 3)]
+        tasks.append({"TYPE": "STOP", "DELTA TIME FROM START": 4, "TIME UNITS": "SECONDS", "COMMAND": ""})
+        self.clock = simulate.VirtualClock()
+        self.cues = []
+        self.tasky = simulate.SimTasker(taskplan.compile_tasks(tasks), self.clock, debug=True,
+                                        on_fire=lambda idx, task, late: self.cues.append((idx, self.clock())))
+        self.tasky.start_at(0)
+
+    def at(self, seconds, action, *args):
+        # DO SOMETHING TO THE TASKER seconds IN, ITS RESULT GOES IN self.results
+        self.results = getattr(self, "results", [])
+        self.clock.call_at_ns(int(seconds * NS_PER_SEC),
+                              lambda: self.results.append(getattr(self.tasky, action)(*args)))
+
+    def test_runs_on_time(self):
+        self.clock.run()
+        self.assertEqual(self.cues, [(0, NS_PER_SEC), (1, 2 * NS_PER_SEC), (2, 3 * NS_PER_SEC),
+                                      (3, 4 * NS_PER_SEC)])
+        self.assertTrue(self.tasky.dead)
+        self.assertEqual([late for _, late in self.tasky.lateness], [0, 0, 0, 0])
+
+    def test_pause_holds_and_resume_moves_every_deadline(self):
+        self.at(1.5, "pause")
+        self.at(5, "resume")
+        self.clock.run()
+        # 3.5 S PAUSED
+        self.assertEqual(self.cues, [(0, NS_PER_SEC), (1, int(5.5 * NS_PER_SEC)), (2, int(6.5 * NS_PER_SEC)),
+                                      (3, int(7.5 * NS_PER_SEC))])
+        self.assertEqual(self.results, [True, True])
+
+    def test_position_stands_still_while_paused(self):
+        self.clock.call_at_ns(int(1.5 * NS_PER_SEC), self.tasky.pause)
+        self.clock.call_at_ns(3 * NS_PER_SEC, self.tasky.kill)
+        self.clock.run()
+        self.assertEqual(self.tasky.position_ns(), int(1.5 * NS_PER_SEC))
+        self.assertEqual(self.tasky.position_ns(10 * NS_PER_SEC), int(1.5 * NS_PER_SEC))
+
+    def test_pause_and_resume_at_given_offsets(self):
+        # THE MASTER WAS A LITTLE AHEAD, WE HOLD AND CARRY ON WHERE IT SAYS
+        self.at(1.5, "pause", int(1.5 * NS_PER_SEC), int(1.75 * NS_PER_SEC))
+        self.at(3, "resume", 3 * NS_PER_SEC, int(1.75 * NS_PER_SEC))
+        self.clock.run()
+        self.assertEqual(self.tasky.start_ns, int(1.25 * NS_PER_SEC))
+        self.assertEqual(self.cues[1], (1, int(3.25 * NS_PER_SEC)))
+
+    def test_pause_twice_and_resume_unpaused_are_refused(self):
+        self.at(0.5, "resume")
+        self.at(1.5, "pause")
+        self.at(1.6, "pause")
+        self.at(2, "resume")
+        self.clock.run()
+        self.assertEqual(self.results, [False, True, False, True])
+
+    def test_seek_forward_skips_cues(self):
+        self.at(0.5, "seek", int(2.5 * NS_PER_SEC))
+        self.clock.run()
+        self.assertEqual(self.cues, [(2, NS_PER_SEC), (3, 2 * NS_PER_SEC)])
+
+    def test_seek_back_runs_cues_again(self):
+        self.at(2.5, "seek", 0)
+        self.clock.run()
+        self.assertEqual([idx for idx, _ in self.cues], [0, 1, 0, 1, 2, 3])
+        self.assertEqual(self.cues[2], (0, int(3.5 * NS_PER_SEC)))
+
+    def test_seek_while_paused_stays_paused(self):
+        self.at(1.5, "pause")
+        self.at(2, "seek", int(2.5 * NS_PER_SEC))
+        self.at(3, "resume")
+        self.clock.run()
+        self.assertEqual(self.cues[1], (2, int(3.5 * NS_PER_SEC)))
+
+    def test_seek_past_the_end_is_refused(self):
+        self.at(0.5, "seek", 5 * NS_PER_SEC)
+        self.clock.run()
+        self.assertEqual(self.results, [False])
+        self.assertEqual(len(self.cues), 4)
+
+    def test_nothing_before_the_start(self):
+        tasky = simulate.SimTasker(self.tasky.plan, self.clock, debug=True)
+        self.assertFalse(tasky.pause(0))
+        self.assertFalse(tasky.seek(0, 0))
+        self.assertIsNone(tasky.position_ns())
+
+
+if __name__ == "__main__":
+    unittest.main()
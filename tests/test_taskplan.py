@@ -0,0 +1,179 @@
+# THIS USES PYTHON 3
+
+# TASK PLAN TESTS
+# COMPILING A TASK LIST, FINDING PLACES IN ITS SCHEDULE AND RECOMPILING IT ON A RELOAD
+
+# MODULE IMPORT
+import tempfile
+import unittest.mock
+import unittest
+import random
+import json
+import os
+# LOCAL MODULES
+import taskplan
+
+# CONSTANTS
+NS_PER_SEC = taskplan.NS_PER_SEC
+
+
+# FUNCTIONS
+def task(at, command="true", task_type="TASK", **options):
+    return dict({"TYPE": task_type, "DELTA TIME FROM START": at, "TIME UNITS": "SECONDS",
+                 "COMMAND": command}, **options)
+
+
+def stop(at):
+    return task(at, "", "STOP")
+
+
+# CLASSES
+class CompileTest(unittest.TestCase):
+    def test_schedule_is_sorted_with_preloads_ahead(self):
+        plan = taskplan.compile_tasks([task(2), task(1, **{"PRELOAD MS": 500}), stop(3)])
+        self.assertEqual([entry[:3] for entry in plan.schedule],
+                         [(NS_PER_SEC // 2, 1, taskplan.PRELOAD),
+                          (NS_PER_SEC, 1, taskplan.CUE),
+                          (2 * NS_PER_SEC, 0, taskplan.CUE),
+                          (3 * NS_PER_SEC, 2, taskplan.CUE)])
+        self.assertEqual(len(plan), 3)
+
+    def test_preload_before_the_start_is_at_the_start(self):
+        plan = taskplan.compile_tasks([task(1, **{"PRELOAD MS": 5000}), stop(2)])
+        self.assertEqual(plan.schedule[0][:3], (0, 0, taskplan.PRELOAD))
+
+    def test_units(self):
+        plan = taskplan.compile_tasks([task(1500, **{"TIME UNITS": "Milliseconds"}),
+                                       task(2, **{"TIME UNITS": "minutes"}), stop(3)])
+        self.assertEqual([record.offset_ns for record in plan.tasks],
+                         [3 * NS_PER_SEC // 2, 120 * NS_PER_SEC, 3 * NS_PER_SEC])
+
+    def test_no_stop_is_an_error(self):
+        with self.assertRaises(taskplan.PlanError):
+            taskplan.compile_tasks([task(1)])
+
+    def test_bad_tasks_are_errors(self):
+        for bad in (task(-1), task(1, ""), task(1, "echo 'unclosed"), task(1, RELEASE=5),
+                    task(1, **{"TIME UNITS": "DAYS"}), task("1"), {"TYPE": "TASK"}):
+            with self.subTest(task=bad), self.assertRaises(taskplan.PlanError):
+                taskplan.compile_tasks([bad, stop(2)])
+
+    def test_options(self):
+        plan = taskplan.compile_tasks([task(1, "play 'a b'", RELEASE="p\n", TIMEOUT=1.5,
+                                            **{"KILL ON STOP": False}), stop(2)])
+        record = plan.tasks[0]
+        self.assertEqual(record.args, ["play", "a b"])
+        self.assertEqual((record.release, record.timeout_ns, record.kill_on_stop),
+                         (b"p\n", 3 * NS_PER_SEC // 2, False))
+
+    def test_tasks_after_the_stop_are_logged(self):
+        with self.assertLogs(taskplan.NAME, "WARNING") as logged:
+            plan = taskplan.compile_tasks([task(3), stop(2)])
+        self.assertIn("1 TASK(S) COME AFTER THE STOP TASK AND WILL NEVER RUN, FIRST IS TASK 0", logged.output[0])
+        self.assertEqual(len(plan.schedule), 2)
+
+    def test_config_is_left_alone(self):
+        tasks = [task(1), stop(2)]
+        taskplan.compile_tasks(tasks)
+        self.assertEqual(tasks, [task(1), stop(2)])
+
+
+class SeekTest(unittest.TestCase):
+    TASKS = [task(1), task(2), task(2), task(5, **{"PRELOAD MS": 1000}), stop(9)]
+
+    def check_seek(self, plan):
+        # FIRST ENTRY DUE AT OR AFTER THE OFFSET, THE END IF THERE'S NONE
+        self.assertEqual(plan.seek(0), 0)
+        self.assertEqual(plan.seek(NS_PER_SEC), 0)
+        self.assertEqual(plan.seek(NS_PER_SEC + 1), 1)
+        self.assertEqual(plan.seek(2 * NS_PER_SEC), 1)
+        self.assertEqual(plan.entry(plan.seek(3 * NS_PER_SEC))[:3], (4 * NS_PER_SEC, 3, taskplan.PRELOAD))
+        self.assertEqual(plan.entry(plan.seek(4 * NS_PER_SEC + 1))[:3], (5 * NS_PER_SEC, 3, taskplan.CUE))
+        self.assertEqual(plan.seek(9 * NS_PER_SEC), 5)
+        self.assertEqual(plan.seek(10 * NS_PER_SEC), 6)
+        self.assertIsNone(plan.entry(6))
+
+    def test_task_plan(self):
+        self.check_seek(taskplan.compile_tasks(self.TASKS))
+
+    def test_streamed_plan_agrees(self):
+        with tempfile.TemporaryDirectory() as where:
+            path = os.path.join(where, "show.jsonl")
+            with open(path, "w") as task_file:
+                task_file.write("".join(json.dumps(line) + "\n" for line in self.TASKS))
+            plan = taskplan.StreamedPlan(path)
+            self.check_seek(plan)
+            compiled = taskplan.compile_tasks(self.TASKS)
+            self.assertEqual([plan.entry(pos)[:3] for pos in range(6)],
+                             [entry[:3] for entry in compiled.schedule])
+            self.assertEqual(plan.task(3).preload_ns, compiled.task(3).preload_ns)
+
+
+
+class RecompileTest(unittest.TestCase):
+    OLD = [task(1, "a"), task(2, "b", **{"PRELOAD MS": 500}), task(3, "c"), stop(4)]
+
+    def setUp(self):
+        self.plan = taskplan.compile_tasks(self.OLD)
+
+    def recompile(self, tasks):
+        # THE RECOMPILED PLAN HAS TO BE THE ONE compile_tasks WOULD HAVE BUILT
+        # RETURNS IT AND HOW MANY TASKS WERE COMPILED FOR IT
+        with unittest.mock.patch.object(taskplan, "compile_task", wraps=taskplan.compile_task) as compiling:
+            plan = taskplan.recompile_tasks(self.plan, self.OLD, tasks)
+        expected = taskplan.compile_tasks(tasks)
+        self.assertEqual([entry[:3] for entry in plan.schedule], [entry[:3] for entry in expected.schedule])
+        self.assertEqual([(record.index, record.command) for record in plan.tasks],
+                         [(record.index, record.command) for record in expected.tasks])
+        for offset_ns, idx, phase, record in plan.schedule:
+            self.assertIs(record, plan.task(idx))
+        return plan, compiling.call_count
+
+    def test_unchanged_is_the_same_plan(self):
+        self.assertIs(taskplan.recompile_tasks(self.plan, self.OLD, [dict(t) for t in self.OLD]), self.plan)
+
+    def test_edit(self):
+        plan, compiled = self.recompile([self.OLD[0], task(2.5, "b"), self.OLD[2], self.OLD[3]])
+        self.assertEqual(compiled, 1)
+        self.assertIs(plan.task(0), self.plan.task(0))
+
+    def test_insert_in_the_middle_only_compiles_the_new_task(self):
+        plan, compiled = self.recompile(self.OLD[:1] + [task(0.5, "new")] + self.OLD[1:])
+        self.assertEqual(compiled, 1)
+        self.assertIs(plan.task(2).args, self.plan.task(1).args)
+
+    def test_delete_and_reorder(self):
+        _, compiled = self.recompile([self.OLD[3], self.OLD[2], self.OLD[0]])
+        self.assertEqual(compiled, 0)
+
+    def test_duplicates_are_matched_once_each(self):
+        _, compiled = self.recompile(self.OLD + [self.OLD[0], self.OLD[0]])
+        self.assertEqual(compiled, 2)
+
+    def test_stop_checks(self):
+        with self.assertRaises(taskplan.PlanError):
+            taskplan.recompile_tasks(self.plan, self.OLD, self.OLD[:3])
+        with self.assertLogs("ESCAPE ROOM", "WARNING") as logged:
+            self.recompile(self.OLD[:3] + [stop(1.5)])
+        self.assertIn("2 TASK(S) COME AFTER THE STOP", logged.output[0])
+
+    def test_random_changes(self):
+        chooser = random.Random(25)
+        for _ in range(200):
+            tasks = list(self.OLD)
+            for _ in range(chooser.randint(1, 4)):
+                where = chooser.randint(0, len(tasks))
+                change = chooser.choice(("insert", "delete", "edit"))
+                if change == "insert" or not tasks:
+                    tasks.insert(where, task(chooser.randint(0, 8) / 2, chooser.choice("abcd")))
+                elif change == "delete":
+                    del tasks[min(where, len(tasks) - 1)]
+                else:
+                    tasks[min(where, len(tasks) - 1)] = task(chooser.randint(0, 8) / 2, "e")
+            tasks.append(stop(5))
+            with self.subTest(tasks=tasks):
+                self.recompile(tasks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# THIS USES PYTHON 3
+
+# VENUE TESTS
+# ROOMS SHARING ONE SOCKET OVER LOOPBACK ON THE ASYNCIO ENGINE, DEBUG MODE SO NOTHING IS RUN
+
+# MODULE IMPORT
+import unittest
+import asyncio
+import time
+# LOCAL MODULES
+import master_control
+import aioengine
+import protocol
+import client
+
+# CONSTANTS
+# HOW LONG A RUN GETS BEFORE THE TEST GIVES UP
+TIMEOUT_SECONDS = 5
+
+
+# FUNCTIONS
+def task(at_ms, command="true", task_type="TASK"):
+    return {"TYPE": task_type, "DELTA TIME FROM START": at_ms, "TIME UNITS": "MILLISECONDS", "COMMAND": command}
+
+
+def room_config(port):
+    # ONE CLIENT WITH ID 5 IN EVERY ROOM, A STOP THAT NEVER COMES ON ITS OWN
+    return {"START OPTION": "AUTO", "START LEAD MS": 50, "PING TIMER": 0.05,
+            "CLIENTS": [{"ID": 5, "IP": "127.0.0.1", "PORT": port}],
+            "TASKS": [task(10), task(3600000, "", "STOP")]}
+
+
+async def wait_for(condition):
+    # POLL THE LOOP UNTIL condition() IS TRUE, FALSE IF IT NEVER IS
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.005)
+    return True
+
+
+# CLASSES
+class VenueTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        loop = asyncio.get_running_loop()
+        self.clients = {name: aioengine.AsyncClient(("127.0.0.1", 0), client.ClientHandler,
+                                                    {"ID": 5, "TASKS": room_config(0)["TASKS"]}, loop, debug=True)
+                        for name in ("a", "b")}
+        rooms = {name: room_config(myclient.server_address[1]) for name, myclient in self.clients.items()}
+        self.venue = aioengine.AsyncVenue(("127.0.0.1", 0), master_control.ControllerHandler, {"WEB PORT": 0},
+                                          rooms, loop, debug=True)
+        self.serving = [loop.create_task(aioengine._serve(server))
+                        for server in [self.venue] + list(self.clients.values())]
+
+    async def asyncTearDown(self):
+        for server in [self.venue] + list(self.clients.values()):
+            server.kill()
+        await asyncio.gather(*self.serving)
+
+    def test_rooms_need_unique_names_and_client_addresses(self):
+        taken = room_config(self.clients["a"].server_address[1])
+        for name, config in (("a", room_config(1)), ("c/d", room_config(1)), ("c", taken)):
+            with self.subTest(name=name), self.assertRaises(ValueError):
+                self.venue.add_room(name, config)
+        self.assertEqual(sorted(self.venue.rooms), ["a", "b"])
+
+    def test_web_requests_go_to_their_room(self):
+        web = self.venue.webcontrol
+        state, path = web.route("/rooms/b/api/status?x=1")
+        self.assertIs(state, self.venue.rooms["b"].webcontrol)
+        self.assertEqual(path, "/api/status?x=1")
+        self.assertEqual(web.route("/rooms/nowhere/api/status")[0], None)
+        self.assertEqual(web.route("/api/rooms"), (web, "/api/rooms"))
+        code, status = web.api("GET", "/api/rooms")
+        self.assertEqual((code, [room["NAME"] for room in status["ROOMS"]]), (200, ["a", "b"]))
+
+    async def test_rooms_start_and_pause_on_their_own(self):
+        rooms = self.venue.rooms
+        # EVERY ROOM AUTO STARTS ITS OWN CLIENT OVER THE SHARED SOCKET
+        started = await wait_for(lambda: all(myclient.tasky.start_ns is not None
+                                             for myclient in self.clients.values()))
+        self.assertTrue(started)
+        self.assertTrue(all(room.started for room in rooms.values()))
+        # A PAUSE IN ONE ROOM ONLY REACHES ITS CLIENT
+        self.assertIsNotNone(rooms["a"].webcontrol.push_control(protocol.CONTROL_PAUSE))
+        self.assertTrue(await wait_for(lambda: rooms["a"].last_control.done()))
+        self.assertTrue(self.clients["a"].tasky.is_paused())
+        self.assertFalse(self.clients["b"].tasky.is_paused())
+        self.assertIsNone(rooms["b"].last_control)
+        # A STOP FOR THE VENUE STOPS EVERY ROOM
+        self.assertEqual(self.venue.webcontrol.api("POST", "/api/stop"),
+                         (202, {"RESULT": "STOP", "ROOMS": ["a", "b"]}))
+        self.assertTrue(await wait_for(lambda: all(myclient.done_with_tasks for myclient in self.clients.values())))
+        self.assertTrue(all(room.done_with_tasks for room in rooms.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,342 @@
+# THIS USES PYTHON 3
+
+# VENUE
+# CODE TO HOST MANY ROOMS IN ONE MASTER PROCESS
+#
+# A VENUE CONFIG LISTS ROOM CONFIGS INSTEAD OF CLIENTS AND TASKS. EVERY ROOM
+# KEEPS ITS OWN CLIENTS, TASKER, DELIVERIES AND RUN STATE (A master_control.Room)
+# BUT THEY ALL SHARE ONE UDP SOCKET, ONE PING TIMER, ONE RETRANSMIT THREAD AND
+# ONE WEB SERVER, SO A ROOM THAT ISN'T RUNNING IS JUST DATA
+#
+# MESSAGES ARE ROUTED TO A ROOM BY THE ADDRESS THEY CAME FROM, SO CLIENT
+# ADDRESSES HAVE TO BE UNIQUE ACROSS THE VENUE, CLIENT IDS ONLY WITHIN A ROOM.
+# EACH ROOM'S PAGE, API AND EVENTS ARE UNDER /rooms/NAME, THE TOP PAGE AND
+# /api/rooms LIST THEM ALL
+
+# MODULE IMPORT
+import socketserver
+import urllib.parse
+import threading
+import html
+import json
+import time
+import os
+import logging
+# LOCAL MODULES
+import master_control
+import tasker
+import protocol
+
+# LOGGER HANDLER
+NAME = "ESCAPE ROOM"
+logger = logging.getLogger(NAME)
+
+# CONSTANTS
+NS_PER_SEC = tasker.NS_PER_SEC
+# KEYS THAT ONLY MEAN SOMETHING IN THE VENUE CONFIG, A ROOM'S ARE IGNORED
+VENUE_KEYS = ("PORT", "WEB PORT", "LOG BUFFER", "LOG REPEAT SECONDS", "LOG JSON")
+
+# CLASSES
+class VenueRoom(master_control.Room):
+    """
+    VenueRoom - A Room that sends on its venue's socket and has the venue
+    ping and retransmit for it
+    """
+    def __init__(self, venue, name, config, debug=False):
+        self.venue = venue
+        self.socket = venue.socket
+        master_control.Room.__init__(self, config, debug=debug, name=name)
+
+    def _start_services(self):
+        master_control.Room._start_services(self)
+        # THE VENUE'S RETRANSMIT THREAD SLEEPS UNTIL A ROOM HAS SOMETHING PENDING
+        self.delivery.on_pending = self.venue.wake_delivery
+
+    def _count_connected(self):
+        master_control.CLIENTS_CONNECTED.set(self.venue.connected_count())
+
+    def _clients_changed(self, added, removed):
+        # MESSAGES FROM THE ADDRESSES WE LOST MAY ALREADY BE ANOTHER ROOM'S
+        for client in removed:
+            if self.venue.by_address.get(client.address) is self:
+                del self.venue.by_address[client.address]
+        for client in added:
+            self.venue.by_address[client.address] = self
+        master_control.Room._clients_changed(self, added, removed)
+
+    def summary(self):
+        # WHAT THE ROOM LIST SHOWS, get_status() HAS EVERYTHING
+        return {"NAME": self.name,
+                "PATH": self.webcontrol.prefix,
+                "STARTED": self.started,
+                "DONE": self.done_with_tasks,
+                "CLIENTS": len(self.clients),
+                "CONNECTED": self.clients.connected_count,
+                "ALL CONNECTED": self.all_connected}
+
+
+class VenueWebState(master_control.WebControlState):
+    """
+    VenueWebState - Sends /rooms/NAME requests on to that room's web state,
+    everything else is the room list, the shared metrics or a stop for every room
+    """
+    def __init__(self, venue, registry=None):
+        master_control.WebControlState.__init__(self, status=venue.get_status, registry=registry)
+        self.venue = venue
+
+    def route(self, path):
+        url = urllib.parse.urlsplit(path)
+        if not url.path.startswith(master_control.ROOMS_PATH):
+            return self, path
+        name, _, rest = url.path[len(master_control.ROOMS_PATH):].partition("/")
+        room = self.venue.rooms.get(urllib.parse.unquote(name))
+        if room is None:
+            return None, path
+        return room.webcontrol, urllib.parse.urlunsplit(("", "", "/" + rest, url.query, ""))
+
+    def api(self, method, path):
+        # GET /api/rooms (OR /api/status), /api/metrics - POST /api/stop STOPS EVERY ROOM,
+        # POST /api/reload RELOADS THE VENUE CONFIG
+        route = urllib.parse.urlparse(path).path[len(master_control.API_PREFIX):].strip("/").lower()
+        if route in ("rooms", "status"):
+            if method != "GET":
+                return 405, {"RESULT": "USE GET"}
+            return 200, self.get_status()
+        if route in ("metrics", "reload"):
+            return master_control.web_api(self, method, path)
+        if route == "stop":
+            if method != "POST":
+                return 405, {"RESULT": "USE POST"}
+            return 202, {"RESULT": "STOP", "ROOMS": self.venue.stop_all()}
+        return 404, {"RESULT": "UNKNOWN ACTION {0}, ROOMS ARE UNDER {1}NAME{2}".format(
+            route.upper(), master_control.ROOMS_PATH, master_control.API_PREFIX)}
+
+    def page(self, path):
+        return venue_page(self, path)
+
+
+class VenueWebControl(socketserver.ThreadingMixIn, VenueWebState, socketserver.TCPServer):
+
+    # WE KINDA WANT TO BE A DAEMON
+    daemon_threads = True
+    # DON'T WAIT ON EVENT STREAMS WHEN CLOSING
+    block_on_close = False
+    # FASTER BINDING
+    allow_reuse_address = True
+
+    def __init__(self, server_address, RequestHandlerClass, venue):
+        socketserver.TCPServer.__init__(self, server_address, RequestHandlerClass)
+        VenueWebState.__init__(self, venue)
+
+
+class Venue(socketserver.UDPServer):
+    """
+    Venue - Many rooms behind one socket
+     - Every datagram goes to the room that has a client at its address and
+       is handled there by the same ControllerHandler a Controller uses
+     - One ping timer ticks at the shortest interval of any room, each room
+       only pings whoever of its clients is due
+     - One thread retransmits for every room, sleeping until the earliest
+       retransmit anywhere is due
+    """
+
+    # WE KINDA WANT TO BE A DAEMON
+    daemon_threads = True
+    # FASTER BINDING
+    allow_reuse_address = True
+
+    def __init__(self, server_address, RequestHandlerClass, config, rooms, debug=False):
+        socketserver.UDPServer.__init__(self, server_address, RequestHandlerClass)
+        self.config = config
+        self.debug = debug
+        self.dead = False
+        # ROOM NAME -> ROOM, AND CLIENT (IP, PORT) -> ITS ROOM FOR ROUTING
+        self.rooms = {}
+        self.by_address = {}
+        # SET WHEN A ROOM QUEUES A COMMAND SO THE RETRANSMIT THREAD LOOKS AGAIN
+        self._wakeup = threading.Condition()
+        self._woken = False
+        if not rooms:
+            raise ValueError("VENUE HAS NO ROOMS")
+        for name, room_config in rooms.items():
+            self.add_room(name, room_config)
+        logger.info("HOSTING {0} ROOMS WITH {1} CLIENTS".format(len(self.rooms), len(self.by_address)))
+        self._start_services()
+
+    def _create_room(self, name, config):
+        return VenueRoom(self, name, config, debug=self.debug)
+
+    def add_room(self, name, config):
+        if not name or "/" in name or name in self.rooms:
+            raise ValueError("BAD OR DUPLICATE ROOM NAME {0!r}".format(name))
+        for client in config["CLIENTS"]:
+            owner = self.by_address.get((client["IP"], client["PORT"]))
+            if owner is not None:
+                raise ValueError("ROOM {0} CLIENT ID {1} HAS THE SAME ADDRESS {2}:{3} AS A CLIENT IN ROOM {4}".format(
+                    name, client["ID"], client["IP"], client["PORT"], owner.name))
+        room = self._create_room(name, config)
+        self.rooms[name] = room
+        for client in room.clients:
+            self.by_address[client.address] = room
+        return room
+
+    def reload(self, config):
+        # TAKE ON A CHANGED VENUE CONFIG WITH ITS ROOMS LOADED (SEE master_control.reload_config)
+        # ROOMS THAT ARE GONE ARE KILLED, NEW ONES ADDED AND THE REST RELOADED, RETURNS WHAT
+        # CHANGED BY ROOM. RAISES ValueError AND CHANGES NOTHING IF A CLIENT ADDRESS WOULD BE
+        # IN TWO ROOMS, A ROOM THAT CAN'T TAKE ITS NEW CONFIG IS LEFT AS IT WAS
+        rooms = config["ROOMS"]
+        if not rooms:
+            raise ValueError("VENUE HAS NO ROOMS")
+        owners = {}
+        for name, room_config in rooms.items():
+            for client in room_config["CLIENTS"]:
+                owner = owners.setdefault((client["IP"], client["PORT"]), name)
+                if owner != name:
+                    raise ValueError("ROOM {0} CLIENT ID {1} HAS THE SAME ADDRESS {2}:{3} AS A CLIENT IN ROOM {4}".format(
+                        name, client["ID"], client["IP"], client["PORT"], owner))
+        # THE PING AND RETRANSMIT LOOPS CARRY ON OVER THE OLD ROOM LIST
+        self.rooms = dict(self.rooms)
+        changes = {}
+        for name in [name for name in self.rooms if name not in rooms]:
+            logger.warning("ROOM {0} REMOVED".format(name))
+            room = self.rooms.pop(name)
+            room.kill()
+            for client in room.clients:
+                if self.by_address.get(client.address) is room:
+                    del self.by_address[client.address]
+            master_control.CLIENTS_CONNECTED.set(self.connected_count())
+            changes[name] = "REMOVED"
+        # EXISTING ROOMS FIRST, THEY MAY BE HANDING ADDRESSES OVER TO NEW ONES
+        for name in sorted(rooms, key=lambda name: name not in self.rooms):
+            try:
+                if name in self.rooms:
+                    changes[name] = self.rooms[name].reload(rooms[name])
+                else:
+                    self.add_room(name, rooms[name])
+                    logger.warning("ROOM {0} ADDED".format(name))
+                    changes[name] = "ADDED"
+            except (KeyError, ValueError) as err:
+                logger.error("ROOM {0} NOT RELOADED: {1}".format(name, err))
+                changes[name] = {"ERROR": str(err)}
+        self.config = config
+        self.retick()
+        return changes
+
+    def retick(self):
+        # THE PING TIMER PICKS UP A CHANGED SHORTEST INTERVAL FROM ITS NEXT TICK
+        self.looper.interval = self.tick_interval
+
+    @property
+    def tick_interval(self):
+        # THE PING TIMER HAS TO KEEP UP WITH THE ROOM THAT PINGS MOST OFTEN
+        return min(room.liveness.tick_interval for room in self.rooms.values())
+
+    def _start_services(self):
+        # THREADED ENGINE - RETRANSMITS, PINGS AND WEB CONTROL GET ONE THREAD EACH FOR EVERY ROOM
+        self.delivery_thread = threading.Thread(target=self.run_deliveries, daemon=True)
+        self.delivery_thread.start()
+
+        self.looper = master_control.LoopingTimer(self.tick_interval, self.send_pings, True)
+        self.looper.start()
+
+        self.webcontrol = VenueWebControl((master_control.ANYHOST, master_control.web_port(self.config)),
+                                          master_control.WebControlHandler, self)
+        self.web_thread = threading.Thread(target=self.webcontrol.serve_forever)
+        self.web_thread.start()
+
+    def room_for(self, address):
+        return self.by_address.get(address)
+
+    def connected_count(self):
+        return sum(room.clients.connected_count for room in self.rooms.values())
+
+    def send_pings(self):
+        for room in self.rooms.values():
+            room.send_ping()
+
+    def wake_delivery(self):
+        with self._wakeup:
+            self._woken = True
+            self._wakeup.notify()
+
+    def service_deliveries(self, now):
+        # RESEND ANYTHING DUE IN ANY ROOM, RETURNS THE NEXT DUE TIME ANYWHERE OR NONE
+        due = [room.delivery.service(now) for room in self.rooms.values()]
+        return min((when for when in due if when is not None), default=None)
+
+    def run_deliveries(self):
+        # THREAD BODY - SLEEP UNTIL THE NEXT RETRANSMIT IN ANY ROOM IS DUE OR NEW WORK SHOWS UP
+        while not self.dead:
+            with self._wakeup:
+                self._woken = False
+            nxt = self.service_deliveries(time.monotonic_ns())
+            with self._wakeup:
+                if self.dead or self._woken:
+                    continue
+                if nxt is None:
+                    self._wakeup.wait()
+                else:
+                    wait = nxt - time.monotonic_ns()
+                    if wait > 0:
+                        self._wakeup.wait(wait / NS_PER_SEC)
+
+    def stop_all(self):
+        # STOP EVERYTHING IN EVERY ROOM, RETURNS THE ROOM NAMES
+        for room in self.rooms.values():
+            room.webcontrol.push_control(protocol.CONTROL_STOP)
+        return list(self.rooms)
+
+    def get_status(self):
+        return {"ROOMS": [room.summary() for room in self.rooms.values()],
+                "CONNECTED": self.connected_count(),
+                "CLIENTS": len(self.by_address)}
+
+    # THIS IS AN OVERLOADED FUNCTION
+    def service_actions(self):
+        for room in self.rooms.values():
+            room.service_actions()
+
+    def kill(self):
+        self.looper.cancel()
+        with self._wakeup:
+            self.dead = True
+            self._wakeup.notify_all()
+        for room in self.rooms.values():
+            room.kill()
+
+
+# FUNCTIONS
+def load_rooms(config, base_dir="."):
+    # ROOM NAME -> ROOM CONFIG FROM A VENUE CONFIG'S "ROOMS", EACH ONE IS A
+    # MASTER CONFIG OR THE PATH TO ONE (RELATIVE TO THE VENUE CONFIG)
+    rooms = {}
+    for name, room in config["ROOMS"].items():
+        if isinstance(room, str):
+            with open(os.path.join(base_dir, room)) as room_file:
+                room = json.load(room_file)
+        ignored = [key for key in VENUE_KEYS if key in room]
+        if ignored:
+            logger.warning("ROOM {0}: {1} ONLY COUNT IN THE VENUE CONFIG".format(name, ", ".join(ignored)))
+        rooms[name] = room
+    return rooms
+
+
+def venue_page(server, path):
+    # THE ROOM LIST, ?cmd=stop STOPS EVERY ROOM
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(path).query)
+    message = ""
+    if query.get("cmd") == ["stop"]:
+        message += "<p>STOPPED {0} ROOMS</p>".format(len(server.venue.stop_all()))
+    for room in server.venue.rooms.values():
+        summary = room.summary()
+        if summary["STARTED"]:
+            state = "RUNNING"
+        elif summary["DONE"]:
+            state = "DONE"
+        else:
+            state = "WAITING"
+        message += '<p><a href="{0}/control.html">{1}</a> {2} - {3} OF {4} CLIENTS CONNECTED</p>'.format(
+            summary["PATH"], html.escape(room.name), state, summary["CONNECTED"], summary["CLIENTS"])
+    message += '<p><a href="/control.html?cmd=stop">STOP EVERY ROOM</a></p>'
+    return message